@@ -97,6 +97,21 @@ class CodeExecutionSandboxConfig(BaseSettings):
         default=10.0,
     )
 
+    CODE_EXECUTION_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of concurrent connections to the code execution service",
+        default=100,
+    )
+
+    CODE_EXECUTION_POOL_MAX_KEEPALIVE_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of idle keep-alive connections to the code execution service",
+        default=20,
+    )
+
+    CODE_EXECUTION_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Time in seconds an idle keep-alive connection to the code execution service is kept open",
+        default=5.0,
+    )
+
     CODE_MAX_NUMBER: PositiveInt = Field(
         description="Maximum allowed numeric value in code execution",
         default=9223372036854775807,
@@ -381,6 +396,26 @@ class HttpConfig(BaseSettings):
         default=5,
     )
 
+    SSRF_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of concurrent connections per pooled HTTP client for network requests (SSRF)",
+        default=100,
+    )
+
+    SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of idle keep-alive connections per pooled HTTP client for network requests (SSRF)",
+        default=20,
+    )
+
+    SSRF_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Time in seconds an idle keep-alive connection is kept open for network requests (SSRF)",
+        default=5.0,
+    )
+
+    SSRF_POOL_HTTP2_ENABLED: bool = Field(
+        description="Negotiate HTTP/2 for network requests (SSRF) when the 'h2' package is installed",
+        default=True,
+    )
+
     RESPECT_XFORWARD_HEADERS_ENABLED: bool = Field(
         description="Enable handling of X-Forwarded-For, X-Forwarded-Proto, and X-Forwarded-Port headers"
         " when the app is behind a single trusted reverse proxy.",
@@ -451,6 +486,23 @@ class ModelLoadBalanceConfig(BaseSettings):
     )
 
 
+class ModelProviderConfig(BaseSettings):
+    """
+    Configuration for model provider configurations
+    """
+
+    PROVIDER_CONFIGURATIONS_CACHE_TTL: NonNegativeInt = Field(
+        description="Time in seconds a workspace's model provider configurations are cached in process,"
+        " 0 to disable the cache",
+        default=30,
+    )
+
+    PROVIDER_CONFIGURATIONS_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of workspaces whose model provider configurations are cached in process",
+        default=1000,
+    )
+
+
 class BillingConfig(BaseSettings):
     """
     Configuration for platform billing features
@@ -498,6 +550,11 @@ class WorkflowConfig(BaseSettings):
         default=3,
     )
 
+    WORKFLOW_GRAPH_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of compiled workflow graphs (per workflow version and root node) kept in memory",
+        default=256,
+    )
+
     MAX_VARIABLE_SIZE: PositiveInt = Field(
         description="Maximum size in bytes for a single variable in workflows. Default to 200 KB.",
         default=200 * 1024,
@@ -681,6 +738,17 @@ class RagEtlConfig(BaseSettings):
         default="false",
     )
 
+    PDF_EXTRACT_MAX_WORKERS: NonNegativeInt = Field(
+        description="Maximum number of processes parsing the pages of one PDF in parallel, 0 or 1 to parse in process."
+        " Always parsed in process under gevent.",
+        default=4,
+    )
+
+    PDF_EXTRACT_PAGES_PER_TASK: PositiveInt = Field(
+        description="Number of PDF pages each parsing process handles at a time",
+        default=50,
+    )
+
 
 class DataSetConfig(BaseSettings):
     """
@@ -717,6 +785,16 @@ class DataSetConfig(BaseSettings):
         default=30,
     )
 
+    SEGMENT_CONTENT_CACHE_TTL: NonNegativeInt = Field(
+        description="Time in seconds retrieved segment contents are cached in process, 0 to disable the cache",
+        default=60,
+    )
+
+    SEGMENT_CONTENT_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of segment contents cached in process",
+        default=10000,
+    )
+
 
 class WorkspaceConfig(BaseSettings):
     """
@@ -744,6 +822,21 @@ class IndexingConfig(BaseSettings):
         default=50,
     )
 
+    INDEXING_EMBEDDING_WORKERS: PositiveInt = Field(
+        description="Maximum number of embedding requests in flight while indexing one document",
+        default=8,
+    )
+
+    INDEXING_PIPELINE_QUEUE_SIZE: PositiveInt = Field(
+        description="Maximum number of batches waiting between two stages of the indexing pipeline",
+        default=8,
+    )
+
+    GPT2_TOKEN_COUNT_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of texts whose GPT-2 token counts are cached in process, 0 to disable the cache",
+        default=10000,
+    )
+
 
 class MultiModalTransferConfig(BaseSettings):
     MULTIMODAL_SEND_FORMAT: Literal["base64", "url"] = Field(
@@ -872,6 +965,7 @@ class FeatureConfig(
     LoggingConfig,
     MailConfig,
     ModelLoadBalanceConfig,
+    ModelProviderConfig,
     ModerationConfig,
     MultiModalTransferConfig,
     PositionConfig,
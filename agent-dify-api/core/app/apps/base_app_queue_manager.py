@@ -1,9 +1,16 @@
+import logging
 import queue
+import threading
 import time
+import types
 from abc import abstractmethod
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from decimal import Decimal
 from enum import Enum
-from typing import Any, Optional
+from typing import Any, Literal, Optional, Union, get_args, get_origin
 
+from pydantic import BaseModel
 from sqlalchemy.orm import DeclarativeMeta
 
 from configs import dify_config
@@ -18,6 +25,8 @@ from core.app.entities.queue_entities import (
 )
 from extensions.ext_redis import redis_client
 
+logger = logging.getLogger(__name__)
+
 
 class PublishFrom(Enum):
     APPLICATION_MANAGER = 1
@@ -25,6 +34,9 @@ class PublishFrom(Enum):
 
 
 class AppQueueManager:
+    PING_INTERVAL = 10
+    STOP_CHECK_INTERVAL = 1.0
+
     def __init__(self, task_id: str, user_id: str, invoke_from: InvokeFrom) -> None:
         if not user_id:
             raise ValueError("user is required")
@@ -42,6 +54,12 @@ class AppQueueManager:
 
         self._q = q
 
+        # Stop signal: set locally by the pub/sub subscription while listening,
+        # otherwise refreshed from redis at most once per STOP_CHECK_INTERVAL
+        self._stopped = False
+        self._last_stop_check: float = 0
+        self._stop_subscription: Optional[threading.Thread] = None
+
     def listen(self):
         """
         Listen to queue
@@ -50,28 +68,34 @@ class AppQueueManager:
         # wait for APP_MAX_EXECUTION_TIME seconds to stop listen
         listen_timeout = dify_config.APP_MAX_EXECUTION_TIME
         start_time = time.time()
-        last_ping_time: int | float = 0
-        while True:
-            try:
-                message = self._q.get(timeout=1)
-                if message is None:
-                    break
-
-                yield message
-            except queue.Empty:
-                continue
-            finally:
-                elapsed_time = time.time() - start_time
-                if elapsed_time >= listen_timeout or self._is_stopped():
-                    # publish two messages to make sure the client can receive the stop signal
-                    # and stop listening after the stop signal processed
-                    self.publish(
-                        QueueStopEvent(stopped_by=QueueStopEvent.StopBy.USER_MANUAL), PublishFrom.TASK_PIPELINE
-                    )
-
-                if elapsed_time // 10 > last_ping_time:
-                    self.publish(QueuePingEvent(), PublishFrom.TASK_PIPELINE)
-                    last_ping_time = elapsed_time // 10
+        next_ping_time = start_time + self.PING_INTERVAL
+        self._subscribe_stop_signal()
+        try:
+            while True:
+                try:
+                    # wake up for the next ping at the latest, and often enough to notice a stop
+                    timeout = max(0.0, min(next_ping_time - time.time(), self.STOP_CHECK_INTERVAL))
+                    message = self._q.get(timeout=timeout)
+                    if message is None:
+                        break
+
+                    yield message
+                except queue.Empty:
+                    continue
+                finally:
+                    now = time.time()
+                    if now - start_time >= listen_timeout or self._is_stopped():
+                        # publish two messages to make sure the client can receive the stop signal
+                        # and stop listening after the stop signal processed
+                        self.publish(
+                            QueueStopEvent(stopped_by=QueueStopEvent.StopBy.USER_MANUAL), PublishFrom.TASK_PIPELINE
+                        )
+
+                    if now >= next_ping_time:
+                        self.publish(QueuePingEvent(), PublishFrom.TASK_PIPELINE)
+                        next_ping_time = now + self.PING_INTERVAL
+        finally:
+            self._unsubscribe_stop_signal()
 
     def stop_listen(self) -> None:
         """
@@ -96,7 +120,8 @@ class AppQueueManager:
         :param pub_from:
         :return:
         """
-        self._check_for_sqlalchemy_models(event.model_dump())
+        if not _is_sqlalchemy_free_type(type(event)):
+            self._check_for_sqlalchemy_models(event.model_dump())
         self._publish(event, pub_from)
 
     @abstractmethod
@@ -125,18 +150,57 @@ class AppQueueManager:
 
         stopped_cache_key = cls._generate_stopped_cache_key(task_id)
         redis_client.setex(stopped_cache_key, 600, 1)
+        redis_client.publish(stopped_cache_key, 1)
 
     def _is_stopped(self) -> bool:
         """
         Check if task is stopped
         :return:
         """
-        stopped_cache_key = AppQueueManager._generate_stopped_cache_key(self._task_id)
-        result = redis_client.get(stopped_cache_key)
-        if result is not None:
+        if self._stopped:
             return True
+        if self._stop_subscription is not None:
+            # pushed by the subscription, nothing to fetch
+            return False
 
-        return False
+        now = time.monotonic()
+        if now - self._last_stop_check < self.STOP_CHECK_INTERVAL:
+            return False
+        self._last_stop_check = now
+        return self._fetch_stop_flag()
+
+    def _fetch_stop_flag(self) -> bool:
+        stopped_cache_key = AppQueueManager._generate_stopped_cache_key(self._task_id)
+        if redis_client.get(stopped_cache_key) is not None:
+            self._stopped = True
+        return self._stopped
+
+    def _on_stop_signal(self, message: dict) -> None:
+        self._stopped = True
+
+    def _subscribe_stop_signal(self) -> None:
+        """
+        Subscribe to the task's stop channel so the stop flag is pushed instead of polled
+        :return:
+        """
+        if self._stop_subscription is not None:
+            return
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{AppQueueManager._generate_stopped_cache_key(self._task_id): self._on_stop_signal})
+            self._stop_subscription = pubsub.run_in_thread(sleep_time=self.STOP_CHECK_INTERVAL, daemon=True)
+        except Exception:
+            logger.warning("Failed to subscribe to the stop signal of task %s, polling instead", self._task_id)
+            return
+        # the flag may have been set before the subscription was active
+        self._fetch_stop_flag()
+
+    def _unsubscribe_stop_signal(self) -> None:
+        subscription = self._stop_subscription
+        self._stop_subscription = None
+        if subscription is not None:
+            # the worker thread closes its pub/sub connection once it exits
+            subscription.stop()
 
     @classmethod
     def _generate_task_belong_cache_key(cls, task_id: str) -> str:
@@ -171,5 +235,48 @@ class AppQueueManager:
                 )
 
 
+_SQLALCHEMY_FREE_LEAF_TYPES = (str, int, float, bool, bytes, Decimal, datetime, Enum, type(None))
+_sqlalchemy_free_types: dict[type, bool] = {}
+
+
+def _is_sqlalchemy_free_annotation(annotation: Any, seen: set[type]) -> bool:
+    origin = get_origin(annotation)
+    if origin is None:
+        if not isinstance(annotation, type):
+            return False
+        if issubclass(annotation, _SQLALCHEMY_FREE_LEAF_TYPES):
+            return True
+        if issubclass(annotation, BaseModel):
+            return _is_sqlalchemy_free_type(annotation, seen)
+        return False
+    if origin is Literal:
+        return True
+    if origin in {Union, types.UnionType, list, tuple, set, frozenset, dict, Sequence, Mapping} or (
+        isinstance(origin, type) and issubclass(origin, Sequence | Mapping)
+    ):
+        args = [arg for arg in get_args(annotation) if arg is not Ellipsis]
+        return bool(args) and all(_is_sqlalchemy_free_annotation(arg, seen) for arg in args)
+    return False
+
+
+def _is_sqlalchemy_free_type(model: type[BaseModel], seen: Optional[set[type]] = None) -> bool:
+    """
+    Whether the declared field types of an event model rule out SQLAlchemy model instances,
+    so publishing it can skip the per-event recursive check. Fields typed ``Any``,
+    bare containers or arbitrary classes make it unsafe. Cached per class.
+    """
+    cached = _sqlalchemy_free_types.get(model)
+    if cached is not None:
+        return cached
+    seen = seen if seen is not None else set()
+    if model in seen:
+        # recursive model, decided by the outer call
+        return True
+    seen.add(model)
+    result = all(_is_sqlalchemy_free_annotation(field.annotation, seen) for field in model.model_fields.values())
+    _sqlalchemy_free_types[model] = result
+    return result
+
+
 class GenerateTaskStoppedError(Exception):
     pass
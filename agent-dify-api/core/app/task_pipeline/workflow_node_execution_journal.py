@@ -0,0 +1,128 @@
+import logging
+import threading
+from typing import Any, Optional
+
+from sqlalchemy import Engine
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from extensions.ext_database import db
+from models.workflow import WorkflowNodeExecution
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = list(WorkflowNodeExecution.__table__.columns)
+
+
+class WorkflowNodeExecutionJournal:
+    """
+    Write-behind persistence of the node executions of one workflow run.
+
+    ``record`` only snapshots the row's current state in memory; the latest state
+    of each execution wins. A background writer bulk upserts everything recorded
+    since its last checkpoint (every ``flush_interval`` seconds, or sooner once
+    ``max_pending`` executions are waiting), so the streaming thread never waits
+    on the database. ``flush`` writes synchronously and ``close`` performs the
+    final flush at the end of the run.
+    """
+
+    def __init__(self, flush_interval: float = 0.5, max_pending: int = 100) -> None:
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # one writer at a time, so an older state never overwrites a newer one
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+        self._engine: Optional[Engine] = None
+
+    def record(self, workflow_node_execution: WorkflowNodeExecution) -> None:
+        """
+        Record the current state of a node execution
+        :param workflow_node_execution: node execution, not attached to any session
+        :return:
+        """
+        row = {}
+        for column in _COLUMNS:
+            value = getattr(workflow_node_execution, column.key)
+            # leave server defaults (id, elapsed_time, created_at) to the database
+            if value is not None or column.server_default is None:
+                row[column.key] = value
+
+        with self._lock:
+            if self._engine is None:
+                # bound here, where the caller's app context is available
+                self._engine = db.engine
+            self._pending[workflow_node_execution.id] = row
+            pending = len(self._pending)
+            if self._writer is None and not self._closed:
+                self._writer = threading.Thread(target=self._run, name="node-execution-journal", daemon=True)
+                self._writer.start()
+        if pending >= self._max_pending:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """
+        Write everything recorded so far
+        :return:
+        """
+        with self._write_lock:
+            with self._lock:
+                rows = list(self._pending.values())
+                self._pending = {}
+            if not rows:
+                return
+            try:
+                self._upsert(rows)
+            except Exception:
+                logger.exception("Failed to persist %d workflow node executions", len(rows))
+                with self._lock:
+                    # retry on the next checkpoint, unless a newer state was recorded meanwhile
+                    for row in rows:
+                        self._pending.setdefault(row["id"], row)
+                raise
+
+    def close(self) -> None:
+        """
+        Stop the background writer and flush what is left
+        :return:
+        """
+        with self._lock:
+            self._closed = True
+            writer = self._writer
+        self._wakeup.set()
+        if writer is not None:
+            writer.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            with self._lock:
+                closed = self._closed
+            if closed:
+                return
+            try:
+                self.flush()
+            except Exception:
+                # already logged, the rows stay pending
+                pass
+
+    def _upsert(self, rows: list[dict[str, Any]]) -> None:
+        # rows with the same columns share one multi-row statement
+        groups: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(row), []).append(row)
+
+        with Session(self._engine) as session:
+            for columns, group in groups.items():
+                stmt = insert(WorkflowNodeExecution).values(group)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[WorkflowNodeExecution.id],
+                    set_={column: stmt.excluded[column] for column in columns if column != "id"},
+                )
+                session.execute(stmt)
+            session.commit()
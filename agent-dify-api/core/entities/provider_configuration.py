@@ -18,6 +18,7 @@ from core.entities.provider_entities import (
 )
 from core.helper import encrypter
 from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
 from core.model_runtime.entities.model_entities import AIModelEntity, FetchFrom, ModelType
 from core.model_runtime.entities.provider_entities import (
     ConfigurateMethod,
@@ -124,7 +125,7 @@ class ProviderConfiguration(BaseModel):
             if not credentials and self.custom_configuration.provider:
                 credentials = self.custom_configuration.provider.credentials
 
-            return credentials
+            return credentials.copy() if credentials else credentials
 
     def get_system_configuration_status(self) -> Optional[SystemConfigurationStatus]:
         """
@@ -280,6 +281,8 @@ class ProviderConfiguration(BaseModel):
 
         provider_model_credentials_cache.delete()
 
+        ProviderConfigurationsCache.invalidate(self.tenant_id)
+
         self.switch_preferred_provider_type(ProviderType.CUSTOM)
 
     def delete_custom_credentials(self) -> None:
@@ -305,6 +308,8 @@ class ProviderConfiguration(BaseModel):
 
             provider_model_credentials_cache.delete()
 
+            ProviderConfigurationsCache.invalidate(self.tenant_id)
+
     def get_custom_model_credentials(
         self, model_type: ModelType, model: str, obfuscated: bool = False
     ) -> Optional[dict]:
@@ -447,6 +452,8 @@ class ProviderConfiguration(BaseModel):
 
         provider_model_credentials_cache.delete()
 
+        ProviderConfigurationsCache.invalidate(self.tenant_id)
+
     def delete_custom_model_credentials(self, model_type: ModelType, model: str) -> None:
         """
         Delete custom model credentials.
@@ -470,6 +477,8 @@ class ProviderConfiguration(BaseModel):
 
             provider_model_credentials_cache.delete()
 
+            ProviderConfigurationsCache.invalidate(self.tenant_id)
+
     def _get_provider_model_setting(self, model_type: ModelType, model: str) -> ProviderModelSetting | None:
         """
         Get provider model setting.
@@ -513,6 +522,8 @@ class ProviderConfiguration(BaseModel):
             db.session.add(model_setting)
             db.session.commit()
 
+        ProviderConfigurationsCache.invalidate(self.tenant_id)
+
         return model_setting
 
     def disable_model(self, model_type: ModelType, model: str) -> ProviderModelSetting:
@@ -538,6 +549,8 @@ class ProviderConfiguration(BaseModel):
             db.session.add(model_setting)
             db.session.commit()
 
+        ProviderConfigurationsCache.invalidate(self.tenant_id)
+
         return model_setting
 
     def get_provider_model_setting(self, model_type: ModelType, model: str) -> Optional[ProviderModelSetting]:
@@ -611,6 +624,8 @@ class ProviderConfiguration(BaseModel):
             db.session.add(model_setting)
             db.session.commit()
 
+        ProviderConfigurationsCache.invalidate(self.tenant_id)
+
         return model_setting
 
     def disable_model_load_balancing(self, model_type: ModelType, model: str) -> ProviderModelSetting:
@@ -650,6 +665,8 @@ class ProviderConfiguration(BaseModel):
             db.session.add(model_setting)
             db.session.commit()
 
+        ProviderConfigurationsCache.invalidate(self.tenant_id)
+
         return model_setting
 
     def get_model_type_instance(self, model_type: ModelType) -> AIModel:
@@ -710,6 +727,7 @@ class ProviderConfiguration(BaseModel):
             db.session.add(preferred_model_provider)
 
         db.session.commit()
+        ProviderConfigurationsCache.invalidate(self.tenant_id)
 
     def extract_secret_variables(self, credential_form_schemas: list[CredentialFormSchema]) -> list[str]:
         """
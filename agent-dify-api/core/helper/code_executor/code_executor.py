@@ -4,7 +4,7 @@ from enum import StrEnum
 from threading import Lock
 from typing import Any, Optional
 
-from httpx import Timeout, post
+from httpx import Limits, Timeout
 from pydantic import BaseModel
 from yarl import URL
 
@@ -13,6 +13,7 @@ from core.helper.code_executor.javascript.javascript_transformer import NodeJsTe
 from core.helper.code_executor.jinja2.jinja2_transformer import Jinja2TemplateTransformer
 from core.helper.code_executor.python3.python3_transformer import Python3TemplateTransformer
 from core.helper.code_executor.template_transformer import TemplateTransformer
+from core.helper.http_client_pool import http_client_pool
 
 logger = logging.getLogger(__name__)
 
@@ -76,7 +77,14 @@ class CodeExecutor:
         }
 
         try:
-            response = post(
+            client = http_client_pool.get_client(
+                limits=Limits(
+                    max_connections=dify_config.CODE_EXECUTION_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=dify_config.CODE_EXECUTION_POOL_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=dify_config.CODE_EXECUTION_POOL_KEEPALIVE_EXPIRY,
+                )
+            )
+            response = client.post(
                 str(url),
                 json=data,
                 headers=headers,
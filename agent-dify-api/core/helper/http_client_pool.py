@@ -0,0 +1,173 @@
+"""
+Process-wide pool of long-lived httpx clients
+"""
+
+import importlib.util
+import os
+import threading
+from collections.abc import Mapping
+from http.cookiejar import CookieJar
+from typing import Any, Optional
+
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+
+class _NoPersistCookieJar(CookieJar):
+    """
+    Cookie jar that never stores response cookies.
+
+    Pooled clients are shared by every tenant in the process, so cookies set by
+    one response must not be sent with anyone else's request. Cookies passed
+    explicitly with a request are still sent.
+    """
+
+    def extract_cookies(self, response, request):
+        pass
+
+    def set_cookie(self, cookie):
+        pass
+
+
+class ConnectionMetrics:
+    """Requests sent versus connections and TLS handshakes actually made"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def trace(self, event_name: str, info: Mapping[str, Any]) -> None:
+        """httpcore trace callback"""
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            requests = self.requests
+            connections_opened = self.connections_opened
+            tls_handshakes = self.tls_handshakes
+        return {
+            "requests": requests,
+            "connections_opened": connections_opened,
+            "tls_handshakes": tls_handshakes,
+            "connections_reused": max(requests - connections_opened, 0),
+        }
+
+
+class HttpClientPool:
+    """
+    Long-lived httpx clients shared by the whole process, one per configuration
+    (verify, proxies, limits, HTTP/2), so requests reuse keep-alive connections
+    instead of paying a TCP and TLS handshake each time.
+
+    httpx clients are thread safe. Connections are never shared across a fork:
+    the child process starts with an empty pool and leaves the inherited
+    sockets to the parent.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: dict[tuple, httpx.Client] = {}
+        self._pid = os.getpid()
+        self.metrics = ConnectionMetrics()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        # Drop (don't close) the parent's clients: closing would shut down its connections
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._pid = os.getpid()
+
+    def get_client(
+        self,
+        *,
+        verify: bool = True,
+        proxy: Optional[str] = None,
+        proxy_mounts: Optional[Mapping[str, str]] = None,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = False,
+    ) -> httpx.Client:
+        """
+        Shared client for the given configuration
+        :param verify: verify TLS certificates
+        :param proxy: proxy URL for all requests
+        :param proxy_mounts: proxy URL by URL pattern (e.g. ``{"http://": ..., "https://": ...}``)
+        :param limits: connection pool limits, ``DEFAULT_LIMITS`` if not given
+        :param http2: negotiate HTTP/2; ignored when the ``h2`` package is not installed
+
+        :return:
+        """
+        limits = limits or DEFAULT_LIMITS
+        http2 = http2 and HTTP2_AVAILABLE
+        key = (
+            verify,
+            proxy,
+            tuple(sorted((proxy_mounts or {}).items())),
+            limits.max_connections,
+            limits.max_keepalive_connections,
+            limits.keepalive_expiry,
+            http2,
+        )
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = self._create_client(verify, proxy, proxy_mounts, limits, http2)
+            return client
+
+    def _create_client(
+        self,
+        verify: bool,
+        proxy: Optional[str],
+        proxy_mounts: Optional[Mapping[str, str]],
+        limits: httpx.Limits,
+        http2: bool,
+    ) -> httpx.Client:
+        mounts = None
+        if proxy_mounts:
+            mounts = {
+                pattern: httpx.HTTPTransport(proxy=proxy_url, verify=verify, limits=limits, http2=http2)
+                for pattern, proxy_url in proxy_mounts.items()
+            }
+        client = httpx.Client(
+            verify=verify,
+            proxy=proxy,
+            mounts=mounts,
+            limits=limits,
+            http2=http2,
+            event_hooks={"request": [self._on_request]},
+        )
+        client.cookies = _NoPersistCookieJar()  # type: ignore[assignment]
+        return client
+
+    def _on_request(self, request: httpx.Request) -> None:
+        self.metrics.record_request()
+        request.extensions["trace"] = self.metrics.trace
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients = {}
+        for client in clients:
+            client.close()
+
+
+http_client_pool = HttpClientPool()
@@ -0,0 +1,139 @@
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Optional
+
+from cachetools import LRUCache, TTLCache
+
+from configs import dify_config
+from extensions.ext_redis import redis_client
+
+if TYPE_CHECKING:
+    from core.entities.provider_configuration import ProviderConfigurations
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderConfigurationsCache:
+    """
+    In-process cache of each tenant's ``ProviderConfigurations``, so resolving a
+    model instance is a dictionary lookup instead of several tenant-wide queries
+    and credential decryptions.
+
+    Entries live for ``PROVIDER_CONFIGURATIONS_CACHE_TTL`` seconds at most. Every
+    write to a tenant's providers, models, settings or credentials calls
+    ``invalidate``, which bumps the tenant's version in Redis and publishes it, so
+    all processes drop their entry right away. An entry built while a newer
+    version was published is never stored. Cached configurations are shared by
+    every request of the tenant and must not be modified.
+    """
+
+    CHANNEL = "provider_configurations_invalidated"
+
+    _entries: TTLCache = TTLCache(
+        maxsize=dify_config.PROVIDER_CONFIGURATIONS_CACHE_SIZE,
+        ttl=max(dify_config.PROVIDER_CONFIGURATIONS_CACHE_TTL, 1),
+    )
+    # latest version seen per tenant
+    _versions: LRUCache = LRUCache(maxsize=dify_config.PROVIDER_CONFIGURATIONS_CACHE_SIZE * 10)
+    _lock = threading.Lock()
+    _subscription: Optional[Any] = None
+    _subscription_pid: Optional[int] = None
+
+    @staticmethod
+    def _version_key(tenant_id: str) -> str:
+        return f"provider_configurations_version:{tenant_id}"
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return dify_config.PROVIDER_CONFIGURATIONS_CACHE_TTL > 0
+
+    @classmethod
+    def get(cls, tenant_id: str) -> Optional["ProviderConfigurations"]:
+        """
+        Cached provider configurations of the tenant
+        :param tenant_id: workspace id
+        :return: configurations, or None if not cached
+        """
+        if not cls.enabled():
+            return None
+        cls._subscribe()
+        with cls._lock:
+            return cls._entries.get(tenant_id)
+
+    @classmethod
+    def version(cls, tenant_id: str) -> int:
+        """Latest version of the tenant's configurations seen by this process, to pass to ``set``"""
+        with cls._lock:
+            return cls._versions.get(tenant_id, 0)
+
+    @classmethod
+    def set(cls, tenant_id: str, configurations: "ProviderConfigurations", version: int) -> None:
+        """
+        Cache provider configurations of the tenant
+        :param tenant_id: workspace id
+        :param configurations: configurations
+        :param version: ``version(tenant_id)`` taken before the configurations were built
+        :return:
+        """
+        if not cls.enabled():
+            return
+        with cls._lock:
+            # invalidated while the configurations were being built
+            if cls._versions.get(tenant_id, 0) != version:
+                return
+            cls._entries[tenant_id] = configurations
+
+    @classmethod
+    def invalidate(cls, tenant_id: str) -> None:
+        """
+        Drop the tenant's cached configurations in every process
+        :param tenant_id: workspace id
+        :return:
+        """
+        version = None
+        try:
+            version = redis_client.incr(cls._version_key(tenant_id))
+            redis_client.publish(cls.CHANNEL, f"{tenant_id}:{version}")
+        except Exception:
+            logger.exception("Failed to publish provider configurations invalidation of tenant %s", tenant_id)
+        cls._apply(tenant_id, version)
+
+    @classmethod
+    def _apply(cls, tenant_id: str, version: Optional[int]) -> None:
+        with cls._lock:
+            cls._entries.pop(tenant_id, None)
+            current = cls._versions.get(tenant_id, 0)
+            cls._versions[tenant_id] = max(current, version) if version is not None else current + 1
+
+    @classmethod
+    def _on_message(cls, message: dict) -> None:
+        data = message["data"]
+        if isinstance(data, bytes):
+            data = data.decode()
+        tenant_id, _, version = data.rpartition(":")
+        cls._apply(tenant_id, int(version))
+
+    @classmethod
+    def _subscribe(cls) -> None:
+        """Listen to invalidations of other processes, once per process"""
+        if cls._subscription_pid == os.getpid():
+            return
+        with cls._lock:
+            if cls._subscription_pid == os.getpid():
+                return
+            # a forked child neither owns the parent's listener thread nor its cache
+            cls._entries.clear()
+            cls._subscription_pid = os.getpid()
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{cls.CHANNEL: cls._on_message})
+                cls._subscription = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            except Exception:
+                logger.warning("Failed to subscribe to provider configurations invalidations, relying on the TTL")
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._entries.clear()
+            cls._versions.clear()
@@ -8,6 +8,7 @@ import time
 import httpx
 
 from configs import dify_config
+from core.helper.http_client_pool import http_client_pool
 
 SSRF_DEFAULT_MAX_RETRIES = dify_config.SSRF_DEFAULT_MAX_RETRIES
 
@@ -34,6 +35,27 @@ class MaxRetriesExceededError(ValueError):
     pass
 
 
+def _get_client() -> httpx.Client:
+    """Pooled client for the configured SSRF proxies, reused across requests and retries"""
+    proxy_mounts = None
+    if not dify_config.SSRF_PROXY_ALL_URL and dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
+        proxy_mounts = {
+            "http://": dify_config.SSRF_PROXY_HTTP_URL,
+            "https://": dify_config.SSRF_PROXY_HTTPS_URL,
+        }
+    return http_client_pool.get_client(
+        verify=HTTP_REQUEST_NODE_SSL_VERIFY,
+        proxy=dify_config.SSRF_PROXY_ALL_URL,
+        proxy_mounts=proxy_mounts,
+        limits=httpx.Limits(
+            max_connections=dify_config.SSRF_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=dify_config.SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=dify_config.SSRF_POOL_KEEPALIVE_EXPIRY,
+        ),
+        http2=dify_config.SSRF_POOL_HTTP2_ENABLED,
+    )
+
+
 def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     if "allow_redirects" in kwargs:
         allow_redirects = kwargs.pop("allow_redirects")
@@ -51,19 +73,7 @@ def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     retries = 0
     while retries <= max_retries:
         try:
-            if dify_config.SSRF_PROXY_ALL_URL:
-                with httpx.Client(proxy=dify_config.SSRF_PROXY_ALL_URL, verify=HTTP_REQUEST_NODE_SSL_VERIFY) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
-                proxy_mounts = {
-                    "http://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTP_URL),
-                    "https://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTPS_URL),
-                }
-                with httpx.Client(mounts=proxy_mounts, verify=HTTP_REQUEST_NODE_SSL_VERIFY) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            else:
-                with httpx.Client(verify=HTTP_REQUEST_NODE_SSL_VERIFY) as client:
-                    response = client.request(method=method, url=url, **kwargs)
+            response = _get_client().request(method=method, url=url, **kwargs)
 
             if response.status_code not in STATUS_FORCELIST:
                 return response
@@ -2,10 +2,13 @@ import concurrent.futures
 import datetime
 import json
 import logging
+import queue
 import re
 import threading
 import time
 import uuid
+from collections import deque
+from collections.abc import Callable
 from typing import Any, Optional, cast
 
 from flask import current_app
@@ -16,9 +19,11 @@ from configs import dify_config
 from core.entities.knowledge_entities import IndexingEstimate, PreviewDetail, QAPreviewDetail
 from core.errors.error import ProviderTokenNotInitError
 from core.model_manager import ModelInstance, ModelManager
-from core.model_runtime.entities.model_entities import ModelType
+from core.model_runtime.entities.model_entities import ModelPropertyKey, ModelType
+from core.model_runtime.model_providers.__base.text_embedding_model import TextEmbeddingModel
 from core.rag.cleaner.clean_processor import CleanProcessor
 from core.rag.datasource.keyword.keyword_factory import Keyword
+from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.docstore.dataset_docstore import DatasetDocumentStore
 from core.rag.extractor.entity.extract_setting import ExtractSetting
 from core.rag.index_processor.constant.index_type import IndexType
@@ -538,36 +543,15 @@ class IndexingRunner:
             )
             create_keyword_thread.start()
 
-        max_workers = 10
         if dataset.indexing_technique == "high_quality":
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = []
-
-                # Distribute documents into multiple groups based on the hash values of page_content
-                # This is done to prevent multiple threads from processing the same document,
-                # Thereby avoiding potential database insertion deadlocks
-                document_groups: list[list[Document]] = [[] for _ in range(max_workers)]
-                for document in documents:
-                    hash = helper.generate_text_hash(document.page_content)
-                    group_index = int(hash, 16) % max_workers
-                    document_groups[group_index].append(document)
-                for chunk_documents in document_groups:
-                    if len(chunk_documents) == 0:
-                        continue
-                    futures.append(
-                        executor.submit(
-                            self._process_chunk,
-                            current_app._get_current_object(),  # type: ignore
-                            index_processor,
-                            chunk_documents,
-                            dataset,
-                            dataset_document,
-                            embedding_model_instance,
-                        )
-                    )
-
-                for future in futures:
-                    tokens += future.result()
+            tokens = self._load_vectors(
+                current_app._get_current_object(),  # type: ignore
+                index_processor,
+                dataset,
+                dataset_document,
+                embedding_model_instance,
+                documents,
+            )
         if dataset_document.doc_form != IndexType.PARENT_CHILD_INDEX:
             create_keyword_thread.join()
         indexing_end_at = time.perf_counter()
@@ -609,38 +593,166 @@ class IndexingRunner:
 
                 db.session.commit()
 
-    def _process_chunk(
-        self, flask_app, index_processor, chunk_documents, dataset, dataset_document, embedding_model_instance
-    ):
-        with flask_app.app_context():
-            # check document is paused
-            self._check_document_paused_status(dataset_document.id)
-
-            tokens = 0
-            if embedding_model_instance:
-                page_content_list = [document.page_content for document in chunk_documents]
-                tokens += sum(embedding_model_instance.get_text_embedding_num_tokens(page_content_list))
-
-            # load index
-            index_processor.load(dataset, chunk_documents, with_keywords=False)
-
-            document_ids = [document.metadata["doc_id"] for document in chunk_documents]
-            db.session.query(DocumentSegment).filter(
-                DocumentSegment.document_id == dataset_document.id,
-                DocumentSegment.dataset_id == dataset.id,
-                DocumentSegment.index_node_id.in_(document_ids),
-                DocumentSegment.status == "indexing",
-            ).update(
-                {
-                    DocumentSegment.status: "completed",
-                    DocumentSegment.enabled: True,
-                    DocumentSegment.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
-                }
-            )
+    def _load_vectors(
+        self, flask_app, index_processor, dataset, dataset_document, embedding_model_instance, documents
+    ) -> int:
+        """
+        Embed documents, write them to the vector index and complete their segments in a staged pipeline.
+
+        Batches of the embedding model's MAX_CHUNKS documents are embedded by up to
+        INDEXING_EMBEDDING_WORKERS threads, written by one vector writer thread and
+        completed by one segment status thread. Stages are connected by queues of
+        at most INDEXING_PIPELINE_QUEUE_SIZE batches, so indexing runs at the pace of
+        the slowest stage. The writer and status stages merge the batches waiting
+        for them into one write, and being single threaded they never contend for
+        the same rows.
+        :return: embedding tokens
+        """
+        batch_size = self._get_embedding_batch_size(embedding_model_instance)
+        embedding_workers = dify_config.INDEXING_EMBEDDING_WORKERS
+        vector = Vector(dataset)
+        stop = threading.Event()
+        errors: list[Exception] = []
+        embedded: queue.Queue = queue.Queue(maxsize=dify_config.INDEXING_PIPELINE_QUEUE_SIZE)
+        written: queue.Queue = queue.Queue(maxsize=dify_config.INDEXING_PIPELINE_QUEUE_SIZE)
+        # busy seconds and documents of each stage
+        progress = {stage: [0.0, 0] for stage in ("embedding", "vector write", "segment update")}
+
+        def put(to: queue.Queue, item: Any) -> None:
+            while not stop.is_set():
+                try:
+                    to.put(item, timeout=1)
+                    return
+                except queue.Full:
+                    continue
 
-            db.session.commit()
+        def take_all(source: queue.Queue) -> Optional[list]:
+            """Wait for the next item and take the ones queued behind it, None once stopped"""
+            while not stop.is_set():
+                try:
+                    items = [source.get(timeout=1)]
+                    break
+                except queue.Empty:
+                    continue
+            else:
+                return None
+            while items[-1] is not None:
+                try:
+                    items.append(source.get_nowait())
+                except queue.Empty:
+                    break
+            return items
+
+        def embed(chunk_documents: list[Document]) -> tuple[list[Document], list[Document], list, int, float]:
+            with flask_app.app_context():
+                # check document is paused
+                self._check_document_paused_status(dataset_document.id)
+                begin = time.perf_counter()
+                tokens = sum(
+                    embedding_model_instance.get_text_embedding_num_tokens(
+                        [document.page_content for document in chunk_documents]
+                    )
+                )
+                vector_documents = index_processor.get_vector_documents(chunk_documents)
+                embeddings = vector.embed_documents(vector_documents) if vector_documents else []
+                return chunk_documents, vector_documents, embeddings, tokens, time.perf_counter() - begin
+
+        def write() -> None:
+            while (items := take_all(embedded)) is not None:
+                batches = [item for item in items if item is not None]
+                if batches:
+                    begin = time.perf_counter()
+                    vector.create_with_embeddings(
+                        [document for _, vector_documents, _ in batches for document in vector_documents],
+                        [embedding for _, _, embeddings in batches for embedding in embeddings],
+                    )
+                    document_ids = [document.metadata["doc_id"] for chunk, _, _ in batches for document in chunk]
+                    progress["vector write"][0] += time.perf_counter() - begin
+                    progress["vector write"][1] += len(document_ids)
+                    put(written, document_ids)
+                if items[-1] is None:
+                    put(written, None)
+                    return
+
+        def complete() -> None:
+            while (items := take_all(written)) is not None:
+                document_ids = [document_id for item in items if item is not None for document_id in item]
+                if document_ids:
+                    begin = time.perf_counter()
+                    db.session.query(DocumentSegment).filter(
+                        DocumentSegment.document_id == dataset_document.id,
+                        DocumentSegment.dataset_id == dataset.id,
+                        DocumentSegment.index_node_id.in_(document_ids),
+                        DocumentSegment.status == "indexing",
+                    ).update(
+                        {
+                            DocumentSegment.status: "completed",
+                            DocumentSegment.enabled: True,
+                            DocumentSegment.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
+                        }
+                    )
+                    db.session.commit()
+                    progress["segment update"][0] += time.perf_counter() - begin
+                    progress["segment update"][1] += len(document_ids)
+                if items[-1] is None:
+                    return
+
+        def run_stage(target: Callable[[], None]) -> threading.Thread:
+            def run() -> None:
+                with flask_app.app_context():
+                    try:
+                        target()
+                    except Exception as e:
+                        errors.append(e)
+                        stop.set()
+
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            return thread
 
-            return tokens
+        stages = [run_stage(write), run_stage(complete)]
+        tokens = 0
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=embedding_workers) as executor:
+                in_flight: deque[concurrent.futures.Future] = deque()
+                for i in range(0, len(documents), batch_size):
+                    in_flight.append(executor.submit(embed, documents[i : i + batch_size]))
+                    # keep at most one batch per embedding worker in flight
+                    while len(in_flight) >= embedding_workers or (i + batch_size >= len(documents) and in_flight):
+                        chunk, vector_documents, embeddings, chunk_tokens, seconds = in_flight.popleft().result()
+                        tokens += chunk_tokens
+                        progress["embedding"][0] += seconds
+                        progress["embedding"][1] += len(chunk)
+                        put(embedded, (chunk, vector_documents, embeddings))
+                    if stop.is_set():
+                        break
+            put(embedded, None)
+        except Exception:
+            stop.set()
+            raise
+        finally:
+            for stage in stages:
+                stage.join()
+
+        if errors:
+            raise errors[0]
+        logging.info(
+            "Indexed document %s: %s",
+            dataset_document.id,
+            ", ".join(f"{stage} {count} docs in {busy:.2f}s" for stage, (busy, count) in progress.items()),
+        )
+        return tokens
+
+    @staticmethod
+    def _get_embedding_batch_size(embedding_model_instance: ModelInstance) -> int:
+        """Number of documents the embedding model takes in one request"""
+        model_type_instance = cast(TextEmbeddingModel, embedding_model_instance.model_type_instance)
+        model_schema = model_type_instance.get_model_schema(
+            embedding_model_instance.model, embedding_model_instance.credentials
+        )
+        if model_schema and ModelPropertyKey.MAX_CHUNKS in model_schema.model_properties:
+            return max(int(model_schema.model_properties[ModelPropertyKey.MAX_CHUNKS]), 1)
+        return 1
 
     @staticmethod
     def _check_document_paused_status(document_id: str):
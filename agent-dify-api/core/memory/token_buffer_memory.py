@@ -1,8 +1,10 @@
+import logging
+from collections import defaultdict
 from collections.abc import Sequence
-from typing import Optional
+from typing import Any, Optional
 
 from core.app.app_config.features.file_upload.manager import FileUploadConfigManager
-from core.file import file_manager
+from core.file import FileUploadConfig, file_manager
 from core.model_manager import ModelInstance
 from core.model_runtime.entities import (
     AssistantPromptMessage,
@@ -15,12 +17,17 @@ from core.model_runtime.entities import (
 )
 from core.prompt.utils.extract_thread_messages import extract_thread_messages
 from extensions.ext_database import db
+from extensions.ext_redis import redis_client
 from factories import file_factory
 from models.model import AppMode, Conversation, Message, MessageFile
-from models.workflow import WorkflowRun
+from models.workflow import Workflow, WorkflowRun
+
+logger = logging.getLogger(__name__)
 
 
 class TokenBufferMemory:
+    TOKEN_COUNT_CACHE_TTL = 86400
+
     def __init__(self, conversation: Conversation, model_instance: ModelInstance) -> None:
         self.conversation = conversation
         self.model_instance = model_instance
@@ -33,8 +40,6 @@ class TokenBufferMemory:
         :param max_token_limit: max token limit
         :param message_limit: message limit
         """
-        app_record = self.conversation.app
-
         # fetch limited messages, and return reversed
         query = (
             db.session.query(
@@ -67,67 +72,143 @@ class TokenBufferMemory:
             thread_messages.pop(0)
 
         messages = list(reversed(thread_messages))
+        if not messages:
+            return []
 
-        prompt_messages: list[PromptMessage] = []
-        for message in messages:
-            files = db.session.query(MessageFile).filter(MessageFile.message_id == message.id).all()
-            if files:
-                file_extra_config = None
-                if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
-                    file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
-                else:
-                    if message.workflow_run_id:
-                        workflow_run = (
-                            db.session.query(WorkflowRun).filter(WorkflowRun.id == message.workflow_run_id).first()
-                        )
-
-                        if workflow_run and workflow_run.workflow:
-                            file_extra_config = FileUploadConfigManager.convert(
-                                workflow_run.workflow.features_dict, is_vision=False
-                            )
-
-                detail = ImagePromptMessageContent.DETAIL.LOW
-                if file_extra_config and app_record:
-                    file_objs = file_factory.build_from_message_files(
-                        message_files=files, tenant_id=app_record.tenant_id, config=file_extra_config
-                    )
-                    if file_extra_config.image_config and file_extra_config.image_config.detail:
-                        detail = file_extra_config.image_config.detail
-                else:
-                    file_objs = []
-
-                if not file_objs:
-                    prompt_messages.append(UserPromptMessage(content=message.query))
-                else:
-                    prompt_message_contents: list[PromptMessageContent] = []
-                    prompt_message_contents.append(TextPromptMessageContent(data=message.query))
-                    for file in file_objs:
-                        prompt_message = file_manager.to_prompt_message_content(
-                            file,
-                            image_detail_config=detail,
-                        )
-                        prompt_message_contents.append(prompt_message)
-
-                    prompt_messages.append(UserPromptMessage(content=prompt_message_contents))
-
-            else:
-                prompt_messages.append(UserPromptMessage(content=message.query))
-
-            prompt_messages.append(AssistantPromptMessage(content=message.answer))
+        message_files = self._get_message_files(messages)
+        file_extra_configs = self._get_file_extra_configs(messages, message_files)
+
+        # keep the most recent (user, assistant) exchanges that fit, walking back from the newest one;
+        # exchanges are only built and counted as far back as the limit reaches
+        keys = [self._token_count_key(message) for message in messages]
+        cached_token_counts = self._get_cached_token_counts(keys)
+        counted: dict[str, int] = {}
+        kept: list[list[PromptMessage]] = []
+        curr_message_tokens = 0
+        for message, key, token_count in zip(reversed(messages), reversed(keys), reversed(cached_token_counts)):
+            user_prompt_message = self._to_user_prompt_message(
+                message, message_files.get(message.id, []), file_extra_configs.get(message.id)
+            )
+            exchange = [user_prompt_message, AssistantPromptMessage(content=message.answer)]
+            if token_count is None:
+                token_count = counted[key] = self.model_instance.get_llm_num_tokens(exchange)
+            if curr_message_tokens + token_count > max_token_limit:
+                break
+            curr_message_tokens += token_count
+            kept.append(exchange)
+
+        self._cache_token_counts(counted)
+
+        if not kept:
+            # not even the last exchange fits, keep its answer only
+            return [AssistantPromptMessage(content=messages[-1].answer)]
+
+        return [prompt_message for exchange in reversed(kept) for prompt_message in exchange]
+
+    def _get_message_files(self, messages: Sequence[Any]) -> dict[str, list[MessageFile]]:
+        """Files of all messages, in one query"""
+        message_files: dict[str, list[MessageFile]] = defaultdict(list)
+        files = db.session.query(MessageFile).filter(MessageFile.message_id.in_([m.id for m in messages])).all()
+        for file in files:
+            message_files[file.message_id].append(file)
+        return message_files
+
+    def _get_file_extra_configs(
+        self, messages: Sequence[Any], message_files: dict[str, list[MessageFile]]
+    ) -> dict[str, FileUploadConfig]:
+        """File upload config of every message with files"""
+        messages_with_files = [message for message in messages if message.id in message_files]
+        if not messages_with_files:
+            return {}
+
+        if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
+            file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
+            if not file_extra_config:
+                return {}
+            return {message.id: file_extra_config for message in messages_with_files}
+
+        # the features of the workflow version each message ran with
+        workflow_run_ids = {message.workflow_run_id for message in messages_with_files if message.workflow_run_id}
+        if not workflow_run_ids:
+            return {}
+        workflow_ids = dict(
+            db.session.query(WorkflowRun.id, WorkflowRun.workflow_id).filter(WorkflowRun.id.in_(workflow_run_ids)).all()
+        )
+        workflows = {
+            workflow.id: workflow
+            for workflow in db.session.query(Workflow).filter(Workflow.id.in_(set(workflow_ids.values()))).all()
+        }
+
+        file_extra_configs: dict[str, FileUploadConfig] = {}
+        configs_by_workflow: dict[str, Optional[FileUploadConfig]] = {}
+        for message in messages_with_files:
+            workflow_id = workflow_ids.get(message.workflow_run_id)
+            if workflow_id not in workflows:
+                continue
+            if workflow_id not in configs_by_workflow:
+                configs_by_workflow[workflow_id] = FileUploadConfigManager.convert(
+                    workflows[workflow_id].features_dict, is_vision=False
+                )
+            file_extra_config = configs_by_workflow[workflow_id]
+            if file_extra_config:
+                file_extra_configs[message.id] = file_extra_config
+        return file_extra_configs
+
+    def _to_user_prompt_message(
+        self, message: Any, files: list[MessageFile], file_extra_config: Optional[FileUploadConfig]
+    ) -> UserPromptMessage:
+        app_record = self.conversation.app
+        if not files or not file_extra_config or not app_record:
+            return UserPromptMessage(content=message.query)
 
-        if not prompt_messages:
-            return []
+        file_objs = file_factory.build_from_message_files(
+            message_files=files, tenant_id=app_record.tenant_id, config=file_extra_config
+        )
+        if not file_objs:
+            return UserPromptMessage(content=message.query)
+
+        detail = ImagePromptMessageContent.DETAIL.LOW
+        if file_extra_config.image_config and file_extra_config.image_config.detail:
+            detail = file_extra_config.image_config.detail
+
+        prompt_message_contents: list[PromptMessageContent] = []
+        prompt_message_contents.append(TextPromptMessageContent(data=message.query))
+        for file in file_objs:
+            prompt_message = file_manager.to_prompt_message_content(
+                file,
+                image_detail_config=detail,
+            )
+            prompt_message_contents.append(prompt_message)
 
-        # prune the chat message if it exceeds the max token limit
-        curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+        return UserPromptMessage(content=prompt_message_contents)
 
-        if curr_message_tokens > max_token_limit:
-            pruned_memory = []
-            while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
-                pruned_memory.append(prompt_messages.pop(0))
-                curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+    def _token_count_key(self, message: Any) -> str:
+        """
+        Cache key of the token count of a message's exchange for the current model.
 
-        return prompt_messages
+        Answered messages never change, so counts are cached in Redis and each
+        exchange is counted once per model instead of on every turn.
+        """
+        return f"memory_exchange_tokens:{self.model_instance.provider}:{self.model_instance.model}:{message.id}"
+
+    def _get_cached_token_counts(self, keys: Sequence[str]) -> list[Optional[int]]:
+        try:
+            cached = redis_client.mget(keys)
+        except Exception:
+            logger.exception("Failed to read cached history token counts")
+            return [None] * len(keys)
+        return [None if value is None else int(value) for value in cached]
+
+    def _cache_token_counts(self, counted: dict[str, int]) -> None:
+        if not counted:
+            return
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for key, token_count in counted.items():
+                pipeline.setex(key, self.TOKEN_COUNT_CACHE_TTL, token_count)
+            pipeline.execute()
+        except Exception:
+            logger.exception("Failed to cache history token counts")
 
     def get_history_prompt_text(
         self,
@@ -1,12 +1,25 @@
 import logging
+from collections.abc import Sequence
+from hashlib import blake2b
 from threading import Lock
 from typing import Any
 
+from cachetools import LRUCache
+
+from configs import dify_config
+
 logger = logging.getLogger(__name__)
 
 _tokenizer: Any = None
 _lock = Lock()
 
+# token counts keyed by a digest of the text, a splitter measures the same separators and chunks over and over
+_token_counts: LRUCache = LRUCache(maxsize=max(dify_config.GPT2_TOKEN_COUNT_CACHE_SIZE, 1))
+_token_counts_lock = Lock()
+
+# below this size a batch is encoded in the calling thread, the thread pool of encode_batch costs more than it saves
+_MIN_PARALLEL_BATCH_SIZE = 8
+
 
 class GPT2Tokenizer:
     @staticmethod
@@ -14,9 +27,7 @@ class GPT2Tokenizer:
         """
         use gpt2 tokenizer to get num tokens
         """
-        _tokenizer = GPT2Tokenizer.get_encoder()
-        tokens = _tokenizer.encode(text)
-        return len(tokens)
+        return GPT2Tokenizer.get_num_tokens_batch([text])[0]
 
     @staticmethod
     def get_num_tokens(text: str) -> int:
@@ -27,9 +38,47 @@ class GPT2Tokenizer:
         # return cast(int, result)
         return GPT2Tokenizer._get_num_tokens_by_gpt2(text)
 
+    @staticmethod
+    def get_num_tokens_batch(texts: Sequence[str]) -> list[int]:
+        """
+        Get num tokens of many texts at once.
+
+        Counts are cached by text digest, and the texts not cached yet are encoded
+        with tiktoken's ``encode_batch``, which releases the GIL across threads.
+        :param texts: texts
+        :return: num tokens of each text
+        """
+        if not dify_config.GPT2_TOKEN_COUNT_CACHE_SIZE:
+            return GPT2Tokenizer._encode_batch(texts)
+
+        keys = [blake2b(text.encode(), digest_size=16).digest() for text in texts]
+        with _token_counts_lock:
+            num_tokens = [_token_counts.get(key) for key in keys]
+
+        # texts not cached yet, each distinct text encoded once
+        missing = {key: text for key, text, count in zip(keys, texts, num_tokens) if count is None}
+        if missing:
+            counted = dict(zip(missing, GPT2Tokenizer._encode_batch(list(missing.values()))))
+            with _token_counts_lock:
+                _token_counts.update(counted)
+            num_tokens = [counted[key] if count is None else count for key, count in zip(keys, num_tokens)]
+
+        return num_tokens
+
+    @staticmethod
+    def _encode_batch(texts: Sequence[str]) -> list[int]:
+        tokenizer = GPT2Tokenizer.get_encoder()
+        if len(texts) >= _MIN_PARALLEL_BATCH_SIZE and hasattr(tokenizer, "encode_batch"):
+            return [len(tokens) for tokens in tokenizer.encode_batch(list(texts))]
+        return [len(tokenizer.encode(text)) for text in texts]
+
     @staticmethod
     def get_encoder() -> Any:
         global _tokenizer, _lock
+        # the tokenizer never changes once loaded, only its loading is locked
+        if _tokenizer is not None:
+            return _tokenizer
+
         with _lock:
             if _tokenizer is None:
                 # Try to use tiktoken to get the tokenizer because it is faster
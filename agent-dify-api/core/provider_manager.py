@@ -22,6 +22,7 @@ from core.entities.provider_entities import (
 from core.helper import encrypter
 from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
 from core.helper.position_helper import is_filtered
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
     ConfigurateMethod,
@@ -89,6 +90,22 @@ class ProviderManager:
         - Get provider instance
         - Switch selection priority
 
+        :param tenant_id:
+        :return:
+        """
+        provider_configurations = ProviderConfigurationsCache.get(tenant_id)
+        if provider_configurations is not None:
+            return provider_configurations
+
+        version = ProviderConfigurationsCache.version(tenant_id)
+        provider_configurations = self._build_configurations(tenant_id)
+        ProviderConfigurationsCache.set(tenant_id, provider_configurations, version)
+        return provider_configurations
+
+    def _build_configurations(self, tenant_id: str) -> ProviderConfigurations:
+        """
+        Build model provider configurations from the workspace's records.
+
         :param tenant_id:
         :return:
         """
@@ -1,17 +1,19 @@
-import json
+import threading
 from collections import defaultdict
 from typing import Any, Optional
 
+from cachetools import LRUCache
 from pydantic import BaseModel
+from sqlalchemy.dialects.postgresql import insert
 
-from configs import dify_config
 from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
 from core.rag.datasource.keyword.keyword_base import BaseKeyword
+from core.rag.datasource.segment_hydrator import SegmentHydrator
 from core.rag.models.document import Document
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from extensions.ext_storage import storage
-from models.dataset import Dataset, DatasetKeywordTable, DocumentSegment
+from models.dataset import Dataset, DatasetKeywordPosting, DatasetKeywordTable, DocumentSegment
 
 
 class KeywordTableConfig(BaseModel):
@@ -19,87 +21,86 @@ class KeywordTableConfig(BaseModel):
 
 
 class Jieba(BaseKeyword):
+    """
+    Jieba keyword index stored as per-keyword postings (``dataset_keyword_postings``).
+
+    Writes insert or delete only the affected (keyword, index node) rows and bump
+    the dataset's index version in redis. Searches read postings through a
+    process-local cache keyed by that version, so a write anywhere invalidates
+    it everywhere. Datasets still holding a whole-table JSON keyword table are
+    moved to postings the first time they are touched.
+    """
+
+    _postings_cache: LRUCache = LRUCache(maxsize=10000)
+    _postings_cache_lock = threading.Lock()
+    _migrated_datasets: set[str] = set()
+    _insert_batch_size = 1000
+    # Length of DatasetKeywordPosting.keyword; longer tokens are not indexed
+    _max_keyword_length = 255
+
     def __init__(self, dataset: Dataset):
         super().__init__(dataset)
         self._config = KeywordTableConfig()
 
     def create(self, texts: list[Document], **kwargs) -> BaseKeyword:
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table_handler = JiebaKeywordTableHandler()
-            keyword_table = self._get_dataset_keyword_table()
-            for text in texts:
+        self.add_texts(texts)
+        return self
+
+    def add_texts(self, texts: list[Document], **kwargs):
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keywords_list = kwargs.get("keywords_list")
+        node_keywords: dict[str, list[str]] = {}
+        for i, text in enumerate(texts):
+            keywords = keywords_list[i] if keywords_list else None
+            if not keywords:
                 keywords = keyword_table_handler.extract_keywords(
                     text.page_content, self._config.max_keywords_per_chunk
                 )
-                if text.metadata is not None:
-                    self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
-                    keyword_table = self._add_text_to_keyword_table(
-                        keyword_table or {}, text.metadata["doc_id"], list(keywords)
-                    )
-
-            self._save_dataset_keyword_table(keyword_table)
-
-            return self
-
-    def add_texts(self, texts: list[Document], **kwargs):
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table_handler = JiebaKeywordTableHandler()
-
-            keyword_table = self._get_dataset_keyword_table()
-            keywords_list = kwargs.get("keywords_list")
-            for i in range(len(texts)):
-                text = texts[i]
-                if keywords_list:
-                    keywords = keywords_list[i]
-                    if not keywords:
-                        keywords = keyword_table_handler.extract_keywords(
-                            text.page_content, self._config.max_keywords_per_chunk
-                        )
-                else:
-                    keywords = keyword_table_handler.extract_keywords(
-                        text.page_content, self._config.max_keywords_per_chunk
-                    )
-                if text.metadata is not None:
-                    self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
-                    keyword_table = self._add_text_to_keyword_table(
-                        keyword_table or {}, text.metadata["doc_id"], list(keywords)
-                    )
+            if text.metadata is not None:
+                node_keywords[text.metadata["doc_id"]] = list(keywords)
 
-            self._save_dataset_keyword_table(keyword_table)
+        self._update_segments_keywords(node_keywords)
+        self._add_postings(node_keywords)
 
     def text_exists(self, id: str) -> bool:
-        keyword_table = self._get_dataset_keyword_table()
-        if keyword_table is None:
-            return False
-        return id in set.union(*keyword_table.values())
+        self._ensure_postings()
+        posting = (
+            db.session.query(DatasetKeywordPosting.index_node_id)
+            .filter(DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.index_node_id == id)
+            .first()
+        )
+        return posting is not None
 
     def delete_by_ids(self, ids: list[str]) -> None:
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table = self._get_dataset_keyword_table()
-            if keyword_table is not None:
-                keyword_table = self._delete_ids_from_keyword_table(keyword_table, ids)
-
-            self._save_dataset_keyword_table(keyword_table)
+        self._ensure_postings()
+        if not ids:
+            return
+        db.session.query(DatasetKeywordPosting).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.index_node_id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        self._bump_version()
 
     def search(self, query: str, **kwargs: Any) -> list[Document]:
-        keyword_table = self._get_dataset_keyword_table()
+        self._ensure_postings()
 
         k = kwargs.get("top_k", 4)
         document_ids_filter = kwargs.get("document_ids_filter")
-        sorted_chunk_indices = self._retrieve_ids_by_query(keyword_table or {}, query, k)
+        sorted_chunk_indices = self._retrieve_ids_by_query(query, k)
+        if not sorted_chunk_indices:
+            return []
+
+        criteria = [
+            DocumentSegment.dataset_id == self.dataset.id,
+            DocumentSegment.index_node_id.in_(sorted_chunk_indices),
+        ]
+        if document_ids_filter:
+            criteria.append(DocumentSegment.document_id.in_(document_ids_filter))
+        segments = {segment.index_node_id: segment for segment in SegmentHydrator.get_segments(*criteria)}
 
         documents = []
         for chunk_index in sorted_chunk_indices:
-            segment_query = db.session.query(DocumentSegment).filter(
-                DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id == chunk_index
-            )
-            if document_ids_filter:
-                segment_query = segment_query.filter(DocumentSegment.document_id.in_(document_ids_filter))
-            segment = segment_query.first()
-
+            segment = segments.get(chunk_index)
             if segment:
                 documents.append(
                     Document(
@@ -116,91 +117,110 @@ class Jieba(BaseKeyword):
         return documents
 
     def delete(self) -> None:
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            dataset_keyword_table = self.dataset.dataset_keyword_table
-            if dataset_keyword_table:
-                db.session.delete(dataset_keyword_table)
-                db.session.commit()
-                if dataset_keyword_table.data_source_type != "database":
-                    file_key = "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
-                    storage.delete(file_key)
-
-    def _save_dataset_keyword_table(self, keyword_table):
-        keyword_table_dict = {
-            "__type__": "keyword_table",
-            "__data__": {"index_id": self.dataset.id, "summary": None, "table": keyword_table},
-        }
-        dataset_keyword_table = self.dataset.dataset_keyword_table
-        keyword_data_source_type = dataset_keyword_table.data_source_type
-        if keyword_data_source_type == "database":
-            dataset_keyword_table.keyword_table = json.dumps(keyword_table_dict, cls=SetEncoder)
-            db.session.commit()
-        else:
-            file_key = "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
-            if storage.exists(file_key):
-                storage.delete(file_key)
-            storage.save(file_key, json.dumps(keyword_table_dict, cls=SetEncoder).encode("utf-8"))
-
-    def _get_dataset_keyword_table(self) -> Optional[dict]:
+        db.session.query(DatasetKeywordPosting).filter(DatasetKeywordPosting.dataset_id == self.dataset.id).delete(
+            synchronize_session=False
+        )
         dataset_keyword_table = self.dataset.dataset_keyword_table
         if dataset_keyword_table:
-            keyword_table_dict = dataset_keyword_table.keyword_table_dict
-            if keyword_table_dict:
-                return dict(keyword_table_dict["__data__"]["table"])
-        else:
-            keyword_data_source_type = dify_config.KEYWORD_DATA_SOURCE_TYPE
-            dataset_keyword_table = DatasetKeywordTable(
-                dataset_id=self.dataset.id,
-                keyword_table="",
-                data_source_type=keyword_data_source_type,
+            db.session.delete(dataset_keyword_table)
+        db.session.commit()
+        if dataset_keyword_table and dataset_keyword_table.data_source_type != "database":
+            storage.delete(self._legacy_file_key())
+        self._bump_version()
+
+    def _version(self) -> int:
+        version = redis_client.get(self._version_key())
+        return int(version) if version else 0
+
+    def _version_key(self) -> str:
+        return "keyword_index_version:{}".format(self.dataset.id)
+
+    def _bump_version(self):
+        redis_client.incr(self._version_key())
+
+    def _legacy_file_key(self) -> str:
+        return "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
+
+    def _ensure_postings(self):
+        """Move a legacy whole-table JSON keyword table into postings, once per dataset"""
+        if self.dataset.id in self._migrated_datasets:
+            return
+        if self._get_legacy_keyword_table() is not None:
+            lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
+            with redis_client.lock(lock_name, timeout=600):
+                # Another worker may have moved it while we waited for the lock
+                dataset_keyword_table = self._get_legacy_keyword_table()
+                if dataset_keyword_table is not None:
+                    keyword_table_dict = dataset_keyword_table.keyword_table_dict
+                    node_keywords: dict[str, list[str]] = defaultdict(list)
+                    if keyword_table_dict:
+                        for keyword, node_ids in keyword_table_dict["__data__"]["table"].items():
+                            for node_id in node_ids:
+                                node_keywords[node_id].append(keyword)
+                    self._insert_postings(node_keywords)
+                    db.session.delete(dataset_keyword_table)
+                    db.session.commit()
+                    if dataset_keyword_table.data_source_type != "database":
+                        storage.delete(self._legacy_file_key())
+                    self._bump_version()
+        self._migrated_datasets.add(self.dataset.id)
+
+    def _get_legacy_keyword_table(self) -> Optional[DatasetKeywordTable]:
+        return db.session.query(DatasetKeywordTable).filter(DatasetKeywordTable.dataset_id == self.dataset.id).first()
+
+    def _insert_postings(self, node_keywords: dict[str, list[str]]):
+        rows = [
+            {"dataset_id": self.dataset.id, "keyword": keyword, "index_node_id": node_id}
+            for node_id, keywords in node_keywords.items()
+            for keyword in set(keywords)
+            if len(keyword) <= self._max_keyword_length
+        ]
+        for i in range(0, len(rows), self._insert_batch_size):
+            db.session.execute(
+                insert(DatasetKeywordPosting).values(rows[i : i + self._insert_batch_size]).on_conflict_do_nothing()
             )
-            if keyword_data_source_type == "database":
-                dataset_keyword_table.keyword_table = json.dumps(
-                    {
-                        "__type__": "keyword_table",
-                        "__data__": {"index_id": self.dataset.id, "summary": None, "table": {}},
-                    },
-                    cls=SetEncoder,
-                )
-            db.session.add(dataset_keyword_table)
-            db.session.commit()
-
-        return {}
-
-    def _add_text_to_keyword_table(self, keyword_table: dict, id: str, keywords: list[str]) -> dict:
-        for keyword in keywords:
-            if keyword not in keyword_table:
-                keyword_table[keyword] = set()
-            keyword_table[keyword].add(id)
-        return keyword_table
-
-    def _delete_ids_from_keyword_table(self, keyword_table: dict, ids: list[str]) -> dict:
-        # get set of ids that correspond to node
-        node_idxs_to_delete = set(ids)
-
-        # delete node_idxs from keyword to node idxs mapping
-        keywords_to_delete = set()
-        for keyword, node_idxs in keyword_table.items():
-            if node_idxs_to_delete.intersection(node_idxs):
-                keyword_table[keyword] = node_idxs.difference(node_idxs_to_delete)
-                if not keyword_table[keyword]:
-                    keywords_to_delete.add(keyword)
-
-        for keyword in keywords_to_delete:
-            del keyword_table[keyword]
 
-        return keyword_table
-
-    def _retrieve_ids_by_query(self, keyword_table: dict, query: str, k: int = 4):
+    def _add_postings(self, node_keywords: dict[str, list[str]]):
+        self._ensure_postings()
+        if not node_keywords:
+            return
+        self._insert_postings(node_keywords)
+        db.session.commit()
+        self._bump_version()
+
+    def _get_postings(self, keywords: set[str]) -> dict[str, frozenset[str]]:
+        """Index node ids of every keyword, from the version-keyed cache or one query for the rest"""
+        version = self._version()
+        postings: dict[str, frozenset[str]] = {}
+        with self._postings_cache_lock:
+            for keyword in keywords:
+                cached = self._postings_cache.get((self.dataset.id, version, keyword))
+                if cached is not None:
+                    postings[keyword] = cached
+
+        missing = keywords - postings.keys()
+        if missing:
+            fetched: dict[str, set[str]] = {keyword: set() for keyword in missing}
+            rows = (
+                db.session.query(DatasetKeywordPosting.keyword, DatasetKeywordPosting.index_node_id)
+                .filter(DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.keyword.in_(missing))
+                .all()
+            )
+            for keyword, index_node_id in rows:
+                fetched[keyword].add(index_node_id)
+            with self._postings_cache_lock:
+                for keyword, node_ids in fetched.items():
+                    postings[keyword] = self._postings_cache[(self.dataset.id, version, keyword)] = frozenset(node_ids)
+        return postings
+
+    def _retrieve_ids_by_query(self, query: str, k: int = 4):
         keyword_table_handler = JiebaKeywordTableHandler()
         keywords = keyword_table_handler.extract_keywords(query)
 
         # go through text chunks in order of most matching keywords
         chunk_indices_count: dict[str, int] = defaultdict(int)
-        keywords_list = [keyword for keyword in keywords if keyword in set(keyword_table.keys())]
-        for keyword in keywords_list:
-            for node_id in keyword_table[keyword]:
+        for node_ids in self._get_postings(set(keywords)).values():
+            for node_id in node_ids:
                 chunk_indices_count[node_id] += 1
 
         sorted_chunk_indices = sorted(
@@ -211,49 +231,44 @@ class Jieba(BaseKeyword):
 
         return sorted_chunk_indices[:k]
 
-    def _update_segment_keywords(self, dataset_id: str, node_id: str, keywords: list[str]):
-        document_segment = (
+    def _update_segments_keywords(self, node_keywords: dict[str, list[str]]):
+        if not node_keywords:
+            return
+        document_segments = (
             db.session.query(DocumentSegment)
-            .filter(DocumentSegment.dataset_id == dataset_id, DocumentSegment.index_node_id == node_id)
-            .first()
+            .filter(
+                DocumentSegment.dataset_id == self.dataset.id,
+                DocumentSegment.index_node_id.in_(list(node_keywords.keys())),
+            )
+            .all()
         )
-        if document_segment:
-            document_segment.keywords = keywords
+        for document_segment in document_segments:
+            document_segment.keywords = node_keywords[document_segment.index_node_id]
             db.session.add(document_segment)
-            db.session.commit()
+        db.session.commit()
 
     def create_segment_keywords(self, node_id: str, keywords: list[str]):
-        keyword_table = self._get_dataset_keyword_table()
-        self._update_segment_keywords(self.dataset.id, node_id, keywords)
-        keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        self._update_segments_keywords({node_id: keywords})
+        self._add_postings({node_id: keywords})
 
     def multi_create_segment_keywords(self, pre_segment_data_list: list):
         keyword_table_handler = JiebaKeywordTableHandler()
-        keyword_table = self._get_dataset_keyword_table()
+        node_keywords: dict[str, list[str]] = {}
         for pre_segment_data in pre_segment_data_list:
             segment = pre_segment_data["segment"]
             if pre_segment_data["keywords"]:
                 segment.keywords = pre_segment_data["keywords"]
-                keyword_table = self._add_text_to_keyword_table(
-                    keyword_table or {}, segment.index_node_id, pre_segment_data["keywords"]
-                )
             else:
                 keywords = keyword_table_handler.extract_keywords(segment.content, self._config.max_keywords_per_chunk)
                 segment.keywords = list(keywords)
-                keyword_table = self._add_text_to_keyword_table(
-                    keyword_table or {}, segment.index_node_id, list(keywords)
-                )
-        self._save_dataset_keyword_table(keyword_table)
+            node_keywords[segment.index_node_id] = segment.keywords
+        self._add_postings(node_keywords)
 
     def update_segment_keywords_index(self, node_id: str, keywords: list[str]):
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
-
+        self._add_postings({node_id: keywords})
 
-class SetEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, set):
-            return list(obj)
-        return super().default(obj)
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._postings_cache_lock:
+            cls._postings_cache.clear()
+        cls._migrated_datasets.clear()
@@ -3,11 +3,13 @@ from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from flask import Flask, current_app
+from sqlalchemy import or_
 from sqlalchemy.orm import load_only
 
 from configs import dify_config
 from core.rag.data_post_processor.data_post_processor import DataPostProcessor
 from core.rag.datasource.keyword.keyword_factory import Keyword
+from core.rag.datasource.segment_hydrator import SegmentHydrator
 from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.embedding.retrieval import RetrievalSegments
 from core.rag.index_processor.constant.index_type import IndexType
@@ -15,7 +17,7 @@ from core.rag.models.document import Document
 from core.rag.rerank.rerank_type import RerankMode
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from extensions.ext_database import db
-from models.dataset import ChildChunk, Dataset, DocumentSegment
+from models.dataset import Dataset, DocumentSegment
 from models.dataset import Document as DatasetDocument
 from services.external_knowledge_service import ExternalDatasetService
 
@@ -284,6 +286,29 @@ class RetrievalService:
                 .all()
             }
 
+            # Resolve child chunks of parent-child documents, then all segments, in bulk
+            child_index_node_ids = set()
+            index_node_ids = set()
+            for document in documents:
+                dataset_document = dataset_documents.get(document.metadata.get("document_id"))
+                if not dataset_document or not document.metadata.get("doc_id"):
+                    continue
+                if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+                    child_index_node_ids.add(document.metadata["doc_id"])
+                else:
+                    index_node_ids.add(document.metadata["doc_id"])
+
+            child_chunks = SegmentHydrator.get_child_chunks(child_index_node_ids)
+            segment_ids = {child_chunk.segment_id for child_chunk in child_chunks.values()}
+            segments = SegmentHydrator.get_segments(
+                DocumentSegment.dataset_id.in_({doc.dataset_id for doc in dataset_documents.values()}),
+                DocumentSegment.enabled == True,
+                DocumentSegment.status == "completed",
+                or_(DocumentSegment.id.in_(segment_ids), DocumentSegment.index_node_id.in_(index_node_ids)),
+            )
+            segments_by_id = {segment.id: segment for segment in segments}
+            segments_by_index_node_id = {segment.index_node_id: segment for segment in segments}
+
             records = []
             include_segment_ids = set()
             segment_child_map = {}
@@ -302,32 +327,14 @@ class RetrievalService:
                     # Handle parent-child documents
                     child_index_node_id = document.metadata.get("doc_id")
 
-                    child_chunk = (
-                        db.session.query(ChildChunk).filter(ChildChunk.index_node_id == child_index_node_id).first()
-                    )
+                    child_chunk = child_chunks.get(child_index_node_id)
 
                     if not child_chunk:
                         continue
 
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .filter(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.id == child_chunk.segment_id,
-                        )
-                        .options(
-                            load_only(
-                                DocumentSegment.id,
-                                DocumentSegment.content,
-                                DocumentSegment.answer,
-                            )
-                        )
-                        .first()
-                    )
+                    segment = segments_by_id.get(child_chunk.segment_id)
 
-                    if not segment:
+                    if not segment or segment.dataset_id != dataset_document.dataset_id:
                         continue
 
                     if segment.id not in include_segment_ids:
@@ -364,18 +371,9 @@ class RetrievalService:
                     if not index_node_id:
                         continue
 
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .filter(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.index_node_id == index_node_id,
-                        )
-                        .first()
-                    )
+                    segment = segments_by_index_node_id.get(index_node_id)
 
-                    if not segment:
+                    if not segment or segment.dataset_id != dataset_document.dataset_id:
                         continue
 
                     include_segment_ids.add(segment.id)
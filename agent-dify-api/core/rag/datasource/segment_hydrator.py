@@ -0,0 +1,81 @@
+import threading
+from collections.abc import Collection
+from typing import Any
+
+from cachetools import TTLCache
+from sqlalchemy.orm import defer
+from sqlalchemy.orm.attributes import set_committed_value
+
+from configs import dify_config
+from extensions.ext_database import db
+from models.dataset import ChildChunk, DocumentSegment
+
+
+class SegmentHydrator:
+    """
+    Resolves retrieved index nodes to their segments and child chunks with one
+    ``IN`` query per kind, whatever the number of retrieved documents.
+
+    Segment contents are cached in process for ``SEGMENT_CONTENT_CACHE_TTL``
+    seconds, keyed by ``index_node_hash``. The hash changes with the content, so
+    an edited segment is never served stale content; the segment row itself is
+    always read, so enabling, disabling and deleting apply right away.
+    """
+
+    _contents: TTLCache = TTLCache(
+        maxsize=dify_config.SEGMENT_CONTENT_CACHE_SIZE, ttl=max(dify_config.SEGMENT_CONTENT_CACHE_TTL, 1)
+    )
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_child_chunks(cls, index_node_ids: Collection[str]) -> dict[str, ChildChunk]:
+        """
+        Child chunks by index node id
+        :param index_node_ids: index node ids of child chunks
+        :return: child chunks found
+        """
+        if not index_node_ids:
+            return {}
+        child_chunks = db.session.query(ChildChunk).filter(ChildChunk.index_node_id.in_(index_node_ids)).all()
+        return {child_chunk.index_node_id: child_chunk for child_chunk in child_chunks}
+
+    @classmethod
+    def get_segments(cls, *criteria: Any) -> list[DocumentSegment]:
+        """
+        Segments matching the criteria, their contents served from the cache where possible
+        :param criteria: filter criteria on DocumentSegment
+        :return: segments
+        """
+        if not dify_config.SEGMENT_CONTENT_CACHE_TTL:
+            return db.session.query(DocumentSegment).filter(*criteria).all()
+
+        segments = db.session.query(DocumentSegment).options(defer(DocumentSegment.content)).filter(*criteria).all()
+
+        missing = []
+        with cls._lock:
+            for segment in segments:
+                content = cls._contents.get(segment.index_node_hash) if segment.index_node_hash else None
+                if content is None:
+                    missing.append(segment)
+                else:
+                    set_committed_value(segment, "content", content)
+
+        if missing:
+            contents = dict(
+                db.session.query(DocumentSegment.id, DocumentSegment.content)
+                .filter(DocumentSegment.id.in_([segment.id for segment in missing]))
+                .all()
+            )
+            with cls._lock:
+                for segment in missing:
+                    content = contents.get(segment.id, "")
+                    set_committed_value(segment, "content", content)
+                    if segment.index_node_hash:
+                        cls._contents[segment.index_node_hash] = content
+
+        return segments
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._contents.clear()
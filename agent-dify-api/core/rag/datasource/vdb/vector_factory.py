@@ -164,6 +164,14 @@ class Vector:
             embeddings = self._embeddings.embed_documents([document.page_content for document in texts])
             self._vector_processor.create(texts=texts, embeddings=embeddings, **kwargs)
 
+    def embed_documents(self, documents: list[Document]) -> list[list[float]]:
+        return self._embeddings.embed_documents([document.page_content for document in documents])
+
+    def create_with_embeddings(self, documents: list[Document], embeddings: list[list[float]], **kwargs):
+        """Write documents whose embeddings were computed with ``embed_documents``"""
+        if documents:
+            self._vector_processor.create(texts=documents, embeddings=embeddings, **kwargs)
+
     def add_texts(self, documents: list[Document], **kwargs):
         if kwargs.get("duplicate_check", False):
             documents = self._filter_duplicate_texts(documents)
@@ -1,4 +1,3 @@
-import base64
 import logging
 from typing import Any, Optional, cast
 
@@ -11,10 +10,9 @@ from core.model_manager import ModelInstance
 from core.model_runtime.entities.model_entities import ModelPropertyKey
 from core.model_runtime.model_providers.__base.text_embedding_model import TextEmbeddingModel
 from core.rag.embedding.embedding_base import Embeddings
+from core.rag.embedding.embedding_cache import EmbeddingCache
 from extensions.ext_database import db
-from extensions.ext_redis import redis_client
 from libs import helper
-from models.dataset import Embedding
 
 logger = logging.getLogger(__name__)
 
@@ -23,23 +21,25 @@ class CacheEmbedding(Embeddings):
     def __init__(self, model_instance: ModelInstance, user: Optional[str] = None) -> None:
         self._model_instance = model_instance
         self._user = user
+        self._cache = EmbeddingCache(model_instance.provider, model_instance.model, EmbeddingInputType.DOCUMENT)
+        self._query_cache = EmbeddingCache(model_instance.provider, model_instance.model, EmbeddingInputType.QUERY)
 
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
         """Embed search docs in batches of 10."""
         # use doc embedding cache or store if not exists
         text_embeddings: list[Any] = [None for _ in range(len(texts))]
+        hashes = [helper.generate_text_hash(text) for text in texts]
+        cached_embeddings = self._cache.get_many(hashes)
+        logger.debug(
+            "Embedding cache served %d of %d texts, overall %s",
+            len([hash for hash in hashes if hash in cached_embeddings]),
+            len(texts),
+            EmbeddingCache.metrics.snapshot(),
+        )
         embedding_queue_indices = []
-        for i, text in enumerate(texts):
-            hash = helper.generate_text_hash(text)
-            embedding = (
-                db.session.query(Embedding)
-                .filter_by(
-                    model_name=self._model_instance.model, hash=hash, provider_name=self._model_instance.provider
-                )
-                .first()
-            )
-            if embedding:
-                text_embeddings[i] = embedding.get_embedding()
+        for i, hash in enumerate(hashes):
+            if hash in cached_embeddings:
+                text_embeddings[i] = cached_embeddings[hash]
             else:
                 embedding_queue_indices.append(i)
         if embedding_queue_indices:
@@ -76,23 +76,11 @@ class CacheEmbedding(Embeddings):
                             db.session.rollback()
                         except Exception:
                             logging.exception("Failed transform embedding")
-                cache_embeddings = []
-                try:
-                    for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
-                        text_embeddings[i] = n_embedding
-                        hash = helper.generate_text_hash(texts[i])
-                        if hash not in cache_embeddings:
-                            embedding_cache = Embedding(
-                                model_name=self._model_instance.model,
-                                hash=hash,
-                                provider_name=self._model_instance.provider,
-                            )
-                            embedding_cache.set_embedding(n_embedding)
-                            db.session.add(embedding_cache)
-                            cache_embeddings.append(hash)
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
+                new_embeddings = {}
+                for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
+                    text_embeddings[i] = n_embedding
+                    new_embeddings[hashes[i]] = n_embedding
+                self._cache.set_many(new_embeddings)
             except Exception as ex:
                 db.session.rollback()
                 logger.exception("Failed to embed documents: %s")
@@ -104,12 +92,9 @@ class CacheEmbedding(Embeddings):
         """Embed query text."""
         # use doc embedding cache or store if not exists
         hash = helper.generate_text_hash(text)
-        embedding_cache_key = f"{self._model_instance.provider}_{self._model_instance.model}_{hash}"
-        embedding = redis_client.get(embedding_cache_key)
-        if embedding:
-            redis_client.expire(embedding_cache_key, 600)
-            decoded_embedding = np.frombuffer(base64.b64decode(embedding), dtype="float")
-            return [float(x) for x in decoded_embedding]
+        cached_embedding = self._query_cache.get_many([hash], use_database=False).get(hash)
+        if cached_embedding is not None:
+            return cached_embedding
         try:
             embedding_result = self._model_instance.invoke_text_embedding(
                 texts=[text], user=self._user, input_type=EmbeddingInputType.QUERY
@@ -125,18 +110,6 @@ class CacheEmbedding(Embeddings):
                 logging.exception(f"Failed to embed query text '{text[:10]}...({len(text)} chars)'")
             raise ex
 
-        try:
-            # encode embedding to base64
-            embedding_vector = np.array(embedding_results)
-            vector_bytes = embedding_vector.tobytes()
-            # Transform to Base64
-            encoded_vector = base64.b64encode(vector_bytes)
-            # Transform to string
-            encoded_str = encoded_vector.decode("utf-8")
-            redis_client.setex(embedding_cache_key, 600, encoded_str)
-        except Exception as ex:
-            if dify_config.DEBUG:
-                logging.exception(f"Failed to add embedding to redis for the text '{text[:10]}...({len(text)} chars)'")
-            raise ex
+        self._query_cache.set_many({hash: embedding_results}, use_database=False)
 
         return embedding_results
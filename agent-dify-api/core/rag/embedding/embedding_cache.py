@@ -0,0 +1,213 @@
+import logging
+import threading
+from collections.abc import Sequence
+
+import numpy as np
+from cachetools import LRUCache
+from sqlalchemy.dialects.postgresql import insert
+
+from core.entities.embedding_type import EmbeddingInputType
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.dataset import Embedding
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCacheMetrics:
+    """Thread-safe hit counters of the embedding cache tiers"""
+
+    TIERS = ("memory", "redis", "database")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = dict.fromkeys(self.TIERS, 0)
+            self.misses = 0
+
+    def record(self, tier: str, count: int) -> None:
+        if count:
+            with self._lock:
+                self.hits[tier] += count
+
+    def record_misses(self, count: int) -> None:
+        if count:
+            with self._lock:
+                self.misses += count
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hits = dict(self.hits)
+            misses = self.misses
+        lookups = sum(hits.values()) + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "lookups": lookups,
+            "hit_rate": sum(hits.values()) / lookups if lookups else 0.0,
+        }
+
+
+class EmbeddingCache:
+    """
+    Tiered cache of normalized embeddings, keyed by (provider, model, input type, text hash).
+
+    Lookups go through a bounded in-process LRU, then Redis (raw float32 bytes,
+    one MGET per batch, TTL refreshed on hits), then optionally the ``embeddings``
+    table (one ``IN`` query per chunk of hashes). Hits from a slower tier are
+    copied into the faster ones; new embeddings are written to every tier, with
+    conflicting database rows ignored. Asymmetric models embed queries and
+    documents differently, so the input type is part of every key and the
+    database, which has no input type column, only holds document embeddings.
+    """
+
+    _memory: LRUCache = LRUCache(maxsize=4096)
+    _memory_lock = threading.Lock()
+    metrics = EmbeddingCacheMetrics()
+
+    redis_ttl = 600
+    db_chunk_size = 500
+
+    def __init__(self, provider: str, model: str, input_type: EmbeddingInputType = EmbeddingInputType.DOCUMENT) -> None:
+        self._provider = provider
+        self._model = model
+        self._input_type = input_type
+
+    def _memory_key(self, hash: str) -> tuple[str, str, str, str]:
+        return self._provider, self._model, self._input_type.value, hash
+
+    def _redis_key(self, hash: str) -> str:
+        return f"embedding_f32:{self._input_type.value}:{self._provider}_{self._model}_{hash}"
+
+    def _use_database(self, use_database: bool) -> bool:
+        return use_database and self._input_type == EmbeddingInputType.DOCUMENT
+
+    def get_many(self, hashes: Sequence[str], use_database: bool = True) -> dict[str, list[float]]:
+        """
+        Cached embeddings of the given text hashes
+        :param hashes: text hashes
+        :param use_database: also look up hashes missing from memory and Redis in the database
+
+        :return: embeddings by hash; missing hashes are left out
+        """
+        found: dict[str, np.ndarray] = {}
+        with self._memory_lock:
+            for hash in hashes:
+                vector = self._memory.get(self._memory_key(hash))
+                if vector is not None:
+                    found[hash] = vector
+        self.metrics.record("memory", len(found))
+
+        missing = [hash for hash in dict.fromkeys(hashes) if hash not in found]
+        if missing:
+            from_redis = self._get_from_redis(missing)
+            self.metrics.record("redis", len(from_redis))
+            self._set_memory(from_redis)
+            found.update(from_redis)
+            missing = [hash for hash in missing if hash not in from_redis]
+
+        if missing and self._use_database(use_database):
+            from_database = self._get_from_database(missing)
+            self.metrics.record("database", len(from_database))
+            self._set_memory(from_database)
+            self._set_redis(from_database)
+            found.update(from_database)
+            missing = [hash for hash in missing if hash not in from_database]
+
+        self.metrics.record_misses(len(missing))
+        return {hash: vector.tolist() for hash, vector in found.items()}
+
+    def set_many(self, embeddings: dict[str, list[float]], use_database: bool = True) -> None:
+        """Store new embeddings in every tier; rows already in the database are left untouched"""
+        if not embeddings:
+            return
+        vectors = {hash: np.asarray(embedding, dtype=np.float32) for hash, embedding in embeddings.items()}
+        self._set_memory(vectors)
+        self._set_redis(vectors)
+        if self._use_database(use_database):
+            self._insert_into_database(embeddings)
+
+    def _set_memory(self, vectors: dict[str, np.ndarray]) -> None:
+        if not vectors:
+            return
+        with self._memory_lock:
+            for hash, vector in vectors.items():
+                self._memory[self._memory_key(hash)] = vector
+
+    def _get_from_redis(self, hashes: list[str]) -> dict[str, np.ndarray]:
+        try:
+            values = redis_client.mget([self._redis_key(hash) for hash in hashes])
+        except Exception:
+            logger.exception("Failed to read embeddings from redis")
+            return {}
+        found = {hash: np.frombuffer(value, dtype=np.float32) for hash, value in zip(hashes, values) if value}
+        if found:
+            # keep embeddings that are still in use alive
+            try:
+                pipeline = redis_client.pipeline(transaction=False)
+                for hash in found:
+                    pipeline.expire(self._redis_key(hash), self.redis_ttl)
+                pipeline.execute()
+            except Exception:
+                logger.exception("Failed to refresh the TTL of embeddings in redis")
+        return found
+
+    def _set_redis(self, vectors: dict[str, np.ndarray]) -> None:
+        if not vectors:
+            return
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for hash, vector in vectors.items():
+                pipeline.setex(self._redis_key(hash), self.redis_ttl, vector.astype(np.float32).tobytes())
+            pipeline.execute()
+        except Exception:
+            logger.exception("Failed to write embeddings to redis")
+
+    def _get_from_database(self, hashes: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        for i in range(0, len(hashes), self.db_chunk_size):
+            rows = (
+                db.session.query(Embedding)
+                .filter(
+                    Embedding.model_name == self._model,
+                    Embedding.provider_name == self._provider,
+                    Embedding.hash.in_(hashes[i : i + self.db_chunk_size]),
+                )
+                .all()
+            )
+            for row in rows:
+                found[row.hash] = np.asarray(row.get_embedding(), dtype=np.float32)
+        return found
+
+    def _insert_into_database(self, embeddings: dict[str, list[float]]) -> None:
+        rows = []
+        for hash, vector in embeddings.items():
+            embedding_cache = Embedding(model_name=self._model, hash=hash, provider_name=self._provider)
+            embedding_cache.set_embedding(vector)
+            rows.append(
+                {
+                    "model_name": self._model,
+                    "hash": hash,
+                    "provider_name": self._provider,
+                    "embedding": embedding_cache.embedding,
+                }
+            )
+        try:
+            for i in range(0, len(rows), self.db_chunk_size):
+                db.session.execute(
+                    insert(Embedding)
+                    .values(rows[i : i + self.db_chunk_size])
+                    .on_conflict_do_nothing(index_elements=["model_name", "hash", "provider_name"])
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception("Failed to save embeddings to the database")
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._memory_lock:
+            cls._memory.clear()
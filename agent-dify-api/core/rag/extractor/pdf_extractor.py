@@ -1,13 +1,48 @@
 """Abstract interface for document loader implementations."""
 
+import logging
+import multiprocessing
+from collections import deque
 from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Optional, cast
 
+from configs import dify_config
 from core.rag.extractor.blob.blob import Blob
 from core.rag.extractor.extractor_base import BaseExtractor
 from core.rag.models.document import Document
 from extensions.ext_storage import storage
 
+logger = logging.getLogger(__name__)
+
+
+def _extract_pages(file_path: str, start: int, stop: int) -> list[str]:
+    """Text of pages [start, stop) of the pdf, run in the parsing processes"""
+    import pypdfium2  # type: ignore
+
+    pdf_reader = pypdfium2.PdfDocument(file_path, autoclose=True)
+    try:
+        contents = []
+        for page_number in range(start, stop):
+            page = pdf_reader[page_number]
+            text_page = page.get_textpage()
+            contents.append(text_page.get_text_range())
+            text_page.close()
+            page.close()
+        return contents
+    finally:
+        pdf_reader.close()
+
+
+def _gevent_patched() -> bool:
+    """Whether gevent has monkey patched this process (the default Celery worker pool)"""
+    try:
+        from gevent import monkey  # type: ignore
+    except ImportError:
+        return False
+    return bool(monkey.is_anything_patched())
+
 
 class PdfExtractor(BaseExtractor):
     """Load pdf files.
@@ -57,6 +92,17 @@ class PdfExtractor(BaseExtractor):
         with blob.as_bytes_io() as file_path:
             pdf_reader = pypdfium2.PdfDocument(file_path, autoclose=True)
             try:
+                page_count = len(pdf_reader)
+                if (
+                    blob.path
+                    and dify_config.PDF_EXTRACT_MAX_WORKERS > 1
+                    and page_count > dify_config.PDF_EXTRACT_PAGES_PER_TASK
+                    and not _gevent_patched()
+                ):
+                    pdf_reader.close()
+                    yield from self._parse_in_processes(blob, page_count)
+                    return
+
                 for page_number, page in enumerate(pdf_reader):
                     text_page = page.get_textpage()
                     content = text_page.get_text_range()
@@ -66,3 +112,48 @@ class PdfExtractor(BaseExtractor):
                     yield Document(page_content=content, metadata=metadata)
             finally:
                 pdf_reader.close()
+
+    def _parse_in_processes(self, blob: Blob, page_count: int) -> Iterator[Document]:
+        """
+        Parse windows of pages in a process pool, in page order.
+
+        At most ``PDF_EXTRACT_MAX_WORKERS`` windows are parsed ahead of the
+        consumer. Workers come from a forkserver, forking the threaded API or
+        Celery process itself could deadlock on locks held by other threads.
+        Where processes cannot be started (e.g. inside a daemonic worker
+        process) the remaining windows are parsed in process.
+        """
+        file_path = str(blob.path)
+        window_size = dify_config.PDF_EXTRACT_PAGES_PER_TASK
+        max_workers = dify_config.PDF_EXTRACT_MAX_WORKERS
+        windows = deque((start, min(start + window_size, page_count)) for start in range(0, page_count, window_size))
+        in_flight: deque[tuple[int, int, Optional[Future]]] = deque()
+
+        executor: Optional[ProcessPoolExecutor] = ProcessPoolExecutor(
+            max_workers=min(max_workers, len(windows)), mp_context=multiprocessing.get_context("forkserver")
+        )
+        try:
+            while windows or in_flight:
+                while windows and len(in_flight) < max_workers:
+                    start, stop = windows.popleft()
+                    future = None
+                    if executor:
+                        try:
+                            future = executor.submit(_extract_pages, file_path, start, stop)
+                        except (AssertionError, BrokenProcessPool, OSError):
+                            logger.warning("Failed to start pdf parsing processes, parsing %s in process", file_path)
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            executor = None
+                    in_flight.append((start, stop, future))
+
+                start, stop, future = in_flight.popleft()
+                try:
+                    contents = future.result() if future else _extract_pages(file_path, start, stop)
+                except BrokenProcessPool:
+                    contents = _extract_pages(file_path, start, stop)
+                for page_number, content in enumerate(contents, start=start):
+                    metadata = {"source": blob.source, "page": page_number}
+                    yield Document(page_content=content, metadata=metadata)
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
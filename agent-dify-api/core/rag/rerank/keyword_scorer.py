@@ -0,0 +1,180 @@
+import threading
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from typing import Optional
+
+import numpy as np
+from cachetools import LRUCache
+
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from models.dataset import DocumentSegment
+
+
+class SparseKeywordMatrix:
+    """
+    Documents x vocabulary term-count matrix, stored as its non-zero entries
+    (``rows``, ``indices``, ``data``).
+
+    Built in one pass over the documents' keywords; every score below is a
+    vectorized sparse matrix-vector product over those entries.
+    """
+
+    def __init__(self, documents_keywords: Sequence[Iterable[str]]):
+        vocabulary: dict[str, int] = {}
+        indices: list[int] = []
+        data: list[float] = []
+        lengths: list[int] = []
+        for keywords in documents_keywords:
+            counts = Counter(keywords)
+            for keyword, count in counts.items():
+                indices.append(vocabulary.setdefault(keyword, len(vocabulary)))
+                data.append(count)
+            lengths.append(len(counts))
+
+        self.vocabulary = vocabulary
+        self.num_documents = len(lengths)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.data = np.asarray(data, dtype=np.float64)
+        # Row id of every stored entry, so row sums are a single bincount
+        self.rows = np.repeat(np.arange(self.num_documents), lengths)
+        self.document_frequency = np.bincount(self.indices, minlength=len(vocabulary)).astype(np.float64)
+        self.document_length = np.bincount(self.rows, weights=self.data, minlength=self.num_documents)
+
+    def query_vector(self, query_keywords: Iterable[str]) -> np.ndarray:
+        """Dense query term counts over the documents' vocabulary (unknown terms are dropped)"""
+        vector = np.zeros(len(self.vocabulary), dtype=np.float64)
+        for keyword, count in Counter(query_keywords).items():
+            index = self.vocabulary.get(keyword)
+            if index is not None:
+                vector[index] = count
+        return vector
+
+    def _row_sum(self, values: np.ndarray) -> np.ndarray:
+        return np.bincount(self.rows, weights=values, minlength=self.num_documents)
+
+    def tfidf_cosine(self, query_keywords: Iterable[str]) -> list[float]:
+        """Cosine similarity between TF-IDF vectors, with IDF = ln((1 + N) / (1 + df)) + 1"""
+        if not self.num_documents:
+            return []
+        idf = np.log((1 + self.num_documents) / (1 + self.document_frequency)) + 1
+        query = self.query_vector(query_keywords) * idf
+        weights = self.data * idf[self.indices]
+        numerator = self._row_sum(weights * query[self.indices])
+        denominator = np.sqrt(self._row_sum(weights * weights)) * np.linalg.norm(query)
+        scores = np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+        return scores.tolist()
+
+    def bm25(self, query_keywords: Iterable[str], k1: float = 1.5, b: float = 0.75) -> list[float]:
+        """Okapi BM25 of every document for the query, with IDF = ln(1 + (N - df + 0.5) / (df + 0.5))"""
+        if not self.num_documents:
+            return []
+        idf = np.log(1 + (self.num_documents - self.document_frequency + 0.5) / (self.document_frequency + 0.5))
+        average_length = self.document_length.mean() or 1.0
+        norm = k1 * (1 - b + b * self.document_length / average_length)
+        term_scores = self.data * (k1 + 1) / (self.data + norm[self.rows])
+        query = self.query_vector(query_keywords)
+        return self._row_sum(term_scores * (idf * query)[self.indices]).tolist()
+
+
+class KeywordScorer:
+    """
+    Keyword scoring of retrieved documents for hybrid search reranking.
+
+    Document keywords are resolved per ``doc_hash`` (the segment's
+    ``index_node_hash``): first from a process-wide LRU cache, then from the
+    keywords already persisted on ``DocumentSegment`` at indexing time, and only
+    then by running jieba on the text.
+    """
+
+    _cache: LRUCache = LRUCache(maxsize=50000)
+    _cache_lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self._keyword_table_handler: Optional[JiebaKeywordTableHandler] = None
+
+    @property
+    def keyword_table_handler(self) -> JiebaKeywordTableHandler:
+        if self._keyword_table_handler is None:
+            self._keyword_table_handler = JiebaKeywordTableHandler()
+        return self._keyword_table_handler
+
+    def extract_query_keywords(self, query: str) -> set[str]:
+        return self.keyword_table_handler.extract_keywords(query, None)
+
+    def documents_keywords(self, documents: list[Document]) -> list[set[str]]:
+        """
+        Keywords of every document (also stored in ``document.metadata["keywords"]``)
+        :param documents: documents; those without metadata get no keywords
+
+        :return:
+        """
+        keywords_by_hash: dict[str, set[str]] = {}
+        hashes = {
+            document.metadata["doc_hash"]
+            for document in documents
+            if document.metadata is not None and document.metadata.get("doc_hash")
+        }
+        with self._cache_lock:
+            for doc_hash in hashes:
+                cached = self._cache.get(doc_hash)
+                if cached is not None:
+                    keywords_by_hash[doc_hash] = cached
+
+        missing = hashes - keywords_by_hash.keys()
+        if missing:
+            persisted = self._load_segment_keywords(list(missing))
+            keywords_by_hash.update(persisted)
+            self._cache_keywords(persisted)
+
+        documents_keywords = []
+        extracted: dict[str, set[str]] = {}
+        for document in documents:
+            if document.metadata is None:
+                documents_keywords.append(set())
+                continue
+            doc_hash = document.metadata.get("doc_hash")
+            keywords = keywords_by_hash.get(doc_hash) if doc_hash else None
+            if keywords is None:
+                keywords = self.keyword_table_handler.extract_keywords(document.page_content, None)
+                if doc_hash:
+                    keywords_by_hash[doc_hash] = extracted[doc_hash] = keywords
+            document.metadata["keywords"] = keywords
+            documents_keywords.append(keywords)
+        self._cache_keywords(extracted)
+        return documents_keywords
+
+    def score(self, query: str, documents: list[Document]) -> list[float]:
+        """
+        TF-IDF cosine similarity of the query against every document
+        :param query: search query
+        :param documents: documents for reranking
+
+        :return:
+        """
+        documents_keywords = self.documents_keywords(documents)
+        return SparseKeywordMatrix(documents_keywords).tfidf_cosine(self.extract_query_keywords(query))
+
+    @staticmethod
+    def _load_segment_keywords(doc_hashes: list[str]) -> dict[str, set[str]]:
+        """Keywords persisted on segments at indexing time, in one query"""
+        rows = (
+            db.session.query(DocumentSegment.index_node_hash, DocumentSegment.keywords)
+            .filter(DocumentSegment.index_node_hash.in_(doc_hashes), DocumentSegment.keywords.isnot(None))
+            .all()
+        )
+        return {index_node_hash: set(keywords) for index_node_hash, keywords in rows if keywords}
+
+    @classmethod
+    def _cache_keywords(cls, keywords_by_hash: dict[str, set[str]]) -> None:
+        if not keywords_by_hash:
+            return
+        with cls._cache_lock:
+            for doc_hash, keywords in keywords_by_hash.items():
+                cls._cache[doc_hash] = keywords
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._cache_lock:
+            cls._cache.clear()
@@ -1,15 +1,13 @@
-import math
-from collections import Counter
 from typing import Optional
 
 import numpy as np
 
 from core.model_manager import ModelManager
 from core.model_runtime.entities.model_entities import ModelType
-from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
 from core.rag.embedding.cached_embedding import CacheEmbedding
 from core.rag.models.document import Document
 from core.rag.rerank.entity.weight import VectorSetting, Weights
+from core.rag.rerank.keyword_scorer import KeywordScorer
 from core.rag.rerank.rerank_base import BaseRerankRunner
 
 
@@ -45,100 +43,37 @@ class WeightRerankRunner(BaseRerankRunner):
 
         documents = unique_documents
 
-        query_scores = self._calculate_keyword_score(query, documents)
-        query_vector_scores = self._calculate_cosine(self.tenant_id, query, documents, self.weights.vector_setting)
+        query_scores = np.asarray(self._calculate_keyword_score(query, documents), dtype=np.float64)
+        query_vector_scores = np.asarray(
+            self._calculate_cosine(self.tenant_id, query, documents, self.weights.vector_setting), dtype=np.float64
+        )
+        scores = (
+            self.weights.vector_setting.vector_weight * query_vector_scores
+            + self.weights.keyword_setting.keyword_weight * query_scores
+        )
 
-        rerank_documents = []
-        for document, query_score, query_vector_score in zip(documents, query_scores, query_vector_scores):
-            score = (
-                self.weights.vector_setting.vector_weight * query_vector_score
-                + self.weights.keyword_setting.keyword_weight * query_score
-            )
-            if score_threshold and score < score_threshold:
-                continue
-            if document.metadata is not None:
-                document.metadata["score"] = score
-                rerank_documents.append(document)
+        indices = np.arange(len(documents))
+        if score_threshold:
+            indices = indices[scores >= score_threshold]
+        for i in indices:
+            if documents[i].metadata is not None:
+                documents[i].metadata["score"] = float(scores[i])
 
-        rerank_documents.sort(key=lambda x: x.metadata["score"] if x.metadata else 0, reverse=True)
-        return rerank_documents[:top_n] if top_n else rerank_documents
+        # highest score first, ties in retrieval order (also at the top n cutoff)
+        indices = indices[np.argsort(-scores[indices], kind="stable")]
+        if top_n:
+            indices = indices[:top_n]
+        return [documents[i] for i in indices]
 
     def _calculate_keyword_score(self, query: str, documents: list[Document]) -> list[float]:
         """
-        Calculate BM25 scores
+        Calculate TF-IDF keyword scores
         :param query: search query
         :param documents: documents for reranking
 
         :return:
         """
-        keyword_table_handler = JiebaKeywordTableHandler()
-        query_keywords = keyword_table_handler.extract_keywords(query, None)
-        documents_keywords = []
-        for document in documents:
-            # get the document keywords
-            document_keywords = keyword_table_handler.extract_keywords(document.page_content, None)
-            if document.metadata is not None:
-                document.metadata["keywords"] = document_keywords
-                documents_keywords.append(document_keywords)
-
-        # Counter query keywords(TF)
-        query_keyword_counts = Counter(query_keywords)
-
-        # total documents
-        total_documents = len(documents)
-
-        # calculate all documents' keywords IDF
-        all_keywords = set()
-        for document_keywords in documents_keywords:
-            all_keywords.update(document_keywords)
-
-        keyword_idf = {}
-        for keyword in all_keywords:
-            # calculate include query keywords' documents
-            doc_count_containing_keyword = sum(1 for doc_keywords in documents_keywords if keyword in doc_keywords)
-            # IDF
-            keyword_idf[keyword] = math.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
-
-        query_tfidf = {}
-
-        for keyword, count in query_keyword_counts.items():
-            tf = count
-            idf = keyword_idf.get(keyword, 0)
-            query_tfidf[keyword] = tf * idf
-
-        # calculate all documents' TF-IDF
-        documents_tfidf = []
-        for document_keywords in documents_keywords:
-            document_keyword_counts = Counter(document_keywords)
-            document_tfidf = {}
-            for keyword, count in document_keyword_counts.items():
-                tf = count
-                idf = keyword_idf.get(keyword, 0)
-                document_tfidf[keyword] = tf * idf
-            documents_tfidf.append(document_tfidf)
-
-        def cosine_similarity(vec1, vec2):
-            intersection = set(vec1.keys()) & set(vec2.keys())
-            numerator = sum(vec1[x] * vec2[x] for x in intersection)
-
-            sum1 = sum(vec1[x] ** 2 for x in vec1)
-            sum2 = sum(vec2[x] ** 2 for x in vec2)
-            denominator = math.sqrt(sum1) * math.sqrt(sum2)
-
-            if not denominator:
-                return 0.0
-            else:
-                return float(numerator) / denominator
-
-        similarities = []
-        for document_tfidf in documents_tfidf:
-            similarity = cosine_similarity(query_tfidf, document_tfidf)
-            similarities.append(similarity)
-
-        # for idx, similarity in enumerate(similarities):
-        #     print(f"Document {idx + 1} similarity: {similarity}")
-
-        return similarities
+        return KeywordScorer().score(query, documents)
 
     def _calculate_cosine(
         self, tenant_id: str, query: str, documents: list[Document], vector_setting: VectorSetting
@@ -150,7 +85,16 @@ class WeightRerankRunner(BaseRerankRunner):
 
         :return:
         """
-        query_vector_scores = []
+        # documents from vector search already carry their similarity
+        query_vector_scores = np.zeros(len(documents), dtype=np.float64)
+        unscored = []
+        for i, document in enumerate(documents):
+            if document.metadata and "score" in document.metadata:
+                query_vector_scores[i] = document.metadata["score"]
+            else:
+                unscored.append(i)
+        if not unscored:
+            return query_vector_scores.tolist()
 
         model_manager = ModelManager()
 
@@ -161,25 +105,24 @@ class WeightRerankRunner(BaseRerankRunner):
             model=vector_setting.embedding_model_name,
         )
         cache_embedding = CacheEmbedding(embedding_model)
-        query_vector = cache_embedding.embed_query(query)
-        for document in documents:
-            # calculate cosine similarity
-            if document.metadata and "score" in document.metadata:
-                query_vector_scores.append(document.metadata["score"])
-            else:
-                # transform to NumPy
-                vec1 = np.array(query_vector)
-                vec2 = np.array(document.vector)
-
-                # calculate dot product
-                dot_product = np.dot(vec1, vec2)
-
-                # calculate norm
-                norm_vec1 = np.linalg.norm(vec1)
-                norm_vec2 = np.linalg.norm(vec2)
-
-                # calculate cosine similarity
-                cosine_sim = dot_product / (norm_vec1 * norm_vec2)
-                query_vector_scores.append(cosine_sim)
+        query_vector = np.asarray(cache_embedding.embed_query(query), dtype=np.float32)
+
+        # documents from keyword or full text search may come without a vector, embed those in one batch
+        missing = [i for i in unscored if documents[i].vector is None]
+        missing_vectors = {}
+        if missing:
+            embeddings = cache_embedding.embed_documents([documents[i].page_content for i in missing])
+            missing_vectors = dict(zip(missing, embeddings))
+
+        # score all unscored documents with one matrix-vector product
+        matrix = np.zeros((len(unscored), len(query_vector)), dtype=np.float32)
+        for row, i in enumerate(unscored):
+            vector = missing_vectors[i] if i in missing_vectors else documents[i].vector
+            if vector is not None:
+                matrix[row] = vector
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+        query_vector_scores[unscored] = np.divide(
+            matrix @ query_vector, norms, out=np.zeros(len(unscored), dtype=np.float32), where=norms > 0
+        )
 
-        return query_vector_scores
+        return query_vector_scores.tolist()
@@ -1,9 +1,9 @@
 import re
 from collections import defaultdict
 from collections.abc import Mapping, Sequence
-from typing import Any, Union
+from typing import Any, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from core.file import File, FileAttribute, file_manager
 from core.variables import Segment, SegmentGroup, Variable
@@ -43,6 +43,13 @@ class VariablePool(BaseModel):
         default_factory=list,
     )
 
+    # Copy-on-write layering: a child pool only stores its own writes and removals,
+    # every other lookup reads through to the parent. Segments are immutable, so
+    # sharing them between layers is safe.
+    _parent: Optional["VariablePool"] = PrivateAttr(default=None)
+    _removed_nodes: set[str] = PrivateAttr(default_factory=set)
+    _removed_keys: set[tuple[str, int]] = PrivateAttr(default_factory=set)
+
     def __init__(
         self,
         *,
@@ -104,6 +111,7 @@ class VariablePool(BaseModel):
 
         hash_key = hash(tuple(selector[1:]))
         self.variable_dictionary[selector[0]][hash_key] = variable
+        self._removed_keys.discard((selector[0], hash_key))
 
     def get(self, selector: Sequence[str], /) -> Segment | None:
         """
@@ -122,7 +130,7 @@ class VariablePool(BaseModel):
             return None
 
         hash_key = hash(tuple(selector[1:]))
-        value = self.variable_dictionary[selector[0]].get(hash_key)
+        value = self._get_variable(selector[0], hash_key)
 
         if value is None:
             selector, attr = selector[:-1], selector[-1]
@@ -154,9 +162,47 @@ class VariablePool(BaseModel):
             return
         if len(selector) == 1:
             self.variable_dictionary[selector[0]] = {}
+            if self._parent is not None:
+                self._removed_nodes.add(selector[0])
             return
         hash_key = hash(tuple(selector[1:]))
         self.variable_dictionary[selector[0]].pop(hash_key, None)
+        if self._parent is not None:
+            self._removed_keys.add((selector[0], hash_key))
+
+    def create_child(self) -> "VariablePool":
+        """
+        Create a copy-on-write child of the variable pool.
+
+        The child sees every variable of this pool, while its own adds and removes
+        are kept in the child. Creating a child costs nothing regardless of the
+        pool's size, so it replaces a deep copy for isolated runs such as the
+        items of a parallel iteration. This pool must not be changed in a way the
+        child should not see while the child is in use.
+
+        Returns:
+            VariablePool: The child pool.
+        """
+        child = VariablePool.model_construct(
+            variable_dictionary=defaultdict(dict),
+            user_inputs=self.user_inputs,
+            system_variables=self.system_variables,
+            environment_variables=self.environment_variables,
+            conversation_variables=self.conversation_variables,
+        )
+        child._parent = self
+        return child
+
+    def _get_variable(self, node_id: str, hash_key: int) -> Segment | None:
+        pool: Optional[VariablePool] = self
+        while pool is not None:
+            variables = pool.variable_dictionary.get(node_id)
+            if variables is not None and hash_key in variables:
+                return variables[hash_key]
+            if node_id in pool._removed_nodes or (node_id, hash_key) in pool._removed_keys:
+                return None
+            pool = pool._parent
+        return None
 
     def convert_template(self, template: str, /):
         parts = VARIABLE_PATTERN.split(template)
@@ -3,7 +3,7 @@ from collections import defaultdict
 from collections.abc import Mapping
 from typing import Any, Optional, cast
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from configs import dify_config
 from core.workflow.graph_engine.entities.run_condition import RunCondition
@@ -53,6 +53,9 @@ class Graph(BaseModel):
     answer_stream_generate_routes: AnswerStreamGenerateRoute = Field(..., description="answer stream generate routes")
     end_stream_param: EndStreamParam = Field(..., description="end stream param")
 
+    # (workflow id, graph hash) of the workflow version this graph was compiled from, set by GraphCache
+    _version_key: Optional[tuple[str, str]] = PrivateAttr(default=None)
+
     @classmethod
     def init(cls, graph_config: Mapping[str, Any], root_node_id: Optional[str] = None) -> "Graph":
         """
@@ -217,17 +220,16 @@ class Graph(BaseModel):
         if source_node_id not in self.node_ids or target_node_id not in self.node_ids:
             return
 
-        if source_node_id not in self.edge_mapping:
-            self.edge_mapping[source_node_id] = []
-
-        if target_node_id in [graph_edge.target_node_id for graph_edge in self.edge_mapping[source_node_id]]:
+        graph_edges = self.edge_mapping.get(source_node_id, [])
+        if target_node_id in [graph_edge.target_node_id for graph_edge in graph_edges]:
             return
 
         graph_edge = GraphEdge(
             source_node_id=source_node_id, target_node_id=target_node_id, run_condition=run_condition
         )
 
-        self.edge_mapping[source_node_id].append(graph_edge)
+        # copy on write: the mapping may be shared with other copies of a cached graph
+        self.edge_mapping = {**self.edge_mapping, source_node_id: [*graph_edges, graph_edge]}
 
     def get_leaf_node_ids(self) -> list[str]:
         """
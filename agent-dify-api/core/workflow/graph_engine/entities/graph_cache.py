@@ -0,0 +1,103 @@
+import json
+import threading
+from collections.abc import Mapping
+from hashlib import sha256
+from typing import Any, Optional
+
+from cachetools import LRUCache
+
+from configs import dify_config
+from core.workflow.graph_engine.entities.graph import Graph
+from models.workflow import Workflow
+
+
+class GraphCache:
+    """
+    Process-local LRU of compiled graphs, keyed by (workflow id, graph hash, root node id).
+
+    The graph hash is taken over the workflow's raw graph JSON, so publishing a
+    new version or editing a draft simply misses the cache. Parsed graph configs
+    and compiled graphs are shared by every run in the process and must be
+    treated as read-only: callers get a shallow copy of the graph, whose mutating
+    methods (``add_extra_edge``) copy on write. Runtime state lives in
+    ``GraphRuntimeState``, never on the graph.
+    """
+
+    _graphs: LRUCache = LRUCache(maxsize=dify_config.WORKFLOW_GRAPH_CACHE_SIZE)
+    _graph_configs: LRUCache = LRUCache(maxsize=dify_config.WORKFLOW_GRAPH_CACHE_SIZE)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def graph_hash(workflow: Workflow) -> str:
+        return sha256((workflow.graph or "").encode()).hexdigest()
+
+    @classmethod
+    def get_graph_config(cls, workflow: Workflow) -> Mapping[str, Any]:
+        """
+        Parsed graph config of the workflow, parsed once per workflow version
+        :param workflow: workflow
+        :return: graph config, shared and read-only
+        """
+        key = (workflow.id, cls.graph_hash(workflow))
+        with cls._lock:
+            graph_config = cls._graph_configs.get(key)
+        if graph_config is None:
+            graph_config = json.loads(workflow.graph) if workflow.graph else {}
+            with cls._lock:
+                cls._graph_configs[key] = graph_config
+        return graph_config
+
+    @classmethod
+    def get_graph(cls, workflow: Workflow, root_node_id: Optional[str] = None) -> Graph:
+        """
+        Compiled graph of the workflow
+        :param workflow: workflow
+        :param root_node_id: root node id, the START node if not given
+        :return: graph
+        """
+        version_key = (workflow.id, cls.graph_hash(workflow))
+        graph = cls._get(version_key, root_node_id)
+        if graph is None:
+            graph = cls._compile(version_key, cls.get_graph_config(workflow), root_node_id)
+        return graph.model_copy()
+
+    @classmethod
+    def get_sub_graph(cls, graph: Graph, graph_config: Mapping[str, Any], root_node_id: str) -> Graph:
+        """
+        Compiled sub graph (iteration or loop body) of the same workflow version as ``graph``
+        :param graph: graph the iteration or loop node runs in
+        :param graph_config: graph config of the whole workflow
+        :param root_node_id: start node id of the sub graph
+        :return: graph
+        """
+        version_key = graph._version_key
+        if version_key is None:
+            # not compiled from a stored workflow version (e.g. single step debugging)
+            return Graph.init(graph_config=graph_config, root_node_id=root_node_id)
+
+        sub_graph = cls._get(version_key, root_node_id)
+        if sub_graph is None:
+            sub_graph = cls._compile(version_key, graph_config, root_node_id)
+        return sub_graph.model_copy()
+
+    @classmethod
+    def _get(cls, version_key: tuple[str, str], root_node_id: Optional[str]) -> Optional[Graph]:
+        with cls._lock:
+            return cls._graphs.get((*version_key, root_node_id))
+
+    @classmethod
+    def _compile(
+        cls, version_key: tuple[str, str], graph_config: Mapping[str, Any], root_node_id: Optional[str]
+    ) -> Graph:
+        # invalid graphs raise here and are never cached
+        graph = Graph.init(graph_config=graph_config, root_node_id=root_node_id)
+        graph._version_key = version_key
+        with cls._lock:
+            cls._graphs[(*version_key, root_node_id)] = graph
+        return graph
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._graphs.clear()
+            cls._graph_configs.clear()
@@ -32,6 +32,7 @@ from core.workflow.graph_engine.entities.event import (
     NodeRunSucceededEvent,
 )
 from core.workflow.graph_engine.entities.graph import Graph
+from core.workflow.graph_engine.entities.graph_cache import GraphCache
 from core.workflow.nodes.base import BaseNode
 from core.workflow.nodes.enums import NodeType
 from core.workflow.nodes.event import NodeEvent, RunCompletedEvent
@@ -67,7 +68,9 @@ class LoopNode(BaseNode[LoopNodeData]):
             raise ValueError(f"field start_node_id in loop {self.node_id} not found")
 
         # Initialize graph
-        loop_graph = Graph.init(graph_config=self.graph_config, root_node_id=self.node_data.start_node_id)
+        loop_graph = GraphCache.get_sub_graph(
+            self.graph, graph_config=self.graph_config, root_node_id=self.node_data.start_node_id
+        )
         if not loop_graph:
             raise ValueError("loop graph not found")
 
@@ -13,6 +13,7 @@ from .dataset import (
     AppDatasetJoin,
     Dataset,
     DatasetCollectionBinding,
+    DatasetKeywordPosting,
     DatasetKeywordTable,
     DatasetPermission,
     DatasetPermissionEnum,
@@ -117,6 +118,7 @@ __all__ = [
     "DataSourceOauthBinding",
     "Dataset",
     "DatasetCollectionBinding",
+    "DatasetKeywordPosting",
     "DatasetKeywordTable",
     "DatasetPermission",
     "DatasetPermissionEnum",
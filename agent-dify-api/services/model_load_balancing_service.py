@@ -8,6 +8,7 @@ from constants import HIDDEN_VALUE
 from core.entities.provider_configuration import ProviderConfiguration
 from core.helper import encrypter
 from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
 from core.model_manager import LBModelManager
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
@@ -277,6 +278,8 @@ class ModelLoadBalancingService:
         db.session.add(inherit_config)
         db.session.commit()
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
         return inherit_config
 
     def update_load_balancing_configs(
@@ -422,6 +425,8 @@ class ModelLoadBalancingService:
 
             self._clear_credentials_cache(tenant_id, config_id)
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
     def validate_load_balancing_credentials(
         self,
         tenant_id: str,
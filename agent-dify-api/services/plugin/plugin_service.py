@@ -9,6 +9,7 @@ from configs import dify_config
 from core.helper import marketplace
 from core.helper.download import download_with_size_limit
 from core.helper.marketplace import download_plugin_pkg
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
 from core.plugin.entities.bundle import PluginBundleDependency
 from core.plugin.entities.plugin import (
     GenericProviderID,
@@ -17,7 +18,7 @@ from core.plugin.entities.plugin import (
     PluginInstallation,
     PluginInstallationSource,
 )
-from core.plugin.entities.plugin_daemon import PluginInstallTask, PluginUploadResponse
+from core.plugin.entities.plugin_daemon import PluginInstallTask, PluginInstallTaskStatus, PluginUploadResponse
 from core.plugin.manager.asset import PluginAssetManager
 from core.plugin.manager.debugging import PluginDebuggingManager
 from core.plugin.manager.plugin import PluginInstallationManager
@@ -35,6 +36,9 @@ class PluginService:
     REDIS_KEY_PREFIX = "plugin_service:latest_plugin:"
     REDIS_TTL = 60 * 5  # 5 minutes
 
+    FINISHED_INSTALL_TASK_KEY_PREFIX = "plugin_service:finished_install_task:"
+    FINISHED_INSTALL_TASK_TTL = 60 * 60 * 24  # 1 day
+
     @staticmethod
     def fetch_latest_plugin_version(plugin_ids: Sequence[str]) -> Mapping[str, Optional[LatestPluginCache]]:
         """
@@ -159,12 +163,48 @@ class PluginService:
         Fetch plugin installation tasks
         """
         manager = PluginInstallationManager()
-        return manager.fetch_plugin_installation_tasks(tenant_id, page, page_size)
+        tasks = manager.fetch_plugin_installation_tasks(tenant_id, page, page_size)
+        PluginService._invalidate_on_finished_install_tasks(tenant_id, tasks)
+        return tasks
 
     @staticmethod
     def fetch_install_task(tenant_id: str, task_id: str) -> PluginInstallTask:
         manager = PluginInstallationManager()
-        return manager.fetch_plugin_installation_task(tenant_id, task_id)
+        task = manager.fetch_plugin_installation_task(tenant_id, task_id)
+        PluginService._invalidate_on_finished_install_tasks(tenant_id, [task])
+        return task
+
+    @staticmethod
+    def _invalidate_on_finished_install_tasks(tenant_id: str, tasks: Sequence[PluginInstallTask]) -> None:
+        """
+        Drop the tenant's cached provider configurations once an install task finishes,
+        the daemon installs in the background and the plugins may provide models.
+        Finished tasks keep being polled, so each one invalidates only once.
+        """
+        finished = [
+            task.id
+            for task in tasks
+            if task.status in {PluginInstallTaskStatus.Success, PluginInstallTaskStatus.Failed}
+        ]
+        if not finished:
+            return
+
+        try:
+            pipe = redis_client.pipeline()
+            for task_id in finished:
+                pipe.set(
+                    f"{PluginService.FINISHED_INSTALL_TASK_KEY_PREFIX}{task_id}",
+                    1,
+                    ex=PluginService.FINISHED_INSTALL_TASK_TTL,
+                    nx=True,
+                )
+            newly_finished = any(pipe.execute())
+        except Exception:
+            logger.exception("Failed to record finished plugin install tasks")
+            newly_finished = True
+
+        if newly_finished:
+            ProviderConfigurationsCache.invalidate(tenant_id)
 
     @staticmethod
     def delete_install_task(tenant_id: str, task_id: str) -> bool:
@@ -214,7 +254,7 @@ class PluginService:
             pkg = download_plugin_pkg(new_plugin_unique_identifier)
             manager.upload_pkg(tenant_id, pkg, verify_signature=False)
 
-        return manager.upgrade_plugin(
+        response = manager.upgrade_plugin(
             tenant_id,
             original_plugin_unique_identifier,
             new_plugin_unique_identifier,
@@ -223,6 +263,9 @@ class PluginService:
                 "plugin_unique_identifier": new_plugin_unique_identifier,
             },
         )
+        # the plugin may provide models, invalidated again when the install task finishes
+        ProviderConfigurationsCache.invalidate(tenant_id)
+        return response
 
     @staticmethod
     def upgrade_plugin_with_github(
@@ -237,7 +280,7 @@ class PluginService:
         Upgrade plugin with github
         """
         manager = PluginInstallationManager()
-        return manager.upgrade_plugin(
+        response = manager.upgrade_plugin(
             tenant_id,
             original_plugin_unique_identifier,
             new_plugin_unique_identifier,
@@ -248,6 +291,9 @@ class PluginService:
                 "package": package,
             },
         )
+        # the plugin may provide models, invalidated again when the install task finishes
+        ProviderConfigurationsCache.invalidate(tenant_id)
+        return response
 
     @staticmethod
     def upload_pkg(tenant_id: str, pkg: bytes, verify_signature: bool = False) -> PluginUploadResponse:
@@ -291,12 +337,15 @@ class PluginService:
     @staticmethod
     def install_from_local_pkg(tenant_id: str, plugin_unique_identifiers: Sequence[str]):
         manager = PluginInstallationManager()
-        return manager.install_from_identifiers(
+        response = manager.install_from_identifiers(
             tenant_id,
             plugin_unique_identifiers,
             PluginInstallationSource.Package,
             [{}],
         )
+        # the plugin may provide models, invalidated again when the install task finishes
+        ProviderConfigurationsCache.invalidate(tenant_id)
+        return response
 
     @staticmethod
     def install_from_github(tenant_id: str, plugin_unique_identifier: str, repo: str, version: str, package: str):
@@ -305,7 +354,7 @@ class PluginService:
         returns plugin_unique_identifier
         """
         manager = PluginInstallationManager()
-        return manager.install_from_identifiers(
+        response = manager.install_from_identifiers(
             tenant_id,
             [plugin_unique_identifier],
             PluginInstallationSource.Github,
@@ -317,6 +366,9 @@ class PluginService:
                 }
             ],
         )
+        # the plugin may provide models, invalidated again when the install task finishes
+        ProviderConfigurationsCache.invalidate(tenant_id)
+        return response
 
     @staticmethod
     def install_from_marketplace_pkg(
@@ -338,7 +390,7 @@ class PluginService:
                 pkg = download_plugin_pkg(plugin_unique_identifier)
                 manager.upload_pkg(tenant_id, pkg, verify_signature)
 
-        return manager.install_from_identifiers(
+        response = manager.install_from_identifiers(
             tenant_id,
             plugin_unique_identifiers,
             PluginInstallationSource.Marketplace,
@@ -349,11 +401,17 @@ class PluginService:
                 for plugin_unique_identifier in plugin_unique_identifiers
             ],
         )
+        # the plugin may provide models, invalidated again when the install task finishes
+        ProviderConfigurationsCache.invalidate(tenant_id)
+        return response
 
     @staticmethod
     def uninstall(tenant_id: str, plugin_installation_id: str) -> bool:
         manager = PluginInstallationManager()
-        return manager.uninstall(tenant_id, plugin_installation_id)
+        uninstalled = manager.uninstall(tenant_id, plugin_installation_id)
+        # the plugin may have provided models
+        ProviderConfigurationsCache.invalidate(tenant_id)
+        return uninstalled
 
     @staticmethod
     def check_tools_existence(tenant_id: str, provider_ids: Sequence[GenericProviderID]) -> Sequence[bool]:
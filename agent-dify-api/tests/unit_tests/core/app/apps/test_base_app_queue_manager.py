@@ -0,0 +1,110 @@
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.app.apps import base_app_queue_manager
+from core.app.apps.base_app_queue_manager import AppQueueManager, PublishFrom, _is_sqlalchemy_free_type
+from core.app.apps.workflow.app_queue_manager import WorkflowAppQueueManager
+from core.app.entities.app_invoke_entities import InvokeFrom
+from core.app.entities.queue_entities import (
+    AppQueueEvent,
+    QueueEvent,
+    QueueLLMChunkEvent,
+    QueuePingEvent,
+    QueueStopEvent,
+    QueueTextChunkEvent,
+)
+
+
+class QueueAnyValueEvent(AppQueueEvent):
+    event: QueueEvent = QueueEvent.NODE_SUCCEEDED
+    outputs: dict[str, Any]
+
+
+class SqlAlchemyRow:
+    _sa_instance_state = None
+
+
+@pytest.fixture
+def redis(mocker):
+    redis = MagicMock()
+    redis.get.return_value = None
+    mocker.patch.object(base_app_queue_manager, "redis_client", redis)
+    return redis
+
+
+@pytest.fixture
+def queue_manager(redis):
+    return WorkflowAppQueueManager(
+        task_id="task-1", user_id="user-1", invoke_from=InvokeFrom.SERVICE_API, app_mode="workflow"
+    )
+
+
+def test_chunk_events_skip_the_sqlalchemy_model_check():
+    assert _is_sqlalchemy_free_type(QueueTextChunkEvent)
+    assert _is_sqlalchemy_free_type(QueueLLMChunkEvent)
+    assert not _is_sqlalchemy_free_type(QueueAnyValueEvent)
+
+
+def test_publish_still_rejects_sqlalchemy_models_in_untyped_fields(queue_manager, mocker):
+    check = mocker.spy(queue_manager, "_check_for_sqlalchemy_models")
+
+    queue_manager.publish(QueueTextChunkEvent(text="hello"), PublishFrom.TASK_PIPELINE)
+    check.assert_not_called()
+
+    with pytest.raises(TypeError):
+        queue_manager.publish(QueueAnyValueEvent(outputs={"row": SqlAlchemyRow()}), PublishFrom.TASK_PIPELINE)
+
+
+def test_stop_flag_is_polled_at_most_once_per_interval(queue_manager, redis):
+    for _ in range(100):
+        assert not queue_manager._is_stopped()
+    assert redis.get.call_count == 1
+
+    redis.get.return_value = b"1"
+    queue_manager._last_stop_check = 0
+    assert queue_manager._is_stopped()
+    assert queue_manager._is_stopped()
+    assert redis.get.call_count == 2
+
+
+def test_stop_flag_is_pushed_while_listening(queue_manager, redis):
+    queue_manager._subscribe_stop_signal()
+    subscribe_kwargs = redis.pubsub.return_value.subscribe.call_args.kwargs
+    handler = subscribe_kwargs["generate_task_stopped:task-1"]
+    redis.get.reset_mock()
+
+    assert not queue_manager._is_stopped()
+    handler({"type": "message", "data": b"1"})
+    assert queue_manager._is_stopped()
+    redis.get.assert_not_called()
+
+    queue_manager._unsubscribe_stop_signal()
+    redis.pubsub.return_value.run_in_thread.return_value.stop.assert_called_once()
+
+
+def test_set_stop_flag_publishes_the_stop_signal(redis):
+    redis.get.return_value = b"end-user-user-1"
+
+    AppQueueManager.set_stop_flag("task-1", InvokeFrom.SERVICE_API, "user-1")
+
+    redis.setex.assert_called_once_with("generate_task_stopped:task-1", 600, 1)
+    redis.publish.assert_called_once_with("generate_task_stopped:task-1", 1)
+
+
+def test_listen_pings_on_a_timer_and_stops_on_signal(queue_manager, redis, mocker):
+    mocker.patch.object(WorkflowAppQueueManager, "PING_INTERVAL", 0)
+    for i in range(3):
+        queue_manager.publish(QueueTextChunkEvent(text=str(i)), PublishFrom.APPLICATION_MANAGER)
+
+    events = []
+    for message in queue_manager.listen():
+        events.append(message.event)
+        if isinstance(message.event, QueuePingEvent):
+            queue_manager._on_stop_signal({"type": "message", "data": b"1"})
+
+    assert [event.text for event in events if isinstance(event, QueueTextChunkEvent)] == ["0", "1", "2"]
+    assert isinstance(events[3], QueuePingEvent)
+    assert isinstance(events[-1], QueueStopEvent)
+    redis.pubsub.return_value.run_in_thread.return_value.stop.assert_called_once()
@@ -0,0 +1,87 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.app.task_pipeline import workflow_node_execution_journal as journal_module
+from core.app.task_pipeline.workflow_node_execution_journal import WorkflowNodeExecutionJournal
+from models.workflow import WorkflowNodeExecution, WorkflowNodeExecutionStatus
+
+
+def _node_execution(id: str, status: WorkflowNodeExecutionStatus) -> WorkflowNodeExecution:
+    workflow_node_execution = WorkflowNodeExecution()
+    workflow_node_execution.id = id
+    workflow_node_execution.node_id = "node-" + id
+    workflow_node_execution.status = status.value
+    return workflow_node_execution
+
+
+@pytest.fixture
+def upserted(mocker):
+    mocker.patch.object(journal_module, "db", MagicMock())
+    rows: list[dict] = []
+    mocker.patch.object(WorkflowNodeExecutionJournal, "_upsert", side_effect=lambda batch: rows.extend(batch))
+    return rows
+
+
+def test_latest_state_wins(upserted):
+    journal = WorkflowNodeExecutionJournal(flush_interval=60)
+    workflow_node_execution = _node_execution("a", WorkflowNodeExecutionStatus.RUNNING)
+    journal.record(workflow_node_execution)
+    workflow_node_execution.status = WorkflowNodeExecutionStatus.SUCCEEDED.value
+    journal.record(workflow_node_execution)
+    journal.close()
+
+    assert len(upserted) == 1
+    assert upserted[0]["id"] == "a"
+    assert upserted[0]["status"] == WorkflowNodeExecutionStatus.SUCCEEDED.value
+
+
+def test_server_defaults_are_left_to_the_database(upserted):
+    journal = WorkflowNodeExecutionJournal(flush_interval=60)
+    journal.record(_node_execution("a", WorkflowNodeExecutionStatus.RUNNING))
+    journal.close()
+
+    assert "created_at" not in upserted[0]
+    assert upserted[0]["error"] is None
+
+
+def test_writer_flushes_once_max_pending_is_reached(upserted):
+    journal = WorkflowNodeExecutionJournal(flush_interval=60, max_pending=2)
+    journal.record(_node_execution("a", WorkflowNodeExecutionStatus.RUNNING))
+    journal.record(_node_execution("b", WorkflowNodeExecutionStatus.RUNNING))
+    journal._writer.join(timeout=0.5)  # the writer wakes up, flushes and waits again
+    assert {row["id"] for row in upserted} == {"a", "b"}
+    journal.close()
+    assert not journal._writer.is_alive()
+
+
+def test_failed_flush_keeps_rows_without_overwriting_newer_state(mocker):
+    mocker.patch.object(journal_module, "db", MagicMock())
+    journal = WorkflowNodeExecutionJournal(flush_interval=60)
+    workflow_node_execution = _node_execution("a", WorkflowNodeExecutionStatus.RUNNING)
+    journal.record(workflow_node_execution)
+    journal.record(_node_execution("b", WorkflowNodeExecutionStatus.RUNNING))
+
+    def fail(rows):
+        # a newer state is recorded while the write is in flight
+        workflow_node_execution.status = WorkflowNodeExecutionStatus.SUCCEEDED.value
+        journal.record(workflow_node_execution)
+        raise RuntimeError("database is down")
+
+    mocker.patch.object(journal, "_upsert", side_effect=fail)
+    with pytest.raises(RuntimeError):
+        journal.flush()
+
+    assert journal._pending["a"]["status"] == WorkflowNodeExecutionStatus.SUCCEEDED.value
+    assert journal._pending["b"]["status"] == WorkflowNodeExecutionStatus.RUNNING.value
+
+
+def test_upsert_groups_rows_by_columns(mocker):
+    mocker.patch.object(journal_module, "db", MagicMock())
+    session = MagicMock()
+    mocker.patch.object(journal_module, "Session").return_value.__enter__.return_value = session
+    journal = WorkflowNodeExecutionJournal(flush_interval=60)
+    journal._upsert([{"id": "a", "status": "running"}, {"id": "b", "status": "running"}, {"id": "c", "error": "x"}])
+
+    assert session.execute.call_count == 2
+    session.commit.assert_called_once()
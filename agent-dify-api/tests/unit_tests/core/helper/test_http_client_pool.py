@@ -0,0 +1,58 @@
+import httpx
+
+from core.helper.http_client_pool import HttpClientPool, _NoPersistCookieJar
+
+
+def test_clients_are_shared_per_configuration():
+    pool = HttpClientPool()
+
+    client = pool.get_client(verify=True)
+
+    assert pool.get_client(verify=True) is client
+    assert pool.get_client(verify=False) is not client
+    assert pool.get_client(proxy_mounts={"http://": "http://proxy:3128"}) is not client
+    assert pool.get_client(limits=httpx.Limits(max_connections=5)) is not client
+    pool.close()
+
+
+def test_child_process_gets_fresh_clients():
+    pool = HttpClientPool()
+    client = pool.get_client()
+
+    # As seen from a forked child
+    pool._pid = -1
+
+    assert pool.get_client() is not client
+    assert not client.is_closed
+
+
+def test_response_cookies_are_not_shared_between_requests():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200, headers={"Set-Cookie": "session=secret"}, json={"cookie": request.headers.get("cookie")}
+        )
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    client.cookies = _NoPersistCookieJar()  # type: ignore[assignment]
+
+    first = client.get("http://example.com/")
+    second = client.get("http://example.com/")
+
+    assert first.cookies.get("session") == "secret"
+    assert second.json() == {"cookie": None}
+    assert client.get("http://example.com/", cookies={"explicit": "1"}).json() == {"cookie": "explicit=1"}
+
+
+def test_metrics_count_reused_connections():
+    pool = HttpClientPool()
+    for _ in range(3):
+        pool.metrics.record_request()
+    pool.metrics.trace("connection.connect_tcp.complete", {})
+    pool.metrics.trace("connection.start_tls.complete", {})
+
+    assert pool.metrics.snapshot() == {
+        "requests": 3,
+        "connections_opened": 1,
+        "tls_handshakes": 1,
+        "connections_reused": 2,
+    }
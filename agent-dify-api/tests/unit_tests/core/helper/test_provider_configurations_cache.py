@@ -0,0 +1,81 @@
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.entities.provider_configuration import ProviderConfigurations
+from core.helper import provider_configurations_cache as cache_module
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
+from core.provider_manager import ProviderManager
+
+
+@pytest.fixture
+def redis(mocker):
+    redis = MagicMock()
+    redis.incr.return_value = 1
+    mocker.patch.object(cache_module, "redis_client", redis)
+    # pretend this process is already subscribed
+    mocker.patch.object(ProviderConfigurationsCache, "_subscription_pid", os.getpid())
+    ProviderConfigurationsCache.clear()
+    yield redis
+    ProviderConfigurationsCache.clear()
+
+
+def test_get_configurations_is_built_once(redis, mocker):
+    build = mocker.patch.object(
+        ProviderManager, "_build_configurations", side_effect=lambda tenant_id: ProviderConfigurations(tenant_id)
+    )
+
+    first = ProviderManager().get_configurations("tenant")
+    second = ProviderManager().get_configurations("tenant")
+
+    assert first is second
+    build.assert_called_once_with("tenant")
+    assert ProviderManager().get_configurations("other") is not first
+
+
+def test_invalidate_publishes_a_new_version(redis, mocker):
+    build = mocker.patch.object(
+        ProviderManager, "_build_configurations", side_effect=lambda tenant_id: ProviderConfigurations(tenant_id)
+    )
+    first = ProviderManager().get_configurations("tenant")
+
+    ProviderConfigurationsCache.invalidate("tenant")
+
+    redis.incr.assert_called_once_with("provider_configurations_version:tenant")
+    redis.publish.assert_called_once_with(ProviderConfigurationsCache.CHANNEL, "tenant:1")
+    assert ProviderManager().get_configurations("tenant") is not first
+    assert build.call_count == 2
+
+
+def test_message_from_another_process_drops_the_entry(redis):
+    configurations = ProviderConfigurations("tenant")
+    ProviderConfigurationsCache.set("tenant", configurations, ProviderConfigurationsCache.version("tenant"))
+    assert ProviderConfigurationsCache.get("tenant") is configurations
+
+    ProviderConfigurationsCache._on_message({"data": b"tenant:7"})
+
+    assert ProviderConfigurationsCache.get("tenant") is None
+    assert ProviderConfigurationsCache.version("tenant") == 7
+    # an older or repeated version does not move the version back
+    ProviderConfigurationsCache._on_message({"data": b"tenant:3"})
+    assert ProviderConfigurationsCache.version("tenant") == 7
+
+
+def test_configurations_built_before_an_invalidation_are_not_cached(redis):
+    version = ProviderConfigurationsCache.version("tenant")
+    ProviderConfigurationsCache._on_message({"data": b"tenant:1"})
+
+    ProviderConfigurationsCache.set("tenant", ProviderConfigurations("tenant"), version)
+
+    assert ProviderConfigurationsCache.get("tenant") is None
+
+
+def test_invalidate_without_redis_still_drops_the_local_entry(redis):
+    redis.incr.side_effect = ConnectionError
+    ProviderConfigurationsCache.set("tenant", ProviderConfigurations("tenant"), 0)
+
+    ProviderConfigurationsCache.invalidate("tenant")
+
+    assert ProviderConfigurationsCache.get("tenant") is None
+    assert ProviderConfigurationsCache.version("tenant") == 1
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.memory import token_buffer_memory as memory_module
+from core.memory.token_buffer_memory import TokenBufferMemory
+from core.model_runtime.entities import AssistantPromptMessage, UserPromptMessage
+
+
+def _message(id: str, query: str, answer: str) -> SimpleNamespace:
+    return SimpleNamespace(id=id, query=query, answer=answer, workflow_run_id=None, parent_message_id=None)
+
+
+@pytest.fixture
+def redis(mocker):
+    cache: dict[str, int] = {}
+    redis = MagicMock()
+    redis.mget.side_effect = lambda keys: [cache.get(key) for key in keys]
+    redis.pipeline.return_value.setex.side_effect = lambda key, ttl, value: cache.__setitem__(key, value)
+    mocker.patch.object(memory_module, "redis_client", redis)
+    return redis
+
+
+@pytest.fixture
+def memory(mocker, redis):
+    db = MagicMock()
+    db.session.query.return_value.filter.return_value.all.return_value = []
+    mocker.patch.object(memory_module, "db", db)
+    # newest first, as extract_thread_messages returns them
+    messages = [_message("3", "q3", "a3"), _message("2", "q2", "a2"), _message("1", "q1", "a1")]
+    mocker.patch.object(memory_module, "extract_thread_messages", side_effect=lambda _: list(messages))
+
+    model_instance = MagicMock()
+    model_instance.provider = "openai"
+    model_instance.model = "gpt-4o"
+    # every prompt message costs 5 tokens
+    model_instance.get_llm_num_tokens.side_effect = lambda prompt_messages: 5 * len(prompt_messages)
+    return TokenBufferMemory(conversation=MagicMock(mode="chat"), model_instance=model_instance)
+
+
+def test_keeps_the_newest_exchanges_that_fit(memory):
+    prompt_messages = memory.get_history_prompt_messages(max_token_limit=25)
+
+    assert [prompt_message.content for prompt_message in prompt_messages] == ["q2", "a2", "q3", "a3"]
+    assert isinstance(prompt_messages[0], UserPromptMessage)
+    assert isinstance(prompt_messages[1], AssistantPromptMessage)
+
+
+def test_exchange_token_counts_are_cached(memory, redis):
+    memory.get_history_prompt_messages(max_token_limit=2000)
+    assert memory.model_instance.get_llm_num_tokens.call_count == 3
+    redis.pipeline.return_value.setex.assert_any_call(
+        "memory_exchange_tokens:openai:gpt-4o:3", TokenBufferMemory.TOKEN_COUNT_CACHE_TTL, 10
+    )
+
+    prompt_messages = memory.get_history_prompt_messages(max_token_limit=2000)
+
+    assert len(prompt_messages) == 6
+    assert memory.model_instance.get_llm_num_tokens.call_count == 3
+
+
+def test_stops_counting_once_the_limit_is_exceeded(memory, redis):
+    memory.get_history_prompt_messages(max_token_limit=15)
+
+    # the newest exchange fits, the second one goes over the limit, the oldest is never counted
+    assert memory.model_instance.get_llm_num_tokens.call_count == 2
+    cached_keys = [call.args[0] for call in redis.pipeline.return_value.setex.call_args_list]
+    assert cached_keys == ["memory_exchange_tokens:openai:gpt-4o:3", "memory_exchange_tokens:openai:gpt-4o:2"]
+
+
+def test_keeps_the_last_answer_if_nothing_fits(memory):
+    prompt_messages = memory.get_history_prompt_messages(max_token_limit=5)
+
+    assert len(prompt_messages) == 1
+    assert prompt_messages[0].content == "a3"
+
+
+def test_counts_tokens_without_redis(memory, redis):
+    redis.mget.side_effect = ConnectionError
+
+    prompt_messages = memory.get_history_prompt_messages(max_token_limit=10)
+
+    assert [prompt_message.content for prompt_message in prompt_messages] == ["q3", "a3"]
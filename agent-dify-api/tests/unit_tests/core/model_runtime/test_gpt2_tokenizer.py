@@ -0,0 +1,43 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.model_runtime.model_providers.__base.tokenizers import gpt2_tokenzier as tokenizer_module
+from core.model_runtime.model_providers.__base.tokenizers.gpt2_tokenzier import GPT2Tokenizer
+
+
+@pytest.fixture
+def encoder(mocker):
+    # one token per word
+    encoder = MagicMock()
+    encoder.encode.side_effect = lambda text: text.split()
+    encoder.encode_batch.side_effect = lambda texts: [text.split() for text in texts]
+    mocker.patch.object(tokenizer_module, "_tokenizer", encoder)
+    tokenizer_module._token_counts.clear()
+    yield encoder
+    tokenizer_module._token_counts.clear()
+
+
+def test_token_counts_are_cached(encoder):
+    assert GPT2Tokenizer.get_num_tokens("hello world") == 2
+    assert GPT2Tokenizer.get_num_tokens_batch(["hello world", "a b c", "a b c"]) == [2, 3, 3]
+    assert GPT2Tokenizer.get_num_tokens("a b c") == 3
+
+    # each distinct text is encoded once
+    assert [call.args[0] for call in encoder.encode.call_args_list] == ["hello world", "a b c"]
+
+
+def test_large_batches_are_encoded_in_parallel(encoder):
+    texts = [" ".join(["word"] * i) for i in range(20)]
+
+    assert GPT2Tokenizer.get_num_tokens_batch(texts) == list(range(20))
+    encoder.encode_batch.assert_called_once_with(texts)
+    encoder.encode.assert_not_called()
+
+
+def test_encoder_is_loaded_once(mocker):
+    mocker.patch.object(tokenizer_module, "_tokenizer", None)
+    get_encoding = mocker.patch("tiktoken.get_encoding")
+
+    assert GPT2Tokenizer.get_encoder() is GPT2Tokenizer.get_encoder()
+    get_encoding.assert_called_once_with("gpt2")
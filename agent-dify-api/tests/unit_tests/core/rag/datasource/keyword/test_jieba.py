@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.rag.datasource.keyword.jieba import jieba as jieba_module
+from core.rag.datasource.keyword.jieba.jieba import Jieba
+
+
+@pytest.fixture(autouse=True)
+def _clear_postings_cache():
+    Jieba.clear_cache()
+    yield
+    Jieba.clear_cache()
+
+
+@pytest.fixture
+def keyword(mocker):
+    dataset = SimpleNamespace(id="dataset-1", tenant_id="tenant-1")
+    mocker.patch.object(jieba_module, "db", MagicMock())
+    mocker.patch.object(jieba_module, "redis_client", MagicMock())
+    Jieba._migrated_datasets.add(dataset.id)
+    return Jieba(dataset)  # type: ignore[arg-type]
+
+
+def _segment(index_node_id):
+    return SimpleNamespace(
+        index_node_id=index_node_id,
+        index_node_hash=index_node_id + "-hash",
+        content="content of " + index_node_id,
+        document_id="document-1",
+        dataset_id="dataset-1",
+    )
+
+
+def test_search_ranks_by_matches_and_fetches_segments_in_one_query(keyword, mocker):
+    mocker.patch.object(keyword, "_version", return_value=1)
+    mocker.patch.object(
+        keyword,
+        "_get_postings",
+        return_value={"apple": frozenset({"n1", "n2"}), "banana": frozenset({"n2", "n3"}), "cherry": frozenset()},
+    )
+    handler = mocker.patch.object(jieba_module, "JiebaKeywordTableHandler")
+    handler.return_value.extract_keywords.return_value = {"apple", "banana", "cherry"}
+    # n3 is filtered out by the query, so it is skipped
+    get_segments = mocker.patch.object(
+        jieba_module.SegmentHydrator, "get_segments", return_value=[_segment("n1"), _segment("n2")]
+    )
+
+    documents = keyword.search("apple banana", top_k=3)
+
+    assert [document.metadata["doc_id"] for document in documents] == ["n2", "n1"]
+    assert documents[0].metadata["doc_hash"] == "n2-hash"
+    assert get_segments.call_count == 1
+
+
+def test_postings_are_cached_per_index_version(keyword):
+    rows = [("apple", "n1"), ("apple", "n2")]
+    postings_query = jieba_module.db.session.query.return_value.filter.return_value
+    postings_query.all.return_value = rows
+    jieba_module.redis_client.get.return_value = b"3"
+
+    first = keyword._get_postings({"apple", "missing"})
+    second = keyword._get_postings({"apple", "missing"})
+
+    assert first == second == {"apple": frozenset({"n1", "n2"}), "missing": frozenset()}
+    assert postings_query.all.call_count == 1
+
+    # A write anywhere bumps the version, so the next read goes back to the database
+    jieba_module.redis_client.get.return_value = b"4"
+    postings_query.all.return_value = [("apple", "n1")]
+    assert keyword._get_postings({"apple"}) == {"apple": frozenset({"n1"})}
+    assert postings_query.all.call_count == 2
+
+
+def test_add_postings_inserts_deduplicated_rows_in_batches(keyword, mocker):
+    mocker.patch.object(Jieba, "_insert_batch_size", 2)
+    insert = mocker.patch.object(jieba_module, "insert")
+
+    keyword._add_postings({"n1": ["apple", "apple", "banana"], "n2": ["x" * 300, "cherry"]})
+
+    batches = [call.args[0] for call in insert.return_value.values.call_args_list]
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert sorted((row["keyword"], row["index_node_id"]) for batch in batches for row in batch) == [
+        ("apple", "n1"),
+        ("banana", "n1"),
+        ("cherry", "n2"),
+    ]
+    assert jieba_module.db.session.execute.call_count == 2
+    jieba_module.db.session.commit.assert_called_once()
+    jieba_module.redis_client.incr.assert_called_once_with("keyword_index_version:dataset-1")
+
+
+def test_delete_by_ids_removes_postings_and_bumps_version(keyword):
+    keyword.delete_by_ids(["n1", "n2"])
+
+    jieba_module.db.session.query.return_value.filter.return_value.delete.assert_called_once_with(
+        synchronize_session=False
+    )
+    jieba_module.db.session.commit.assert_called_once()
+    jieba_module.redis_client.incr.assert_called_once_with("keyword_index_version:dataset-1")
+
+
+def test_legacy_keyword_table_is_moved_to_postings_once(keyword, mocker):
+    Jieba._migrated_datasets.clear()
+    legacy_table = MagicMock(data_source_type="database")
+    legacy_table.keyword_table_dict = {"__data__": {"table": {"apple": {"n1", "n2"}, "banana": {"n2"}}}}
+    get_legacy = mocker.patch.object(keyword, "_get_legacy_keyword_table", side_effect=[legacy_table, legacy_table])
+    insert_postings = mocker.patch.object(keyword, "_insert_postings")
+
+    keyword._ensure_postings()
+    keyword._ensure_postings()
+
+    node_keywords = insert_postings.call_args.args[0]
+    assert {node_id: sorted(keywords) for node_id, keywords in node_keywords.items()} == {
+        "n1": ["apple"],
+        "n2": ["apple", "banana"],
+    }
+    insert_postings.assert_called_once()
+    assert get_legacy.call_count == 2
+    jieba_module.db.session.delete.assert_called_once_with(legacy_table)
+    jieba_module.redis_client.incr.assert_called_once()
@@ -0,0 +1,63 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.rag.datasource import segment_hydrator as hydrator_module
+from core.rag.datasource.segment_hydrator import SegmentHydrator
+from models.dataset import DocumentSegment
+
+
+@pytest.fixture
+def db(mocker):
+    SegmentHydrator.clear()
+    db = MagicMock()
+    mocker.patch.object(hydrator_module, "db", db)
+    yield db
+    SegmentHydrator.clear()
+
+
+def _segment(id: str, index_node_hash: str) -> DocumentSegment:
+    segment = DocumentSegment()
+    segment.id = id
+    segment.index_node_hash = index_node_hash
+    return segment
+
+
+def _serve(db, segments: list[DocumentSegment], contents: list[tuple[str, str]]) -> MagicMock:
+    db.session.query.return_value.options.return_value.filter.return_value.all.return_value = segments
+    content_query = db.session.query.return_value.filter.return_value
+    content_query.all.return_value = contents
+    return content_query
+
+
+def test_contents_are_cached_by_index_node_hash(db):
+    content_query = _serve(db, [_segment("1", "hash-1"), _segment("2", "hash-2")], [("1", "one"), ("2", "two")])
+    segments = SegmentHydrator.get_segments(DocumentSegment.enabled == True)
+    assert [segment.content for segment in segments] == ["one", "two"]
+    assert content_query.all.call_count == 1
+
+    # same segments, only the new one needs its content
+    content_query = _serve(db, [_segment("1", "hash-1"), _segment("3", "hash-3")], [("3", "three")])
+    segments = SegmentHydrator.get_segments(DocumentSegment.enabled == True)
+
+    assert [segment.content for segment in segments] == ["one", "three"]
+    assert content_query.all.call_count == 2
+
+
+def test_edited_segment_misses_the_cache(db):
+    _serve(db, [_segment("1", "hash-1")], [("1", "before")])
+    SegmentHydrator.get_segments(DocumentSegment.enabled == True)
+
+    _serve(db, [_segment("1", "hash-1-edited")], [("1", "after")])
+    segments = SegmentHydrator.get_segments(DocumentSegment.enabled == True)
+
+    assert segments[0].content == "after"
+
+
+def test_child_chunks_are_loaded_in_one_query(db):
+    child_chunk = MagicMock(index_node_id="child-1")
+    db.session.query.return_value.filter.return_value.all.return_value = [child_chunk]
+
+    assert SegmentHydrator.get_child_chunks({"child-1", "child-2"}) == {"child-1": child_chunk}
+    assert SegmentHydrator.get_child_chunks(set()) == {}
+    assert db.session.query.call_count == 1
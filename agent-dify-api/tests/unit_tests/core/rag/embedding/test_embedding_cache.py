@@ -0,0 +1,136 @@
+import pickle
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from core.entities.embedding_type import EmbeddingInputType
+from core.rag.embedding import embedding_cache as embedding_cache_module
+from core.rag.embedding.cached_embedding import CacheEmbedding
+from core.rag.embedding.embedding_cache import EmbeddingCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+        self.mget_calls = 0
+        self.expired = []
+
+    def mget(self, keys):
+        self.mget_calls += 1
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def setex(self, key, ttl, value):
+                redis.store[key] = value
+
+            def expire(self, key, ttl):
+                redis.expired.append(key)
+
+            def execute(self):
+                pass
+
+        return Pipeline()
+
+
+@pytest.fixture(autouse=True)
+def _reset_cache():
+    EmbeddingCache.clear()
+    EmbeddingCache.metrics.reset()
+    yield
+    EmbeddingCache.clear()
+    EmbeddingCache.metrics.reset()
+
+
+@pytest.fixture
+def redis(mocker):
+    fake = FakeRedis()
+    mocker.patch.object(embedding_cache_module, "redis_client", fake)
+    return fake
+
+
+@pytest.fixture
+def database(mocker):
+    db = MagicMock()
+    mocker.patch.object(embedding_cache_module, "db", db)
+    return db
+
+
+def test_database_hits_are_fetched_in_one_query_and_promoted(redis, database):
+    rows = [SimpleNamespace(hash=hash, get_embedding=lambda: [0.6, 0.8]) for hash in ("h1", "h2")]
+    database.session.query.return_value.filter.return_value.all.return_value = rows
+    cache = EmbeddingCache("openai", "text-embedding-3-small")
+
+    found = cache.get_many(["h1", "h2", "h3", "h1"])
+
+    assert set(found) == {"h1", "h2"}
+    assert found["h1"] == pytest.approx([0.6, 0.8])
+    assert database.session.query.return_value.filter.return_value.all.call_count == 1
+    # Promoted to redis as float32 bytes
+    value = redis.store["embedding_f32:document:openai_text-embedding-3-small_h1"]
+    assert len(value) == 2 * np.dtype(np.float32).itemsize
+
+    # Second lookup is served from memory without touching redis or the database
+    assert set(cache.get_many(["h1", "h2"])) == {"h1", "h2"}
+    assert redis.mget_calls == 1
+    assert database.session.query.call_count == 1
+
+    metrics = EmbeddingCache.metrics.snapshot()
+    assert metrics["hits"] == {"memory": 2, "redis": 0, "database": 2}
+    assert metrics["misses"] == 1
+    assert metrics["hit_rate"] == pytest.approx(4 / 5)
+
+
+def test_redis_hits_skip_the_database(redis, database):
+    redis.store["embedding_f32:document:openai_m_h1"] = np.asarray([1.0, 0.0], dtype=np.float32).tobytes()
+    cache = EmbeddingCache("openai", "m")
+
+    assert cache.get_many(["h1"]) == {"h1": [1.0, 0.0]}
+    database.session.query.assert_not_called()
+    assert redis.expired == ["embedding_f32:document:openai_m_h1"]
+
+
+def test_query_lookups_do_not_use_the_database(redis, database):
+    cache = EmbeddingCache("openai", "m")
+
+    assert cache.get_many(["h1"], use_database=False) == {}
+    database.session.query.assert_not_called()
+
+
+def test_set_many_writes_every_tier_with_conflict_ignoring_insert(redis, database, mocker):
+    insert = mocker.patch.object(embedding_cache_module, "insert")
+    cache = EmbeddingCache("openai", "m")
+
+    cache.set_many({"h1": [0.6, 0.8], "h2": [1.0, 0.0]})
+
+    rows = insert.return_value.values.call_args.args[0]
+    assert [row["hash"] for row in rows] == ["h1", "h2"]
+    assert pickle.loads(rows[0]["embedding"]) == [0.6, 0.8]  # noqa: S301
+    insert.return_value.values.return_value.on_conflict_do_nothing.assert_called_once_with(
+        index_elements=["model_name", "hash", "provider_name"]
+    )
+    database.session.commit.assert_called_once()
+    assert "embedding_f32:document:openai_m_h2" in redis.store
+    assert cache.get_many(["h1", "h2"]) == {"h1": pytest.approx([0.6, 0.8]), "h2": [1.0, 0.0]}
+    assert redis.mget_calls == 0
+
+
+def test_query_and_document_embeddings_do_not_collide(redis, database, mocker):
+    model_instance = MagicMock(provider="cohere", model="embed-english-v3.0")
+    model_instance.model_type_instance.get_model_schema.return_value = None
+    model_instance.invoke_text_embedding.side_effect = lambda texts, user, input_type: SimpleNamespace(
+        embeddings=[[1.0, 0.0] if input_type == EmbeddingInputType.QUERY else [0.0, 1.0] for _ in texts]
+    )
+    mocker.patch.object(embedding_cache_module, "insert")
+    embeddings = CacheEmbedding(model_instance)
+
+    assert embeddings.embed_query("hello") == [1.0, 0.0]
+    assert embeddings.embed_documents(["hello"]) == [[0.0, 1.0]]
+    # both are cached now, each under its own input type
+    assert embeddings.embed_query("hello") == [1.0, 0.0]
+    assert embeddings.embed_documents(["hello"]) == [[0.0, 1.0]]
+    assert model_instance.invoke_text_embedding.call_count == 2
@@ -0,0 +1,74 @@
+import pytest
+
+from configs import dify_config
+from core.rag.extractor import pdf_extractor as pdf_extractor_module
+from core.rag.extractor.pdf_extractor import PdfExtractor
+
+
+def _make_pdf(texts: list[str]) -> bytes:
+    """A pdf with one line of text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", "", "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >>"
+            f" /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return pdf
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "test.pdf"
+    path.write_bytes(_make_pdf([f"page {i}" for i in range(7)]))
+    return str(path)
+
+
+def test_pages_are_parsed_in_processes_in_order(pdf_path, mocker):
+    mocker.patch.object(dify_config, "PDF_EXTRACT_MAX_WORKERS", 2)
+    mocker.patch.object(dify_config, "PDF_EXTRACT_PAGES_PER_TASK", 2)
+    parse_in_processes = mocker.spy(PdfExtractor, "_parse_in_processes")
+
+    documents = PdfExtractor(pdf_path).extract()
+
+    parse_in_processes.assert_called_once()
+    assert [document.page_content.strip() for document in documents] == [f"page {i}" for i in range(7)]
+    assert [document.metadata["page"] for document in documents] == list(range(7))
+
+
+def test_pages_are_parsed_in_process_without_a_pool(pdf_path, mocker):
+    mocker.patch.object(dify_config, "PDF_EXTRACT_MAX_WORKERS", 2)
+    mocker.patch.object(dify_config, "PDF_EXTRACT_PAGES_PER_TASK", 2)
+    mocker.patch.object(pdf_extractor_module, "ProcessPoolExecutor").return_value.submit.side_effect = AssertionError(
+        "daemonic processes are not allowed to have children"
+    )
+
+    documents = PdfExtractor(pdf_path).extract()
+
+    assert [document.page_content.strip() for document in documents] == [f"page {i}" for i in range(7)]
+
+
+def test_pages_are_parsed_in_process_under_gevent(pdf_path, mocker):
+    mocker.patch.object(dify_config, "PDF_EXTRACT_MAX_WORKERS", 2)
+    mocker.patch.object(dify_config, "PDF_EXTRACT_PAGES_PER_TASK", 2)
+    mocker.patch.object(pdf_extractor_module, "_gevent_patched", return_value=True)
+    parse_in_processes = mocker.spy(PdfExtractor, "_parse_in_processes")
+
+    documents = PdfExtractor(pdf_path).extract()
+
+    parse_in_processes.assert_not_called()
+    assert [document.page_content.strip() for document in documents] == [f"page {i}" for i in range(7)]
@@ -0,0 +1,114 @@
+import math
+from collections import Counter
+
+import pytest
+
+from core.rag.models.document import Document
+from core.rag.rerank.keyword_scorer import KeywordScorer, SparseKeywordMatrix
+
+
+def _reference_tfidf_cosine(query_keywords, documents_keywords):
+    """The dict-based implementation the sparse matrix replaces"""
+    total_documents = len(documents_keywords)
+    all_keywords = set().union(*documents_keywords) if documents_keywords else set()
+    idf = {
+        keyword: math.log((1 + total_documents) / (1 + sum(1 for doc in documents_keywords if keyword in doc))) + 1
+        for keyword in all_keywords
+    }
+    query = {keyword: count * idf.get(keyword, 0) for keyword, count in Counter(query_keywords).items()}
+    scores = []
+    for document_keywords in documents_keywords:
+        document = {keyword: count * idf[keyword] for keyword, count in Counter(document_keywords).items()}
+        numerator = sum(query[k] * document[k] for k in set(query) & set(document))
+        denominator = math.sqrt(sum(v**2 for v in query.values())) * math.sqrt(sum(v**2 for v in document.values()))
+        scores.append(numerator / denominator if denominator else 0.0)
+    return scores
+
+
+@pytest.fixture(autouse=True)
+def _clear_keyword_cache():
+    KeywordScorer.clear_cache()
+    yield
+    KeywordScorer.clear_cache()
+
+
+def test_tfidf_cosine_matches_reference():
+    documents_keywords = [
+        {"apple", "banana", "cherry"},
+        {"banana", "durian"},
+        {"elderberry"},
+        set(),
+        {"apple", "durian", "fig", "grape"},
+    ]
+    query_keywords = {"apple", "durian", "unknown"}
+
+    scores = SparseKeywordMatrix(documents_keywords).tfidf_cosine(query_keywords)
+
+    assert scores == pytest.approx(_reference_tfidf_cosine(query_keywords, documents_keywords))
+    assert scores[2] == 0.0
+    assert scores[3] == 0.0
+
+
+def test_empty_inputs():
+    assert SparseKeywordMatrix([]).tfidf_cosine({"a"}) == []
+    assert SparseKeywordMatrix([{"a"}, {"b"}]).tfidf_cosine(set()) == [0.0, 0.0]
+    assert SparseKeywordMatrix([]).bm25({"a"}) == []
+
+
+def test_bm25_prefers_rarer_and_denser_matches():
+    documents_keywords = [
+        ["rare", "common"],
+        ["common", "x", "y", "z"],
+        ["common"],
+    ]
+    scores = SparseKeywordMatrix(documents_keywords).bm25(["rare", "common"])
+
+    assert scores[0] > scores[2] > scores[1] > 0
+    assert SparseKeywordMatrix(documents_keywords).bm25(["missing"]) == [0.0, 0.0, 0.0]
+
+
+def test_documents_keywords_prefers_cache_then_persisted_then_extraction(mocker):
+    scorer = KeywordScorer()
+    load = mocker.patch.object(KeywordScorer, "_load_segment_keywords", return_value={"hash-b": {"persisted"}})
+    extract = mocker.patch.object(scorer.keyword_table_handler, "extract_keywords", return_value={"extracted"})
+    KeywordScorer._cache_keywords({"hash-a": {"cached"}})
+
+    documents = [
+        Document(page_content="a", metadata={"doc_id": "1", "doc_hash": "hash-a"}),
+        Document(page_content="b", metadata={"doc_id": "2", "doc_hash": "hash-b"}),
+        Document(page_content="c", metadata={"doc_id": "3", "doc_hash": "hash-c"}),
+        Document(page_content="d", metadata={"doc_id": "4"}),
+    ]
+
+    keywords = scorer.documents_keywords(documents)
+
+    assert keywords == [{"cached"}, {"persisted"}, {"extracted"}, {"extracted"}]
+    assert documents[1].metadata["keywords"] == {"persisted"}
+    assert sorted(load.call_args.args[0]) == ["hash-b", "hash-c"]
+    assert extract.call_count == 2
+
+    # Extracted and persisted keywords are now cached, so nothing is loaded or extracted again
+    load.reset_mock()
+    extract.reset_mock()
+    scorer.documents_keywords(documents[:3])
+    load.assert_not_called()
+    extract.assert_not_called()
+
+
+def test_score_uses_document_and_query_keywords(mocker):
+    scorer = KeywordScorer()
+    mocker.patch.object(KeywordScorer, "_load_segment_keywords", return_value={})
+    mocker.patch.object(
+        scorer.keyword_table_handler,
+        "extract_keywords",
+        side_effect=lambda text, max_keywords: set(text.split()),
+    )
+    documents = [
+        Document(page_content="alpha beta", metadata={"doc_id": "1", "doc_hash": "h1"}),
+        Document(page_content="gamma", metadata={"doc_id": "2", "doc_hash": "h2"}),
+    ]
+
+    scores = scorer.score("alpha", documents)
+
+    assert scores[0] > 0
+    assert scores[1] == 0.0
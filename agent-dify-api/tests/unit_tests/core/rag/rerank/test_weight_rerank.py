@@ -0,0 +1,97 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from core.rag.models.document import Document
+from core.rag.rerank import weight_rerank as weight_rerank_module
+from core.rag.rerank.entity.weight import KeywordSetting, VectorSetting, Weights
+from core.rag.rerank.weight_rerank import WeightRerankRunner
+
+
+@pytest.fixture
+def cache_embedding(mocker):
+    mocker.patch.object(weight_rerank_module, "ModelManager")
+    cache_embedding = MagicMock()
+    cache_embedding.embed_query.return_value = [1.0, 0.0]
+    cache_embedding.embed_documents.side_effect = lambda texts: [[0.0, 1.0] for _ in texts]
+    mocker.patch.object(weight_rerank_module, "CacheEmbedding", return_value=cache_embedding)
+    return cache_embedding
+
+
+def _runner(vector_weight: float = 1.0, keyword_weight: float = 0.0) -> WeightRerankRunner:
+    return WeightRerankRunner(
+        "tenant",
+        Weights(
+            vector_setting=VectorSetting(
+                vector_weight=vector_weight, embedding_provider_name="openai", embedding_model_name="embedding"
+            ),
+            keyword_setting=KeywordSetting(keyword_weight=keyword_weight),
+        ),
+    )
+
+
+def _document(doc_id: str, vector=None, score=None) -> Document:
+    metadata = {"doc_id": doc_id}
+    if score is not None:
+        metadata["score"] = score
+    return Document(page_content=doc_id, vector=vector, metadata=metadata)
+
+
+def test_cosine_matches_the_per_document_formula(cache_embedding):
+    rng = np.random.default_rng(0)
+    query_vector = rng.normal(size=8).tolist()
+    vectors = rng.normal(size=(5, 8)).tolist()
+    cache_embedding.embed_query.return_value = query_vector
+    documents = [_document(str(i), vector=vector) for i, vector in enumerate(vectors)]
+
+    scores = _runner()._calculate_cosine("tenant", "query", documents, _runner().weights.vector_setting)
+
+    expected = [np.dot(query_vector, v) / (np.linalg.norm(query_vector) * np.linalg.norm(v)) for v in vectors]
+    assert scores == pytest.approx(expected, abs=1e-6)
+
+
+def test_missing_vectors_are_embedded_in_one_batch(cache_embedding):
+    documents = [_document("a", vector=[2.0, 0.0]), _document("b"), _document("c"), _document("d", score=0.3)]
+
+    scores = _runner()._calculate_cosine("tenant", "query", documents, _runner().weights.vector_setting)
+
+    assert scores == pytest.approx([1.0, 0.0, 0.0, 0.3])
+    cache_embedding.embed_documents.assert_called_once_with(["b", "c"])
+
+
+def test_documents_with_scores_need_no_embedding(cache_embedding):
+    documents = [_document("a", score=0.2), _document("b", score=0.9)]
+
+    _runner()._calculate_cosine("tenant", "query", documents, _runner().weights.vector_setting)
+
+    weight_rerank_module.CacheEmbedding.assert_not_called()
+
+
+def test_run_returns_the_top_n_in_score_order(cache_embedding, mocker):
+    mocker.patch.object(WeightRerankRunner, "_calculate_keyword_score", side_effect=lambda q, docs: [0.0] * len(docs))
+    scores = [0.1, 0.8, 0.5, 0.8, 0.05, 0.6]
+    documents = [_document(str(i), score=score) for i, score in enumerate(scores)]
+    documents.append(_document("1", score=1.0))  # duplicate doc id
+
+    reranked = _runner().run("query", documents, score_threshold=0.2, top_n=3)
+
+    assert [document.metadata["doc_id"] for document in reranked] == ["1", "3", "5"]
+    assert [document.metadata["score"] for document in reranked] == [0.8, 0.8, 0.6]
+    assert [document.metadata["doc_id"] for document in _runner().run("query", documents)] == [
+        "1",
+        "3",
+        "5",
+        "2",
+        "0",
+        "4",
+    ]
+
+
+def test_ties_at_the_top_n_cutoff_keep_retrieval_order(cache_embedding, mocker):
+    mocker.patch.object(WeightRerankRunner, "_calculate_keyword_score", side_effect=lambda q, docs: [0.0] * len(docs))
+    documents = [_document(str(i), score=0.5) for i in range(20)] + [_document("20", score=0.9)]
+
+    reranked = _runner().run("query", documents, top_n=5)
+
+    assert [document.metadata["doc_id"] for document in reranked] == ["20", "0", "1", "2", "3"]
@@ -0,0 +1,65 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from core import indexing_runner as indexing_runner_module
+from core.indexing_runner import DocumentIsPausedError, IndexingRunner
+from core.rag.models.document import Document
+
+
+@pytest.fixture
+def vector(mocker):
+    mocker.patch.object(indexing_runner_module, "db", MagicMock())
+    redis = mocker.patch.object(indexing_runner_module, "redis_client", MagicMock())
+    redis.get.return_value = None
+    mocker.patch.object(IndexingRunner, "_get_embedding_batch_size", return_value=2)
+    vector = MagicMock()
+    vector.embed_documents.side_effect = lambda documents: [[float(len(documents))] for _ in documents]
+    mocker.patch.object(indexing_runner_module, "Vector", return_value=vector)
+    return vector
+
+
+def _load_vectors(documents: list[Document]) -> int:
+    embedding_model_instance = MagicMock()
+    embedding_model_instance.get_text_embedding_num_tokens.side_effect = lambda texts: [1] * len(texts)
+    index_processor = MagicMock()
+    index_processor.get_vector_documents.side_effect = lambda documents: documents
+    runner = IndexingRunner.__new__(IndexingRunner)
+    return runner._load_vectors(
+        MagicMock(), index_processor, MagicMock(), MagicMock(), embedding_model_instance, documents
+    )
+
+
+def _documents(count: int) -> list[Document]:
+    return [Document(page_content=f"chunk {i}", metadata={"doc_id": f"doc-{i}"}) for i in range(count)]
+
+
+def test_every_document_is_embedded_written_and_completed(vector):
+    documents = _documents(7)
+
+    tokens = _load_vectors(documents)
+
+    assert tokens == 7
+    # embedded in batches of the model's max chunks
+    assert [len(call.args[0]) for call in vector.embed_documents.call_args_list] == [2, 2, 2, 1]
+    written = [document for call in vector.create_with_embeddings.call_args_list for document in call.args[0]]
+    assert sorted(document.metadata["doc_id"] for document in written) == sorted(f"doc-{i}" for i in range(7))
+    assert indexing_runner_module.db.session.commit.called
+
+
+def test_a_failing_stage_stops_the_pipeline(vector):
+    vector.create_with_embeddings.side_effect = RuntimeError("vector store is down")
+
+    with pytest.raises(RuntimeError, match="vector store is down"):
+        _load_vectors(_documents(40))
+
+    assert vector.embed_documents.call_count < 20
+
+
+def test_paused_document_stops_embedding(vector):
+    indexing_runner_module.redis_client.get.return_value = "1"
+
+    with pytest.raises(DocumentIsPausedError):
+        _load_vectors(_documents(7))
+
+    vector.embed_documents.assert_not_called()
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from core.workflow.graph_engine.entities.graph import Graph
+from core.workflow.graph_engine.entities.graph_cache import GraphCache
+from models.workflow import Workflow
+
+GRAPH_CONFIG = {
+    "edges": [
+        {"id": "start-source-llm-target", "source": "start", "target": "llm"},
+        {"id": "llm-source-answer-target", "source": "llm", "target": "answer"},
+        {"id": "iteration-start-source-code-target", "source": "iteration-start", "target": "code"},
+    ],
+    "nodes": [
+        {"data": {"type": "start"}, "id": "start"},
+        {"data": {"type": "llm"}, "id": "llm"},
+        {"data": {"type": "answer", "title": "answer", "answer": "1"}, "id": "answer"},
+        {"data": {"type": "iteration-start", "iteration_id": "iteration"}, "id": "iteration-start"},
+        {"data": {"type": "code", "iteration_id": "iteration"}, "id": "code"},
+    ],
+}
+
+
+def _workflow(graph_config: dict) -> Workflow:
+    workflow = Workflow()
+    workflow.id = "workflow-id"
+    workflow.graph = json.dumps(graph_config)
+    return workflow
+
+
+@pytest.fixture(autouse=True)
+def clear_graph_cache():
+    GraphCache.clear()
+    yield
+    GraphCache.clear()
+
+
+def test_graph_is_compiled_once_per_workflow_version(mocker):
+    init = mocker.spy(Graph, "init")
+    workflow = _workflow(GRAPH_CONFIG)
+
+    graph = GraphCache.get_graph(workflow)
+    same_version = GraphCache.get_graph(_workflow(GRAPH_CONFIG))
+
+    assert init.call_count == 1
+    assert graph is not same_version
+    assert graph.edge_mapping is same_version.edge_mapping
+    assert GraphCache.get_graph_config(workflow) is GraphCache.get_graph_config(workflow)
+
+    edited = dict(GRAPH_CONFIG, edges=GRAPH_CONFIG["edges"][:1])
+    assert GraphCache.get_graph(_workflow(edited)).node_ids == ["start", "llm"]
+    assert init.call_count == 2
+
+
+def test_sub_graph_is_cached_with_the_workflow_version(mocker):
+    graph = GraphCache.get_graph(_workflow(GRAPH_CONFIG))
+    init = mocker.spy(Graph, "init")
+
+    sub_graph = GraphCache.get_sub_graph(graph, graph_config=GRAPH_CONFIG, root_node_id="iteration-start")
+    GraphCache.get_sub_graph(graph, graph_config=GRAPH_CONFIG, root_node_id="iteration-start")
+    # nested iterations look up their sub graphs through the sub graph
+    GraphCache.get_sub_graph(sub_graph, graph_config=GRAPH_CONFIG, root_node_id="iteration-start")
+
+    assert sub_graph.node_ids == ["iteration-start", "code"]
+    assert init.call_count == 1
+
+
+def test_sub_graph_of_uncached_graph_is_not_cached(mocker):
+    graph = Graph.init(graph_config=GRAPH_CONFIG)
+    init = mocker.spy(Graph, "init")
+
+    GraphCache.get_sub_graph(graph, graph_config=GRAPH_CONFIG, root_node_id="iteration-start")
+    GraphCache.get_sub_graph(graph, graph_config=GRAPH_CONFIG, root_node_id="iteration-start")
+
+    assert init.call_count == 2
+
+
+def test_extra_edge_does_not_leak_into_the_cached_graph():
+    workflow = _workflow(GRAPH_CONFIG)
+    graph = GraphCache.get_graph(workflow)
+    graph.add_extra_edge(source_node_id="answer", target_node_id="start")
+
+    assert [edge.target_node_id for edge in graph.edge_mapping["answer"]] == ["start"]
+    assert "answer" not in GraphCache.get_graph(workflow).edge_mapping
+
+
+def test_invalid_graph_is_not_cached():
+    workflow = _workflow({"edges": [], "nodes": [{"data": {"type": "llm"}, "id": "llm"}]})
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            GraphCache.get_graph(workflow)
+    assert len(GraphCache._graphs) == 0
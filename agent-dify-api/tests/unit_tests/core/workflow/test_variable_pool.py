@@ -44,3 +44,64 @@ def test_use_long_selector(pool):
     result = pool.get(("node_1", "part_1", "part_2"))
     assert result is not None
     assert result.value == "test_value"
+
+
+def test_child_reads_through_to_parent(pool, file):
+    pool.add(("node_1", "text"), "parent")
+    pool.add(("node_1", "file_var"), FileSegment(value=file))
+    child = pool.create_child()
+
+    assert child.get(("node_1", "text")).value == "parent"
+    assert child.get(("node_1", "file_var", "name")).value == file.filename
+    # the parent's segments are shared, not copied
+    assert child.get(("node_1", "text")) is pool.get(("node_1", "text"))
+
+
+def test_child_writes_stay_in_child(pool):
+    pool.add(("node_1", "text"), "parent")
+    child = pool.create_child()
+    child.add(("node_1", "text"), "child")
+    child.add(("node_2", "text"), "new")
+
+    assert child.get(("node_1", "text")).value == "child"
+    assert child.get(("node_2", "text")).value == "new"
+    assert pool.get(("node_1", "text")).value == "parent"
+    assert pool.get(("node_2", "text")) is None
+    # only the child's own writes are stored in the child
+    assert {node_id: len(variables) for node_id, variables in child.variable_dictionary.items()} == {
+        "node_1": 1,
+        "node_2": 1,
+    }
+
+
+def test_child_removals_hide_parent_variables(pool):
+    pool.add(("node_1", "a"), "a")
+    pool.add(("node_1", "b"), "b")
+    pool.add(("node_2", "c"), "c")
+    child = pool.create_child()
+
+    child.remove(("node_1", "a"))
+    assert child.get(("node_1", "a")) is None
+    assert child.get(("node_1", "b")).value == "b"
+    child.add(("node_1", "a"), "again")
+    assert child.get(("node_1", "a")).value == "again"
+
+    child.remove(("node_2",))
+    assert child.get(("node_2", "c")) is None
+    child.add(("node_2", "d"), "d")
+    assert child.get(("node_2", "c")) is None
+    assert child.get(("node_2", "d")).value == "d"
+
+    assert pool.get(("node_1", "a")).value == "a"
+    assert pool.get(("node_2", "c")).value == "c"
+
+
+def test_grandchild_reads_through_every_layer(pool):
+    pool.add(("node_1", "a"), "a")
+    child = pool.create_child()
+    child.add(("node_1", "b"), "b")
+    child.remove(("node_1", "a"))
+    grandchild = child.create_child()
+
+    assert grandchild.get(("node_1", "a")) is None
+    assert grandchild.get(("node_1", "b")).value == "b"
@@ -0,0 +1,77 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.plugin.entities.plugin_daemon import PluginInstallTask, PluginInstallTaskStatus
+from services.plugin import plugin_service as plugin_service_module
+from services.plugin.plugin_service import PluginService
+
+
+def _task(status: PluginInstallTaskStatus) -> PluginInstallTask:
+    return PluginInstallTask(
+        id="task",
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+        status=status,
+        total_plugins=1,
+        completed_plugins=1 if status == PluginInstallTaskStatus.Success else 0,
+        plugins=[],
+    )
+
+
+@pytest.fixture
+def manager(mocker):
+    manager = MagicMock()
+    mocker.patch.object(plugin_service_module, "PluginInstallationManager", return_value=manager)
+    return manager
+
+
+@pytest.fixture
+def invalidate(mocker):
+    return mocker.patch.object(plugin_service_module.ProviderConfigurationsCache, "invalidate")
+
+
+@pytest.fixture
+def redis(mocker):
+    # SET NX on a dict: true only the first time a key is set
+    store: dict[str, int] = {}
+    commands: list[str] = []
+    pipe = MagicMock()
+    pipe.set.side_effect = lambda key, value, ex=None, nx=False: commands.append(key)
+
+    def execute():
+        results = [key not in store for key in commands]
+        store.update(dict.fromkeys(commands, 1))
+        commands.clear()
+        return results
+
+    pipe.execute.side_effect = execute
+    redis = MagicMock()
+    redis.pipeline.return_value = pipe
+    mocker.patch.object(plugin_service_module, "redis_client", redis)
+    return redis
+
+
+def test_install_and_upgrade_invalidate_provider_configurations(manager, invalidate):
+    PluginService.install_from_github("tenant", "author/plugin:0.0.1@abc", "author/plugin", "0.0.1", "plugin.difypkg")
+    PluginService.upgrade_plugin_with_github(
+        "tenant", "author/plugin:0.0.1@abc", "author/plugin:0.0.2@def", "author/plugin", "0.0.2", "plugin.difypkg"
+    )
+
+    assert invalidate.call_count == 2
+    invalidate.assert_called_with("tenant")
+
+
+def test_finished_install_task_invalidates_once(manager, invalidate, redis):
+    manager.fetch_plugin_installation_task.return_value = _task(PluginInstallTaskStatus.Running)
+    PluginService.fetch_install_task("tenant", "task")
+    invalidate.assert_not_called()
+
+    manager.fetch_plugin_installation_task.return_value = _task(PluginInstallTaskStatus.Success)
+    PluginService.fetch_install_task("tenant", "task")
+    PluginService.fetch_install_task("tenant", "task")
+    manager.fetch_plugin_installation_tasks.return_value = [_task(PluginInstallTaskStatus.Success)]
+    PluginService.fetch_install_tasks("tenant", 1, 10)
+
+    invalidate.assert_called_once_with("tenant")
@@ -9,28 +9,36 @@ import asyncio
 from .models import Agent, Message, Workflow, AlphaResult, SystemEvent
 from .schemas import AgentCreate, MessageCreate, WorkflowCreate
 from .websocket_manager import WebSocketManager
+from .event_writer import BatchedEventWriter
+from .database import AsyncSessionLocal
 import os
+import uuid
 
 logger = logging.getLogger(__name__)
 
 class AgentManager:
-    def __init__(self):
+    def __init__(self, websocket_manager: Optional[WebSocketManager] = None):
         self.active_agents: Dict[str, dict] = {}
         self.websocket_agents: Dict[str, Any] = {}
+        self.websocket_manager = websocket_manager
         self.total_messages = 0
         self.alpha_generator_url = None
         self.n8n_url = None
+        # System events and messages are committed in batches, not one row per request
+        self.event_writer = BatchedEventWriter(AsyncSessionLocal)
         
     async def start(self):
         """Initialize the agent manager"""
         logger.info("Starting Agent Manager...")
         # Start background tasks
+        self.event_writer.start()
         asyncio.create_task(self._monitor_agents())
         asyncio.create_task(self._cleanup_inactive_agents())
         
     async def stop(self):
         """Stop the agent manager"""
         logger.info("Stopping Agent Manager...")
+        await self.event_writer.stop()
         
     async def register_agent(self, agent_data: AgentCreate, db: AsyncSession) -> Agent:
         """Register a new agent"""
@@ -119,6 +127,7 @@ class AgentManager:
         """Send a message to an agent"""
         try:
             message = Message(
+                id=str(uuid.uuid4()),
                 sender_id=message_data.sender_id,
                 recipient_id=message_data.recipient_id,
                 message_type=message_data.message_type.value,
@@ -126,20 +135,24 @@ class AgentManager:
                 metadata=message_data.metadata
             )
             
-            db.add(message)
-            await db.commit()
-            await db.refresh(message)
+            # Persisted by the batched writer; the id is assigned up front
+            if not self.event_writer.enqueue(message):
+                return False
             
             # Send via WebSocket if agent is connected
             if message_data.recipient_id in self.websocket_agents:
-                websocket = self.websocket_agents[message_data.recipient_id]
-                await websocket.send_text(json.dumps({
+                outgoing = {
                     "type": "message",
                     "message_id": message.id,
                     "sender_id": message_data.sender_id,
                     "payload": message_data.payload,
                     "timestamp": datetime.utcnow().isoformat()
-                }))
+                }
+                if self.websocket_manager is not None:
+                    await self.websocket_manager.send_personal_message(message_data.recipient_id, outgoing)
+                else:
+                    websocket = self.websocket_agents[message_data.recipient_id]
+                    await websocket.send_text(json.dumps(outgoing))
             
             self.total_messages += 1
             logger.info(f"Message sent from {message_data.sender_id} to {message_data.recipient_id}")
@@ -147,7 +160,6 @@ class AgentManager:
             
         except Exception as e:
             logger.error(f"Error sending message: {e}")
-            await db.rollback()
             return False
     
     async def get_messages(self, agent_id: str, db: AsyncSession) -> List[Message]:
@@ -382,7 +394,7 @@ class AgentManager:
                 await asyncio.sleep(300)
     
     async def _log_system_event(self, event_type: str, agent_id: str, payload: dict, db: AsyncSession):
-        """Log a system event"""
+        """Log a system event (committed with the next batch, not on the request session)"""
         try:
             event = SystemEvent(
                 event_type=event_type,
@@ -390,9 +402,7 @@ class AgentManager:
                 payload=payload
             )
             
-            db.add(event)
-            await db.commit()
+            self.event_writer.enqueue(event)
             
         except Exception as e:
-            logger.error(f"Error logging system event: {e}")
-            await db.rollback() 
\ No newline at end of file
+            logger.error(f"Error logging system event: {e}") 
\ No newline at end of file
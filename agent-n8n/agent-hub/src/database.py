@@ -17,6 +17,8 @@ if DATABASE_URL.startswith("postgresql://"):
 # Create async engine
 engine = create_async_engine(DATABASE_URL, echo=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sessions for background writers, which commit outside any request
+AsyncSessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
 # Create base class for models
 Base = declarative_base()
@@ -0,0 +1,110 @@
+from typing import Any, Callable, List
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class BatchedEventWriter:
+    """Persists ORM rows (system events, messages) in batches from a background task
+
+    Request handlers only enqueue rows. The writer waits up to ``flush_interval``
+    after the first pending row, then adds everything queued (up to
+    ``max_batch_size`` rows) in one session and commits once.
+    """
+
+    def __init__(self, session_factory: Callable[[], Any], max_batch_size: int = 200,
+                 flush_interval: float = 0.5, max_queue_size: int = 10000):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._task = None
+        self.rows_written = 0
+        self.commits = 0
+        self.rows_dropped = 0
+        self.rows_failed = 0
+
+    def start(self):
+        """Start the background writer task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, row) -> bool:
+        """Queue a row for the next batch; returns False if the queue is full"""
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except asyncio.QueueFull:
+            self.rows_dropped += 1
+            logger.warning(f"Event writer queue full, dropping {type(row).__name__} row")
+            return False
+
+    def _take_batch(self, first=None) -> List[Any]:
+        batch = [] if first is None else [first]
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            first = await self.queue.get()
+            if first is not _STOP and self.queue.qsize() + 1 < self.max_batch_size:
+                # Give the batch a moment to fill up
+                await asyncio.sleep(self.flush_interval)
+            batch = self._take_batch(first)
+            stopping = any(row is _STOP for row in batch)
+            try:
+                await self._commit([row for row in batch if row is not _STOP])
+            except Exception as e:
+                logger.error(f"Error in event writer: {e}")
+            if stopping:
+                return
+
+    async def _commit(self, batch: List[Any]):
+        if not batch:
+            return
+        try:
+            async with self.session_factory() as session:
+                session.add_all(batch)
+                await session.commit()
+            self.rows_written += len(batch)
+            self.commits += 1
+            return
+        except Exception as e:
+            logger.error(f"Error committing batch of {len(batch)} rows, retrying one by one: {e}")
+        # Isolate the bad rows so they don't take the rest of the batch with them
+        for row in batch:
+            try:
+                async with self.session_factory() as session:
+                    session.add(row)
+                    await session.commit()
+                self.rows_written += 1
+                self.commits += 1
+            except Exception as e:
+                self.rows_failed += 1
+                logger.error(f"Error persisting {type(row).__name__}: {e}")
+
+    async def stop(self):
+        """Commit what is still queued and stop the background task"""
+        if self._task is not None and not self._task.done():
+            await self.queue.put(_STOP)
+            await self._task
+        self._task = None
+        # Rows queued without a running writer (or after the stop marker)
+        while not self.queue.empty():
+            await self._commit([row for row in self._take_batch() if row is not _STOP])
+
+    def get_stats(self) -> dict:
+        """Get event writer statistics"""
+        return {
+            "queued_rows": self.queue.qsize(),
+            "rows_written": self.rows_written,
+            "commits": self.commits,
+            "rows_dropped": self.rows_dropped,
+            "rows_failed": self.rows_failed
+        }
@@ -22,7 +22,7 @@ logger = logging.getLogger(__name__)
 
 # Global variables
 websocket_manager = WebSocketManager()
-agent_manager = AgentManager()
+agent_manager = AgentManager(websocket_manager)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -34,6 +34,7 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down Agent Network Hub...")
     await agent_manager.stop()
+    await websocket_manager.close()
 
 app = FastAPI(
     title="Agent Network Hub",
@@ -159,12 +160,12 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             elif message.get("type") == "workflow_update":
                 await websocket_manager.broadcast_to_agents(message)
             
-            # Echo back for testing
-            await websocket.send_text(json.dumps({
+            # Echo back for testing (queued behind anything already sent to this client)
+            await websocket_manager.send_personal_message(client_id, {
                 "type": "ack",
                 "message": "Message received",
                 "timestamp": datetime.utcnow().isoformat()
-            }))
+            })
             
     except WebSocketDisconnect:
         websocket_manager.disconnect(client_id)
@@ -204,6 +205,9 @@ async def get_metrics():
         "active_agents": len(agent_manager.active_agents),
         "websocket_connections": len(websocket_manager.active_connections),
         "total_messages": agent_manager.total_messages,
+        "websocket_dropped_messages": websocket_manager.total_dropped,
+        "slow_consumers_disconnected": websocket_manager.slow_consumers_disconnected,
+        "event_writer": agent_manager.event_writer.get_stats(),
         "system_uptime": datetime.utcnow().isoformat()
     }
 
@@ -1,5 +1,5 @@
 from fastapi import WebSocket
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 import json
 import logging
 from datetime import datetime
@@ -7,117 +7,159 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
+class ClientConnection:
+    """A connected socket with its own bounded send queue and sender task"""
+
+    def __init__(self, websocket: WebSocket, max_queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.sender: Optional[asyncio.Task] = None
+        self.dropped = 0
+
 class WebSocketManager:
-    def __init__(self):
+    """Fans messages out to WebSocket clients without waiting on any single socket
+
+    Every message is serialized once and put on each recipient's bounded queue;
+    a sender task per connection drains its queue. When a queue is full the
+    oldest queued message is dropped, so a slow client only loses its own
+    backlog. A client whose send does not complete within ``send_timeout`` is
+    disconnected as a stalled consumer.
+    """
+
+    def __init__(self, max_queue_size: int = 256, send_timeout: float = 10.0):
         self.active_connections: Dict[str, WebSocket] = {}
         self.connection_metadata: Dict[str, dict] = {}
-        
+        self.connections: Dict[str, ClientConnection] = {}
+        self.max_queue_size = max_queue_size
+        self.send_timeout = send_timeout
+        self.total_dropped = 0
+        self.slow_consumers_disconnected = 0
+
     async def connect(self, websocket: WebSocket, client_id: str):
         """Connect a new WebSocket client"""
         await websocket.accept()
+        if client_id in self.connections:
+            # Same client reconnecting: retire the old socket's sender
+            self.disconnect(client_id)
+        connection = ClientConnection(websocket, self.max_queue_size)
+        self.connections[client_id] = connection
         self.active_connections[client_id] = websocket
         self.connection_metadata[client_id] = {
             "connected_at": datetime.utcnow(),
             "last_activity": datetime.utcnow(),
             "message_count": 0
         }
+        connection.sender = asyncio.create_task(self._send_loop(client_id, connection))
         logger.info(f"WebSocket client {client_id} connected. Total connections: {len(self.active_connections)}")
-        
+
         # Send welcome message
         await self.send_personal_message(client_id, {
             "type": "connection_established",
             "client_id": client_id,
             "timestamp": datetime.utcnow().isoformat()
         })
-    
+
     def disconnect(self, client_id: str):
         """Disconnect a WebSocket client"""
+        connection = self.connections.pop(client_id, None)
+        if connection and connection.sender and connection.sender is not asyncio.current_task():
+            connection.sender.cancel()
         if client_id in self.active_connections:
             del self.active_connections[client_id]
         if client_id in self.connection_metadata:
             del self.connection_metadata[client_id]
         logger.info(f"WebSocket client {client_id} disconnected. Total connections: {len(self.active_connections)}")
-    
-    async def send_personal_message(self, client_id: str, message: dict):
-        """Send a message to a specific client"""
-        if client_id in self.active_connections:
+
+    def _drop_connection(self, client_id: str, connection: ClientConnection):
+        # Only if the client has not reconnected on a new socket meanwhile
+        if self.connections.get(client_id) is connection:
+            self.disconnect(client_id)
+
+    async def _send_loop(self, client_id: str, connection: ClientConnection):
+        """Drain one client's queue; a failed or timed out send disconnects only that client"""
+        while True:
+            text = await connection.queue.get()
             try:
-                await self.active_connections[client_id].send_text(json.dumps(message))
-                self.connection_metadata[client_id]["last_activity"] = datetime.utcnow()
-                self.connection_metadata[client_id]["message_count"] += 1
+                await asyncio.wait_for(connection.websocket.send_text(text), timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Disconnecting stalled WebSocket consumer {client_id}: "
+                               f"send took longer than {self.send_timeout}s")
+                self.slow_consumers_disconnected += 1
+                self._drop_connection(client_id, connection)
+                return
             except Exception as e:
                 logger.error(f"Error sending message to {client_id}: {e}")
-                self.disconnect(client_id)
-    
+                self._drop_connection(client_id, connection)
+                return
+            metadata = self.connection_metadata.get(client_id)
+            if metadata is not None:
+                metadata["last_activity"] = datetime.utcnow()
+                metadata["message_count"] += 1
+
+    def _enqueue(self, client_id: str, connection: ClientConnection, text: str):
+        """Queue text for one client, dropping its oldest message if the queue is full"""
+        try:
+            connection.queue.put_nowait(text)
+            return
+        except asyncio.QueueFull:
+            pass
+        connection.queue.get_nowait()
+        connection.queue.put_nowait(text)
+        connection.dropped += 1
+        self.total_dropped += 1
+        if connection.dropped == 1 or connection.dropped % 100 == 0:
+            logger.warning(f"WebSocket client {client_id} is falling behind: {connection.dropped} messages dropped")
+
+    def _fan_out(self, text: str, client_ids: Iterable[str]) -> int:
+        """Queue already serialized text for several clients; never waits on a socket"""
+        queued = 0
+        for client_id in list(client_ids):
+            connection = self.connections.get(client_id)
+            if connection is not None:
+                self._enqueue(client_id, connection, text)
+                queued += 1
+        return queued
+
+    async def send_personal_message(self, client_id: str, message: dict):
+        """Send a message to a specific client"""
+        if client_id in self.connections:
+            self._fan_out(json.dumps(message), [client_id])
+
     async def broadcast_to_agents(self, message: dict):
         """Broadcast message to all agent connections"""
-        disconnected_clients = []
-        
-        for client_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(json.dumps(message))
-                self.connection_metadata[client_id]["last_activity"] = datetime.utcnow()
-                self.connection_metadata[client_id]["message_count"] += 1
-            except Exception as e:
-                logger.error(f"Error broadcasting to {client_id}: {e}")
-                disconnected_clients.append(client_id)
-        
-        # Clean up disconnected clients
-        for client_id in disconnected_clients:
-            self.disconnect(client_id)
-    
+        self._fan_out(json.dumps(message), self.connections)
+
     async def broadcast_to_clients(self, message: dict, exclude_client: Optional[str] = None):
         """Broadcast message to all clients except the excluded one"""
-        disconnected_clients = []
-        
-        for client_id, websocket in self.active_connections.items():
-            if client_id != exclude_client:
-                try:
-                    await websocket.send_text(json.dumps(message))
-                    self.connection_metadata[client_id]["last_activity"] = datetime.utcnow()
-                    self.connection_metadata[client_id]["message_count"] += 1
-                except Exception as e:
-                    logger.error(f"Error broadcasting to {client_id}: {e}")
-                    disconnected_clients.append(client_id)
-        
-        # Clean up disconnected clients
-        for client_id in disconnected_clients:
-            self.disconnect(client_id)
-    
+        self._fan_out(json.dumps(message),
+                      (client_id for client_id in self.connections if client_id != exclude_client))
+
     def get_connection_info(self, client_id: str) -> Optional[dict]:
         """Get connection information for a client"""
         if client_id in self.connection_metadata:
             return self.connection_metadata[client_id]
         return None
-    
+
     def get_all_connections_info(self) -> List[dict]:
         """Get information about all active connections"""
         connections_info = []
         for client_id, metadata in self.connection_metadata.items():
+            connection = self.connections.get(client_id)
             connections_info.append({
                 "client_id": client_id,
-                **metadata
+                **metadata,
+                "queued_messages": connection.queue.qsize() if connection else 0,
+                "dropped_messages": connection.dropped if connection else 0
             })
         return connections_info
-    
+
     async def ping_all_connections(self):
-        """Ping all connections to check if they're still alive"""
-        disconnected_clients = []
-        
-        for client_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(json.dumps({
-                    "type": "ping",
-                    "timestamp": datetime.utcnow().isoformat()
-                }))
-            except Exception as e:
-                logger.error(f"Error pinging {client_id}: {e}")
-                disconnected_clients.append(client_id)
-        
-        # Clean up disconnected clients
-        for client_id in disconnected_clients:
-            self.disconnect(client_id)
-    
+        """Ping all connections; dead sockets are dropped by their sender task"""
+        self._fan_out(json.dumps({
+            "type": "ping",
+            "timestamp": datetime.utcnow().isoformat()
+        }), self.connections)
+
     async def start_heartbeat(self, interval: int = 30):
         """Start heartbeat mechanism to keep connections alive"""
         while True:
@@ -127,10 +169,21 @@ class WebSocketManager:
                 logger.debug(f"Heartbeat sent to {len(self.active_connections)} connections")
             except Exception as e:
                 logger.error(f"Error in heartbeat: {e}")
-    
+
+    async def close(self):
+        """Stop all sender tasks"""
+        senders = [connection.sender for connection in self.connections.values() if connection.sender]
+        for sender in senders:
+            sender.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+        for client_id in list(self.connections):
+            self.disconnect(client_id)
+
     def get_stats(self) -> dict:
         """Get WebSocket manager statistics"""
         return {
             "total_connections": len(self.active_connections),
+            "dropped_messages": self.total_dropped,
+            "slow_consumers_disconnected": self.slow_consumers_disconnected,
             "connections_info": self.get_all_connections_info()
-        } 
\ No newline at end of file
+        }
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Check that modules copied between subprojects have not drifted apart.
+
+Every subproject is built on its own (``COPY . .`` in its Dockerfile), so a
+module used by several of them is kept as identical copies. After editing one
+copy, apply the change to the others and run this script; it prints a diff and
+exits non-zero when a copy differs from the first one in its group.
+"""
+
+import difflib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SHARED_COPIES = [
+    [
+        "naive-ollama/dashboard_stream.py",
+        "consultant-naive-ollama/dashboard_stream.py",
+    ],
+    [
+        "naive-ollama/web_dashboard.py",
+        "consultant-naive-ollama/web_dashboard.py",
+    ],
+    [
+        "naive-ollama/test_web_dashboard.py",
+        "consultant-naive-ollama/test_web_dashboard.py",
+    ],
+    [
+        "consultant-templates-ollama/state_store.py",
+        "consultant-templates-bruteforce-ollama/state_store.py",
+        "consultant-atom-up/state_store.py",
+    ],
+]
+
+
+def _read(path):
+    with open(os.path.join(ROOT, path), 'r', encoding='utf-8') as f:
+        return f.readlines()
+
+
+def main():
+    drifted = False
+    for group in SHARED_COPIES:
+        reference = _read(group[0])
+        for path in group[1:]:
+            copy = _read(path)
+            if copy != reference:
+                drifted = True
+                sys.stdout.writelines(difflib.unified_diff(reference, copy, group[0], path))
+    if drifted:
+        print("Shared copies differ, apply the change to every copy listed in check_shared_copies.py")
+        return 1
+    print(f"{sum(len(group) for group in SHARED_COPIES)} shared copies are in sync")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
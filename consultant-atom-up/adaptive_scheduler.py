@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Adaptive scheduling for the atom tester's (data field x operator combination) grid.
+
+- Pending tasks are ranked by learned success priors (Beta posteriors) per
+  region, dataset, field type, operator stack level and operator, plus a small
+  exploration bonus for datasets that have hardly been tried.
+- A stacked combination waits for its prefix on the same field (``[a, b]``
+  waits for ``[a]``, ``[a]`` waits for the raw field). If the prefix had no
+  coverage, the whole branch above it is pruned without being simulated.
+- Datasets and combinations that produced no valid simulation after enough
+  conclusive tests are pruned as well.
+- Every outcome is kept in an indexed SQLite store, so a resumed run rebuilds
+  its priors and skips finished or pruned tasks without re-reading results.
+"""
+
+import json
+import logging
+import math
+import sqlite3
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Outcomes that say nothing about the atom itself (quota, network, timeouts)
+INCONCLUSIVE_ERRORS = ('Submission failed', 'Simulation timeout', 'Failed to get results')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS atom_outcomes (
+    task_id TEXT PRIMARY KEY,
+    region TEXT NOT NULL,
+    field_id TEXT NOT NULL,
+    dataset_id TEXT,
+    field_type TEXT,
+    combination_id TEXT NOT NULL,
+    operators TEXT NOT NULL,
+    stack_level INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    sharpe REAL,
+    conclusive INTEGER NOT NULL,
+    valid INTEGER NOT NULL,
+    hit INTEGER NOT NULL,
+    reason TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_atom_outcomes_field ON atom_outcomes (region, field_id);
+CREATE INDEX IF NOT EXISTS idx_atom_outcomes_dataset ON atom_outcomes (dataset_id, conclusive);
+CREATE INDEX IF NOT EXISTS idx_atom_outcomes_combination ON atom_outcomes (combination_id, conclusive);
+"""
+
+
+def _reason_kind(reason: Optional[str]) -> str:
+    """'base', 'dataset' or 'combination' from a prune reason"""
+    return (reason or 'unknown').split(' ', 1)[0]
+
+
+def task_features(task: Dict) -> Dict:
+    """Scheduling features of a task dict (region, data_field, operator_combination, task_id)"""
+    data_field = task['data_field']
+    combination = task['operator_combination']
+    return {
+        'region': task['region'],
+        'field_id': data_field['id'],
+        'dataset_id': (data_field.get('dataset') or {}).get('id', ''),
+        'field_type': data_field.get('type', 'UNKNOWN'),
+        'combination_id': combination.combination_id,
+        'operators': tuple(combination.operators),
+        'stack_level': combination.stack_level,
+    }
+
+
+class AdaptiveAtomScheduler:
+    """Ranks, gates and prunes atom test tasks from the outcomes seen so far"""
+
+    PRIOR_HITS = 1.0
+    PRIOR_MISSES = 3.0
+
+    def __init__(self, db_path: str = "atom_scheduler.db", hit_sharpe: float = 0.5,
+                 min_prune_trials: int = 8, exploration: float = 0.3, commit_every: int = 10):
+        self.db_path = db_path
+        self.hit_sharpe = hit_sharpe
+        self.min_prune_trials = min_prune_trials
+        self.exploration = exploration
+        self.commit_every = commit_every
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+        self._counts = defaultdict(lambda: [0, 0, 0])  # {(dimension, value): [trials, hits, valid]}
+        self._total_trials = 0
+        self._resolved = {}  # {task_id: (conclusive, valid)}
+        self._buckets = defaultdict(deque)  # {(region, dataset, type, combination): deque of tasks}
+        self._bucket_scores = []
+        self._scores_stale = True
+        self._waiting = defaultdict(list)  # {prefix task_id: [tasks gated on it]}
+        self._pending_ids = set()
+        self._uncommitted = 0
+        self.pruned = defaultdict(int)  # {reason: count}
+
+    # ----- persistence ----------------------------------------------------
+
+    def reset(self):
+        """Forget every stored outcome (fresh, non-resumed run)"""
+        self.conn.execute("DELETE FROM atom_outcomes")
+        self.conn.commit()
+        self._counts.clear()
+        self._total_trials = 0
+        self._resolved.clear()
+        self.pruned.clear()
+        self._scores_stale = True
+
+    def load(self) -> int:
+        """Rebuild priors and the finished-task index from the store; returns tasks known"""
+        self._counts.clear()
+        self._total_trials = 0
+        self._resolved.clear()
+
+        rows = self.conn.execute(
+            "SELECT task_id, region, dataset_id, field_type, combination_id, operators, stack_level, "
+            "status, conclusive, valid, hit, reason FROM atom_outcomes"
+        )
+        for (task_id, region, dataset_id, field_type, combination_id, operators, stack_level,
+             status, conclusive, valid, hit, reason) in rows:
+            self._resolved[task_id] = (bool(conclusive), bool(valid))
+            if status == 'pruned':
+                self.pruned[_reason_kind(reason)] += 1
+            elif conclusive:
+                features = {'region': region, 'dataset_id': dataset_id, 'field_type': field_type,
+                            'combination_id': combination_id, 'operators': tuple(json.loads(operators)),
+                            'stack_level': stack_level}
+                self._learn(features, bool(hit), bool(valid))
+        self._scores_stale = True
+        if self._resolved:
+            logger.info(f"📁 Scheduler store: {len(self._resolved)} finished tasks, "
+                        f"{sum(self.pruned.values())} pruned, from {self.db_path}")
+        return len(self._resolved)
+
+    def _store(self, task_id: str, features: Dict, status: str, sharpe: Optional[float],
+               conclusive: bool, valid: bool, hit: bool, reason: Optional[str] = None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO atom_outcomes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (task_id, features['region'], features['field_id'], features['dataset_id'], features['field_type'],
+             features['combination_id'], json.dumps(list(features['operators'])), features['stack_level'],
+             status, sharpe, int(conclusive), int(valid), int(hit), reason, time.time())
+        )
+        self._resolved[task_id] = (conclusive, valid)
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        if self._uncommitted:
+            self.conn.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    # ----- priors ---------------------------------------------------------
+
+    @staticmethod
+    def _dimensions(features: Dict) -> List[Tuple[str, object]]:
+        dimensions = [
+            ('region', features['region']),
+            ('dataset', features['dataset_id']),
+            ('field_type', features['field_type']),
+            ('stack_level', features['stack_level']),
+            ('combination', features['combination_id']),
+        ]
+        dimensions.extend(('operator', operator) for operator in features['operators'] or ('raw',))
+        return dimensions
+
+    def _learn(self, features: Dict, hit: bool, valid: bool):
+        self._total_trials += 1
+        for key in self._dimensions(features):
+            counts = self._counts[key]
+            counts[0] += 1
+            counts[1] += int(hit)
+            counts[2] += int(valid)
+
+    def _posterior(self, key) -> float:
+        trials, hits, _ = self._counts.get(key, (0, 0, 0))
+        return (hits + self.PRIOR_HITS) / (trials + self.PRIOR_HITS + self.PRIOR_MISSES)
+
+    def score(self, features: Dict) -> float:
+        """Expected hit rate of a task from the priors of its dimensions, plus exploration"""
+        operators = features['operators'] or ('raw',)
+        operator_prior = sum(self._posterior(('operator', op)) for op in operators) / len(operators)
+        priors = [
+            self._posterior(('region', features['region'])),
+            self._posterior(('dataset', features['dataset_id'])),
+            self._posterior(('field_type', features['field_type'])),
+            self._posterior(('stack_level', features['stack_level'])),
+            operator_prior,
+        ]
+        dataset_trials = self._counts.get(('dataset', features['dataset_id']), (0, 0, 0))[0]
+        bonus = self.exploration * math.sqrt(math.log(1 + self._total_trials) / (1 + dataset_trials))
+        return sum(priors) / len(priors) + bonus
+
+    def _dead_dimension(self, features: Dict) -> Optional[str]:
+        """Name of a dimension that never produced a valid simulation in enough tries"""
+        for dimension, value in (('dataset', features['dataset_id']), ('combination', features['combination_id'])):
+            trials, _, valid = self._counts.get((dimension, value), (0, 0, 0))
+            if trials >= self.min_prune_trials and valid == 0:
+                return f"{dimension} {value} has no valid simulation in {trials} tests"
+        return None
+
+    # ----- task queue -----------------------------------------------------
+
+    def add_tasks(self, tasks: List[Dict]) -> int:
+        """Queue tasks not already finished; deeper stacks are gated on their prefix"""
+        queued = []
+        by_operators = {}  # {(region, field_id, operators): task_id}
+        for task in tasks:
+            if task['task_id'] in self._resolved or task['task_id'] in self._pending_ids:
+                continue
+            task['features'] = task_features(task)
+            queued.append(task)
+            features = task['features']
+            by_operators.setdefault((features['region'], features['field_id'], features['operators']), task['task_id'])
+        # Finished prefixes still gate (or prune) the tasks built on them
+        combination_ids = {}
+        for task in tasks:
+            combination = task['operator_combination']
+            combination_ids.setdefault(tuple(combination.operators), combination.combination_id)
+
+        for task in queued:
+            self._pending_ids.add(task['task_id'])
+            features = task['features']
+            prefix_id = None
+            for depth in range(len(features['operators']) - 1, -1, -1):
+                prefix = features['operators'][:depth]
+                prefix_id = by_operators.get((features['region'], features['field_id'], prefix))
+                if prefix_id is None and prefix in combination_ids:
+                    candidate = f"{features['region']}_{features['field_id']}_{combination_ids[prefix]}"
+                    prefix_id = candidate if candidate in self._resolved else None
+                if prefix_id is not None:
+                    break
+            if prefix_id is None:
+                self._enqueue(task)
+            elif prefix_id in self._resolved:
+                self._release(task, *self._resolved[prefix_id], prefix_id=prefix_id)
+            else:
+                self._waiting[prefix_id].append(task)
+        logger.info(f"🧭 Scheduler: {len(queued)} tasks queued, "
+                    f"{sum(len(waiting) for waiting in self._waiting.values())} waiting on their base atom")
+        return len(queued)
+
+    def _enqueue(self, task: Dict):
+        features = task['features']
+        key = (features['region'], features['dataset_id'], features['field_type'], features['combination_id'])
+        self._buckets[key].append(task)
+        self._scores_stale = True
+
+    def _release(self, task: Dict, conclusive: bool, valid: bool, prefix_id: str):
+        if conclusive and not valid:
+            self._prune(task, f"base atom {prefix_id} has no coverage")
+        else:
+            self._enqueue(task)
+
+    def _prune(self, task: Dict, reason: str):
+        """Record a task (and everything gated on it) as pruned"""
+        stack = [(task, reason)]
+        while stack:
+            current, current_reason = stack.pop()
+            self._pending_ids.discard(current['task_id'])
+            self._store(current['task_id'], current['features'], 'pruned', None,
+                        conclusive=True, valid=False, hit=False, reason=current_reason)
+            self.pruned[_reason_kind(current_reason)] += 1
+            logger.debug(f"✂️ Pruned {current['task_id']}: {current_reason}")
+            for dependent in self._waiting.pop(current['task_id'], []):
+                stack.append((dependent, f"base atom {current['task_id']} was pruned"))
+
+    def _rescore(self):
+        scored = [(self.score(bucket[0]['features']), key) for key, bucket in self._buckets.items() if bucket]
+        scored.sort(reverse=True)
+        self._bucket_scores = scored
+        self._scores_stale = False
+
+    def next_task(self) -> Optional[Dict]:
+        """Most promising ready task, or None if nothing is ready right now"""
+        while True:
+            if self._scores_stale:
+                self._rescore()
+            while self._bucket_scores and not self._buckets[self._bucket_scores[0][1]]:
+                del self._buckets[self._bucket_scores.pop(0)[1]]
+            if not self._bucket_scores:
+                return None
+            task = self._buckets[self._bucket_scores[0][1]].popleft()
+            reason = self._dead_dimension(task['features'])
+            if reason:
+                self._prune(task, reason)
+                continue
+            return task
+
+    def has_pending(self) -> bool:
+        return bool(self._pending_ids)
+
+    def record(self, task: Dict, result) -> None:
+        """Learn from a finished AtomTestResult and release the tasks gated on it"""
+        sharpe = result.sharpe_ratio
+        conclusive = not (result.status in ('failed', 'error') and
+                          any(marker in (result.error_message or '') for marker in INCONCLUSIVE_ERRORS))
+        valid = result.status in ('success', 'too_good') and any(
+            value for value in (result.sharpe_ratio, result.turnover, result.returns))
+        hit = result.status == 'success' and sharpe is not None and sharpe >= self.hit_sharpe
+        features = task.get('features') or task_features(task)
+        self._pending_ids.discard(task['task_id'])
+        self._store(task['task_id'], features, result.status, sharpe, conclusive, valid, hit,
+                    reason=result.error_message)
+        if conclusive:
+            self._learn(features, hit, valid)
+            self._scores_stale = True
+        for dependent in self._waiting.pop(task['task_id'], []):
+            self._release(dependent, conclusive, valid, prefix_id=task['task_id'])
+
+    def summary(self) -> Dict:
+        datasets = [(value, counts) for (dimension, value), counts in self._counts.items() if dimension == 'dataset']
+        datasets.sort(key=lambda item: -self._posterior(('dataset', item[0])))
+        return {
+            'tested': self._total_trials,
+            'pending': len(self._pending_ids),
+            'pruned': dict(self.pruned),
+            'top_datasets': [
+                {'dataset': value, 'trials': counts[0], 'hits': counts[1], 'valid': counts[2],
+                 'prior': round(self._posterior(('dataset', value)), 3)}
+                for value, counts in datasets[:5]
+            ],
+        }
@@ -20,7 +20,7 @@ from typing import List, Dict, Tuple, Optional, Set
 from dataclasses import dataclass, asdict
 from requests.auth import HTTPBasicAuth
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed, Future
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED, Future
 import numpy as np
 from datetime import datetime
 import threading
@@ -31,6 +31,8 @@ from collections import defaultdict, Counter
 import statistics
 import ollama
 from itertools import combinations, product
+from state_store import WriteBehindStore
+from adaptive_scheduler import AdaptiveAtomScheduler
 
 # Configure logging with Unicode handling
 class SafeStreamHandler(logging.StreamHandler):
@@ -417,6 +419,9 @@ class EnhancedMultiThreadedAtomTester:
         self.progress_file = "atom_test_progress.json"
         self.results_file = "enhanced_atom_results.json"
         self.progress_state: Optional[ProgressState] = None
+        # Progress and results are written behind so the result loop never waits on disk
+        self.state_store = WriteBehindStore(flush_interval=5.0)
+        self.scheduler_db = "atom_scheduler.db"
         
         # Load credentials and setup session
         self._load_credentials()
@@ -906,25 +911,21 @@ class EnhancedMultiThreadedAtomTester:
         return {'success': False, 'error': 'Simulation timeout'}
     
     def _save_progress(self):
-        """Save current progress to file"""
-        try:
-            progress_data = {
-                'current_region': self.progress_state.current_region if self.progress_state else 'ASI',
-                'current_data_field_index': self.progress_state.current_data_field_index if self.progress_state else 0,
-                'completed_combinations': list(self.progress_state.completed_combinations) if self.progress_state else [],
-                'completed_tests': self.progress_state.completed_tests if self.progress_state else 0,
-                'total_tests': self.progress_state.total_tests if self.progress_state else 0,
-                'start_time': self.progress_state.start_time if self.progress_state else time.time(),
-                'last_save_time': time.time()
-            }
-            
-            with open(self.progress_file, 'w', encoding='utf-8') as f:
-                json.dump(progress_data, f, indent=2)
-            
-            logger.info("💾 Progress saved")
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to save progress: {e}")
+        """Schedule a write of the current progress"""
+        self.state_store.schedule(self.progress_file, self._progress_data, indent=2)
+    
+    def _progress_data(self) -> Dict:
+        progress_data = {
+            'current_region': self.progress_state.current_region if self.progress_state else 'ASI',
+            'current_data_field_index': self.progress_state.current_data_field_index if self.progress_state else 0,
+            'completed_combinations': list(self.progress_state.completed_combinations) if self.progress_state else [],
+            'completed_tests': self.progress_state.completed_tests if self.progress_state else 0,
+            'total_tests': self.progress_state.total_tests if self.progress_state else 0,
+            'start_time': self.progress_state.start_time if self.progress_state else time.time(),
+            'last_save_time': time.time()
+        }
+        logger.info("💾 Progress saved")
+        return progress_data
     
     def _load_progress(self) -> bool:
         """Load progress from file"""
@@ -953,26 +954,28 @@ class EnhancedMultiThreadedAtomTester:
             return False
     
     def _save_results(self):
-        """Save results to JSON file"""
-        try:
-            # Convert results to serializable format
-            serializable_results = []
-            for result in self.results:
-                result_dict = asdict(result)
-                # Convert operator combination to dict
-                result_dict['operator_combination'] = asdict(result.operator_combination)
-                serializable_results.append(result_dict)
-            
-            with open(self.results_file, 'w', encoding='utf-8') as f:
-                json.dump(serializable_results, f, indent=2)
-            
-            logger.info(f"💾 Results saved to {self.results_file}")
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to save results: {e}")
+        """Schedule a write of the results JSON file"""
+        self.state_store.schedule(self.results_file, self._serializable_results, indent=2)
+    
+    def _serializable_results(self) -> List[Dict]:
+        # Convert results to serializable format
+        serializable_results = []
+        for result in list(self.results):
+            result_dict = asdict(result)
+            # Convert operator combination to dict
+            result_dict['operator_combination'] = asdict(result.operator_combination)
+            serializable_results.append(result_dict)
+        logger.info(f"💾 Results saved to {self.results_file}")
+        return serializable_results
     
-    def run_multi_threaded_atom_tests(self, max_workers: int = 8, resume: bool = False):
-        """Run multi-threaded atom tests with operator combinations"""
+    def run_multi_threaded_atom_tests(self, max_workers: int = 8, resume: bool = False,
+                                      adaptive: bool = True, max_tests: Optional[int] = None):
+        """Run multi-threaded atom tests with operator combinations
+        
+        With ``adaptive`` the grid is explored most promising first and dominated
+        branches are pruned; otherwise every task is tested in grid order.
+        ``max_tests`` caps the number of simulations in this run.
+        """
         logger.info("🚀 Starting Enhanced Multi-Threaded Atom Testing System...")
         logger.info(f"🔧 Using {max_workers} workers for parallel processing")
         
@@ -1022,53 +1025,104 @@ class EnhancedMultiThreadedAtomTester:
         
         logger.info(f"📋 Created {len(test_tasks)} test tasks")
         
-        # Run tests with ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks
-            future_to_task = {}
-            for task in test_tasks:
-                future = executor.submit(
-                    self._test_single_atom,
-                    task['data_field'],
-                    task['operator_combination'],
-                    task['region'],
-                    'TOP3000',  # Default universe
-                    'INDUSTRY'  # Default neutralization
-                )
-                future_to_task[future] = task
-            
-            # Process completed tasks
-            for future in as_completed(future_to_task):
-                task = future_to_task[future]
-                try:
-                    result = future.result()
-                    self.results.append(result)
-                    
-                    # Update progress
-                    self.progress_state.completed_combinations.add(task['task_id'])
-                    self.progress_state.completed_tests += 1
-                    
-                    # Log result
-                    status_emoji = "✅" if result.status == "success" else "❌"
-                    sharpe_str = f"{result.sharpe_ratio:.3f}" if result.sharpe_ratio is not None else "N/A"
-                    color_str = result.color_status if result.color_status is not None else "N/A"
-                    logger.info(f"{status_emoji} {result.region} | {result.data_field_name[:30]}... | {result.operator_combination.combination_id} | Sharpe: {sharpe_str} | Color: {color_str}")
-                    
-                    # Save progress every 10 tests
-                    if self.progress_state.completed_tests % 10 == 0:
-                        self._save_progress()
-                        self._save_results()
-                    
-                except Exception as e:
-                    logger.error(f"❌ Task failed: {e}")
+        if adaptive:
+            self._run_adaptive(test_tasks, max_workers, resume, max_tests)
+        else:
+            if max_tests is not None:
+                test_tasks = test_tasks[:max_tests]
+            # Run tests with ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Submit all tasks
+                future_to_task = {}
+                for task in test_tasks:
+                    future_to_task[self._submit_task(executor, task)] = task
+                
+                # Process completed tasks
+                for future in as_completed(future_to_task):
+                    self._handle_task_result(future_to_task[future], future)
         
         # Final save
         self._save_progress()
         self._save_results()
+        self.state_store.flush()
         
         # Print summary
         self._print_summary()
     
+    def _submit_task(self, executor: ThreadPoolExecutor, task: Dict) -> Future:
+        return executor.submit(
+            self._test_single_atom,
+            task['data_field'],
+            task['operator_combination'],
+            task['region'],
+            'TOP3000',  # Default universe
+            'INDUSTRY'  # Default neutralization
+        )
+    
+    def _handle_task_result(self, task: Dict, future: Future) -> Optional[AtomTestResult]:
+        """Record a finished task's result, log it and save progress every 10 tests"""
+        try:
+            result = future.result()
+            self.results.append(result)
+            
+            # Update progress
+            self.progress_state.completed_combinations.add(task['task_id'])
+            self.progress_state.completed_tests += 1
+            
+            # Log result
+            status_emoji = "✅" if result.status == "success" else "❌"
+            sharpe_str = f"{result.sharpe_ratio:.3f}" if result.sharpe_ratio is not None else "N/A"
+            color_str = result.color_status if result.color_status is not None else "N/A"
+            logger.info(f"{status_emoji} {result.region} | {result.data_field_name[:30]}... | {result.operator_combination.combination_id} | Sharpe: {sharpe_str} | Color: {color_str}")
+            
+            # Save progress every 10 tests
+            if self.progress_state.completed_tests % 10 == 0:
+                self._save_progress()
+                self._save_results()
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Task failed: {e}")
+            return None
+    
+    def _run_adaptive(self, test_tasks: List[Dict], max_workers: int, resume: bool, max_tests: Optional[int]):
+        """Keep the workers busy with the most promising ready task, re-ranking after every result"""
+        scheduler = AdaptiveAtomScheduler(self.scheduler_db)
+        if resume:
+            scheduler.load()
+        else:
+            scheduler.reset()
+        scheduler.add_tasks(test_tasks)
+        
+        submitted = 0
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                in_flight = {}
+                while True:
+                    # Only max_workers tasks are in flight, so each pick sees the latest priors
+                    while len(in_flight) < max_workers and (max_tests is None or submitted < max_tests):
+                        task = scheduler.next_task()
+                        if task is None:
+                            break
+                        in_flight[self._submit_task(executor, task)] = task
+                        submitted += 1
+                    if not in_flight:
+                        break
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        task = in_flight.pop(future)
+                        result = self._handle_task_result(task, future)
+                        if result is not None:
+                            scheduler.record(task, result)
+        finally:
+            summary = scheduler.summary()
+            scheduler.close()
+        
+        logger.info(f"🧭 Scheduler: {submitted} simulations run, {summary['pending']} tasks left, "
+                    f"pruned {summary['pruned'] or 'nothing'}")
+        for row in summary['top_datasets']:
+            logger.info(f"🧭   {row['dataset']}: prior={row['prior']} hits={row['hits']}/{row['trials']} valid={row['valid']}")
+    
     def _print_summary(self):
         """Print testing summary"""
         logger.info("🎉 Multi-threaded atom testing completed!")
@@ -1096,12 +1150,15 @@ def main():
     parser = argparse.ArgumentParser(description='Enhanced Multi-Threaded Atom Tester')
     parser.add_argument('--workers', type=int, default=8, help='Number of worker threads')
     parser.add_argument('--resume', action='store_true', help='Resume from previous progress')
+    parser.add_argument('--max-tests', type=int, default=None, help='Maximum number of simulations to run')
+    parser.add_argument('--grid', action='store_true', help='Test every task in grid order (no adaptive scheduling or pruning)')
     
     args = parser.parse_args()
     
     try:
         tester = EnhancedMultiThreadedAtomTester()
-        tester.run_multi_threaded_atom_tests(max_workers=args.workers, resume=args.resume)
+        tester.run_multi_threaded_atom_tests(max_workers=args.workers, resume=args.resume,
+                                             adaptive=not args.grid, max_tests=args.max_tests)
     except KeyboardInterrupt:
         logger.info("⏹️ Testing interrupted by user")
     except Exception as e:
@@ -24,6 +24,7 @@ Examples:
   python run_enhanced_multi_threaded_atom_tester.py --workers 4        # Run with 4 workers
   python run_enhanced_multi_threaded_atom_tester.py --resume           # Resume from previous progress
   python run_enhanced_multi_threaded_atom_tester.py --workers 8 --resume  # Resume with 8 workers
+  python run_enhanced_multi_threaded_atom_tester.py --max-tests 500    # Spend 500 simulations on the most promising atoms
         """
     )
     
@@ -40,6 +41,19 @@ Examples:
         help='Resume from previous progress without prompting'
     )
     
+    parser.add_argument(
+        '--max-tests', '-m',
+        type=int,
+        default=None,
+        help='Maximum number of simulations to run (default: no limit)'
+    )
+    
+    parser.add_argument(
+        '--grid',
+        action='store_true',
+        help='Test every field/combination in grid order instead of adaptive scheduling with pruning'
+    )
+    
     parser.add_argument(
         '--region', '-reg',
         type=str,
@@ -146,7 +160,8 @@ def main():
             print(f"🎯 Limited to region: {args.region}")
         
         # Run tests
-        tester.run_multi_threaded_atom_tests(max_workers=args.workers, resume=resume)
+        tester.run_multi_threaded_atom_tests(max_workers=args.workers, resume=resume,
+                                             adaptive=not args.grid, max_tests=args.max_tests)
         
         print("\n🎉 Enhanced Multi-Threaded Atom Testing completed!")
         print("Check the following files for results:")
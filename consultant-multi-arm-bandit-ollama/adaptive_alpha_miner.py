@@ -16,6 +16,11 @@ import pickle
 from datetime import datetime, timedelta
 import math
 
+from expression_tree import (
+    MATRIX, LOOKBACK, LOOKBACK_WINDOWS, ExpressionParseError, Node, OperatorCatalog,
+    annotate_types, parse_expression, random_subtree, replace_child, validate
+)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -127,20 +132,60 @@ class MultiArmBandit:
             with open(filename, 'rb') as f:
                 self.arms = pickle.load(f)
 
+def _json_fitness(entry: Dict) -> Dict:
+    """Copy of a population or cache entry with failed (-inf) fitness as None, JSON has no infinity."""
+    fitness = entry.get('fitness')
+    if isinstance(fitness, float) and not math.isfinite(fitness):
+        return {**entry, 'fitness': None}
+    return entry
+
+
+def _loaded_fitness(entry: Dict) -> Dict:
+    """Inverse of _json_fitness, failed expressions rank below every result again."""
+    if 'fitness' in entry and entry['fitness'] is None:
+        entry['fitness'] = float('-inf')
+    return entry
+
+
 class GeneticAlgorithm:
-    """Genetic algorithm for evolving alpha expressions."""
+    """Tree-based genetic programming over alpha expressions.
+
+    Expressions are parsed into typed trees (see expression_tree) so that
+    crossover swaps whole subtrees of matching type and mutation draws from
+    the operator catalog. Fitness is cached by canonical expression across
+    generations, and evolution is steady-state: every evaluated offspring
+    competes for a place in the population as soon as its result arrives.
+    """
     
-    def __init__(self, population_size: int = 50, mutation_rate: float = 0.1, crossover_rate: float = 0.8):
+    def __init__(self, population_size: int = 50, mutation_rate: float = 0.1, crossover_rate: float = 0.8,
+                 max_depth: int = 6, tournament_size: int = 3):
         self.population_size = population_size
         self.mutation_rate = mutation_rate
         self.crossover_rate = crossover_rate
+        self.max_depth = max_depth
+        self.tournament_size = tournament_size
         self.population = []
         self.generation = 0
         self.data_fields = []
+        self._field_set = set()
+        self.catalog = OperatorCatalog()
+        self.fitness_cache = {}  # canonical expression -> {'fitness', 'sharpe', 'success'}
+        self.pending = set()  # canonical expressions handed out but not yet reported
         
     def set_data_fields(self, data_fields: List[str]):
         """Set available data fields for expression generation."""
         self.data_fields = data_fields
+        self._field_set = set(data_fields)
+    
+    def set_operators(self, operators: List[Dict]):
+        """Set the operator catalog from the WorldQuant Brain operator list."""
+        self.catalog = OperatorCatalog.from_operators(operators)
+        logger.info(f"Genetic programming catalog has {len(self.catalog.signatures)} typed operators")
+    
+    def canonical(self, expression: str) -> Optional[str]:
+        """Return the canonical form of an expression, or None if it is invalid."""
+        tree = self._parse(expression)
+        return tree.to_string() if tree else None
     
     def initialize_population(self, base_expressions: List[str]):
         """Initialize population with base expressions and variations."""
@@ -148,156 +193,267 @@ class GeneticAlgorithm:
         
         # Add base expressions
         for expr in base_expressions:
-            self.population.append({
-                'expression': expr,
-                'fitness': 0,
-                'sharpe': 0,
-                'generation': 0
-            })
+            canonical = self.canonical(expr)
+            if canonical and not self._in_population(canonical):
+                self.population.append(self._individual(canonical, 0))
+        
+        if not self.population:
+            logger.warning("No parseable base expressions for genetic programming")
+            return
         
         # Generate variations
-        while len(self.population) < self.population_size:
+        attempts = 0
+        while len(self.population) < self.population_size and attempts < self.population_size * 10:
+            attempts += 1
             parent = random.choice(self.population)
             child = self._mutate_expression(parent['expression'])
-            self.population.append({
-                'expression': child,
-                'fitness': 0,
-                'sharpe': 0,
-                'generation': 0
-            })
+            if child and not self._in_population(child):
+                self.population.append(self._individual(child, 0))
     
-    def evolve(self, results: List[AlphaResult]) -> List[str]:
-        """Evolve population based on results."""
-        # Update fitness scores
-        for result in results:
-            for individual in self.population:
-                if individual['expression'] == result.expression:
-                    individual['fitness'] = result.fitness
-                    individual['sharpe'] = result.sharpe
-                    break
-        
-        # Sort by fitness
-        self.population.sort(key=lambda x: x['fitness'], reverse=True)
-        
-        # Keep top 20%
-        elite_size = max(1, int(self.population_size * 0.2))
-        elite = self.population[:elite_size]
-        
-        # Generate new population
-        new_population = elite.copy()
-        
-        while len(new_population) < self.population_size:
-            if random.random() < self.crossover_rate:
-                # Crossover
-                parent1 = self._tournament_selection()
-                parent2 = self._tournament_selection()
+    def next_offspring(self, max_attempts: int = 50) -> Optional[str]:
+        """Produce the next expression worth simulating.
+        
+        Unevaluated population members are handed out first, then new
+        offspring bred by tournament selection. Expressions already in the
+        fitness cache or currently in flight are never returned twice.
+        """
+        for individual in self.population:
+            expression = self.canonical(individual['expression'])
+            if expression and expression not in self.fitness_cache and expression not in self.pending:
+                self.pending.add(expression)
+                return expression
+        
+        evaluated = [ind for ind in self.population if ind['expression'] in self.fitness_cache]
+        if not evaluated:
+            return None
+        
+        for _ in range(max_attempts):
+            if len(evaluated) > 1 and random.random() < self.crossover_rate:
+                parent1 = self._tournament_selection(evaluated)
+                parent2 = self._tournament_selection(evaluated)
                 child = self._crossover(parent1['expression'], parent2['expression'])
+                if child and random.random() < self.mutation_rate:
+                    child = self._mutate_expression(child)
             else:
-                # Mutation
-                parent = self._tournament_selection()
+                parent = self._tournament_selection(evaluated)
                 child = self._mutate_expression(parent['expression'])
             
-            new_population.append({
-                'expression': child,
-                'fitness': 0,
-                'sharpe': 0,
-                'generation': self.generation + 1
-            })
-        
-        self.population = new_population
+            if child and child not in self.fitness_cache and child not in self.pending:
+                self.pending.add(child)
+                return child
+        
+        logger.info("Genetic programming could not breed a novel offspring")
+        return None
+    
+    def report_result(self, result: AlphaResult):
+        """Record a simulation result and apply steady-state replacement."""
+        expression = self.canonical(result.expression) or result.expression
+        self.pending.discard(expression)
+        fitness = result.fitness if result.success else float('-inf')
+        self.fitness_cache[expression] = {
+            'fitness': fitness,
+            'sharpe': result.sharpe if result.success else 0,
+            'success': result.success
+        }
+        
+        for individual in self.population:
+            if individual['expression'] == expression:
+                individual['fitness'] = fitness
+                individual['sharpe'] = self.fitness_cache[expression]['sharpe']
+                return
+        
+        if not result.success:
+            return
+        
         self.generation += 1
+        newcomer = self._individual(expression, self.generation)
+        newcomer['fitness'] = fitness
+        newcomer['sharpe'] = result.sharpe
+        
+        if len(self.population) < self.population_size:
+            self.population.append(newcomer)
+            return
+        
+        # Replace the worst evaluated member if the newcomer beats it
+        evaluated = [ind for ind in self.population if ind['expression'] in self.fitness_cache]
+        if not evaluated:
+            return
+        worst = min(evaluated, key=lambda x: x['fitness'])
+        if fitness > worst['fitness']:
+            self.population[self.population.index(worst)] = newcomer
+    
+    def cached_result(self, expression: str) -> Optional[Dict]:
+        """Return cached fitness for an expression evaluated in any generation."""
+        canonical = self.canonical(expression)
+        return self.fitness_cache.get(canonical) if canonical else None
+    
+    def evolve(self, results: List[AlphaResult]) -> List[str]:
+        """Evolve population based on results and return new expressions to test."""
+        for result in results:
+            self.report_result(result)
+        
+        # Sort by fitness
+        self.population.sort(key=lambda x: x['fitness'], reverse=True)
         
-        # Return top expressions
-        return [ind['expression'] for ind in self.population[:10]]
+        offspring = []
+        while len(offspring) < 10:
+            child = self.next_offspring()
+            if child is None:
+                break
+            offspring.append(child)
+        return offspring
+    
+    def _individual(self, expression: str, generation: int) -> Dict:
+        cached = self.fitness_cache.get(expression, {})
+        return {
+            'expression': expression,
+            'fitness': cached.get('fitness', 0),
+            'sharpe': cached.get('sharpe', 0),
+            'generation': generation
+        }
+    
+    def _in_population(self, expression: str) -> bool:
+        return any(ind['expression'] == expression for ind in self.population)
     
-    def _tournament_selection(self, tournament_size: int = 3):
+    def _parse(self, expression: str):
+        """Parse an expression into a typed tree, or None if it is invalid."""
+        try:
+            tree = parse_expression(expression, self.catalog)
+        except ExpressionParseError:
+            return None
+        if not validate(tree, self.catalog, self._field_set):
+            return None
+        return tree
+    
+    def _finish(self, tree) -> Optional[str]:
+        """Re-type, validate and render a modified tree."""
+        if tree is None or tree.depth() > self.max_depth:
+            return None
+        annotate_types(tree, self.catalog)
+        if not validate(tree, self.catalog, self._field_set):
+            return None
+        # Round-trip through the parser so only well-formed strings leave here
+        return self.canonical(tree.to_string())
+    
+    def _tournament_selection(self, candidates: List[Dict] = None):
         """Tournament selection."""
-        tournament = random.sample(self.population, tournament_size)
+        candidates = candidates or self.population
+        tournament = random.sample(candidates, min(self.tournament_size, len(candidates)))
         return max(tournament, key=lambda x: x['fitness'])
     
-    def _crossover(self, parent1: str, parent2: str) -> str:
-        """Crossover two expressions."""
-        # Simple crossover: combine parts of expressions
-        parts1 = parent1.split('(')
-        parts2 = parent2.split('(')
-        
-        if len(parts1) > 1 and len(parts2) > 1:
-            # Crossover at operator level
-            if random.random() < 0.5:
-                return parts1[0] + '(' + parts2[1]
-            else:
-                return parts2[0] + '(' + parts1[1]
-        else:
-            return parent1
+    def _crossover(self, parent1: str, parent2: str) -> Optional[str]:
+        """Typed subtree crossover: graft a matrix subtree of parent2 into parent1."""
+        tree1 = self._parse(parent1)
+        tree2 = self._parse(parent2)
+        if tree1 is None or tree2 is None:
+            return None
+        
+        target = random_subtree(tree1, MATRIX, include_root=False)
+        donor = random_subtree(tree2, MATRIX)
+        if target is None or donor is None:
+            return None
+        
+        _, parent, slot = target
+        replace_child(parent, slot, donor[0].copy())
+        return self._finish(tree1)
     
-    def _mutate_expression(self, expression: str) -> str:
+    def _mutate_expression(self, expression: str) -> Optional[str]:
         """Mutate an expression."""
+        tree = self._parse(expression)
+        if tree is None:
+            return None
+        
         mutations = [
             self._add_operator,
             self._change_parameter,
             self._swap_operators,
-            self._add_winsorize,
-            self._add_ts_backfill,
-            self._change_data_field
+            self._change_data_field,
+            self._hoist_subtree
         ]
-        
-        mutation = random.choice(mutations)
-        return mutation(expression)
-    
-    def _add_operator(self, expression: str) -> str:
-        """Add an operator to the expression."""
-        operators = ['ts_rank', 'ts_zscore', 'ts_delta', 'ts_sum', 'ts_mean', 'ts_std_dev']
-        if '(' in expression:
-            operator = random.choice(operators)
-            return f"{operator}({expression})"
-        return expression
+        random.shuffle(mutations)
+        
+        # Fall through to the next mutation when one does not apply
+        for mutation in mutations:
+            mutated = mutation(tree.copy())
+            if mutated is not None:
+                child = self._finish(mutated)
+                if child and child != expression:
+                    return child
+        return None
     
-    def _change_parameter(self, expression: str) -> str:
-        """Change a parameter in the expression."""
-        # Simple parameter change
-        if 'std=4' in expression:
-            return expression.replace('std=4', f'std={random.randint(2, 6)}')
-        elif '60' in expression:
-            return expression.replace('60', str(random.choice([30, 60, 90, 120])))
-        return expression
+    def _add_operator(self, tree):
+        """Wrap a random matrix subtree in a single-input operator."""
+        wrappers = self.catalog.wrappers()
+        target = random_subtree(tree, MATRIX)
+        if not wrappers or target is None:
+            return None
+        
+        node, parent, slot = target
+        operator = random.choice(wrappers)
+        wrapped = Node('call', operator, [node])
+        for _ in self.catalog.signature(operator)[1:]:
+            wrapped.children.append(Node('number', str(random.choice(LOOKBACK_WINDOWS)), type=LOOKBACK))
+        if parent is None:
+            return wrapped
+        replace_child(parent, slot, wrapped)
+        return tree
     
-    def _swap_operators(self, expression: str) -> str:
-        """Swap operators in the expression."""
-        swaps = [
-            ('ts_rank', 'ts_zscore'),
-            ('ts_sum', 'ts_mean'),
-            ('vec_max', 'vec_avg'),
-            ('vec_sum', 'vec_ir')
-        ]
-        
-        for old, new in swaps:
-            if old in expression:
-                return expression.replace(old, new)
-        return expression
-    
-    def _add_winsorize(self, expression: str) -> str:
-        """Add winsorize wrapper."""
-        if 'winsorize' not in expression:
-            return f"winsorize({expression}, std=4)"
-        return expression
+    def _change_parameter(self, tree):
+        """Change a lookback window or std parameter.
+
+        Only numbers in slots the operator signature marks as lookbacks are
+        treated as windows, other constants (e.g. the -1 in trade_when) stay.
+        """
+        numbers = [(n, s) for n, p, s in tree.walk()
+                   if n.kind == 'number' and p is not None and (n.type == LOOKBACK or s == 'std')]
+        if not numbers:
+            return None
+        
+        node, slot = random.choice(numbers)
+        if slot == 'std':
+            node.value = str(random.randint(2, 6))
+        else:
+            node.value = str(random.choice(LOOKBACK_WINDOWS))
+        return tree
     
-    def _add_ts_backfill(self, expression: str) -> str:
-        """Add ts_backfill wrapper."""
-        if 'ts_backfill' not in expression:
-            return f"ts_backfill({expression}, 60)"
-        return expression
+    def _swap_operators(self, tree):
+        """Replace an operator with another of the same signature."""
+        calls = [n for n, _, _ in tree.walk() if n.kind == 'call' and self.catalog.alternatives(n.value)]
+        if not calls:
+            return None
+        
+        node = random.choice(calls)
+        node.value = random.choice(self.catalog.alternatives(node.value))
+        # Keyword arguments are operator specific
+        node.kwargs = []
+        return tree
     
-    def _change_data_field(self, expression: str) -> str:
-        """Change data field in the expression."""
+    def _change_data_field(self, tree):
+        """Change a data field leaf in the expression."""
         if not self.data_fields:
-            return expression
-        
-        # Find data fields in expression
-        for field in self.data_fields:
-            if field in expression:
-                new_field = random.choice(self.data_fields)
-                return expression.replace(field, new_field)
-        return expression
+            return None
+        
+        leaves = [n for n, _, _ in tree.walk()
+                  if n.kind == 'field' and n.type == MATRIX and n.value in self._field_set]
+        if not leaves:
+            return None
+        
+        random.choice(leaves).value = random.choice(self.data_fields)
+        return tree
+    
+    def _hoist_subtree(self, tree):
+        """Replace an operator call with one of its matrix arguments."""
+        calls = [(n, p, s) for n, p, s in tree.walk()
+                 if n.kind == 'call' and any(c.type == MATRIX for c in n.children)]
+        if not calls:
+            return None
+        
+        node, parent, slot = random.choice(calls)
+        child = random.choice([c for c in node.children if c.type == MATRIX])
+        if parent is None:
+            return child
+        replace_child(parent, slot, child)
+        return tree
 
 class AdaptiveAlphaMiner:
     """Adaptive alpha miner using multi-arm bandit and genetic algorithm."""
@@ -488,19 +644,19 @@ class AdaptiveAlphaMiner:
             max_trade_options = ["ON", "OFF"]  # Enable max trade for ASI and CHN
         
         for delay in delays:
-        for neutralization in neutralizations:
-            for truncation in truncations:
+            for neutralization in neutralizations:
+                for truncation in truncations:
                     for max_trade in max_trade_options:
-                settings = SimulationSettings(
+                        settings = SimulationSettings(
                             region=region,
                             universe=universe,
-                    instrumentType="EQUITY",
+                            instrumentType="EQUITY",
                             delay=delay,
-                    neutralization=neutralization,
-                    truncation=truncation,
-                    maxTrade=max_trade
-                )
-                self.bandit.add_arm(settings)
+                            neutralization=neutralization,
+                            truncation=truncation,
+                            maxTrade=max_trade
+                        )
+                        self.bandit.add_arm(settings)
         
         logger.info(f"Initialized {len(self.bandit.arms)} settings variations for universe {universe} in region {region}")
         
@@ -556,8 +712,9 @@ class AdaptiveAlphaMiner:
             operators = temp_generator.get_operators()
             logger.info(f"Total unique data fields: {len(data_fields)} and {len(operators)} operators")
             
-            # Set data fields for genetic algorithm
+            # Set data fields and operator catalog for genetic programming
             self.genetic_algo.set_data_fields([field['id'] for field in data_fields])
+            self.genetic_algo.set_operators(operators)
             
             # Extract field IDs and operator names with descriptions
             field_info = [(field['id'], field.get('description', 'No description')) for field in data_fields]
@@ -678,19 +835,19 @@ JSON:"""
                             generated_expressions = []
                         
                         # Validate and add expressions
-                    field_ids = [field_id for field_id, _ in selected_fields]
+                        field_ids = [field_id for field_id, _ in selected_fields]
                         for expr in generated_expressions:
                             if isinstance(expr, str) and expr.strip():
                                 expr = expr.strip()
                                 # Validate that it contains at least one of our selected fields
                                 if any(field_id in expr for field_id in field_ids):
-                        # Additional validation - check for basic syntax
+                                    # Additional validation - check for basic syntax
                                     if '(' in expr and ')' in expr:
                                         expressions.append(expr)
                                         logger.info(f"Generated expression: {expr}")
-                        else:
+                                    else:
                                         logger.warning(f"Generated expression has invalid syntax: {expr}")
-                    else:
+                                else:
                                     logger.warning(f"Generated expression doesn't contain selected fields: {expr}")
                         
                         # If we got valid expressions, continue to next iteration
@@ -741,11 +898,11 @@ JSON:"""
                             logger.warning(f"Failed to fix JSON: {fix_error}")
                     
                     # If JSON parsing failed or no valid expressions, use fallback
-                        field_id, _ = random.choice(selected_fields)
-                        operator_name, _ = random.choice(selected_operators)
-                        fallback_expr = f"{operator_name}({field_id}, {lookback})"
-                        expressions.append(fallback_expr)
-                        logger.info(f"Using fallback expression {i+1}: {fallback_expr}")
+                    field_id, _ = random.choice(selected_fields)
+                    operator_name, _ = random.choice(selected_operators)
+                    fallback_expr = f"{operator_name}({field_id}, {lookback})"
+                    expressions.append(fallback_expr)
+                    logger.info(f"Using fallback expression {i+1}: {fallback_expr}")
                 else:
                     # Fallback if Ollama fails
                     field_id, _ = random.choice(selected_fields)
@@ -959,50 +1116,92 @@ JSON:"""
         logger.warning("Simulation monitoring timed out")
         return None
     
+    def _submit_simulation(self, expression: str, settings: SimulationSettings) -> Tuple[Optional[str], str]:
+        """Submit one simulation and return (progress_url, error_message)."""
+        sim_data = {
+            'type': 'REGULAR',
+            'settings': asdict(settings),
+            'regular': expression
+        }
+        try:
+            response = self.sess.post('https://api.worldquantbrain.com/simulations', 
+                                     json=sim_data)
+            
+            if response.status_code == 401:
+                logger.warning("Authentication expired, refreshing...")
+                self.setup_auth(self.credentials_path)
+                response = self.sess.post('https://api.worldquantbrain.com/simulations', 
+                                         json=sim_data)
+            
+            if response.status_code != 201:
+                return None, response.text
+            
+            progress_url = response.headers.get('Location')
+            if not progress_url:
+                return None, "No progress URL"
+            
+            return progress_url, ""
+            
+        except Exception as e:
+            return None, str(e)
+    
+    def _poll_simulation(self, progress_url: str, expression: str, settings: SimulationSettings) -> Optional[AlphaResult]:
+        """Check a simulation once; returns None while it is still running."""
+        try:
+            response = self.sess.get(progress_url)
+            if response.status_code != 200:
+                return None
+            
+            data = response.json()
+            status = data.get('status')
+            
+            if status == 'COMPLETE':
+                is_data = data.get('is', {})
+                return AlphaResult(
+                    alpha_id=data.get('alpha'),
+                    expression=expression,
+                    settings=settings,
+                    sharpe=is_data.get('sharpe', 0),
+                    fitness=is_data.get('fitness', 0),
+                    turnover=is_data.get('turnover', 0),
+                    returns=is_data.get('returns', 0),
+                    drawdown=is_data.get('drawdown', 0),
+                    margin=is_data.get('margin', 0),
+                    longCount=is_data.get('longCount', 0),
+                    shortCount=is_data.get('shortCount', 0),
+                    timestamp=time.time()
+                )
+            
+            if status in ['FAILED', 'ERROR']:
+                return self._failed_result(expression, settings, data.get('message', 'Unknown error'))
+            
+        except Exception as e:
+            logger.error(f"Error monitoring simulation {progress_url}: {str(e)}")
+        
+        return None
+    
+    def _failed_result(self, expression: str, settings: SimulationSettings, error_message: str) -> AlphaResult:
+        return AlphaResult(
+            alpha_id="",
+            expression=expression,
+            settings=settings,
+            sharpe=0, fitness=0, turnover=0, returns=0, drawdown=0, margin=0,
+            longCount=0, shortCount=0, timestamp=time.time(), success=False,
+            error_message=error_message
+        )
+    
     def multi_simulate_alpha_batch(self, expressions: List[str], settings: SimulationSettings) -> List[Optional[AlphaResult]]:
         """Simulate multiple alphas in parallel using multi-simulate functionality."""
         try:
-            # Create simulation data for each expression
-            simulation_data_list = []
-            for expression in expressions:
-                sim_data = {
-                    'type': 'REGULAR',
-                    'settings': asdict(settings),
-                    'regular': expression
-                }
-                simulation_data_list.append(sim_data)
-            
             # Submit all simulations
             progress_urls = []
-            for i, sim_data in enumerate(simulation_data_list):
-                try:
-                    response = self.sess.post('https://api.worldquantbrain.com/simulations', 
-                                             json=sim_data)
-                    
-                    if response.status_code == 401:
-                        logger.warning("Authentication expired, refreshing...")
-                        self.setup_auth(self.credentials_path)
-                        response = self.sess.post('https://api.worldquantbrain.com/simulations', 
-                                                 json=sim_data)
-                    
-                    if response.status_code != 201:
-                        logger.error(f"Simulation {i+1} failed: {response.text}")
-                        progress_urls.append(None)
-                        continue
-                    
-                    progress_url = response.headers.get('Location')
-                    if not progress_url:
-                        logger.error(f"No progress URL for simulation {i+1}")
-                        progress_urls.append(None)
-                        continue
-                    
-                    progress_urls.append(progress_url)
+            for i, expression in enumerate(expressions):
+                progress_url, error_message = self._submit_simulation(expression, settings)
+                if progress_url is None:
+                    logger.error(f"Simulation {i+1} failed: {error_message}")
+                else:
                     logger.info(f"Submitted simulation {i+1}, got progress URL: {progress_url}")
-                    
-                except Exception as e:
-                    logger.error(f"Error submitting simulation {i+1}: {str(e)}")
-                    progress_urls.append(None)
-                    continue
+                progress_urls.append(progress_url)
             
             # Monitor all progress URLs
             results = self._monitor_multi_progress(progress_urls, expressions, settings)
@@ -1025,49 +1224,13 @@ JSON:"""
                 if progress_url is None or results[i] is not None:
                     continue
                 
-                try:
-                    response = self.sess.get(progress_url)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        status = data.get('status')
-                        
-                        if status == 'COMPLETE':
-                            alpha_id = data.get('alpha')
-                            is_data = data.get('is', {})
-                            
-                            results[i] = AlphaResult(
-                                alpha_id=alpha_id,
-                                expression=expressions[i],
-                                settings=settings,
-                                sharpe=is_data.get('sharpe', 0),
-                                fitness=is_data.get('fitness', 0),
-                                turnover=is_data.get('turnover', 0),
-                                returns=is_data.get('returns', 0),
-                                drawdown=is_data.get('drawdown', 0),
-                                margin=is_data.get('margin', 0),
-                                longCount=is_data.get('longCount', 0),
-                                shortCount=is_data.get('shortCount', 0),
-                                timestamp=time.time()
-                            )
-                            logger.info(f"Simulation {i+1} completed successfully")
-                            
-                        elif status in ['FAILED', 'ERROR']:
-                            logger.error(f"Simulation {i+1} failed: {data.get('message', 'Unknown error')}")
-                            results[i] = AlphaResult(
-                                alpha_id="",
-                                expression=expressions[i],
-                                settings=settings,
-                                sharpe=0, fitness=0, turnover=0, returns=0, drawdown=0, margin=0,
-                                longCount=0, shortCount=0, timestamp=time.time(), success=False,
-                                error_message=data.get('message', 'Unknown error')
-                            )
-                        else:
-                            all_complete = False
-                    
-                except Exception as e:
-                    logger.error(f"Error monitoring simulation {i+1}: {str(e)}")
+                results[i] = self._poll_simulation(progress_url, expressions[i], settings)
+                if results[i] is None:
                     all_complete = False
+                elif results[i].success:
+                    logger.info(f"Simulation {i+1} completed successfully")
+                else:
+                    logger.error(f"Simulation {i+1} failed: {results[i].error_message}")
             
             if all_complete:
                 logger.info("All simulations completed")
@@ -1079,14 +1242,80 @@ JSON:"""
         # Fill in any remaining None results with failed results
         for i, result in enumerate(results):
             if result is None:
-                results[i] = AlphaResult(
-                    alpha_id="",
-                    expression=expressions[i],
-                    settings=settings,
-                    sharpe=0, fitness=0, turnover=0, returns=0, drawdown=0, margin=0,
-                    longCount=0, shortCount=0, timestamp=time.time(), success=False,
-                    error_message="Simulation timed out"
-                )
+                results[i] = self._failed_result(expressions[i], settings, "Simulation timed out")
+        
+        return results
+    
+    def evolve_steady_state(self, max_evaluations: int = 20, concurrency: int = 5) -> List[AlphaResult]:
+        """Run steady-state genetic programming against the simulation API.
+        
+        Offspring are bred one at a time and submitted as soon as a
+        simulation slot frees up, so there is no generation barrier: each
+        finished simulation updates the population and the bandit before
+        the next offspring is chosen. Expressions already in the fitness
+        cache are never resubmitted.
+        """
+        results = []
+        
+        if not self.genetic_algo.population:
+            seeds = self.generate_alpha_expressions(max(concurrency, 5))
+            self.genetic_algo.initialize_population(seeds)
+            logger.info(f"Seeded genetic population with {len(self.genetic_algo.population)} expressions")
+        
+        max_wait_time = 1800  # 30 minutes per simulation
+        in_flight = {}  # progress_url -> (expression, settings, submit_time)
+        submitted = 0
+        
+        while submitted < max_evaluations or in_flight:
+            # Fill every free slot with a fresh offspring
+            while submitted < max_evaluations and len(in_flight) < concurrency:
+                expression = self.genetic_algo.next_offspring()
+                if expression is None:
+                    break
+                
+                settings = self.bandit.select_arm()
+                progress_url, error_message = self._submit_simulation(expression, settings)
+                submitted += 1
+                
+                if progress_url is None:
+                    logger.error(f"Offspring submission failed: {error_message}")
+                    self.genetic_algo.report_result(self._failed_result(expression, settings, error_message))
+                    continue
+                
+                in_flight[progress_url] = (expression, settings, time.time())
+                logger.info(f"Submitted offspring {submitted}/{max_evaluations}: {expression}")
+            
+            if not in_flight:
+                break
+            
+            time.sleep(5)
+            
+            for progress_url, (expression, settings, submit_time) in list(in_flight.items()):
+                result = self._poll_simulation(progress_url, expression, settings)
+                if result is None:
+                    if time.time() - submit_time < max_wait_time:
+                        continue
+                    result = self._failed_result(expression, settings, "Simulation timed out")
+                
+                del in_flight[progress_url]
+                self.genetic_algo.report_result(result)
+                
+                if not result.success:
+                    logger.warning(f"Offspring simulation failed: {expression[:50]}...")
+                    continue
+                
+                reward = self.calculate_reward(result)
+                self.bandit.update_reward(settings, reward)
+                
+                score = result.sharpe * result.fitness
+                if score > self.best_score:
+                    self.best_score = score
+                    self.best_alpha = result
+                    logger.info(f"Genetic programming found new best alpha! Score: {score:.3f}")
+                
+                self.results_history.append(result)
+                results.append(result)
+                logger.info(f"Offspring completed - Sharpe: {result.sharpe:.3f}, Fitness: {result.fitness:.3f}, Reward: {reward:.3f}")
         
         return results
     
@@ -1298,8 +1527,10 @@ JSON:"""
             'best_score': self.best_score,
             'results_history': [asdict(r) for r in self.results_history[-100:]],  # Keep last 100
             'genetic_algo': {
-                'population': self.genetic_algo.population,
-                'generation': self.genetic_algo.generation
+                'population': [_json_fitness(i) for i in self.genetic_algo.population],
+                'generation': self.genetic_algo.generation,
+                'fitness_cache': {e: _json_fitness(c) for e, c in
+                                  list(self.genetic_algo.fitness_cache.items())[-5000:]}  # Keep last 5000
             },
             'selected_region': self.selected_region,
             'selected_universe': self.selected_universe
@@ -1328,8 +1559,10 @@ JSON:"""
                 
                 # Load genetic algorithm state
                 ga_state = state.get('genetic_algo', {})
-                self.genetic_algo.population = ga_state.get('population', [])
+                self.genetic_algo.population = [_loaded_fitness(i) for i in ga_state.get('population', [])]
                 self.genetic_algo.generation = ga_state.get('generation', 0)
+                self.genetic_algo.fitness_cache = {e: _loaded_fitness(c)
+                                                   for e, c in ga_state.get('fitness_cache', {}).items()}
                 
                 # Load universe information if available
                 if 'selected_region' in state and 'selected_universe' in state:
@@ -1350,7 +1583,7 @@ def main():
                       help='Ollama API URL (default: http://localhost:11434)')
     parser.add_argument('--ollama-model', type=str, default='deepseek-r1:8b',
                       help='Ollama model to use (default: deepseek-r1:8b)')
-    parser.add_argument('--mode', type=str, choices=['mine', 'submit', 'lateral', 'hopeful'],
+    parser.add_argument('--mode', type=str, choices=['mine', 'submit', 'lateral', 'hopeful', 'evolve'],
                       default='mine', help='Operation mode (default: mine)')
     parser.add_argument('--batch-size', type=int, default=5,
                       help='Batch size for mining (default: 5)')
@@ -1364,6 +1597,10 @@ def main():
                       help='Path to hopeful alphas file for processing (default: hopeful_alphas.json)')
     parser.add_argument('--hopeful-count', type=int, default=10,
                       help='Number of hopeful alphas to process (default: 10)')
+    parser.add_argument('--evaluations', type=int, default=50,
+                      help='Number of offspring to simulate in evolve mode (default: 50)')
+    parser.add_argument('--concurrency', type=int, default=5,
+                      help='Concurrent simulation slots in evolve mode (default: 5)')
     
     args = parser.parse_args()
     
@@ -1415,6 +1652,12 @@ def main():
             results = miner.process_hopeful_alphas(args.hopeful_file, args.hopeful_count)
             logger.info(f"Hopeful alpha processing complete - {len(results)} alphas tested")
         
+        elif args.mode == 'evolve':
+            logger.info(f"Running steady-state genetic programming for {args.evaluations} evaluations")
+            results = miner.evolve_steady_state(args.evaluations, args.concurrency)
+            miner.save_state()
+            logger.info(f"Evolution complete - {len(results)} offspring simulated successfully")
+        
     except Exception as e:
         logger.error(f"Fatal error: {e}")
         return 1
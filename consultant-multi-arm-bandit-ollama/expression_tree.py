@@ -0,0 +1,376 @@
+"""Typed expression trees for WorldQuant Brain FASTEXPR alpha expressions.
+
+Genetic operators work on these trees instead of on raw strings, so crossover
+and mutation always yield balanced, well-typed expressions. Anything that
+does not parse is rejected before it ever reaches the simulation API.
+"""
+
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Value types carried by tree nodes
+MATRIX = 'matrix'   # per-instrument time series (data fields, operator outputs)
+NUMBER = 'number'   # scalar constants such as std multiples
+LOOKBACK = 'lookback'  # scalar lookback windows, the only numbers mutated as windows
+BOOLEAN = 'boolean'  # comparisons and logical ops, and the condition slots they go in
+GROUP = 'group'     # grouping fields (industry, sector, ...)
+STRING = 'string'   # quoted literals such as bucket ranges
+
+GROUP_FIELDS = ['market', 'sector', 'industry', 'subindustry']
+LOOKBACK_WINDOWS = [5, 10, 22, 60, 120, 240, 512]
+
+# Parameter names that take a scalar rather than a matrix
+_LOOKBACK_PARAMS = {'d', 'lag', 'days', 'lookback', 'window'}
+_NUMBER_PARAMS = {'n', 'k', 'std', 'f', 'constant'}
+_GROUP_PARAMS = {'group', 'g'}
+
+# Positional condition slots of operators whose definitions name them x, y, z
+_CONDITION_SLOTS = {'trade_when': (0, 2), 'if_else': (0,)}
+
+_BOOLEAN_OPS = {'<', '>', '<=', '>=', '==', '!=', '&&', '||'}
+
+# Fallback signatures used when the operator list cannot be fetched
+DEFAULT_SIGNATURES = {
+    'rank': (MATRIX,),
+    'zscore': (MATRIX,),
+    'scale': (MATRIX,),
+    'sign': (MATRIX,),
+    'abs': (MATRIX,),
+    'log': (MATRIX,),
+    'winsorize': (MATRIX,),
+    'ts_rank': (MATRIX, LOOKBACK),
+    'ts_zscore': (MATRIX, LOOKBACK),
+    'ts_delta': (MATRIX, LOOKBACK),
+    'ts_sum': (MATRIX, LOOKBACK),
+    'ts_mean': (MATRIX, LOOKBACK),
+    'ts_std_dev': (MATRIX, LOOKBACK),
+    'ts_decay_linear': (MATRIX, LOOKBACK),
+    'ts_delay': (MATRIX, LOOKBACK),
+    'ts_arg_max': (MATRIX, LOOKBACK),
+    'ts_arg_min': (MATRIX, LOOKBACK),
+    'ts_backfill': (MATRIX, LOOKBACK),
+    'ts_scale': (MATRIX, LOOKBACK),
+    'ts_corr': (MATRIX, MATRIX, LOOKBACK),
+    'ts_covariance': (MATRIX, MATRIX, LOOKBACK),
+    'group_neutralize': (MATRIX, GROUP),
+    'group_rank': (MATRIX, GROUP),
+    'group_zscore': (MATRIX, GROUP),
+}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<number>\d+\.\d*|\.\d+|\d+)
+  | (?P<string>"[^"]*"|'[^']*')
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_.]*)
+  | (?P<op>&&|\|\||<=|>=|==|!=|[-+*/^<>(),=?:])
+  | (?P<space>\s+)
+""", re.VERBOSE)
+
+# Binary operator precedence, lowest first
+_PRECEDENCE = [('||',), ('&&',), ('<', '>', '<=', '>=', '==', '!='), ('+', '-'), ('*', '/'), ('^',)]
+
+
+class ExpressionParseError(ValueError):
+    """Raised when an expression is not valid FASTEXPR."""
+
+
+@dataclass
+class Node:
+    """A node in an alpha expression tree.
+
+    kind is one of 'call', 'field', 'number', 'string', 'binop', 'neg' or
+    'cond'. Keyword arguments of calls are kept in ``kwargs`` in source order.
+    """
+    kind: str
+    value: str = ''
+    children: List['Node'] = field(default_factory=list)
+    kwargs: List[Tuple[str, 'Node']] = field(default_factory=list)
+    type: str = MATRIX
+
+    def copy(self) -> 'Node':
+        return Node(self.kind, self.value, [c.copy() for c in self.children],
+                    [(k, v.copy()) for k, v in self.kwargs], self.type)
+
+    def walk(self):
+        """Yield (node, parent, slot) for every node, pre-order.
+
+        slot is an index into parent.children or a kwargs name.
+        """
+        stack = [(self, None, None)]
+        while stack:
+            node, parent, slot = stack.pop()
+            yield node, parent, slot
+            for name, child in reversed(node.kwargs):
+                stack.append((child, node, name))
+            for i in range(len(node.children) - 1, -1, -1):
+                stack.append((node.children[i], node, i))
+
+    def depth(self) -> int:
+        below = [c.depth() for c in self.children] + [v.depth() for _, v in self.kwargs]
+        return 1 + (max(below) if below else 0)
+
+    def size(self) -> int:
+        return sum(1 for _ in self.walk())
+
+    def to_string(self) -> str:
+        if self.kind in ('field', 'number', 'string'):
+            return self.value
+        if self.kind == 'neg':
+            return f"-{self.children[0].to_string()}"
+        if self.kind == 'binop':
+            return f"({self.children[0].to_string()} {self.value} {self.children[1].to_string()})"
+        if self.kind == 'cond':
+            a, b, c = (child.to_string() for child in self.children)
+            return f"({a} ? {b} : {c})"
+        args = [c.to_string() for c in self.children]
+        args += [f"{k}={v.to_string()}" for k, v in self.kwargs]
+        return f"{self.value}({', '.join(args)})"
+
+    def __str__(self) -> str:
+        return self.to_string()
+
+
+def replace_child(parent: Node, slot, new: Node):
+    """Put new in parent's given child slot."""
+    if isinstance(slot, int):
+        parent.children[slot] = new
+    else:
+        parent.kwargs = [(k, new if k == slot else v) for k, v in parent.kwargs]
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+
+    @staticmethod
+    def _tokenize(text: str) -> List[Tuple[str, str]]:
+        tokens = []
+        pos = 0
+        while pos < len(text):
+            match = _TOKEN_RE.match(text, pos)
+            if not match:
+                raise ExpressionParseError(f"Unexpected character {text[pos]!r} at {pos}")
+            pos = match.end()
+            if match.lastgroup != 'space':
+                tokens.append((match.lastgroup, match.group()))
+        return tokens
+
+    def peek(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, value: str = None) -> Tuple[str, str]:
+        kind, text = self.peek()
+        if kind is None or (value is not None and text != value):
+            raise ExpressionParseError(f"Expected {value or 'token'}, got {text!r}")
+        self.pos += 1
+        return kind, text
+
+    def parse(self) -> Node:
+        node = self.expression()
+        if self.pos != len(self.tokens):
+            raise ExpressionParseError(f"Trailing input at token {self.peek()[1]!r}")
+        return node
+
+    def expression(self) -> Node:
+        node = self.binary(0)
+        if self.peek()[1] == '?':
+            self.take('?')
+            then = self.expression()
+            self.take(':')
+            otherwise = self.expression()
+            node = Node('cond', children=[node, then, otherwise])
+        return node
+
+    def binary(self, level: int) -> Node:
+        if level == len(_PRECEDENCE):
+            return self.unary()
+        node = self.binary(level + 1)
+        while self.peek()[0] == 'op' and self.peek()[1] in _PRECEDENCE[level]:
+            _, op = self.take()
+            node = Node('binop', op, [node, self.binary(level + 1)])
+        return node
+
+    def unary(self) -> Node:
+        if self.peek()[1] == '-':
+            self.take('-')
+            operand = self.unary()
+            if operand.kind == 'number':
+                return Node('number', '-' + operand.value, type=NUMBER)
+            return Node('neg', children=[operand])
+        return self.primary()
+
+    def primary(self) -> Node:
+        kind, text = self.take()
+        if kind == 'number':
+            return Node('number', text, type=NUMBER)
+        if kind == 'string':
+            return Node('string', text, type=STRING)
+        if text == '(':
+            node = self.expression()
+            self.take(')')
+            return node
+        if kind != 'ident':
+            raise ExpressionParseError(f"Unexpected token {text!r}")
+        if self.peek()[1] != '(':
+            return Node('field', text)
+        self.take('(')
+        node = Node('call', text)
+        if self.peek()[1] != ')':
+            while True:
+                if self.peek()[0] == 'ident' and self.pos + 1 < len(self.tokens) \
+                        and self.tokens[self.pos + 1][1] == '=':
+                    _, name = self.take()
+                    self.take('=')
+                    node.kwargs.append((name, self.expression()))
+                elif node.kwargs:
+                    raise ExpressionParseError("Positional argument after keyword argument")
+                else:
+                    node.children.append(self.expression())
+                if self.peek()[1] != ',':
+                    break
+                self.take(',')
+        self.take(')')
+        return node
+
+
+class OperatorCatalog:
+    """Positional type signatures of the operators available to evolution."""
+
+    def __init__(self, signatures: Dict[str, Tuple[str, ...]] = None):
+        self.signatures = dict(signatures if signatures is not None else DEFAULT_SIGNATURES)
+
+    @classmethod
+    def from_operators(cls, operators: List[Dict]) -> 'OperatorCatalog':
+        """Build a catalog from the WorldQuant Brain /operators payload.
+
+        Only REGULAR-scope operators with a parseable ``definition`` such as
+        ``ts_rank(x, d, constant = 0)`` are kept. Falls back to the defaults
+        when nothing usable is found.
+        """
+        signatures = {}
+        for op in operators or []:
+            scope = op.get('scope') or ['REGULAR']
+            if 'REGULAR' not in scope:
+                continue
+            signature = _parse_definition(op.get('name', ''), op.get('definition', ''))
+            if signature:
+                signatures[op['name']] = signature
+        return cls(signatures or DEFAULT_SIGNATURES)
+
+    def signature(self, name: str) -> Optional[Tuple[str, ...]]:
+        return self.signatures.get(name)
+
+    def alternatives(self, name: str) -> List[str]:
+        """Operators with the same signature as name, excluding name itself."""
+        signature = self.signatures.get(name)
+        if signature is None:
+            return []
+        return [op for op, sig in self.signatures.items() if sig == signature and op != name]
+
+    def wrappers(self) -> List[str]:
+        """Operators that take a single matrix plus optional lookback windows."""
+        return [op for op, sig in self.signatures.items()
+                if sig and sig[0] == MATRIX and all(t == LOOKBACK for t in sig[1:])]
+
+
+def _parse_definition(name: str, definition: str) -> Optional[Tuple[str, ...]]:
+    match = re.match(r'\s*' + re.escape(name) + r'\s*\((.*?)\)', definition or '')
+    if not name or not match:
+        return None
+    signature = []
+    for param in match.group(1).split(','):
+        param = param.strip()
+        if not param or '=' in param or param == '...':
+            continue
+        if not re.fullmatch(r'[A-Za-z_]\w*', param):
+            return None
+        if param in _LOOKBACK_PARAMS:
+            signature.append(LOOKBACK)
+        elif param in _NUMBER_PARAMS:
+            signature.append(NUMBER)
+        elif param in _GROUP_PARAMS:
+            signature.append(GROUP)
+        else:
+            signature.append(MATRIX)
+    for i in _CONDITION_SLOTS.get(name, ()):
+        if i < len(signature):
+            signature[i] = BOOLEAN
+    return tuple(signature) if signature else None
+
+
+def parse_expression(text: str, catalog: OperatorCatalog = None) -> Node:
+    """Parse an alpha expression into a typed tree.
+
+    Raises ExpressionParseError for anything that is not a single FASTEXPR
+    expression (multi-statement expressions are not evolved).
+    """
+    if not text or not text.strip():
+        raise ExpressionParseError("Empty expression")
+    root = _Parser(text.strip()).parse()
+    annotate_types(root, catalog or OperatorCatalog())
+    return root
+
+
+def annotate_types(root: Node, catalog: OperatorCatalog):
+    """Assign value types to every node from the operator signatures."""
+    for node, _, _ in root.walk():
+        if node.kind == 'call':
+            signature = catalog.signature(node.value)
+            for i, child in enumerate(node.children):
+                if signature and i < len(signature):
+                    child.type = signature[i]
+                elif child.kind == 'number':
+                    child.type = NUMBER
+                elif child.kind == 'field' and child.value in GROUP_FIELDS:
+                    child.type = GROUP
+            for _, child in node.kwargs:
+                if child.kind == 'number':
+                    child.type = NUMBER
+                elif child.kind == 'string':
+                    child.type = STRING
+                elif child.kind == 'field':
+                    # Bare identifiers in keyword position are flags or groups
+                    child.type = GROUP if child.value in GROUP_FIELDS else STRING
+        elif node.kind in ('binop', 'neg', 'cond'):
+            for child in node.children:
+                if child.kind == 'number':
+                    child.type = NUMBER
+            if node.kind == 'cond':
+                node.children[0].type = BOOLEAN
+    # Comparisons are boolean wherever they sit, so they never pass for a matrix
+    for node, _, _ in root.walk():
+        if node.kind == 'binop' and node.value in _BOOLEAN_OPS:
+            node.type = BOOLEAN
+
+
+def validate(root: Node, catalog: OperatorCatalog, data_fields: set = None) -> bool:
+    """Check arity, argument types and field names against the catalog."""
+    for node, _, _ in root.walk():
+        if node.kind == 'call':
+            signature = catalog.signature(node.value)
+            if signature is None:
+                continue
+            if len(node.children) < len(signature):
+                return False
+            for expected, child in zip(signature, node.children):
+                if expected in (NUMBER, LOOKBACK) and child.kind != 'number':
+                    return False
+                if expected == GROUP and child.kind != 'field':
+                    return False
+                if expected == MATRIX and (child.kind in ('number', 'string') or child.type == BOOLEAN):
+                    return False
+                if expected == BOOLEAN and child.kind == 'string':
+                    return False
+        elif node.kind == 'field' and data_fields and node.type in (MATRIX, BOOLEAN):
+            if node.value not in data_fields:
+                return False
+    return True
+
+
+def random_subtree(root: Node, value_type: str, include_root: bool = True, rng=random):
+    """Pick a random (node, parent, slot) whose node carries value_type."""
+    candidates = [(n, p, s) for n, p, s in root.walk()
+                  if n.type == value_type and (include_root or p is not None)]
+    return rng.choice(candidates) if candidates else None
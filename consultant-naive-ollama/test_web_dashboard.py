@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for the web dashboard endpoints (run with pytest from this directory).
+"""
+
+import web_dashboard
+
+
+class FakeStream:
+    """Records the event id a stream was resumed from."""
+
+    def __init__(self):
+        self.resumed_from = None
+
+    def start(self):
+        pass
+
+    def sse(self, last_event_id=0):
+        self.resumed_from = last_event_id
+        yield "event: status\ndata: {}\n\n"
+
+
+def _resume(monkeypatch, path, headers=None):
+    stream = FakeStream()
+    monkeypatch.setattr(web_dashboard.dashboard, "stream", stream)
+    response = web_dashboard.app.test_client().get(path, headers=headers or {})
+    response.get_data()
+    return response, stream
+
+
+def test_stream_resumes_from_query_string(monkeypatch):
+    response, stream = _resume(monkeypatch, "/api/stream?since=7")
+    assert response.status_code == 200
+    assert stream.resumed_from == 7
+
+
+def test_stream_prefers_last_event_id_header(monkeypatch):
+    response, stream = _resume(monkeypatch, "/api/stream?since=7", {"Last-Event-ID": "12"})
+    assert response.status_code == 200
+    assert stream.resumed_from == 12
+
+
+def test_stream_starts_from_zero_without_an_id(monkeypatch):
+    response, stream = _resume(monkeypatch, "/api/stream?since=abc")
+    assert response.status_code == 200
+    assert stream.resumed_from == 0
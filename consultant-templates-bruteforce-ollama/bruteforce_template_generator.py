@@ -26,6 +26,7 @@ import sys
 import math
 import subprocess
 import ollama
+from state_store import WriteBehindStore
 
 # Configure logging with UTF-8 encoding to handle Unicode characters
 import io
@@ -164,6 +165,8 @@ class BruteforceTemplateGenerator:
         self.results = []
         self.results_file = "bruteforce_results.json"
         self.progress_file = "bruteforce_progress.json"
+        # Progress is written behind so simulation threads never wait on disk
+        self.state_store = WriteBehindStore(flush_interval=5.0)
         
         # Track templates that have VECTOR field issues
         self.templates_with_vector_issues = set()
@@ -328,32 +331,34 @@ class BruteforceTemplateGenerator:
             logger.warning(f"⚠️ Regenerated template failed validation, trying again...")
             return self.regenerate_template_if_needed(original_template, attempt + 1)
     
-    def save_progress(self):
-        """Save current progress to file for continuation"""
-        try:
-            progress_data = {
-                'timestamp': time.time(),
-                'total_simulations': len(self.results),
-                'successful_simulations': len([r for r in self.results if r.success]),
-                'failed_simulations': len([r for r in self.results if not r.success]),
-                'success_criteria_met': len([r for r in self.results if self.check_success_criteria(r)]),
-                'current_batch': getattr(self, 'current_batch', 0),
-                'current_template': getattr(self, 'current_template', 0),
-                'templates_with_vector_issues': list(self.templates_with_vector_issues),
-                'resume_info': {
-                    'can_resume': True,
-                    'last_saved': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()),
-                    'total_simulations': len(self.results),
-                    'success_rate': len([r for r in self.results if r.success]) / max(len(self.results), 1) * 100
-                },
-                'results': [asdict(r) for r in self.results]
-            }
-            
-            with open(self.progress_file, 'w') as f:
-                json.dump(progress_data, f, indent=2)
-            logger.info(f"💾 Progress saved to {self.progress_file}")
-        except Exception as e:
-            logger.error(f"❌ Failed to save progress: {e}")
+    def save_progress(self, sync: bool = False):
+        """Save current progress for continuation (written behind unless sync)"""
+        self.state_store.schedule(self.progress_file, self._progress_data, indent=2)
+        if sync:
+            self.state_store.flush(self.progress_file)
+    
+    def _progress_data(self) -> Dict:
+        results = list(self.results)
+        successful = len([r for r in results if r.success])
+        progress_data = {
+            'timestamp': time.time(),
+            'total_simulations': len(results),
+            'successful_simulations': successful,
+            'failed_simulations': len(results) - successful,
+            'success_criteria_met': len([r for r in results if self.check_success_criteria(r)]),
+            'current_batch': getattr(self, 'current_batch', 0),
+            'current_template': getattr(self, 'current_template', 0),
+            'templates_with_vector_issues': list(self.templates_with_vector_issues),
+            'resume_info': {
+                'can_resume': True,
+                'last_saved': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()),
+                'total_simulations': len(results),
+                'success_rate': successful / max(len(results), 1) * 100
+            },
+            'results': [asdict(r) for r in results]
+        }
+        logger.info(f"💾 Progress saved to {self.progress_file}")
+        return progress_data
     
     def load_progress(self) -> bool:
         """Load progress from file for continuation"""
@@ -1403,7 +1408,7 @@ Generate a new template:"""
         self._execute_multiple_templates_concurrent(simulation_tasks, all_results, use_ollama)
         
         # Save final progress after all templates
-        self.save_progress()
+        self.save_progress(sync=True)
         
         return all_results
 
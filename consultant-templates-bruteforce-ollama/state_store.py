@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Write-behind persistence for small JSON state files.
+
+Hot paths call ``schedule(path, build)`` instead of rewriting the file: that
+only marks the path dirty. A background thread flushes dirty files every few
+seconds, so bursts of updates to the same file coalesce into one write.
+``build`` runs at flush time and returns the JSON data for the file.
+
+Every write goes to a temporary file in the same directory and is renamed over
+the target, so readers and concurrent writers never see a torn file. Pending
+writes are flushed on ``close()`` and at interpreter exit.
+
+consultant-atom-up, consultant-templates-bruteforce-ollama and
+consultant-templates-ollama are built separately and each ship a copy of this
+module. Keep them identical; the root check_shared_copies.py reports drift.
+"""
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write_json(path: str, data: Any, **dump_kwargs):
+    """Write JSON to a temporary file next to path and rename it into place"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class WriteBehindStore:
+    """Dirty tracking and coalesced background flushes for JSON state files"""
+
+    def __init__(self, flush_interval: float = 5.0, max_attempts: int = 3):
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._builders = {}  # {path: (build, dump_kwargs)}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._write_locks = {}  # {path: Lock}, so one file is never written twice at once
+        self._stop = threading.Event()
+        self._thread = None
+        self.writes = 0
+        self.coalesced = 0
+        atexit.register(self.close)
+
+    def schedule(self, path: str, build: Callable[[], Any], **dump_kwargs):
+        """Mark path dirty; ``build()`` is called at flush time to produce its data"""
+        with self._lock:
+            self._builders[path] = (build, dump_kwargs)
+            if path in self._dirty:
+                self.coalesced += 1
+            self._dirty.add(path)
+            stopped = self._stop.is_set()
+            if self._thread is None and not stopped:
+                self._thread = threading.Thread(target=self._run, name="state-store-flush", daemon=True)
+                self._thread.start()
+        if stopped:
+            # Already closed (shutting down): write through
+            self.flush(path)
+
+    def is_dirty(self, path: str) -> bool:
+        with self._lock:
+            return path in self._dirty
+
+    def discard(self, path: str):
+        """Drop a pending write, e.g. before the file is deliberately deleted"""
+        with self._lock:
+            self._dirty.discard(path)
+
+    def flush(self, path: Optional[str] = None) -> int:
+        """Write dirty files now (all of them, or only ``path``); returns files written"""
+        with self._lock:
+            if path is None:
+                paths = list(self._dirty)
+            else:
+                paths = [path] if path in self._dirty else []
+            for p in paths:
+                self._dirty.discard(p)
+            jobs = [(p, self._builders[p]) for p in paths]
+
+        written = 0
+        for p, (build, dump_kwargs) in jobs:
+            if self._write(p, build, dump_kwargs):
+                written += 1
+            else:
+                # Keep it dirty so the next flush retries
+                with self._lock:
+                    self._dirty.add(p)
+        return written
+
+    def _write(self, path: str, build: Callable[[], Any], dump_kwargs: Dict) -> bool:
+        with self._lock:
+            write_lock = self._write_locks.setdefault(path, threading.Lock())
+        with write_lock:
+            for attempt in range(self.max_attempts):
+                try:
+                    atomic_write_json(path, build(), **dump_kwargs)
+                    self.writes += 1
+                    return True
+                except RuntimeError as e:
+                    # State changed size while being serialized by another thread; try again
+                    if attempt == self.max_attempts - 1:
+                        logger.warning(f"⚠️ State file {path} changed during serialization, will retry: {e}")
+                except Exception as e:
+                    logger.error(f"❌ Failed to write state file {path}: {e}")
+                    return False
+        return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ State flush failed: {e}")
+
+    def close(self):
+        """Stop the flush thread and write everything still pending"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self.flush_interval + 5)
+        self.flush()
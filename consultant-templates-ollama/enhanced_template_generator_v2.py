@@ -27,6 +27,11 @@ import sys
 import math
 import subprocess
 import ollama
+from weighted_sampler import FieldSamplingIndex, OperatorSamplingIndex, field_usage_score
+from prompt_compiler import PromptCompiler, PromptSection, FIELD_LEGEND, FIELD_TYPE_CODES, compact_text, encode_field, encode_operator
+from variant_algebra import VariantAlgebra
+from lazy_startup import DeferredState, StartupLoader, StartupTimer, WarmSnapshot
+from state_store import WriteBehindStore, atomic_write_json
 
 # Configure logging with UTF-8 encoding to handle Unicode characters
 import io
@@ -177,6 +182,7 @@ class TemplateResult:
     neutralization: str = "INDUSTRY"  # Track neutralization used
     alpha_id: str = ""  # Track alpha ID for post-simulation analysis (optional)
     timestamp: float = 0.0
+    derived_from: str = ""  # Parent template when metrics were derived instead of simulated
 
 class PersonaBandit:
     """Multi-arm bandit specifically for persona selection and exploration"""
@@ -572,13 +578,46 @@ class ProgressTracker:
         sys.stdout.flush()
 
 class EnhancedTemplateGeneratorV2:
+    # State loaded from disk at startup. With lazy_startup it loads in the background
+    # and reads wait only for the group they belong to.
+    personas = DeferredState('personas')
+    persona_bandit = DeferredState('personas')
+    dynamic_personas = DeferredState('personas')
+    persona_generation_count = DeferredState('personas')
+    alpha_results = DeferredState('alpha_tracking')
+    green_alphas = DeferredState('alpha_tracking')
+    yellow_alphas = DeferredState('alpha_tracking')
+    red_alphas = DeferredState('alpha_tracking')
+    progress_tracker = DeferredState('progress')
+    all_results = DeferredState('progress')
+    template_quality_tracker = DeferredState('progress')
+    operator_compatibility = DeferredState('operator_compatibility')
+    historical_alphas = DeferredState('historical_alphas')
+    use_personas_only = DeferredState('historical_alphas')
+    STARTUP_GROUPS = ('auth', 'personas', 'alpha_tracking', 'progress', 'operator_compatibility', 'historical_alphas')
+    
     def __init__(self, credentials_path: str, ollama_model: str = "qwen2.5-coder:7b", max_concurrent: int = 8, 
-                 progress_file: str = "template_progress_v2.json", results_file: str = "enhanced_results_v2.json"):
-        """Initialize the enhanced template generator with TRUE CONCURRENT subprocess execution"""
+                 progress_file: str = "template_progress_v2.json", results_file: str = "enhanced_results_v2.json",
+                 lazy_startup: bool = False, warm_snapshot_file: str = "generator_warm_state.pkl"):
+        """Initialize the enhanced template generator with TRUE CONCURRENT subprocess execution
+        
+        With lazy_startup, authentication and state files load in the background and parsed
+        files are reused from a warm snapshot, so the first slot can be filled sooner.
+        """
+        self.startup_timer = StartupTimer()
+        self.lazy_startup = lazy_startup
+        self.warm_snapshot = WarmSnapshot(warm_snapshot_file) if lazy_startup else None
+        self._startup_loader = None
+        self._authenticated = False
+        self._auth_lock = threading.Lock()
+        # Small state files are written behind: saves mark them dirty, a background thread writes them
+        self.state_store = WriteBehindStore(flush_interval=5.0)
         self.sess = requests.Session()
         self.credentials_path = credentials_path
         self.ollama_model = ollama_model
         self.ollama_url = "http://127.0.0.1:11434"  # Default Ollama URL
+        self.prompt_token_budget = 3000  # Keeps 7B/8B models well inside their context window
+        self.prompt_compiler = PromptCompiler(ollama, token_budget=self.prompt_token_budget)
         self.max_concurrent = min(max_concurrent, 8)  # WorldQuant Brain limit is 8
         self.progress_file = progress_file
         self.results_file = results_file
@@ -598,8 +637,13 @@ class EnhancedTemplateGeneratorV2:
         self.blacklist_release_threshold = 10  # Release after 10 successful simulations
         self.blacklist_timeout_hours = 10/60  # Release after 10 minutes (10/60 = 0.167 hours)
         self.successful_simulations_since_blacklist = 0  # Track successful simulations
+
+        # Incremental sampling indexes (built lazily, updated in O(log N))
+        self.field_sampling_indexes = {}  # {(region, delay): FieldSamplingIndex}
+        self.operator_sampling_index = None  # OperatorSamplingIndex over self.operators
         
-        self._load_blacklist_from_disk()
+        with self.startup_timer.phase('operator blacklist'):
+            self._load_blacklist_from_disk()
         
         # TRUE CONCURRENT execution using ThreadPoolExecutor
         self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent)
@@ -618,15 +662,17 @@ class EnhancedTemplateGeneratorV2:
         self.slot_plans = ['explore', 'exploit', 'explore', 'exploit', 'explore', 'exploit', 'explore', 'exploit']
         self.slot_plan_index = 0
         
-        self.setup_auth()
+        if not lazy_startup:
+            with self.startup_timer.phase('authentication'):
+                self.setup_auth()
         
         # Optimization tracking
         self.optimization_queue = []  # Queue of alphas to optimize
         self.optimization_results = {}  # Track optimization history
         self.max_optimization_iterations = 10
         
-        # Initialize persona system
-        self.personas = self._load_personas()
+        # Initialize persona system (personas themselves are loaded by _startup_load_personas)
+        self.personas = []
         self.recent_personas = []  # Track recently used personas
         
         # Initialize persona bandit system
@@ -635,12 +681,6 @@ class EnhancedTemplateGeneratorV2:
         self.persona_generation_count = 0
         self.persona_evolution_threshold = 50  # Generate new personas every 50 simulations
         
-        # Add static personas to bandit system with proper IDs
-        for i, persona in enumerate(self.personas):
-            persona_id = f"static_{i}"
-            persona['id'] = persona_id  # Add ID to static persona
-            self.persona_bandit.add_persona(persona_id, persona['name'], persona['style'])
-        
         # Alpha tracking system
         self.alpha_results = []  # Store all alpha results
         self.green_alphas = []  # Store green alphas
@@ -648,27 +688,6 @@ class EnhancedTemplateGeneratorV2:
         self.red_alphas = []  # Store red alphas
         self.alpha_tracking_file = "alpha_tracking.json"
         
-        # Load existing alpha tracking data
-        self._load_alpha_tracking()
-        
-        # Load existing dynamic personas
-        self._load_dynamic_personas()
-        
-        # Clear invalid dynamic personas that use non-existent operators
-        self._clear_invalid_dynamic_personas()
-        
-        # Load historical alpha expressions for inspiration from local file
-        logger.info("📚 Loading historical alphas from local JSON file...")
-        self.historical_alphas = self._load_historical_alphas()
-        
-        # Cache historical alphas to avoid repeated API calls
-        if self.historical_alphas:
-            logger.info(f"✅ Cached {len(self.historical_alphas)} historical alphas for reuse")
-        else:
-            logger.warning("⚠️ No historical alphas loaded - will use personas only")
-            # Set a flag to use personas more frequently when historical alphas are unavailable
-            self.use_personas_only = True
-        
         # Rate limiting for API calls (30 requests per minute)
         self.last_api_call_time = 0
         self.api_call_interval = 2.1  # 2.1 seconds between calls (30 calls per minute = 2 seconds, plus buffer)
@@ -695,9 +714,8 @@ class EnhancedTemplateGeneratorV2:
         # Define regions list
         self.regions = list(self.region_configs.keys())
         
-        # Dynamic learning system for operator compatibility
+        # Dynamic learning system for operator compatibility (loaded with the other state files)
         self.operator_compatibility_file = 'operator_compatibility.json'
-        self.operator_compatibility = self._load_operator_compatibility()
         
         # Pyramid theme multipliers (delay=0, delay=1) for each region
         self.pyramid_multipliers = {
@@ -709,7 +727,8 @@ class EnhancedTemplateGeneratorV2:
         }
         
         # Load operators and data fields
-        self.operators = self.load_operators()
+        with self.startup_timer.phase('operators'):
+            self.operators = self._warm_load('operators', ['operatorRAW.json'], self.load_operators)
         self.data_fields = {}
         
         # Operator usage tracking for diversity
@@ -740,6 +759,9 @@ class EnhancedTemplateGeneratorV2:
         # Hopeful alphas storage for negation exploitation
         self.hopeful_alphas = []
         
+        # Simulated cores, so sign-flipped and rescaled variants are derived instead of simulated
+        self.variant_algebra = VariantAlgebra()
+        
         # Template quality tracking for PnL data quality
         self.template_quality_tracker = {}  # {template_hash: {'zero_pnl_count': int, 'total_attempts': int}}
         self.max_zero_pnl_attempts = 3  # Delete template after 3 zero PnL occurrences
@@ -759,16 +781,6 @@ class EnhancedTemplateGeneratorV2:
         self.last_cleanup_time = time.time()
         self.cleanup_enabled = True
         
-        # Load existing blacklist for persistence
-        self.load_blacklist_from_file()
-        
-        # Load previous progress if it exists (for exploit data)
-        self.load_progress()
-        
-        # Perform initial cleanup on startup
-        logger.info("🧹 STARTUP CLEANUP: Performing initial cleanup to start with clean slate")
-        self.force_cleanup()
-        
         # Dynamic field selection strategy tracking
         self.elite_templates_found = 0  # Count of elite templates discovered
         self.last_elite_discovery_time = 0  # Timestamp of last elite template discovery
@@ -780,6 +792,106 @@ class EnhancedTemplateGeneratorV2:
             "random_exploration": {"random": 0.7, "rare": 0.3},
             "rare_focused": {"random": 0.3, "rare": 0.7}
         }
+        
+        # State files, loaded inline or on background threads
+        steps = self._startup_steps()
+        if lazy_startup:
+            self._startup_loader = StartupLoader(self.startup_timer, self.STARTUP_GROUPS, on_complete=self._on_startup_state_loaded)
+            self._startup_loader.start_lane('auth', [('authentication', self._authenticate_in_background, ('auth',))])
+            self._startup_loader.start_lane('state', steps)
+            self.startup_timer.report("STARTUP TIMING (constructor, state loading in background)")
+        else:
+            for name, step, _ in steps:
+                with self.startup_timer.phase(name):
+                    step()
+            self.startup_timer.report("STARTUP TIMING (constructor)")
+    
+    def _startup_steps(self) -> List[Tuple[str, callable, Tuple[str, ...]]]:
+        """Startup loading steps as (name, function, groups released when done)
+        
+        The startup cleanup clears personas, alpha tracking and progress state, so
+        those groups are only released after it; the rest don't depend on it.
+        """
+        return [
+            ('personas', self._startup_load_personas, ()),
+            ('alpha tracking', self._load_alpha_tracking, ()),
+            ('dynamic personas', self._startup_load_dynamic_personas, ()),
+            ('alpha blacklist', self.load_blacklist_from_file, ()),
+            ('progress', self.load_progress, ()),
+            ('startup cleanup', self._startup_cleanup, ('personas', 'alpha_tracking', 'progress')),
+            ('operator compatibility', self._startup_load_operator_compatibility, ('operator_compatibility',)),
+            ('historical alphas', self._startup_load_historical_alphas, ('historical_alphas',)),
+        ]
+    
+    def _warm_load(self, name: str, sources: List[str], loader):
+        """Parse a state file, reusing the warm snapshot when lazy startup is on"""
+        if self.warm_snapshot is None:
+            return loader()
+        return self.warm_snapshot.cached(name, sources, loader)
+    
+    def _startup_load_personas(self):
+        self.personas = self._warm_load('personas', ['prompt_personas.json'], self._load_personas)
+        
+        # Add static personas to bandit system with proper IDs
+        for i, persona in enumerate(self.personas):
+            persona_id = f"static_{i}"
+            persona['id'] = persona_id  # Add ID to static persona
+            self.persona_bandit.add_persona(persona_id, persona['name'], persona['style'])
+    
+    def _startup_load_dynamic_personas(self):
+        # Load existing dynamic personas
+        self._load_dynamic_personas()
+        
+        # Clear invalid dynamic personas that use non-existent operators
+        self._clear_invalid_dynamic_personas()
+    
+    def _startup_cleanup(self):
+        # Perform initial cleanup on startup
+        logger.info("🧹 STARTUP CLEANUP: Performing initial cleanup to start with clean slate")
+        # On the loader thread only deferred state is touched; the rest may already be in use
+        # by the main thread and is still fresh from the constructor anyway
+        self.force_cleanup(deferred_only=self._startup_loader is not None)
+    
+    def _startup_load_operator_compatibility(self):
+        self.operator_compatibility = self._load_operator_compatibility()
+    
+    def _startup_load_historical_alphas(self):
+        # Load historical alpha expressions for inspiration from local file
+        logger.info("📚 Loading historical alphas from local JSON file...")
+        self.historical_alphas = self._warm_load('historical_alphas', ['submitted_alpha.json'], self._load_historical_alphas)
+        
+        # Cache historical alphas to avoid repeated API calls
+        if self.historical_alphas:
+            logger.info(f"✅ Cached {len(self.historical_alphas)} historical alphas for reuse")
+        else:
+            logger.warning("⚠️ No historical alphas loaded - will use personas only")
+            # Set a flag to use personas more frequently when historical alphas are unavailable
+            self.use_personas_only = True
+    
+    def _authenticate_in_background(self):
+        with self._auth_lock:
+            if not self._authenticated:
+                self.setup_auth()
+    
+    def _ensure_authenticated(self):
+        """Authenticate on first use when lazy startup deferred it"""
+        if self._startup_loader is not None:
+            self._startup_loader.wait('auth')
+        with self._auth_lock:
+            if not self._authenticated:
+                with self.startup_timer.phase('authentication (on demand)'):
+                    self.setup_auth()
+    
+    def _on_startup_state_loaded(self):
+        if self._startup_loader.errors:
+            logger.warning(f"⚠️ Background startup finished with errors in: {list(self._startup_loader.errors)}")
+        if self.warm_snapshot is not None:
+            self.warm_snapshot.save()
+        self.startup_timer.report("STARTUP TIMING (background state loaded)")
+    
+    def _mark_first_simulation(self):
+        if self.startup_timer.mark('first simulation submitted'):
+            self.startup_timer.report("STARTUP TIMING (time to first simulation)")
     
     def select_optimal_delay(self, region: str) -> int:
         """Select delay based on pyramid multipliers and region constraints"""
@@ -868,6 +980,7 @@ class EnhancedTemplateGeneratorV2:
             
             if auth_response.status_code == 201:
                 logger.info("Authentication successful")
+                self._authenticated = True
             else:
                 logger.error(f"Authentication failed: {auth_response.status_code}")
                 raise Exception("Authentication failed")
@@ -878,6 +991,9 @@ class EnhancedTemplateGeneratorV2:
     
     def make_api_request(self, method: str, url: str, **kwargs):
         """Make API request with automatic 401 reauthentication and rate limiting"""
+        if not self._authenticated:
+            self._ensure_authenticated()
+        
         # Rate limiting: ensure minimum interval between API calls
         import time
         current_time = time.time()
@@ -973,6 +1089,14 @@ class EnhancedTemplateGeneratorV2:
         if not recent_failures:
             return ""
         
+        # Guidance only changes when a new failure is recorded, so it is cached per failure
+        last_failure = recent_failures[-1]
+        cache_key = ('failure_guidance', region, len(self.failure_patterns[region]),
+                     last_failure.get('timestamp'), last_failure['template'])
+        return self.prompt_compiler.static(cache_key, lambda: self._build_failure_guidance(recent_failures))
+    
+    def _build_failure_guidance(self, recent_failures: List[Dict]) -> str:
+        """Build failure guidance text from recent failures"""
         # Analyze failure patterns for better guidance
         error_types = {}
         for failure in recent_failures:
@@ -1019,7 +1143,7 @@ CRITICAL ERROR PATTERN: SYNTAX ERRORS
 ULTRA-ENHANCED FAILURE ANALYSIS - LEARN FROM THESE MISTAKES:
 
 RECENT FAILURE PATTERNS ({len(recent_failures)} failures analyzed):
-{chr(10).join([f"- FAILED: {failure['template'][:60]}... ERROR: {failure['error']}" for failure in recent_failures[-5:]])}
+{chr(10).join([f"- FAILED: {failure['template'][:60]}... ERROR: {compact_text(failure['error'], 160)}" for failure in recent_failures[-5:]])}
 
 ERROR TYPE ANALYSIS:
 {chr(10).join([f"- {error_type.replace('_', ' ').title()}: {count} occurrences" for error_type, count in error_types.items()])}
@@ -1978,12 +2102,8 @@ Generate 3 PROFITABLE optimized alpha expressions:"""
             logger.warning(f"⚠️ Failed to load operator blacklist: {e}")
             return []
 
-    def call_ollama_api(self, prompt: str, max_retries: int = 3) -> Optional[str]:
-        """Call Ollama API to generate templates using structured outputs"""
-        # Load blacklisted operators
-        blacklisted_operators = self.load_operator_blacklist()
-        
-        # Build system prompt with blacklist information
+    def _build_system_prompt(self, blacklisted_operators: List[str]) -> str:
+        """Build the template generation system prompt"""
         system_prompt = """You are a revolutionary quantitative finance AI that BREAKS CONVENTIONAL PATTERNS and creates INNOVATIVE alpha expressions. 
         
         🚀 INNOVATION MANDATE:
@@ -2036,6 +2156,19 @@ Generate 3 PROFITABLE optimized alpha expressions:"""
         
         Remember: You are not here to be safe and conventional. You are here to REVOLUTIONIZE quantitative finance with your creativity!"""
         
+        return system_prompt
+    
+    def call_ollama_api(self, prompt: str, max_retries: int = 3) -> Optional[str]:
+        """Call Ollama API to generate templates using structured outputs"""
+        # Load blacklisted operators
+        blacklisted_operators = self.load_operator_blacklist()
+        
+        # System prompt only changes with the blacklist, so it is built once per blacklist
+        system_prompt = self.prompt_compiler.static(
+            ('system_prompt', tuple(sorted(blacklisted_operators))),
+            lambda: self._build_system_prompt(blacklisted_operators)
+        )
+        
         # Define JSON schema for structured outputs
         json_schema = {
             "type": "object",
@@ -2067,18 +2200,12 @@ Generate 3 PROFITABLE optimized alpha expressions:"""
                 logger.info(f"   JSON schema: {json_schema}")
                 logger.info(f"   Options: temperature=0, top_p=0.9, num_predict=1000, timeout=30")
                 
-                response = ollama.chat(
-                    model=self.ollama_model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": system_prompt
-                        },
-                        {
-                            "role": "user", 
-                            "content": prompt
-                        }
-                    ],
+                # System prompt is the shared prefix: Ollama evaluates it once and reuses its context
+                content = self.prompt_compiler.chat(
+                    self.ollama_model,
+                    prompt,
+                    label='call_ollama_api',
+                    system=system_prompt,
                     format=json_schema,  # Use structured outputs
                     options={
                         "temperature": 0,  # Set to 0 for more deterministic output with structured outputs
@@ -2090,20 +2217,8 @@ Generate 3 PROFITABLE optimized alpha expressions:"""
                 
                 # TRACE: Log response details
                 logger.info(f"🔍 OLLAMA OUTPUT TRACE:")
-                logger.info(f"   Response type: {type(response)}")
-                logger.info(f"   Response keys: {list(response.keys()) if isinstance(response, dict) else 'Not a dict'}")
-                if 'message' in response:
-                    logger.info(f"   Message keys: {list(response['message'].keys()) if isinstance(response['message'], dict) else 'Not a dict'}")
-                    if 'content' in response['message']:
-                        content = response['message']['content']
-                        logger.info(f"   Content length: {len(content)} chars")
-                        logger.info(f"   Content preview: {content[:300]}...")
-                    else:
-                        logger.error(f"   ❌ No 'content' key in message: {response['message']}")
-                else:
-                    logger.error(f"   ❌ No 'message' key in response: {response}")
-                
-                content = response['message']['content']
+                logger.info(f"   Content length: {len(content)} chars")
+                logger.info(f"   Content preview: {content[:300]}...")
                 logger.info("Ollama API call successful")
                 
                 # Parse and validate structured output
@@ -2291,19 +2406,8 @@ Generate 3 PROFITABLE optimized alpha expressions:"""
             data_fields = region_specific_fields
         
         # BALANCED FIELD SELECTION: Mix of high-usage and low-usage fields
-        def get_usage_score(field):
-            user_count = field.get('userCount', 0)
-            alpha_count = field.get('alphaCount', 0)
-            return user_count + alpha_count
-        
-        # Categorize fields by usage
-        data_fields.sort(key=get_usage_score)
-        total_fields = len(data_fields)
-        
-        # Define usage categories
-        low_usage_fields = data_fields[:total_fields//3]  # Bottom third (lowest usage)
-        medium_usage_fields = data_fields[total_fields//3:2*total_fields//3]  # Middle third
-        high_usage_fields = data_fields[2*total_fields//3:]  # Top third (highest usage)
+        # Usage thirds come from the (region, delay) sampling index, ranked once when it is built
+        index = self._get_field_index(data_fields, region, delay)
         
         # Randomly decide selection strategy (30% chance for all high-usage, 70% for balanced)
         import random
@@ -2311,19 +2415,14 @@ Generate 3 PROFITABLE optimized alpha expressions:"""
         
         if selection_strategy == 'all_high_usage':
             # Sometimes select all high-usage fields to stir things up
-            selected_fields = high_usage_fields[:30] if len(high_usage_fields) >= 30 else high_usage_fields
+            selected_fields = index.sample(30, {'high': 1.0})
             logger.info(f"🎯 HIGH-USAGE STRATEGY: Selected {len(selected_fields)} high-usage fields")
         else:
             # Balanced selection: mix of low, medium, and high usage fields
             # 40% low-usage, 40% medium-usage, 20% high-usage
-            low_count = min(12, len(low_usage_fields))  # 40% of 30 fields
-            medium_count = min(12, len(medium_usage_fields))  # 40% of 30 fields  
-            high_count = min(6, len(high_usage_fields))  # 20% of 30 fields
-            
-            # Randomly select from each category
-            selected_low = random.sample(low_usage_fields, low_count) if low_usage_fields else []
-            selected_medium = random.sample(medium_usage_fields, medium_count) if medium_usage_fields else []
-            selected_high = random.sample(high_usage_fields, high_count) if high_usage_fields else []
+            selected_low = index.sample(12, {'low': 1.0})  # 40% of 30 fields
+            selected_medium = index.sample(12, {'medium': 1.0})  # 40% of 30 fields
+            selected_high = index.sample(6, {'high': 1.0})  # 20% of 30 fields
             
             selected_fields = selected_low + selected_medium + selected_high
             # Shuffle to mix the categories
@@ -2343,32 +2442,16 @@ Generate 3 PROFITABLE optimized alpha expressions:"""
         
         logger.info(f"📊 SELECTED FIELDS: {usage_stats[:5]}")
         
-        # Create field selection prompt with indexed list
-        fields_desc = []
-        for i, field in enumerate(data_fields[:30]):  # Show first 30 fields with indices
-            field_type = field.get('type', 'REGULAR')
-            if field_type == 'VECTOR':
-                field_type_info = "VECTOR (use Cross Sectional operators: normalize, quantile, rank, scale, winsorize, zscore)"
-            elif field_type == 'MATRIX':
-                field_type_info = "MATRIX (use Time Series operators: ts_rank, ts_delta, ts_mean, ts_std, ts_corr, ts_regression, vec_avg, vec_sum, vec_max, vec_min)"
-            else:
-                field_type_info = "REGULAR (use standard operators)"
-            
-            # Include usage information
-            user_count = field.get('userCount', 0)
-            alpha_count = field.get('alphaCount', 0)
-            usage_info = f"users={user_count}, alphas={alpha_count}"
-            fields_desc.append(f"[{i}] {field['id']}: {field.get('description', 'No description')} [{field_type_info}] [{usage_info}]")
-        
-        prompt = f"""
-🎯 DATA FIELD SELECTION FOR {region.upper()}
-
-Choose 2-4 data fields by selecting their INDEX NUMBERS from the list below:
-
-AVAILABLE DATA FIELDS (balanced mix of usage levels):
-{chr(10).join(fields_desc)}
+        # Create field selection prompt with a compact indexed list; the list is
+        # cut from the tail if the prompt would exceed the token budget
+        fields_desc = [encode_field(field, i) for i, field in enumerate(data_fields[:30])]
+        compiled = self.prompt_compiler.compile([
+            PromptSection('header', f"""🎯 DATA FIELD SELECTION FOR {region.upper()}
 
-INSTRUCTIONS:
+Choose 2-4 data fields by selecting their INDEX NUMBERS from the list below.""", required=True),
+            PromptSection('fields', f"""AVAILABLE DATA FIELDS (balanced mix of usage levels):
+{FIELD_LEGEND}""", priority=10, items=fields_desc, min_items=4),
+            PromptSection('instructions', self.prompt_compiler.static('field_selection_instructions', lambda: """INSTRUCTIONS:
 - Choose 2-4 fields by their INDEX NUMBERS (e.g., [0, 1, 4])
 - BALANCED APPROACH: Mix of low-usage, medium-usage, and high-usage fields
 - Low-usage fields offer discovery potential but may be less reliable
@@ -2378,19 +2461,20 @@ INSTRUCTIONS:
 - Return ONLY the index numbers in square brackets
 
 RESPONSE FORMAT:
-[0, 1, 4]
-"""
+[0, 1, 4]"""), required=True),
+        ])
+        listed_fields = data_fields[:compiled.item_counts.get('fields', 0)]
         
         try:
-            import ollama
-            response = ollama.chat(
-                model=self.ollama_model,
-                messages=[{'role': 'user', 'content': prompt}],
+            content = self.prompt_compiler.chat(
+                self.ollama_model,
+                compiled,
+                label='choose_data_fields',
                 options={'temperature': 0.7, 'top_p': 0.9}
             )
             
             # Parse response to get field indices
-            content = response['message']['content'].strip()
+            content = content.strip()
             logger.info(f"📊 STEP 1 RESPONSE: {content}")
             
             # Extract indices from response (e.g., [0, 1, 4] or 0, 1, 4)
@@ -2405,13 +2489,13 @@ RESPONSE FORMAT:
             else:
                 # Try to find individual numbers
                 numbers = re.findall(r'\b(\d+)\b', content)
-                indices = [int(x) for x in numbers if int(x) < len(data_fields[:30])]
+                indices = [int(x) for x in numbers if int(x) < len(listed_fields)]
             
             # Get selected fields by index
             selected_fields = []
             for idx in indices:
-                if 0 <= idx < len(data_fields[:30]):
-                    selected_fields.append(data_fields[idx])
+                if 0 <= idx < len(listed_fields):
+                    selected_fields.append(listed_fields[idx])
             
             logger.info(f"📊 STEP 1 COMPLETE: Selected {len(selected_fields)} fields: {[f['id'] for f in selected_fields]}")
             return selected_fields
@@ -2494,43 +2578,39 @@ RESPONSE FORMAT:
         selected_operators = random.sample(compatible_operators, min(15, len(compatible_operators)))
         logger.info(f"🎲 RANDOM OPERATOR SELECTION: {[op['name'] for op in selected_operators]}")
         
-        operators_desc = []
-        for i, op in enumerate(selected_operators):
-            operators_desc.append(f"[{i}] {op['name']}: {op['description']}")
-        
-        prompt = f"""
-⚙️ OPERATOR SELECTION FOR {region.upper()}
-
-Choose 2-4 operators by selecting their INDEX NUMBERS:
-
-SELECTED FIELDS:
-{chr(10).join([f"- {f['id']} ({f.get('type', 'REGULAR')})" for f in selected_fields])}
+        operators_desc = [encode_operator(op, i, with_syntax=False, description_chars=80)
+                          for i, op in enumerate(selected_operators)]
+        compiled = self.prompt_compiler.compile([
+            PromptSection('header', f"""⚙️ OPERATOR SELECTION FOR {region.upper()}
 
-AVAILABLE OPERATORS:
-{chr(10).join(operators_desc)}
-
-INSTRUCTIONS:
+Choose 2-4 operators by selecting their INDEX NUMBERS:""", required=True),
+            PromptSection('fields', "SELECTED FIELDS:", priority=5,
+                          items=[f"- {f['id']} ({f.get('type', 'REGULAR')})" for f in selected_fields]),
+            PromptSection('operators', "AVAILABLE OPERATORS:", priority=10, items=operators_desc, min_items=4),
+            PromptSection('instructions', f"""INSTRUCTIONS:
 - Choose 2-4 operators by their INDEX NUMBERS (e.g., [0, 1, 4])
-- Valid indices are 0-14 (15 operators available)
+- Valid indices are 0-{len(selected_operators) - 1} ({len(selected_operators)} operators available)
 - Select operators that create interesting and diverse combinations
 - Mix different operator types for variety
 - Field compatibility will be handled automatically
 - Return ONLY the index numbers in square brackets
 
 RESPONSE FORMAT:
-[0, 1, 4]
-"""
+[0, 1, 4]""", required=True),
+        ])
+        # Only operators that made it into the prompt can be picked
+        selected_operators = selected_operators[:compiled.item_counts.get('operators', 0)]
         
         try:
-            import ollama
-            response = ollama.chat(
-                model=self.ollama_model,
-                messages=[{'role': 'user', 'content': prompt}],
+            content = self.prompt_compiler.chat(
+                self.ollama_model,
+                compiled,
+                label='choose_operators',
                 options={'temperature': 0.7, 'top_p': 0.9}
             )
             
             # Parse response to get operator indices
-            content = response['message']['content'].strip()
+            content = content.strip()
             logger.info(f"⚙️ STEP 2 RESPONSE: {content}")
             
             # Extract indices from response (e.g., [0, 1, 4] or 0, 1, 4)
@@ -2603,19 +2683,13 @@ RESPONSE FORMAT:
             selected_fields = region_specific_fields[:len(selected_fields)]  # Keep same count
             logger.info(f"🔄 REGENERATED FIELDS: {[f['id'] for f in selected_fields]}")
         
-        # Create template building prompt
-        fields_info = []
-        for field in selected_fields:
-            field_type = field.get('type', 'REGULAR')
-            # Get compatible operators dynamically
-            compatible_ops = self._get_compatible_operators_for_field_type(field_type)
-            field_type_info = f"{field_type} (use: {', '.join(compatible_ops[:10])})"  # Show first 10 operators
-            fields_info.append(f"- {field['id']}: {field.get('description', 'No description')} [{field_type_info}]")
-        
-        operators_info = []
-        for op in selected_operators:
-            definition = op.get('definition', 'No definition available')
-            operators_info.append(f"- {op['name']}: {op['description']} | Syntax: {definition}")
+        # Create template building prompt: one compact line per field and operator,
+        # with the compatible operators listed once per field type
+        fields_info = [f"- {encode_field(field, with_usage=False)}" for field in selected_fields]
+        field_types = sorted({field.get('type', 'REGULAR') for field in selected_fields})
+        type_hints = [f"- {FIELD_TYPE_CODES.get(field_type, 'R')}={field_type}: use {', '.join(self._get_compatible_operators_for_field_type(field_type)[:10])}"
+                      for field_type in field_types]
+        operators_info = [f"- {encode_operator(op, description_chars=100)}" for op in selected_operators]
         
         # 60% real examples, 40% personas - randomly choose inspiration type
         import random
@@ -2627,13 +2701,10 @@ RESPONSE FORMAT:
         if use_real_examples:
             # 60% chance: Use historical alpha examples
             historical_alphas = self._select_historical_alphas(3)
-            historical_examples = ""
-            if historical_alphas:
-                historical_examples = "\n\nHISTORICAL ALPHA EXAMPLES FOR INSPIRATION:\n"
-                for i, alpha in enumerate(historical_alphas, 1):
-                    status_emoji = "✅" if alpha['status'] == 'SUBMITTED' else "📝" if alpha['status'] == 'UNSUBMITTED' else "❌"
-                    historical_examples += f"{i}. {alpha['expression']} {status_emoji} (Sharpe: {alpha['sharpe']:.2f}, Fitness: {alpha['fitness']:.2f}, Region: {alpha['region']}, Status: {alpha['status']})\n"
-                historical_examples += "\nUse these as inspiration but create your own unique expression using the selected fields and operators.\n"
+            historical_examples = []
+            for i, alpha in enumerate(historical_alphas or [], 1):
+                status_emoji = "✅" if alpha['status'] == 'SUBMITTED' else "📝" if alpha['status'] == 'UNSUBMITTED' else "❌"
+                historical_examples.append(f"{i}. {compact_text(alpha['expression'], 300)} {status_emoji} (Sharpe: {alpha['sharpe']:.2f}, Fitness: {alpha['fitness']:.2f}, Region: {alpha['region']}, Status: {alpha['status']})")
             
             persona_prompt = ""  # No persona when using real examples
             current_persona = "historical_examples"  # Track that we used historical examples
@@ -2643,30 +2714,24 @@ RESPONSE FORMAT:
             # 40% chance: Use creative personas
             persona = self._select_persona()
             persona_prompt = self._get_persona_prompt(persona, 1)
-            historical_examples = ""  # No historical examples when using personas
+            historical_examples = []  # No historical examples when using personas
             current_persona = persona.get('id', persona.get('name', 'unknown'))  # Track persona ID
             logger.info(f"🎭 USING PERSONA: {persona['name']} - {persona['style']}")
         
         # Store current persona for alpha tracking
         self.current_persona = current_persona
         
-        prompt = f"""
-🔨 ALPHA EXPRESSION BUILDER FOR {region.upper()}
-
-
-CREATE ALPHAS LIKE THIS:
-{persona_prompt}
-
-You are building a WorldQuant Brain alpha expression. This is NOT SQL - it's a mathematical expression using operators and data fields.
-
-SELECTED FIELDS:
-{chr(10).join(fields_info)}
-
-SELECTED OPERATORS:
-{chr(10).join(operators_info)}
-{historical_examples}
-
-CRITICAL INSTRUCTIONS:
+        sections = [
+            PromptSection('header', f"""🔨 ALPHA EXPRESSION BUILDER FOR {region.upper()}""", required=True),
+            PromptSection('persona', f"""CREATE ALPHAS LIKE THIS:
+{persona_prompt}""" if persona_prompt else "", priority=4),
+            PromptSection('intro', "You are building a WorldQuant Brain alpha expression. This is NOT SQL - it's a mathematical expression using operators and data fields.", required=True),
+            PromptSection('fields', "SELECTED FIELDS:", required=True, items=fields_info + type_hints),
+            PromptSection('operators', "SELECTED OPERATORS:", required=True, items=operators_info),
+            PromptSection('examples', "HISTORICAL ALPHA EXAMPLES FOR INSPIRATION (create your own unique expression using the selected fields and operators):",
+                          priority=6, items=historical_examples) if historical_examples else PromptSection('examples'),
+            PromptSection('failure_guidance', self.get_failure_guidance(region).strip(), priority=2),
+            PromptSection('instructions', self.prompt_compiler.static('template_builder_instructions', lambda: """CRITICAL INSTRUCTIONS:
 - This is a MATHEMATICAL EXPRESSION, not SQL code
 - Use ONLY the selected fields and operators above
 - Field compatibility will be handled automatically during validation
@@ -2676,18 +2741,17 @@ CRITICAL INSTRUCTIONS:
 - DO NOT include "plaintext" prefix or any other prefixes
 - No words like 'math' or 'alpha expression' in the results, only the expression
 
-RESPONSE FORMAT (return only the expression, no prefixes):
-"""
+RESPONSE FORMAT (return only the expression, no prefixes):"""), required=True),
+        ]
+        compiled = self.prompt_compiler.compile(sections)
         
         try:
-            import ollama
-            response = ollama.chat(
-                model=self.ollama_model,
-                messages=[{'role': 'user', 'content': prompt}],
+            template = self.prompt_compiler.chat(
+                self.ollama_model,
+                compiled,
+                label='build_template',
                 options={'temperature': 0.5, 'top_p': 0.9}
-            )
-            
-            template = response['message']['content'].strip()
+            ).strip()
 
             # Clean up any SQL blocks or markdown that Ollama might generate
             if '```' in template:
@@ -2788,84 +2852,59 @@ RESPONSE FORMAT (return only the expression, no prefixes):
         }
         return contexts.get(region, 'General equity markets with diverse opportunities')
     
-    def _prioritize_fields(self, data_fields: List[Dict]) -> List[Dict]:
-        """Prioritize fields using dynamic strategy based on elite template discoveries"""
+    def _get_field_index(self, data_fields: List[Dict], region: str = None, delay: int = None) -> FieldSamplingIndex:
+        """Get the sampling index for these fields, built once per (region, delay)"""
+        if data_fields:
+            region = region or data_fields[0].get('region')
+            delay = delay if delay is not None else data_fields[0].get('delay')
+        key = (region, delay)
+        index = self.field_sampling_indexes.get(key)
+        if index is None or not index.matches(data_fields):
+            index = FieldSamplingIndex(data_fields, region, delay, history=index)
+            self.field_sampling_indexes[key] = index
+            logger.info(f"🗂️ FIELD INDEX: Built sampling index for {region} delay={delay} ({len(index)} fields)")
+        return index
+    
+    def track_field_usage(self, template: str, region: str, delay: int):
+        """Feed the fields of a successful template back into the sampling index"""
+        index = self.field_sampling_indexes.get((region, delay))
+        if index is None:
+            return
+        used_fields = [word for word in set(re.findall(r'\b[a-zA-Z_][a-zA-Z0-9_]*\b', template)) if word in index]
+        for field_id in used_fields:
+            index.record_usage(field_id)
+            index.record_success(field_id)
+        if used_fields:
+            logger.info(f"📊 Field usage updated for {region} delay={delay}: {used_fields}")
+    
+    def _prioritize_fields(self, data_fields: List[Dict], max_fields: int = 30) -> List[Dict]:
+        """Prioritize fields using dynamic strategy based on elite template discoveries
+        
+        Fields are drawn from the (region, delay) sampling index with probability
+        proportional to their strategy score instead of rescoring and sorting them all.
+        """
         # Update field strategy before prioritizing
         self._update_field_strategy()
         
-        def field_score(field):
-            pyramid_mult = field.get('pyramidMultiplier', 1.0)
-            user_count = field.get('userCount', 0)
-            alpha_count = field.get('alphaCount', 0)
-            
-            # Get current strategy weights
-            weights = self.field_strategy_weights[self.field_strategy_mode]
-            
-            # Calculate random exploration component (favors diverse field usage)
-            if user_count == 0 and alpha_count == 0:
-                # Completely unused - high random score
-                random_score = 4.0
-            elif user_count <= 10 and alpha_count <= 20:
-                # Lightly used - good random score
-                random_score = 3.0
-            elif user_count <= 50 and alpha_count <= 100:
-                # Moderately used - medium random score
-                random_score = 2.0
-            elif user_count <= 200 and alpha_count <= 500:
-                # Heavily used - low random score
-                random_score = 1.0
-            else:
-                # Overused - minimal random score
-                random_score = 0.1
-            
-            # Calculate rare field component (favors undiscovered fields)
-            if user_count == 0 and alpha_count == 0:
-                # Completely unused - maximum rare score
-                rare_score = 5.0
-            elif user_count <= 2 and alpha_count <= 5:
-                # Barely used - very high rare score
-                rare_score = 4.0
-            elif user_count <= 10 and alpha_count <= 20:
-                # Lightly used - high rare score
-                rare_score = 3.0
-            elif user_count <= 50 and alpha_count <= 100:
-                # Moderately used - medium rare score
-                rare_score = 2.0
-            elif user_count <= 200 and alpha_count <= 500:
-                # Heavily used - low rare score
-                rare_score = 1.0
-            else:
-                # Overused - minimal rare score
-                rare_score = 0.1
-            
-            # Apply strategy weights
-            strategy_score = (weights['random'] * random_score + 
-                            weights['rare'] * rare_score)
-            
-            # Add pyramid multiplier as base score
-            total_score = pyramid_mult + strategy_score
-            
-            # Apply penalty for overused fields
-            if user_count > 500 or alpha_count > 1000:
-                total_score -= 2.0
-            
-            return total_score
+        if not data_fields:
+            return []
         
-        # Sort by score (higher is better)
-        prioritized = sorted(data_fields, key=field_score, reverse=True)
+        # Strategy weights only change the component mix, the index is not rebuilt
+        index = self._get_field_index(data_fields)
+        weights = self.field_strategy_weights[self.field_strategy_mode]
+        mix = FieldSamplingIndex.strategy_mix(weights)
+        prioritized = index.sample(min(max_fields, len(index)), mix)
         
         # Log strategy information
-        weights = self.field_strategy_weights[self.field_strategy_mode]
         logger.info(f"🎯 DYNAMIC FIELD STRATEGY: {self.field_strategy_mode.upper()}")
         logger.info(f"🎯 STRATEGY WEIGHTS: Random={weights['random']:.1%}, Rare={weights['rare']:.1%}")
         logger.info(f"🎯 ELITE STATUS: Found {self.elite_templates_found} elites, mode based on discoveries")
         
-        logger.info(f"🔍 DYNAMIC FIELD PRIORITIZATION: Top 10 fields by strategy score:")
+        logger.info(f"🔍 DYNAMIC FIELD PRIORITIZATION: First 10 fields drawn by strategy score:")
         for i, field in enumerate(prioritized[:10]):
             pyramid_mult = field.get('pyramidMultiplier', 1.0)
-            user_count = field.get('userCount', 0)
-            alpha_count = field.get('alphaCount', 0)
-            score = field_score(field)
+            user_count, alpha_count = index.counts(field['id'])
+            score = index.score(field['id'], mix)
             status = "UNUSED" if user_count == 0 and alpha_count == 0 else "BARELY_USED" if user_count <= 2 and alpha_count <= 5 else "OVERUSED" if user_count > 500 or alpha_count > 1000 else "MODERATE"
             logger.info(f"   {i+1}. {field['id']} (score: {score:.3f}, pyramid: {pyramid_mult}, users: {user_count}, alphas: {alpha_count}) [{status}]")
         
@@ -2873,96 +2912,69 @@ RESPONSE FORMAT (return only the expression, no prefixes):
     
     def _find_undiscovered_gems(self, data_fields: List[Dict], max_fields: int = 20) -> List[Dict]:
         """Find the most undiscovered fields (lowest usage) for maximum alpha potential"""
-        # Filter for truly undiscovered fields
-        undiscovered = []
-        for field in data_fields:
-            user_count = field.get('userCount', 0)
-            alpha_count = field.get('alphaCount', 0)
-            
-            # Only include fields with very low usage
-            if user_count <= 5 and alpha_count <= 10:
-                undiscovered.append(field)
+        if not data_fields:
+            return []
         
-        # Sort by pyramid multiplier (highest first) among undiscovered fields
-        undiscovered.sort(key=lambda x: x.get('pyramidMultiplier', 1.0), reverse=True)
+        # Truly undiscovered fields (users <= 5, alphas <= 10), drawn by pyramid multiplier
+        index = self._get_field_index(data_fields)
+        gem_count = index.category_counts['GEM']
+        undiscovered = index.sample(min(max_fields, gem_count), {'gem': 1.0})
         
-        logger.info(f"💎 UNDISCOVERED GEMS: Found {len(undiscovered)} truly undiscovered fields")
+        logger.info(f"💎 UNDISCOVERED GEMS: Found {gem_count} truly undiscovered fields")
         if undiscovered:
             logger.info(f"💎 TOP UNDISCOVERED GEMS:")
             for i, field in enumerate(undiscovered[:10]):
-                users = field.get('userCount', 0)
-                alphas = field.get('alphaCount', 0)
+                users, alphas = index.counts(field['id'])
                 pyramid = field.get('pyramidMultiplier', 1.0)
                 logger.info(f"   {i+1}. {field['id']} (pyramid: {pyramid}, users: {users}, alphas: {alphas})")
         
-        return undiscovered[:max_fields]
+        return undiscovered
     
     def _create_gem_discovery_selection(self, data_fields: List[Dict], max_fields: int = 30) -> List[Dict]:
         """Create a dynamic selection based on elite template discoveries and time"""
         # Update field strategy before selection
         self._update_field_strategy()
         
+        if not data_fields:
+            return []
+        
         # Get current strategy weights
         weights = self.field_strategy_weights[self.field_strategy_mode]
         
-        # Categorize fields by usage levels
-        undiscovered_gems = []      # Very low usage (users <= 5, alphas <= 10)
-        moderate_fields = []       # Moderate usage (users 6-50, alphas 11-100)
-        popular_fields = []        # High usage (users > 50, alphas > 100)
-        
-        for field in data_fields:
-            user_count = field.get('userCount', 0)
-            alpha_count = field.get('alphaCount', 0)
-            
-            if user_count <= 5 and alpha_count <= 10:
-                undiscovered_gems.append(field)
-            elif user_count <= 50 and alpha_count <= 100:
-                moderate_fields.append(field)
-            else:
-                popular_fields.append(field)
+        # Usage levels are maintained by the index as usage counts change
+        index = self._get_field_index(data_fields)
+        counts = index.category_counts
         
         logger.info(f"🎯 DYNAMIC GEM DISCOVERY ANALYSIS:")
         logger.info(f"🎯 STRATEGY: {self.field_strategy_mode.upper()} (Random: {weights['random']:.1%}, Rare: {weights['rare']:.1%})")
-        logger.info(f"   Undiscovered gems: {len(undiscovered_gems)} (users ≤5, alphas ≤10)")
-        logger.info(f"   Moderate fields: {len(moderate_fields)} (users 6-50, alphas 11-100)")
-        logger.info(f"   Popular fields: {len(popular_fields)} (users >50, alphas >100)")
+        logger.info(f"   Undiscovered gems: {counts['GEM']} (users ≤5, alphas ≤10)")
+        logger.info(f"   Moderate fields: {counts['MODERATE']} (users 6-50, alphas 11-100)")
+        logger.info(f"   Popular fields: {counts['POPULAR']} (users >50, alphas >100)")
         
         # Dynamic selection based on strategy weights
         selected_fields = []
         
         # Calculate field counts based on strategy weights
-        gems_count = min(len(undiscovered_gems), int(max_fields * weights['rare']))
-        random_count = min(len(moderate_fields) + len(popular_fields), int(max_fields * weights['random']))
+        gems_count = min(counts['GEM'], int(max_fields * weights['rare']))
+        random_count = min(counts['MODERATE'] + counts['POPULAR'], int(max_fields * weights['random']))
         
-        # Add undiscovered gems (rare-focused component)
+        # Add undiscovered gems (rare-focused component), weighted by pyramid multiplier
         if gems_count > 0:
-            # Sort gems by pyramid multiplier (highest first)
-            undiscovered_gems.sort(key=lambda x: x.get('pyramidMultiplier', 1.0), reverse=True)
-            selected_fields.extend(undiscovered_gems[:gems_count])
+            selected_fields.extend(index.sample(gems_count, {'gem': 1.0}))
             logger.info(f"💎 Added {gems_count} undiscovered gems (rare component)")
         
-        # Add random exploration fields (random component)
+        # Add random exploration fields (random component) from moderate and popular fields
         if random_count > 0:
-            # Combine moderate and popular fields for random exploration
-            random_fields = moderate_fields + popular_fields
-            # Sort by pyramid multiplier but add some randomness
-            random_fields.sort(key=lambda x: x.get('pyramidMultiplier', 1.0), reverse=True)
-            # Add some randomness to the selection
-            random.shuffle(random_fields[:min(len(random_fields), random_count * 2)])
-            selected_fields.extend(random_fields[:random_count])
+            selected_fields.extend(index.sample(random_count, {'moderate': 1.0, 'popular': 1.0}))
             logger.info(f"🎲 Added {random_count} random exploration fields")
         
         # Fill remaining slots with best available fields
         if len(selected_fields) < max_fields:
             remaining = max_fields - len(selected_fields)
-            all_fields = data_fields.copy()
-            # Remove already selected fields
             selected_ids = {field['id'] for field in selected_fields}
-            available_fields = [f for f in all_fields if f['id'] not in selected_ids]
-            # Sort by pyramid multiplier
-            available_fields.sort(key=lambda x: x.get('pyramidMultiplier', 1.0), reverse=True)
-            selected_fields.extend(available_fields[:remaining])
-            logger.info(f"🔧 Added {min(remaining, len(available_fields))} additional fields for completeness")
+            additional = index.sample(remaining, {'gem': 1.0, 'moderate': 1.0, 'popular': 1.0}, exclude=selected_ids)
+            selected_fields.extend(additional)
+            logger.info(f"🔧 Added {len(additional)} additional fields for completeness")
         
         # Shuffle the final selection to create interesting combinations
         random.shuffle(selected_fields)
@@ -2974,11 +2986,9 @@ RESPONSE FORMAT (return only the expression, no prefixes):
         
         # Show top selections
         for i, field in enumerate(selected_fields[:10]):
-            users = field.get('userCount', 0)
-            alphas = field.get('alphaCount', 0)
+            users, alphas = index.counts(field['id'])
             pyramid = field.get('pyramidMultiplier', 1.0)
-            category = "GEM" if users <= 5 and alphas <= 10 else "MODERATE" if users <= 50 and alphas <= 100 else "POPULAR"
-            logger.info(f"   {i+1}. {field['id']} [{category}] (pyramid: {pyramid}, users: {users}, alphas: {alphas})")
+            logger.info(f"   {i+1}. {field['id']} [{index.category(field['id'])}] (pyramid: {pyramid}, users: {users}, alphas: {alphas})")
         
         return selected_fields[:max_fields]
     
@@ -3029,14 +3039,15 @@ RESPONSE FORMAT (return only the expression, no prefixes):
             }
     
     def _save_operator_compatibility(self):
-        """Save operator compatibility data to file"""
-        try:
-            self.operator_compatibility['last_updated'] = time.time()
-            with open(self.operator_compatibility_file, 'w') as f:
-                json.dump(self.operator_compatibility, f, indent=2)
-            logger.info(f"💾 Saved operator compatibility data: {len(self.operator_compatibility['operators'])} operators tracked")
-        except Exception as e:
-            logger.error(f"❌ Failed to save operator compatibility: {e}")
+        """Schedule a write of the operator compatibility data"""
+        self.operator_compatibility['last_updated'] = time.time()
+        self.state_store.schedule(self.operator_compatibility_file, self._operator_compatibility_state, indent=2)
+    
+    def _operator_compatibility_state(self) -> Dict:
+        data = dict(self.operator_compatibility)
+        data['operators'] = dict(data.get('operators', {}))
+        logger.info(f"💾 Saved operator compatibility data: {len(data['operators'])} operators tracked")
+        return data
     
     def _load_blacklist_from_disk(self):
         """Load blacklist from disk for persistence"""
@@ -3094,27 +3105,28 @@ RESPONSE FORMAT (return only the expression, no prefixes):
             self.successful_simulations_since_blacklist = 0
     
     def _save_blacklist_to_disk(self):
-        """Save blacklist to disk for persistence"""
-        try:
-            data = {
-                "blacklisted_operators": list(self.operator_blacklist),
-                "usage_count": self.operator_usage_count,
-                "blacklist_timestamps": self.operator_blacklist_timestamps,
-                "blacklist_reasons": self.operator_blacklist_reasons,
-                "successful_simulations": self.successful_simulations_since_blacklist,
-                "last_updated": time.time()
-            }
-            with open(self.blacklist_file, "w") as f:
-                json.dump(data, f, indent=2)
-            logger.info(f"💾 SAVED BLACKLIST: {len(self.operator_blacklist)} operators blacklisted")
-        except Exception as e:
-            logger.error(f"Failed to save blacklist to disk: {e}")
+        """Schedule a write of the blacklist for persistence"""
+        self.state_store.schedule(self.blacklist_file, self._blacklist_state, indent=2)
+    
+    def _blacklist_state(self) -> Dict:
+        data = {
+            "blacklisted_operators": list(self.operator_blacklist),
+            "usage_count": dict(self.operator_usage_count),
+            "blacklist_timestamps": dict(self.operator_blacklist_timestamps),
+            "blacklist_reasons": dict(self.operator_blacklist_reasons),
+            "successful_simulations": self.successful_simulations_since_blacklist,
+            "last_updated": time.time()
+        }
+        logger.info(f"💾 SAVED BLACKLIST: {len(data['blacklisted_operators'])} operators blacklisted")
+        return data
     
     def _add_to_blacklist(self, operator_name: str, reason: str = ""):
         """Add operator to blacklist and save to disk"""
         self.operator_blacklist.add(operator_name)
         self.operator_blacklist_timestamps[operator_name] = time.time()
         self.operator_blacklist_reasons[operator_name] = reason
+        if self.operator_sampling_index is not None:
+            self.operator_sampling_index.set_blacklisted(operator_name, True)
         logger.warning(f"🚫 BLACKLISTED: {operator_name} - {reason}")
         self._save_blacklist_to_disk()
     
@@ -3164,6 +3176,9 @@ RESPONSE FORMAT (return only the expression, no prefixes):
             if operator_name in self.operator_usage_count:
                 self.operator_usage_count[operator_name] = 0
                 logger.info(f"🔄 USAGE RESET: {operator_name} usage count reset to 0")
+            if self.operator_sampling_index is not None:
+                self.operator_sampling_index.set_usage(operator_name, self.operator_usage_count.get(operator_name, 0))
+                self.operator_sampling_index.set_blacklisted(operator_name, False)
 
             logger.info(f"🔄 UNBLACKLISTED: {operator_name} - {reason}")
             self._save_blacklist_to_disk()
@@ -3344,12 +3359,7 @@ RESPONSE FORMAT (return only the expression, no prefixes):
                                 available_fields.append(field)
                     
                     # Sort by usage (lowest usage first) - prioritize underused fields
-                    def get_usage_score(field):
-                        user_count = field.get('userCount', 0)
-                        alpha_count = field.get('alphaCount', 0)
-                        return user_count + alpha_count
-                    
-                    available_fields.sort(key=get_usage_score)
+                    available_fields.sort(key=field_usage_score)
                     logger.info(f"🔧 REGION-SPECIFIC FIX: Using {len(available_fields)} replacement fields from {region} delay={delay} (sorted by usage)")
                 except Exception as e:
                     logger.warning(f"⚠️ Failed to load {region} cache: {e}")
@@ -3837,12 +3847,7 @@ RESPONSE FORMAT: Answer with only "YES" or "NO"
                             vector_fields.append(field)
                 
                 # Sort by usage (lowest usage first) - prioritize underused fields
-                def get_usage_score(field):
-                    user_count = field.get('userCount', 0)
-                    alpha_count = field.get('alphaCount', 0)
-                    return user_count + alpha_count
-                
-                vector_fields.sort(key=get_usage_score)
+                vector_fields.sort(key=field_usage_score)
                 logger.info(f"🔧 VEC OPERATORS DETECTED: Found {len(vector_fields)} VECTOR fields for MATRIX replacement in {region}")
                 
             except Exception as e:
@@ -3901,13 +3906,8 @@ RESPONSE FORMAT: Answer with only "YES" or "NO"
                             matrix_fields.append(field)
                 
                 # Apply balanced selection for matrix fields
-                def get_usage_score(field):
-                    user_count = field.get('userCount', 0)
-                    alpha_count = field.get('alphaCount', 0)
-                    return user_count + alpha_count
-                
                 # Sort and categorize matrix fields by usage
-                matrix_fields.sort(key=get_usage_score)
+                matrix_fields.sort(key=field_usage_score)
                 total_matrix_fields = len(matrix_fields)
                 
                 if total_matrix_fields > 0:
@@ -3997,13 +3997,8 @@ RESPONSE FORMAT: Answer with only "YES" or "NO"
                             matrix_fields.append(field)
                 
                 # Apply balanced selection for matrix fields
-                def get_usage_score(field):
-                    user_count = field.get('userCount', 0)
-                    alpha_count = field.get('alphaCount', 0)
-                    return user_count + alpha_count
-                
                 # Sort and categorize matrix fields by usage
-                matrix_fields.sort(key=get_usage_score)
+                matrix_fields.sort(key=field_usage_score)
                 total_matrix_fields = len(matrix_fields)
                 
                 if total_matrix_fields > 0:
@@ -4157,40 +4152,26 @@ RESPONSE FORMAT: Answer with only "YES" or "NO"
             selected_operators = random.sample(operators, min(4, len(operators)))
             
             # Create error feedback prompt
-            fields_info = []
-            for field in selected_fields:
-                field_type = field.get('type', 'REGULAR')
-                fields_info.append(f"- {field['id']}: {field.get('description', 'No description')} [{field_type}]")
-            
-            operators_info = []
-            for op in selected_operators:
-                definition = op.get('definition', 'No definition available')
-                operators_info.append(f"- {op['name']}: {op['description']} | Syntax: {definition}")
+            fields_info = [f"- {encode_field(field, with_usage=False)}" for field in selected_fields]
+            operators_info = [f"- {encode_operator(op, description_chars=100)}" for op in selected_operators]
             
             # Select a random persona
             persona = self._select_persona()
             persona_prompt = self._get_persona_prompt(persona, 1)
             
-            prompt = f"""
-🔄 TEMPLATE REGENERATION WITH ERROR FEEDBACK FOR {region.upper()}
-
-{persona_prompt}
-
-PREVIOUS TEMPLATE THAT FAILED:
+            compiled = self.prompt_compiler.compile([
+                PromptSection('header', f"🔄 TEMPLATE REGENERATION WITH ERROR FEEDBACK FOR {region.upper()}", required=True),
+                PromptSection('persona', persona_prompt, priority=2),
+                PromptSection('failure', f"""PREVIOUS TEMPLATE THAT FAILED:
 {failed_template}
 
 ERROR MESSAGE:
-{error_msg}
-
-You are building a WorldQuant Brain alpha expression. This is NOT SQL - it's a mathematical expression using operators and data fields.
-
-SELECTED FIELDS:
-{chr(10).join(fields_info)}
-
-SELECTED OPERATORS:
-{chr(10).join(operators_info)}
-
-CRITICAL INSTRUCTIONS:
+{error_msg}""", required=True),
+                PromptSection('intro', "You are building a WorldQuant Brain alpha expression. This is NOT SQL - it's a mathematical expression using operators and data fields.", required=True),
+                PromptSection('fields', "SELECTED FIELDS:", required=True,
+                              items=fields_info + [f"- Types: {', '.join(f'{code}={name}' for name, code in FIELD_TYPE_CODES.items())}"]),
+                PromptSection('operators', "SELECTED OPERATORS:", required=True, items=operators_info),
+                PromptSection('instructions', self.prompt_compiler.static('regeneration_instructions', lambda: """CRITICAL INSTRUCTIONS:
 - This is a MATHEMATICAL EXPRESSION, not SQL code
 - Use ONLY the selected fields and operators above
 - AVOID the error that occurred in the previous template
@@ -4199,17 +4180,15 @@ CRITICAL INSTRUCTIONS:
 - DO NOT include "plaintext" prefix or any other prefixes
 - No saying 'math' or 'alpha expression' in the results, only the expression
 
-RESPONSE FORMAT (return only the expression, no prefixes):
-"""
+RESPONSE FORMAT (return only the expression, no prefixes):"""), required=True),
+            ])
             
-            import ollama
-            response = ollama.chat(
-                model=self.ollama_model,
-                messages=[{'role': 'user', 'content': prompt}],
+            content = self.prompt_compiler.chat(
+                self.ollama_model,
+                compiled,
+                label='regenerate_template',
                 options={'temperature': 0.8, 'top_p': 0.9}
-            )
-            
-            content = response['message']['content'].strip()
+            ).strip()
             
             # Clean up the response
             if content.startswith('```'):
@@ -4958,8 +4937,10 @@ RESPONSE FORMAT (return only the expression, no prefixes):
         if not base_prompt:
             return ""
         
-        # Add final requirements
-        final_requirements = f"""
+        # Add final requirements (static per persona and template count)
+        final_requirements = self.prompt_compiler.static(
+            ('persona_requirements', persona['name'], persona['style'], num_templates),
+            lambda: f"""
 FINAL REQUIREMENTS:
 1. Use ONLY the provided operators and fields exactly as listed
 2. Focus on economic intuition and market significance
@@ -4970,6 +4951,7 @@ FINAL REQUIREMENTS:
 7. Each template must be immediately usable in WorldQuant Brain
 8. {persona['name'].upper()} APPROACH - {persona['style'].upper()}
 """
+        )
         
         return base_prompt + final_requirements
     
@@ -4988,19 +4970,17 @@ FINAL REQUIREMENTS:
             logger.warning(f"⚠️ Failed to load alpha tracking data: {e}")
     
     def _save_alpha_tracking(self):
-        """Save alpha tracking data to file"""
-        try:
-            data = {
-                'alpha_results': [asdict(result) for result in self.alpha_results],
-                'green_alphas': [asdict(result) for result in self.green_alphas],
-                'yellow_alphas': [asdict(result) for result in self.yellow_alphas],
-                'red_alphas': [asdict(result) for result in self.red_alphas],
-                'timestamp': time.time()
-            }
-            with open(self.alpha_tracking_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to save alpha tracking data: {e}")
+        """Schedule a write of the alpha tracking data"""
+        self.state_store.schedule(self.alpha_tracking_file, self._alpha_tracking_state, indent=2, ensure_ascii=False)
+    
+    def _alpha_tracking_state(self) -> Dict:
+        return {
+            'alpha_results': [asdict(result) for result in list(self.alpha_results)],
+            'green_alphas': [asdict(result) for result in list(self.green_alphas)],
+            'yellow_alphas': [asdict(result) for result in list(self.yellow_alphas)],
+            'red_alphas': [asdict(result) for result in list(self.red_alphas)],
+            'timestamp': time.time()
+        }
     
     def _classify_alpha_color(self, result: TemplateResult) -> str:
         """Classify alpha result into green, yellow, or red based on performance"""
@@ -5423,22 +5403,18 @@ Return JSON format:
         logger.info("=" * 60)
     
     def _save_dynamic_personas(self):
-        """Save dynamically generated personas to file for persistence"""
-        try:
-            dynamic_personas_data = {
-                'dynamic_personas': self.dynamic_personas,
-                'persona_generation_count': self.persona_generation_count,
-                'generated_at': time.time(),
-                'total_dynamic_personas': len(self.dynamic_personas)
-            }
-            
-            with open('dynamic_personas.json', 'w', encoding='utf-8') as f:
-                json.dump(dynamic_personas_data, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"💾 Saved {len(self.dynamic_personas)} dynamic personas to dynamic_personas.json")
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to save dynamic personas: {e}")
+        """Schedule a write of the dynamically generated personas for persistence"""
+        self.state_store.schedule('dynamic_personas.json', self._dynamic_personas_state, indent=2, ensure_ascii=False)
+    
+    def _dynamic_personas_state(self) -> Dict:
+        dynamic_personas = list(self.dynamic_personas)
+        logger.info(f"💾 Saved {len(dynamic_personas)} dynamic personas to dynamic_personas.json")
+        return {
+            'dynamic_personas': dynamic_personas,
+            'persona_generation_count': self.persona_generation_count,
+            'generated_at': time.time(),
+            'total_dynamic_personas': len(dynamic_personas)
+        }
     
     def _load_dynamic_personas(self):
         """Load dynamically generated personas from file"""
@@ -6368,6 +6344,8 @@ These are actual submitted alphas with real performance metrics. Use them as ins
         operators_used = self.extract_operators_from_template(template)
         for op in operators_used:
             self.operator_usage_count[op] = self.operator_usage_count.get(op, 0) + 1
+            if self.operator_sampling_index is not None:
+                self.operator_sampling_index.set_usage(op, self.operator_usage_count[op])
             
             # Check if operator should be blacklisted due to overuse
             if self.operator_usage_count[op] >= self.max_operator_usage:
@@ -6379,64 +6357,39 @@ These are actual submitted alphas with real performance metrics. Use them as ins
         
         logger.info(f"📊 Operator usage updated: {operators_used} | Blacklisted: {list(self.operator_blacklist)}")
     
+    def _get_operator_index(self) -> OperatorSamplingIndex:
+        """Get the operator sampling index, building it on first use"""
+        index = self.operator_sampling_index
+        if index is None or index.source is not self.operators:
+            # Enforce the usage cap once here instead of on every selection
+            for op in self.operators:
+                usage_count = self.operator_usage_count.get(op['name'], 0)
+                if usage_count >= self.max_operator_usage and not self._is_operator_blacklisted(op['name']):
+                    self._add_to_blacklist(op['name'], f"Used {usage_count} times (max: {self.max_operator_usage})")
+            index = OperatorSamplingIndex(self.operators, self.operator_usage_count,
+                                          self.operator_blacklist, self.max_operator_usage)
+            self.operator_sampling_index = index
+        return index
+    
     def get_diverse_operators(self) -> List[Dict]:
         """Get a diverse set of operators, prioritizing underused and two-field operators"""
-        import random
-        
         # Check for blacklist releases before selecting operators
         self._check_blacklist_release_conditions()
         
-        # Categorize operators by type and usage
-        arithmetic_ops = []
-        time_series_ops = []
-        ranking_ops = []
-        normalization_ops = []
-        two_field_ops = []
-        
-        for op in self.operators:
-            op_name = op['name'].lower()
-            op_def = op['definition'].lower()
-            
-            # CRITICAL: Skip blacklisted operators
-            if self._is_operator_blacklisted(op['name']):
-                continue  # Skip blacklisted operators
-            
-            # Check if it's a two-field operator
-            if 'x, y' in op_def or op_name in ['add', 'subtract', 'multiply', 'divide', 'ts_corr', 'ts_regression']:
-                two_field_ops.append(op)
-            elif 'ts_' in op_name:
-                time_series_ops.append(op)
-            elif any(rank_word in op_name for rank_word in ['rank', 'percentile', 'quantile']):
-                ranking_ops.append(op)
-            elif any(norm_word in op_name for norm_word in ['normalize', 'zscore', 'standardize']):
-                normalization_ops.append(op)
-            else:
-                arithmetic_ops.append(op)
-        
-        # Select diverse operators, prioritizing underused ones
-        diverse_operators = []
+        # Operators are categorized once in the index; blacklisted ones have zero weight
+        # and the rest weigh 1 / (1 + usage), so underused operators are drawn first
+        index = self._get_operator_index()
         
         # First, add two-field operators (up to 10)
-        if two_field_ops:
-            two_field_sorted = sorted(two_field_ops, key=lambda x: self.operator_usage_count.get(x['name'], 0))
-            diverse_operators.extend(two_field_sorted[:min(10, len(two_field_sorted))])
+        final_operators = index.sample(10, ['two_field'])
         
         # Then add from other categories (up to 3 each)
-        for category in [arithmetic_ops, time_series_ops, ranking_ops, normalization_ops]:
-            if category:
-                category_sorted = sorted(category, key=lambda x: self.operator_usage_count.get(x['name'], 0))
-                diverse_operators.extend(category_sorted[:min(3, len(category_sorted))])
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        final_operators = []
-        for op in diverse_operators:
-            if op['name'] not in seen:
-                seen.add(op['name'])
-                final_operators.append(op)
+        for category in ['arithmetic', 'time_series', 'ranking', 'normalization']:
+            final_operators.extend(index.sample(3, [category]))
         
         # Ensure we have at least 6 operators
         if len(final_operators) < 6:
+            seen = {op['name'] for op in final_operators}
             remaining_ops = [op for op in self.operators if op['name'] not in seen]
             final_operators.extend(remaining_ops[:6 - len(final_operators)])
         
@@ -6446,35 +6399,20 @@ These are actual submitted alphas with real performance metrics. Use them as ins
         """Get a random group of underused operators to force diversity, excluding blacklisted operators"""
         # Check for blacklist releases before selecting operators
         self._check_blacklist_release_conditions()
-        # Filter out blacklisted operators and overused operators
-        available_operators = []
-        for op in self.operators:
-            if not self._is_operator_blacklisted(op['name']):
-                usage_count = self.operator_usage_count.get(op['name'], 0)
-                if usage_count < self.max_operator_usage:
-                    available_operators.append(op)
-                else:
-                    self._add_to_blacklist(op['name'], f"Used {usage_count} times (max: {self.max_operator_usage})")
+        index = self._get_operator_index()
         
-        if not available_operators:
+        if index.available_mass() <= 0:
             logger.warning("🚫 All operators are blacklisted! Clearing blacklist and using all operators")
             self.operator_blacklist.clear()
-            available_operators = self.operators
+            self.operator_sampling_index = None
+            return random.sample(self.operators, min(max_operators, len(self.operators)))
         
         if not self.operator_usage_count:
             # If no usage data, return diverse operators from available ones
             return self.get_diverse_operators()[:max_operators]
         
-        # Sort available operators by usage count (ascending = least used first)
-        sorted_operators = sorted(available_operators, key=lambda x: self.operator_usage_count.get(x['name'], 0))
-        
-        # Get the least used operators (top 50% least used)
-        half_point = len(sorted_operators) // 2
-        underused_pool = sorted_operators[:half_point]
-        
-        # Randomly select from underused operators
-        import random
-        selected_operators = random.sample(underused_pool, min(max_operators, len(underused_pool)))
+        # Weighted draw over available operators, least used first (weight 1 / (1 + usage))
+        selected_operators = index.sample(max_operators)
         
         # Log the selection
         operator_names = [op['name'] for op in selected_operators]
@@ -6741,6 +6679,7 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                     }
                     
                     # Submit simulation with automatic 401 handling
+                    self._mark_first_simulation()
                     simulation_response = self.make_api_request('POST', 'https://api.worldquantbrain.com/simulations', 
                                                              json=simulation_data)
                     
@@ -6880,18 +6819,22 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                                 shortCount=shortCount,
                                 success=is_truly_successful,
                                 neutralization=settings.neutralization,
+                                alpha_id=alpha_id,
                                 timestamp=time.time()
                             )
                             results.append(result)
                             completed_urls.append(progress_url)
+                            if has_meaningful_metrics:
+                                self._record_variant_parent(result, settings.delay)
                             
                             # Update progress tracker
                             self.progress_tracker.update_simulation_progress(is_truly_successful, result.sharpe, result.template)
                             
                             # Check if this alpha qualifies for optimization
                             if is_truly_successful:
-                                # Track operator usage for diversity
+                                # Track operator and field usage for diversity
                                 self.track_operator_usage(template_data['template'])
+                                self.track_field_usage(template_data['template'], settings.region, settings.delay)
                                 self.add_to_optimization_queue(result)
                                 logger.info(f"✅ Template simulation completed successfully: {template_data['template'][:50]}...")
                                 logger.info(f"📊 Alpha {alpha_id} Performance: Sharpe={sharpe}, Fitness={fitness}, Turnover={turnover}, Returns={returns}")
@@ -7061,6 +7004,9 @@ These are actual submitted alphas with real performance metrics. Use them as ins
         # Shutdown executor
         self.executor.shutdown(wait=True)
         
+        # Write out state files still pending in the write-behind store
+        self.state_store.flush()
+        
         # Process optimization queue for good alphas
         logger.info("🔍 Checking for alphas that qualify for optimization...")
         self.process_optimization_queue()
@@ -7453,6 +7399,9 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                         logger.warning(f"⚠️ Failed to parse PnL value in record {i}: {record} - {parse_error}")
                         continue
                 
+                # Keep the series so negated variants can derive their drawdown
+                self.variant_algebra.record_pnl(alpha_id, pnl_values)
+                
                 # Check if we have enough valid PnL values after parsing
                 if len(pnl_values) < 5:
                     logger.warning(f"⚠️ Insufficient valid PnL values after parsing: {len(pnl_values)}")
@@ -7764,8 +7713,7 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                     'total_attempts': tracker['total_attempts']
                 })
         
-        with open(filename, 'w') as f:
-            json.dump(blacklisted_templates, f, indent=2)
+        atomic_write_json(filename, blacklisted_templates, indent=2)
         
         logger.info(f"Saved {len(blacklisted_templates)} blacklisted templates to {filename}")
     
@@ -7903,7 +7851,10 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                 completed_futures.append(future_id)
                 try:
                     result = future.result()
-                    if result and result.success:
+                    if result and result.derived_from:
+                        # Derived results are recorded when derived and never used a simulation slot
+                        logger.info(f"🧮 DERIVED variation (no simulation): {result.template[:50]}... (Sharpe: {result.sharpe:.3f})")
+                    elif result and result.success:
                         self.successful_count += 1
                         self._update_bandit_with_result(result)
                         self._add_to_results(result)
@@ -8405,6 +8356,16 @@ These are actual submitted alphas with real performance metrics. Use them as ins
             # Combine all variations
             all_variations = field_variations + neutralization_variations + negation_variations + hopeful_negation_variations
             
+            # Sign flips and rescalings of already simulated cores don't need a simulation slot
+            all_variations, derived_variations = self.variant_algebra.partition(
+                all_variations, region, delay, best_template.get('neutralization', 'INDUSTRY'))
+            derived_results = [self._record_derived_variation(variation, metrics, region, delay)
+                               for variation, metrics in derived_variations]
+            
+            if not all_variations and derived_results:
+                # Everything was derivable; hand back the best one, already recorded
+                return max(derived_results, key=lambda r: r.sharpe)
+            
             if not all_variations:
                 logger.warning(f"No variations generated for {region}")
                 return TemplateResult(
@@ -8550,6 +8511,7 @@ These are actual submitted alphas with real performance metrics. Use them as ins
             
             logger.info(f"🎮 CONCURRENT SIMULATION: Submitting simulation to API...")
             # Submit simulation
+            self._mark_first_simulation()
             response = self.make_api_request('POST', 'https://api.worldquantbrain.com/simulations', json=simulation_data)
             logger.info(f"🎮 CONCURRENT SIMULATION: API response status: {response.status_code}")
             
@@ -8703,6 +8665,7 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                         # Track operator usage for diversity if successful
                         if is_truly_successful:
                             self.track_operator_usage(template['template'])
+                            self.track_field_usage(template['template'], region, delay)
                         
                         # Perform post-simulation analysis immediately after getting alphaId
                         if is_truly_successful:
@@ -8733,7 +8696,7 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                                 logger.error(f"❌ POST-SIMULATION ANALYSIS TRACEBACK: {traceback.format_exc()}")
                                 # Continue execution even if post-simulation analysis fails
                         
-                        return TemplateResult(
+                        result = TemplateResult(
                             template=template['template'],
                             region=region,
                             settings=SimulationSettings(region=region, universe=self.region_configs[region].universe, delay=delay, neutralization=template.get('neutralization', 'INDUSTRY')),
@@ -8749,6 +8712,9 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                             alpha_id=alpha_id,
                             timestamp=time.time()
                         )
+                        if has_meaningful_metrics:
+                            self._record_variant_parent(result, delay)
+                        return result
                     
                     elif status in ['FAILED', 'ERROR', 'FAIL']:
                         error_message = data.get('message', 'Unknown error')
@@ -8894,6 +8860,40 @@ These are actual submitted alphas with real performance metrics. Use them as ins
         logger.info(f"  Metrics: Sharpe={result.sharpe:.3f}, Fitness={result.fitness:.3f}, "
                    f"Returns={result.returns:.3f}, Margin={result.margin:.4f}")
     
+    def _record_variant_parent(self, result: TemplateResult, delay: int):
+        """Remember a simulated result so trivially related variants can be derived from it"""
+        metrics = {key: getattr(result, key) for key in VariantAlgebra.METRIC_KEYS}
+        self.variant_algebra.record(result.template, result.region, delay, result.settings.neutralization,
+                                    metrics, alpha_id=result.alpha_id, success=result.success)
+    
+    def _record_derived_variation(self, variation: Dict, metrics: Dict, region: str, delay: int) -> TemplateResult:
+        """Turn derived metrics into a result and record it like a completed simulation"""
+        neutralization = variation.get('neutralization', 'INDUSTRY')
+        result = TemplateResult(
+            template=variation['template'],
+            region=region,
+            settings=SimulationSettings(region=region, universe=self.region_configs[region].universe, delay=delay, neutralization=neutralization),
+            sharpe=metrics['sharpe'],
+            fitness=metrics['fitness'],
+            turnover=metrics['turnover'],
+            returns=metrics['returns'],
+            drawdown=metrics['drawdown'],
+            margin=metrics['margin'],
+            longCount=metrics['longCount'],
+            shortCount=metrics['shortCount'],
+            success=metrics['parent_success'],
+            neutralization=neutralization,
+            timestamp=time.time(),
+            derived_from=metrics['parent_template']
+        )
+        relation = "scaled copy" if metrics['ratio'] > 0 else "negation"
+        logger.info(f"🧮 DERIVED {relation} of {metrics['parent_template'][:50]}... -> {result.template[:50]}... "
+                    f"(Sharpe={result.sharpe:.3f}, Fitness={result.fitness:.3f}, {self.variant_algebra.derived_count} simulations saved)")
+        if result.success:
+            self._update_bandit_with_result(result)
+            self._add_to_results(result)
+        return result
+    
     def _add_to_results(self, result):
         """Add result to the results collection"""
         if result.success:
@@ -8904,7 +8904,7 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                 self.all_results['simulation_results'][region] = []
             
             # Add to simulation results
-            self.all_results['simulation_results'][region].append({
+            simulation_entry = {
                 'template': result.template,
                 'region': result.region,
                 'sharpe': result.sharpe,
@@ -8918,7 +8918,10 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                 'success': result.success,
                 'error_message': result.error_message,
                 'timestamp': result.timestamp
-            })
+            }
+            if result.derived_from:
+                simulation_entry['derived_from'] = result.derived_from
+            self.all_results['simulation_results'][region].append(simulation_entry)
             
             # Track alpha result for persona performance
             persona_used = getattr(self, 'current_persona', 'unknown')
@@ -9054,8 +9057,11 @@ These are actual submitted alphas with real performance metrics. Use them as ins
             self.perform_cleanup()
             self.last_cleanup_time = current_time
     
-    def perform_cleanup(self):
-        """Perform comprehensive cleanup of logs, temporary files, and old data"""
+    def perform_cleanup(self, deferred_only: bool = False):
+        """Perform comprehensive cleanup of logs, temporary files, and old data
+        
+        With deferred_only, in-memory data is only trimmed for DeferredState attributes.
+        """
         try:
             cleanup_stats = {
                 'files_removed': 0,
@@ -9073,6 +9079,8 @@ These are actual submitted alphas with real performance metrics. Use them as ins
             ]
             
             for json_file in large_json_files:
+                # A pending write-behind save would recreate the file after cleanup
+                self.state_store.discard(json_file)
                 if os.path.exists(json_file):
                     try:
                         # Get file size before cleanup
@@ -9189,13 +9197,13 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                     logger.warning(f"⚠️ Failed to clean temp files with pattern {pattern}: {e}")
             
             # 4. Clean up old correlation data and PnL signals
-            if hasattr(self, 'pnl_signals') and len(self.pnl_signals) > 100:
+            if not deferred_only and hasattr(self, 'pnl_signals') and len(self.pnl_signals) > 100:
                 # Keep only the last 50 signals
                 self.pnl_signals = self.pnl_signals[-50:]
                 cleanup_stats['data_cleaned'] += 1
                 logger.info(f"🧹 Trimmed PnL signals to last 50")
             
-            if hasattr(self, 'correlation_results') and len(self.correlation_results) > 200:
+            if not deferred_only and hasattr(self, 'correlation_results') and len(self.correlation_results) > 200:
                 # Keep only the last 100 correlation results
                 self.correlation_results = self.correlation_results[-100:]
                 cleanup_stats['data_cleaned'] += 1
@@ -9218,7 +9226,7 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                     logger.info(f"🧹 Removed {len(old_entries)} old template quality entries")
             
             # 6. Clean up old suspicion scores
-            if hasattr(self, 'pnl_check_stats') and 'suspicion_scores' in self.pnl_check_stats:
+            if not deferred_only and hasattr(self, 'pnl_check_stats') and 'suspicion_scores' in self.pnl_check_stats:
                 if len(self.pnl_check_stats['suspicion_scores']) > 1000:
                     # Keep only the last 500 scores
                     self.pnl_check_stats['suspicion_scores'] = self.pnl_check_stats['suspicion_scores'][-500:]
@@ -9233,7 +9241,7 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                 logger.info(f"🧹 Trimmed alpha results to last 100")
             
             # 8. Clean up old hopeful alphas
-            if hasattr(self, 'hopeful_alphas') and len(self.hopeful_alphas) > 50:
+            if not deferred_only and hasattr(self, 'hopeful_alphas') and len(self.hopeful_alphas) > 50:
                 # Keep only the last 20 hopeful alphas
                 self.hopeful_alphas = self.hopeful_alphas[-20:]
                 cleanup_stats['data_cleaned'] += 1
@@ -9259,16 +9267,21 @@ These are actual submitted alphas with real performance metrics. Use them as ins
         
         logger.info(f"🧹 CLEANUP CONFIG: Enabled={enabled}, Interval={interval_minutes} minutes")
     
-    def force_cleanup(self):
-        """Force an immediate cleanup"""
+    def force_cleanup(self, deferred_only: bool = False):
+        """Force an immediate cleanup
+        
+        With deferred_only, only DeferredState attributes are cleared in memory, so it is
+        safe to run on the background startup thread.
+        """
         logger.info("🧹 FORCE CLEANUP: Performing immediate cleanup")
-        self.perform_cleanup()
+        self.perform_cleanup(deferred_only=deferred_only)
         
         # Clear in-memory variables to prevent file recreation
-        self._clear_memory_variables()
-        self.last_cleanup_time = time.time()
+        self._clear_memory_variables(deferred_only=deferred_only)
+        if not deferred_only:
+            self.last_cleanup_time = time.time()
     
-    def _clear_memory_variables(self):
+    def _clear_memory_variables(self, deferred_only: bool = False):
         """Clear in-memory variables that cause file recreation"""
         logger.info("🧹 CLEARING MEMORY VARIABLES")
         
@@ -9299,12 +9312,12 @@ These are actual submitted alphas with real performance metrics. Use them as ins
                     logger.info(f"🗑️ Cleared {original_count} templates for {region}")
         
         # Clear PnL signals and correlation data
-        if hasattr(self, 'pnl_signals'):
+        if not deferred_only and hasattr(self, 'pnl_signals'):
             original_count = len(self.pnl_signals)
             self.pnl_signals = []
             logger.info(f"🗑️ Cleared {original_count} PnL signals from memory")
         
-        if hasattr(self, 'correlation_results'):
+        if not deferred_only and hasattr(self, 'correlation_results'):
             original_count = len(self.correlation_results)
             self.correlation_results = []
             logger.info(f"🗑️ Cleared {original_count} correlation results from memory")
@@ -9316,7 +9329,7 @@ These are actual submitted alphas with real performance metrics. Use them as ins
             logger.info(f"🗑️ Cleared {original_count} template quality entries from memory")
         
         # Clear PnL check stats
-        if hasattr(self, 'pnl_check_stats') and 'suspicion_scores' in self.pnl_check_stats:
+        if not deferred_only and hasattr(self, 'pnl_check_stats') and 'suspicion_scores' in self.pnl_check_stats:
             original_count = len(self.pnl_check_stats['suspicion_scores'])
             self.pnl_check_stats['suspicion_scores'] = []
             logger.info(f"🗑️ Cleared {original_count} PnL suspicion scores from memory")
@@ -9348,6 +9361,7 @@ def main():
     parser.add_argument('--templates-per-region', type=int, default=10, help='Number of templates per region')
     parser.add_argument('--max-concurrent', type=int, default=8, help='Maximum concurrent simulations (default: 8)')
     parser.add_argument('--resume', action='store_true', help='Resume from previous progress')
+    parser.add_argument('--fast-startup', action='store_true', help='Load state in the background and reuse the warm snapshot')
     
     args = parser.parse_args()
     
@@ -9358,7 +9372,8 @@ def main():
             args.ollama_model, 
             args.max_concurrent,
             args.progress_file,
-            args.output
+            args.output,
+            lazy_startup=args.fast_startup
         )
         
         # Generate and test templates
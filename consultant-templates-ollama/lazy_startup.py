@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Fast startup support for the template generator.
+
+- ``StartupTimer`` records how long each startup phase takes and when the
+  first simulation is submitted, so time-to-first-simulation can be tracked.
+- ``StartupLoader`` runs startup steps on background threads. Each step
+  releases one or more named groups when it finishes.
+- ``DeferredState`` is a class attribute descriptor: reading the attribute
+  from another thread waits until its group has been released, so state is
+  only waited for where it is first used.
+- ``WarmSnapshot`` keeps parsed state files in one pickle, keyed on the source
+  files' size and mtime, so unchanged files are not parsed again on the next
+  start.
+"""
+
+import logging
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Wall-clock breakdown of the startup phases"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.phases = {}  # {phase: seconds}, in the order they finished
+        self.marks = {}  # {mark: seconds since start}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def mark(self, name: str) -> bool:
+        """Record the first time something happens; later calls are ignored"""
+        with self._lock:
+            if name in self.marks:
+                return False
+            self.marks[name] = self.elapsed()
+        logger.info(f"⏱️ STARTUP: {name} after {self.marks[name]:.2f}s")
+        return True
+
+    def report(self, title: str = "STARTUP TIMING") -> Dict[str, float]:
+        with self._lock:
+            phases = dict(self.phases)
+            marks = dict(self.marks)
+        logger.info(f"⏱️ {title} (t={self.elapsed():.2f}s):")
+        for name, seconds in phases.items():
+            logger.info(f"   {name:<32} {seconds * 1000:9.1f}ms")
+        for name, seconds in marks.items():
+            logger.info(f"   {name:<32} at {seconds:7.2f}s")
+        return {**{f"phase:{k}": v for k, v in phases.items()}, **{f"mark:{k}": v for k, v in marks.items()}}
+
+
+class StartupLoader:
+    """Runs startup steps in background lanes and releases state groups as they finish"""
+
+    def __init__(self, timer: StartupTimer, groups: Iterable[str], on_complete: Optional[Callable[[], None]] = None):
+        self.timer = timer
+        self.on_complete = on_complete
+        self._events = {group: threading.Event() for group in groups}
+        self._threads = []
+        self._pending_lanes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.errors = {}
+
+    def start_lane(self, lane: str, steps: Sequence[Tuple[str, Callable[[], Any], Sequence[str]]]):
+        """Run ``(name, fn, released_groups)`` steps in order on a daemon thread"""
+        with self._lock:
+            self._pending_lanes += 1
+        thread = threading.Thread(target=self._run_lane, args=(lane, list(steps)), name=f"startup-{lane}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _run_lane(self, lane: str, steps):
+        self._local.in_loader = True
+        try:
+            for name, fn, groups in steps:
+                try:
+                    with self.timer.phase(f"background {lane}: {name}"):
+                        fn()
+                except Exception as e:
+                    self.errors[name] = e
+                    logger.error(f"❌ Background startup step '{name}' failed: {e}")
+                for group in groups:
+                    self.release(group)
+        finally:
+            with self._lock:
+                self._pending_lanes -= 1
+                finished = self._pending_lanes == 0
+            if finished:
+                # A failed lane must never leave readers waiting forever
+                for group in list(self._events):
+                    self.release(group)
+                if self.on_complete:
+                    try:
+                        self.on_complete()
+                    except Exception as e:
+                        logger.error(f"❌ Startup completion hook failed: {e}")
+
+    def release(self, group: str):
+        event = self._events.get(group)
+        if event is not None:
+            event.set()
+
+    def is_ready(self, group: str) -> bool:
+        event = self._events.get(group)
+        return event is None or event.is_set()
+
+    def wait(self, group: str, timeout: Optional[float] = None) -> bool:
+        event = self._events.get(group)
+        if event is None or event.is_set() or getattr(self._local, 'in_loader', False):
+            return True
+        logger.info(f"⏳ Waiting for background startup state '{group}'...")
+        with self.timer.phase(f"waited for {group}"):
+            return event.wait(timeout)
+
+    def done(self) -> bool:
+        with self._lock:
+            return self._pending_lanes == 0
+
+    def join(self, timeout: Optional[float] = None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+class DeferredState:
+    """Attribute whose reads wait for a startup group when the owner loads lazily
+
+    Values live in the instance ``__dict__`` under the attribute name. An owner
+    without a ``_startup_loader`` behaves exactly like a plain attribute.
+    """
+
+    def __init__(self, group: str):
+        self.group = group
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        loader = instance.__dict__.get('_startup_loader')
+        if loader is not None:
+            loader.wait(self.group)
+        try:
+            return instance.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+    def __delete__(self, instance):
+        instance.__dict__.pop(self.name, None)
+
+
+def file_signature(paths: Sequence[str]) -> Tuple:
+    """Size and mtime of each source file (None for missing files)"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class WarmSnapshot:
+    """Pickled copies of parsed state files, reused while the sources are unchanged"""
+
+    VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('version') == self.VERSION:
+                self._entries = data.get('entries', {})
+                logger.info(f"⚡ Warm snapshot loaded: {len(self._entries)} entries from {self.path}")
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable warm snapshot {self.path}: {e}")
+            self._entries = {}
+
+    def cached(self, name: str, sources: Sequence[str], loader: Callable[[], Any]) -> Any:
+        """Value from the snapshot if its sources are unchanged, else from the loader"""
+        signature = file_signature(sources)
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is not None and entry[0] == signature:
+            logger.info(f"⚡ Warm snapshot hit: {name}")
+            return pickle.loads(entry[1])
+        value = loader()
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"⚠️ Cannot snapshot {name}: {e}")
+            return value
+        with self._lock:
+            self._entries[name] = (signature, payload)
+            self._dirty = True
+        return value
+
+    def save(self):
+        """Write the snapshot atomically if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'version': self.VERSION, 'entries': dict(self._entries)}
+            self._dirty = False
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            logger.info(f"⚡ Warm snapshot saved: {len(data['entries'])} entries to {self.path}")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to save warm snapshot {self.path}: {e}")
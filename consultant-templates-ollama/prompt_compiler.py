@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted prompt compiler for the Ollama calls of the template generator.
+
+- Prompts are assembled from ranked sections. Required sections always go in,
+  the others are added by priority while they fit the token budget, and list
+  sections (fields, operators, examples) are cut item by item instead of being
+  dropped whole.
+- Static text such as the system prompt is built once and cached.
+- The Ollama ``context`` returned after priming a system prompt is kept (for
+  the most recently used prompts), so later calls only evaluate the new user
+  text after that shared prefix.
+- Every call records estimated and actual (``prompt_eval_count``) prompt tokens
+  with Ollama's timings, so latency can be tied to prompt size.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+FIELD_TYPE_CODES = {'VECTOR': 'V', 'MATRIX': 'M', 'REGULAR': 'R'}
+
+FIELD_LEGEND = ("Format: [index] id type users/alphas | description. "
+                "Types: V=VECTOR (use Cross Sectional operators: normalize, quantile, rank, scale, winsorize, zscore), "
+                "M=MATRIX (use Time Series operators: ts_rank, ts_delta, ts_mean, ts_std, ts_corr, ts_regression, "
+                "vec_avg, vec_sum, vec_max, vec_min), R=REGULAR (use standard operators)")
+
+
+def compact_text(text: str, max_chars: int) -> str:
+    """Collapse whitespace and cut text to max_chars"""
+    text = re.sub(r'\s+', ' ', text or '').strip()
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 3)].rstrip() + '...'
+
+
+def encode_field(field_info: Dict, index: Optional[int] = None, description_chars: int = 60,
+                 with_usage: bool = True) -> str:
+    """One short line per data field, e.g. ``[3] fnd6_capex M 12/40 | Capital expenditures``"""
+    parts = []
+    if index is not None:
+        parts.append(f"[{index}]")
+    parts.append(field_info['id'])
+    parts.append(FIELD_TYPE_CODES.get(field_info.get('type', 'REGULAR'), 'R'))
+    if with_usage:
+        parts.append(f"{field_info.get('userCount', 0)}/{field_info.get('alphaCount', 0)}")
+    line = ' '.join(parts)
+    description = compact_text(field_info.get('description', ''), description_chars)
+    return f"{line} | {description}" if description else line
+
+
+def encode_operator(operator: Dict, index: Optional[int] = None, description_chars: int = 60,
+                    with_syntax: bool = True) -> str:
+    """One short line per operator; the definition already carries the name and arguments"""
+    prefix = f"[{index}] " if index is not None else ""
+    head = operator.get('definition') if with_syntax and operator.get('definition') else operator['name']
+    description = compact_text(operator.get('description', ''), description_chars)
+    return f"{prefix}{compact_text(head, 80)} | {description}" if description else f"{prefix}{head}"
+
+
+@dataclass
+class PromptSection:
+    """A piece of prompt text; higher priority sections are kept first
+
+    ``items`` make the section truncatable: the header ``text`` is followed by
+    as many items as fit (at least ``min_items``), one per line.
+    """
+    name: str
+    text: str = ""
+    priority: int = 0
+    required: bool = False
+    items: Optional[List[str]] = None
+    min_items: int = 1
+
+    def render(self, item_count: Optional[int] = None) -> str:
+        if self.items is None:
+            return self.text
+        items = self.items if item_count is None else self.items[:item_count]
+        lines = [self.text] if self.text else []
+        lines.extend(items)
+        return '\n'.join(lines)
+
+
+@dataclass
+class CompiledPrompt:
+    text: str
+    estimated_tokens: int
+    included: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+    item_counts: Dict[str, int] = field(default_factory=dict)
+
+
+def _context_unsupported(error: Exception) -> bool:
+    """True if the error means the client or server can't take a ``context`` at all"""
+    if isinstance(error, (TypeError, NotImplementedError)):
+        return True
+    return getattr(error, 'status_code', None) in (405, 501)
+
+
+def _response_value(response: Any, key: str, default=None):
+    """Read a key from a plain dict or an ollama response object"""
+    try:
+        value = response[key]
+    except (KeyError, TypeError, IndexError):
+        value = getattr(response, key, default)
+    return default if value is None else value
+
+
+class PromptCompiler:
+    """Assembles budgeted prompts and runs them through the Ollama client"""
+
+    def __init__(self, client, token_budget: int = 3000, chars_per_token: float = 3.5,
+                 reuse_context: bool = True, summary_interval: int = 25, max_static_entries: int = 256,
+                 max_contexts: int = 16, context_retry_seconds: float = 300.0):
+        self.client = client
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.reuse_context = reuse_context
+        self.summary_interval = summary_interval
+        self.max_static_entries = max_static_entries
+        self.max_contexts = max_contexts
+        self.context_retry_seconds = context_retry_seconds
+        self._static = OrderedDict()
+        self._contexts = OrderedDict()
+        self._context_retry_at = 0.0
+        self._stats = {}
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    # ----- building -------------------------------------------------------
+
+    def estimate(self, text: str) -> int:
+        return int(len(text) / self.chars_per_token) + 1
+
+    def static(self, key, builder: Callable[[], str]) -> str:
+        """Build a static section once per key (least recently used keys are evicted)"""
+        with self._lock:
+            if key in self._static:
+                self._static.move_to_end(key)
+                return self._static[key]
+        text = builder()
+        with self._lock:
+            self._static[key] = text
+            while len(self._static) > self.max_static_entries:
+                self._static.popitem(last=False)
+        return text
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._static.clear()
+            else:
+                self._static.pop(key, None)
+
+    def compile(self, sections: Sequence[PromptSection], budget: Optional[int] = None) -> CompiledPrompt:
+        """Fit sections into the budget by priority, keeping their original order in the output"""
+        budget = budget or self.token_budget
+        chosen = {}
+        used = 0
+        for position, section in enumerate(sections):
+            if section.required:
+                chosen[position] = None
+                used += self.estimate(section.render())
+
+        optional = [(position, section) for position, section in enumerate(sections) if not section.required]
+        optional.sort(key=lambda pair: -pair[1].priority)
+        dropped = []
+        for position, section in optional:
+            remaining = budget - used
+            cost = self.estimate(section.render())
+            if cost <= remaining:
+                chosen[position] = None
+                used += cost
+                continue
+            if section.items:
+                # Drop items from the tail until the section fits
+                header_cost = self.estimate(section.text) if section.text else 0
+                count = 0
+                running = header_cost
+                for item in section.items:
+                    item_cost = self.estimate(item) + 1
+                    if running + item_cost > remaining:
+                        break
+                    running += item_cost
+                    count += 1
+                if count >= section.min_items:
+                    chosen[position] = count
+                    used += running
+                    continue
+            dropped.append(section.name)
+
+        parts = []
+        included = []
+        item_counts = {}
+        for position, section in enumerate(sections):
+            if position not in chosen:
+                continue
+            count = chosen[position]
+            rendered = section.render(count)
+            if not rendered.strip():
+                continue
+            parts.append(rendered)
+            included.append(section.name)
+            if section.items is not None:
+                item_counts[section.name] = len(section.items) if count is None else count
+        text = '\n\n'.join(parts)
+        if dropped:
+            logger.info(f"📏 PROMPT BUDGET: dropped sections {dropped} to stay under {budget} tokens")
+        return CompiledPrompt(text=text, estimated_tokens=self.estimate(text), included=included,
+                              dropped=dropped, item_counts=item_counts)
+
+    # ----- calling --------------------------------------------------------
+
+    def _prefix_context(self, model: str, system: str) -> Optional[List[int]]:
+        """Evaluate the system prompt once and keep Ollama's context for reuse"""
+        key = (model, hashlib.sha1(system.encode('utf-8')).hexdigest())
+        with self._lock:
+            if key in self._contexts:
+                self._contexts.move_to_end(key)
+                return self._contexts[key]
+        response = self.client.generate(model=model, system=system, prompt="Acknowledge the instructions.",
+                                        options={'num_predict': 1, 'temperature': 0})
+        context = _response_value(response, 'context')
+        self._record('system_prefix', self.estimate(system) + self.estimate("Acknowledge the instructions."), response, 0.0, reused=False)
+        with self._lock:
+            self._contexts[key] = context or None
+            while len(self._contexts) > self.max_contexts:
+                self._contexts.popitem(last=False)
+        return context or None
+
+    def _context_failed(self, model: str, system: str, error: Exception):
+        """Drop the failed prefix context and pause reuse, or stop it if the server can't do it"""
+        key = (model, hashlib.sha1(system.encode('utf-8')).hexdigest())
+        with self._lock:
+            self._contexts.pop(key, None)
+            if _context_unsupported(error):
+                self.reuse_context = False
+            else:
+                self._context_retry_at = time.time() + self.context_retry_seconds
+        if self.reuse_context:
+            logger.warning(f"⚠️ Ollama context reuse failed, using chat for {self.context_retry_seconds:.0f}s: {error}")
+        else:
+            logger.warning(f"⚠️ Ollama context reuse unsupported, falling back to chat: {error}")
+
+    def chat(self, model: str, prompt, label: str, system: Optional[str] = None,
+             format=None, options: Optional[Dict] = None) -> str:
+        """Run one prompt and return the response text
+
+        ``prompt`` may be a string or a CompiledPrompt. With a system prompt and
+        context reuse enabled the shared prefix is evaluated only once.
+        """
+        text = prompt.text if isinstance(prompt, CompiledPrompt) else prompt
+        estimated = prompt.estimated_tokens if isinstance(prompt, CompiledPrompt) else self.estimate(text)
+        start = time.time()
+
+        if system and self.reuse_context and time.time() >= self._context_retry_at:
+            try:
+                context = self._prefix_context(model, system)
+                if context:
+                    start = time.time()
+                    response = self.client.generate(model=model, prompt=text, context=context,
+                                                    format=format or '', options=options)
+                    self._record(label, estimated, response, time.time() - start, reused=True)
+                    return _response_value(response, 'response', '')
+            except Exception as e:
+                # This call still goes through chat
+                self._context_failed(model, system, e)
+
+        messages = []
+        if system:
+            messages.append({'role': 'system', 'content': system})
+            estimated += self.estimate(system)
+        messages.append({'role': 'user', 'content': text})
+        kwargs = {'model': model, 'messages': messages, 'options': options}
+        if format is not None:
+            kwargs['format'] = format
+        start = time.time()
+        response = self.client.chat(**kwargs)
+        self._record(label, estimated, response, time.time() - start, reused=False)
+        return _response_value(_response_value(response, 'message', {}), 'content', '')
+
+    # ----- reporting ------------------------------------------------------
+
+    def _record(self, label: str, estimated: int, response, wall_seconds: float, reused: bool):
+        actual = _response_value(response, 'prompt_eval_count', 0) or 0
+        prompt_ms = (_response_value(response, 'prompt_eval_duration', 0) or 0) / 1e6
+        load_ms = (_response_value(response, 'load_duration', 0) or 0) / 1e6
+        total_ms = (_response_value(response, 'total_duration', 0) or 0) / 1e6 or wall_seconds * 1000
+
+        with self._lock:
+            stats = self._stats.setdefault(label, {'calls': 0, 'estimated_tokens': 0, 'prompt_tokens': 0,
+                                                   'prompt_eval_ms': 0.0, 'total_ms': 0.0, 'reused_context': 0})
+            stats['calls'] += 1
+            stats['estimated_tokens'] += estimated
+            stats['prompt_tokens'] += actual
+            stats['prompt_eval_ms'] += prompt_ms
+            stats['total_ms'] += total_ms
+            stats['reused_context'] += int(reused)
+            # Calibrate the chars-per-token estimate from real counts (full prompts only)
+            if actual and not reused and estimated:
+                observed = self.chars_per_token * estimated / actual
+                self.chars_per_token = 0.9 * self.chars_per_token + 0.1 * min(6.0, max(2.0, observed))
+            self._calls += 1
+            log_summary = self.summary_interval and self._calls % self.summary_interval == 0
+
+        logger.info(f"📏 PROMPT TOKENS [{label}]: estimated={estimated}, evaluated={actual}, "
+                    f"prompt_eval={prompt_ms:.0f}ms, load={load_ms:.0f}ms, total={total_ms:.0f}ms"
+                    f"{', shared prefix reused' if reused else ''}")
+        if log_summary:
+            for name, row in self.summary().items():
+                logger.info(f"📏 PROMPT SUMMARY [{name}]: {row}")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Average prompt size and latency per call label"""
+        with self._lock:
+            result = {}
+            for label, stats in self._stats.items():
+                calls = stats['calls'] or 1
+                result[label] = {
+                    'calls': stats['calls'],
+                    'avg_estimated_tokens': round(stats['estimated_tokens'] / calls, 1),
+                    'avg_prompt_tokens': round(stats['prompt_tokens'] / calls, 1),
+                    'avg_prompt_eval_ms': round(stats['prompt_eval_ms'] / calls, 1),
+                    'avg_total_ms': round(stats['total_ms'] / calls, 1),
+                    'reused_context': stats['reused_context'],
+                }
+            return result
@@ -53,6 +53,12 @@ Examples:
         help='Automatically resume from previous progress without prompting'
     )
     
+    parser.add_argument(
+        '--fast-startup',
+        action='store_true',
+        help='Load state files in the background and reuse the warm snapshot from the last start'
+    )
+    
     return parser.parse_args()
 
 def main():
@@ -108,13 +114,16 @@ def main():
             'qwen2.5-coder:7b',  # Default Ollama model
             max_concurrent=8,
             progress_file=progress_file,
-            results_file=results_file
+            results_file=results_file,
+            lazy_startup=args.fast_startup
         )
         
         # Force cleanup on startup to ensure clean slate
-        print("🧹 Performing startup cleanup...")
-        generator.force_cleanup()
-        print("✅ Startup cleanup completed")
+        # (fast startup already runs it in the background after loading state)
+        if not args.fast_startup:
+            print("🧹 Performing startup cleanup...")
+            generator.force_cleanup()
+            print("✅ Startup cleanup completed")
         
         # Configuration
         all_regions = ['USA', 'GLB', 'EUR', 'ASI', 'CHN']
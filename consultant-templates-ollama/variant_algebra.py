@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Variant algebra for exploit-phase template variations.
+
+WorldQuant Brain rescales every alpha vector to the book size, so a positive
+constant multiple of an expression trades exactly the same portfolio, and a
+negative multiple trades the mirrored portfolio: Sharpe, fitness, returns and
+margin flip sign, turnover is unchanged and the long/short counts swap.
+
+Expressions are parsed into a small AST and reduced to ``k * core``, where the
+outer sign and constant factors (``-x``, ``subtract(0, x)``, ``multiply(c, x)``,
+``x / c``, ...) are collected in ``k``. Once a core has been simulated under a
+given region, delay and neutralization, every other variant of the same core is
+derived from the stored metrics instead of being sent to the simulator.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_TOKEN_RE = re.compile(r'\s*(?:(\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?|([A-Za-z_][A-Za-z0-9_.]*)|(<=|>=|==|!=|[-+*/(),=<>]))')
+
+Node = tuple
+
+
+class ExpressionParseError(ValueError):
+    pass
+
+
+def _tokenize(expression: str) -> List[str]:
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match or match.end() == position:
+            raise ExpressionParseError(f"Unexpected character at {position}: {expression[position:position + 10]!r}")
+        tokens.append(match.group(0).strip())
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser for single FASTEXPR expressions
+
+    Statements (``;``) and ternaries (``?:``) are not supported; such templates
+    simply bypass the algebra and are simulated as before.
+    """
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.index = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def take(self, expected: Optional[str] = None) -> str:
+        token = self.peek()
+        if token is None or (expected is not None and token != expected):
+            raise ExpressionParseError(f"Expected {expected or 'token'}, got {token}")
+        self.index += 1
+        return token
+
+    def parse(self) -> Node:
+        node = self.comparison()
+        if self.peek() is not None:
+            raise ExpressionParseError(f"Trailing token {self.peek()}")
+        return node
+
+    def comparison(self) -> Node:
+        node = self.additive()
+        while self.peek() in ('<', '>', '<=', '>=', '==', '!='):
+            op = self.take()
+            node = ('bin', op, node, self.additive())
+        return node
+
+    def additive(self) -> Node:
+        node = self.term()
+        while self.peek() in ('+', '-'):
+            op = self.take()
+            node = ('bin', op, node, self.term())
+        return node
+
+    def term(self) -> Node:
+        node = self.unary()
+        while self.peek() in ('*', '/'):
+            op = self.take()
+            node = ('bin', op, node, self.unary())
+        return node
+
+    def unary(self) -> Node:
+        if self.peek() == '-':
+            self.take()
+            return ('neg', self.unary())
+        if self.peek() == '+':
+            self.take()
+            return self.unary()
+        return self.primary()
+
+    def primary(self) -> Node:
+        token = self.take()
+        if token == '(':
+            node = self.comparison()
+            self.take(')')
+            return node
+        if token[0].isdigit() or token[0] == '.':
+            return ('num', float(token))
+        if not (token[0].isalpha() or token[0] == '_'):
+            raise ExpressionParseError(f"Unexpected token {token}")
+        if self.peek() != '(':
+            return ('name', token)
+        self.take('(')
+        args = []
+        if self.peek() != ')':
+            while True:
+                args.append(self.argument())
+                if self.peek() == ',':
+                    self.take()
+                    continue
+                break
+        self.take(')')
+        return ('call', token, tuple(args))
+
+    def argument(self) -> Node:
+        # Keyword arguments such as ``winsorize(x, std=4)``
+        if (self.index + 1 < len(self.tokens) and self.tokens[self.index + 1] == '='
+                and self.peek()[0].isalpha()):
+            name = self.take()
+            self.take('=')
+            return ('kw', name, self.comparison())
+        return self.comparison()
+
+
+def parse_expression(expression: str) -> Node:
+    return _Parser(_tokenize(expression)).parse()
+
+
+def render(node: Node) -> str:
+    """Canonical text for an AST; equal cores render identically whatever the spacing"""
+    kind = node[0]
+    if kind == 'num':
+        return repr(int(node[1])) if float(node[1]).is_integer() else repr(node[1])
+    if kind == 'name':
+        return node[1]
+    if kind == 'neg':
+        return f"-({render(node[1])})"
+    if kind == 'kw':
+        return f"{node[1]}={render(node[2])}"
+    if kind == 'bin':
+        return f"({render(node[2])}{node[1]}{render(node[3])})"
+    return f"{node[1]}({','.join(render(arg) for arg in node[2])})"
+
+
+def _number(node: Node) -> Optional[float]:
+    """Value of a numeric literal, including a negated one"""
+    if node[0] == 'num':
+        return node[1]
+    if node[0] == 'neg' and node[1][0] == 'num':
+        return -node[1][1]
+    return None
+
+
+def factor_out_scale(node: Node) -> Tuple[float, Node]:
+    """Split an expression into ``(k, core)`` with ``expression == k * core``"""
+    scale = 1.0
+    while True:
+        kind = node[0]
+        if kind == 'neg':
+            scale, node = -scale, node[1]
+            continue
+        if kind == 'bin' and node[1] in ('*', '/', '-'):
+            op, left, right = node[1], node[2], node[3]
+            left_value, right_value = _number(left), _number(right)
+            if op == '*' and left_value is not None and right_value is None:
+                scale, node = scale * left_value, right
+                continue
+            if op == '*' and right_value is not None and left_value is None:
+                scale, node = scale * right_value, left
+                continue
+            if op == '/' and right_value and left_value is None:
+                scale, node = scale / right_value, left
+                continue
+            if op == '-' and left_value == 0 and right_value is None:
+                scale, node = -scale, right
+                continue
+        if kind == 'call' and len(node[2]) == 2 and not any(arg[0] == 'kw' for arg in node[2]):
+            name, (first, second) = node[1], node[2]
+            first_value, second_value = _number(first), _number(second)
+            if name == 'multiply' and first_value is not None and second_value is None:
+                scale, node = scale * first_value, second
+                continue
+            if name == 'multiply' and second_value is not None and first_value is None:
+                scale, node = scale * second_value, first
+                continue
+            if name == 'divide' and second_value and first_value is None:
+                scale, node = scale / second_value, first
+                continue
+            if name == 'subtract' and first_value == 0 and second_value is None:
+                scale, node = -scale, second
+                continue
+        return scale, node
+
+
+def decompose(expression: str) -> Optional[Tuple[float, str]]:
+    """``(k, canonical core)`` for an expression, or None if it can't be reasoned about"""
+    try:
+        scale, core = factor_out_scale(parse_expression(expression))
+    except (ExpressionParseError, RecursionError, ValueError):
+        return None
+    if scale == 0:
+        return None
+    return scale, render(core)
+
+
+def max_drawdown(cumulative_pnl: Sequence[float]) -> float:
+    peak = None
+    worst = 0.0
+    for value in cumulative_pnl:
+        peak = value if peak is None else max(peak, value)
+        worst = max(worst, peak - value)
+    return worst
+
+
+def derive_metrics(parent: Dict, ratio: float, parent_pnl: Optional[Sequence[float]] = None) -> Dict:
+    """Metrics of ``ratio * parent`` from the parent's simulated metrics
+
+    A positive ratio leaves everything unchanged. A negative ratio mirrors the
+    PnL; drawdown of the mirrored curve needs the parent's PnL series and keeps
+    the parent's value when that was never fetched.
+    """
+    metrics = dict(parent)
+    if ratio > 0:
+        return metrics
+    for key in ('sharpe', 'fitness', 'returns', 'margin'):
+        metrics[key] = -(parent.get(key) or 0)
+    metrics['longCount'], metrics['shortCount'] = parent.get('shortCount', 0), parent.get('longCount', 0)
+    if parent_pnl:
+        parent_drawdown = max_drawdown(parent_pnl)
+        mirrored_drawdown = max_drawdown([-value for value in parent_pnl])
+        if parent_drawdown > 0:
+            metrics['drawdown'] = parent.get('drawdown', 0) * mirrored_drawdown / parent_drawdown
+    return metrics
+
+
+class VariantAlgebra:
+    """Remembers simulated cores and derives the metrics of their trivial variants"""
+
+    METRIC_KEYS = ('sharpe', 'fitness', 'turnover', 'returns', 'drawdown', 'margin', 'longCount', 'shortCount')
+
+    def __init__(self, max_entries: int = 5000, max_pnl_series: int = 500):
+        self.max_entries = max_entries
+        self.max_pnl_series = max_pnl_series
+        self._entries = OrderedDict()  # {(core, region, delay, neutralization): entry}
+        self._pnl = OrderedDict()  # {alpha_id: cumulative pnl values}
+        self._lock = threading.Lock()
+        self.derived_count = 0
+
+    @staticmethod
+    def _key(core: str, region: str, delay: int, neutralization: str):
+        return core, region, int(delay), neutralization or 'INDUSTRY'
+
+    def record(self, template: str, region: str, delay: int, neutralization: str, metrics: Dict,
+               alpha_id: str = "", success: bool = True) -> bool:
+        """Store a simulated result as the reference for its core"""
+        decomposed = decompose(template)
+        if decomposed is None:
+            return False
+        scale, core = decomposed
+        entry = {
+            'template': template,
+            'scale': scale,
+            'metrics': {key: metrics.get(key, 0) or 0 for key in self.METRIC_KEYS},
+            'alpha_id': alpha_id,
+            'success': success,
+        }
+        key = self._key(core, region, delay, neutralization)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def record_pnl(self, alpha_id: str, pnl_values: Sequence[float]):
+        if not alpha_id or not pnl_values:
+            return
+        with self._lock:
+            self._pnl[alpha_id] = list(pnl_values)
+            while len(self._pnl) > self.max_pnl_series:
+                self._pnl.popitem(last=False)
+
+    def derive(self, template: str, region: str, delay: int, neutralization: str) -> Optional[Dict]:
+        """Derived metrics for a template whose core was already simulated, else None
+
+        The returned dict has the metrics plus ``parent_template``, ``ratio``,
+        ``parent_success`` and ``parent_alpha_id``.
+        """
+        decomposed = decompose(template)
+        if decomposed is None:
+            return None
+        scale, core = decomposed
+        with self._lock:
+            entry = self._entries.get(self._key(core, region, delay, neutralization))
+            if entry is None:
+                return None
+            pnl = self._pnl.get(entry['alpha_id'])
+            self.derived_count += 1
+        ratio = scale / entry['scale']
+        derived = derive_metrics(entry['metrics'], ratio, pnl)
+        derived.update({
+            'parent_template': entry['template'],
+            'ratio': ratio,
+            'parent_success': entry['success'],
+            'parent_alpha_id': entry['alpha_id'],
+        })
+        return derived
+
+    def partition(self, variations: List[Dict], region: str, delay: int,
+                  default_neutralization: str = 'INDUSTRY') -> Tuple[List[Dict], List[Tuple[Dict, Dict]]]:
+        """Split variations into (to_simulate, [(variation, derived_metrics), ...])
+
+        Variations in the same batch that only differ by a constant factor are
+        also collapsed: only the first of each core is simulated.
+        """
+        to_simulate = []
+        derived = []
+        pending_cores = set()
+        for variation in variations:
+            neutralization = variation.get('neutralization', default_neutralization)
+            metrics = self.derive(variation['template'], region, delay, neutralization)
+            if metrics is not None:
+                derived.append((variation, metrics))
+                continue
+            decomposed = decompose(variation['template'])
+            if decomposed is not None:
+                key = self._key(decomposed[1], region, delay, neutralization)
+                if key in pending_cores:
+                    continue
+                pending_cores.add(key)
+            to_simulate.append(variation)
+        return to_simulate, derived
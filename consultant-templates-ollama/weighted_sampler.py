@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Incremental weighted sampling for data field and operator selection.
+
+Selection weights live in Fenwick (binary indexed) trees, so one weighted draw
+and one weight update each cost O(log N) instead of rescoring and re-sorting the
+whole field or operator list for every template slot.
+
+Every index keeps a few named weight *components* (pyramid base, random
+exploration score, rare score, usage tier, ...). A draw mixes the components
+with caller supplied coefficients, which is how the generator switches between
+the random_exploration and rare_focused strategies without rebuilding anything:
+only the coefficients change.
+"""
+
+import random
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+
+class FenwickTree:
+    """Prefix sums over non-negative weights with O(log N) update and search"""
+
+    def __init__(self, weights: Sequence[float]):
+        self._values = [max(0.0, float(w)) for w in weights]
+        self._size = len(self._values)
+        self._tree = [0.0] * (self._size + 1)
+        self._rebuild()
+
+    def _rebuild(self):
+        tree = [0.0] + list(self._values)
+        for i in range(1, self._size + 1):
+            parent = i + (i & -i)
+            if parent <= self._size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._updates = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, index: int) -> float:
+        return self._values[index]
+
+    def set(self, index: int, weight: float):
+        weight = max(0.0, float(weight))
+        delta = weight - self._values[index]
+        if delta == 0.0:
+            return
+        self._values[index] = weight
+        i = index + 1
+        while i <= self._size:
+            self._tree[i] += delta
+            i += i & -i
+        # Rebuild now and then so float drift from add/subtract cycles can't accumulate
+        self._updates += 1
+        if self._updates > 4 * self._size + 64:
+            self._rebuild()
+
+    def total(self) -> float:
+        total = 0.0
+        i = self._size
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, target: float) -> int:
+        """Smallest index whose prefix sum exceeds target"""
+        pos = 0
+        step = 1 << self._size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self._size and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return min(pos, self._size - 1)
+
+
+class WeightedSampler:
+    """Weighted draws without replacement over a fixed key set and named weight components
+
+    Safe to share between threads: draws temporarily zero weights in the trees,
+    so draws, updates and reads all hold the sampler lock.
+    """
+
+    def __init__(self, keys: Sequence[str], components: Dict[str, Sequence[float]]):
+        self._lock = threading.Lock()
+        self._keys = list(keys)
+        self._positions = {key: i for i, key in enumerate(self._keys)}
+        self._trees = {}
+        for name, weights in components.items():
+            if len(weights) != len(self._keys):
+                raise ValueError(f"Component '{name}' has {len(weights)} weights for {len(self._keys)} keys")
+            self._trees[name] = FenwickTree(weights)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._positions
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._keys)
+
+    def get_weight(self, key: str, component: str) -> float:
+        with self._lock:
+            return self._trees[component].get(self._positions[key])
+
+    def set_weight(self, key: str, component: str, weight: float):
+        with self._lock:
+            self._trees[component].set(self._positions[key], weight)
+
+    def weight(self, key: str, mix: Dict[str, float]) -> float:
+        """Mixed weight of one key, i.e. its unnormalised draw probability"""
+        index = self._positions[key]
+        with self._lock:
+            return sum(coef * self._trees[name].get(index) for name, coef in mix.items() if coef > 0)
+
+    def mass(self, mix: Dict[str, float]) -> float:
+        with self._lock:
+            return sum(coef * self._trees[name].total() for name, coef in mix.items() if coef > 0)
+
+    def sample(self, k: int, mix: Dict[str, float], rng: Optional[random.Random] = None,
+               exclude: Optional[Iterable[str]] = None) -> List[str]:
+        """Draw up to k distinct keys with probability proportional to their mixed weight"""
+        rng = rng or random
+        active = [(name, coef) for name, coef in mix.items() if coef > 0 and name in self._trees]
+        if k <= 0 or not active or not self._keys:
+            return []
+        with self._lock:
+            return self._sample(k, active, rng, exclude)
+
+    def _sample(self, k: int, active: List, rng, exclude: Optional[Iterable[str]]) -> List[str]:
+        # Drawn (and excluded) keys are zeroed for the duration of the call and
+        # restored afterwards, which keeps sampling without replacement O(k log N)
+        saved = {}
+
+        def hide(index: int):
+            if index in saved:
+                return
+            saved[index] = [(name, self._trees[name].get(index)) for name, _ in active]
+            for name, _ in active:
+                self._trees[name].set(index, 0.0)
+
+        for key in exclude or ():
+            index = self._positions.get(key)
+            if index is not None:
+                hide(index)
+
+        drawn = []
+        misses = 0
+        try:
+            while len(drawn) < k and misses < 8:
+                masses = [(name, coef, coef * self._trees[name].total()) for name, coef in active]
+                total = sum(m for _, _, m in masses)
+                if total <= 1e-12:
+                    break
+                target = rng.random() * total
+                chosen = None
+                last = len(masses) - 1
+                for position, (name, coef, component_mass) in enumerate(masses):
+                    if component_mass > 0 and (target < component_mass or position == last):
+                        tree = self._trees[name]
+                        index = tree.find(min(target, component_mass) / coef)
+                        if tree.get(index) > 0.0:
+                            chosen = index
+                        break
+                    target -= component_mass
+                if chosen is None:
+                    # Float rounding landed on a zero-weight slot (or only drift is
+                    # left in the tree); retry a few times before giving up
+                    misses += 1
+                    continue
+                misses = 0
+                drawn.append(self._keys[chosen])
+                hide(chosen)
+        finally:
+            for index, values in saved.items():
+                for name, value in values:
+                    self._trees[name].set(index, value)
+        return drawn
+
+
+def field_usage_score(field: Dict) -> int:
+    """Platform usage of a data field: users plus alphas"""
+    return field.get('userCount', 0) + field.get('alphaCount', 0)
+
+
+def random_tier_score(user_count: int, alpha_count: int) -> float:
+    """Random exploration component - favors diverse field usage"""
+    if user_count == 0 and alpha_count == 0:
+        return 4.0
+    if user_count <= 10 and alpha_count <= 20:
+        return 3.0
+    if user_count <= 50 and alpha_count <= 100:
+        return 2.0
+    if user_count <= 200 and alpha_count <= 500:
+        return 1.0
+    return 0.1
+
+
+def rare_tier_score(user_count: int, alpha_count: int) -> float:
+    """Rare field component - favors undiscovered fields"""
+    if user_count == 0 and alpha_count == 0:
+        return 5.0
+    if user_count <= 2 and alpha_count <= 5:
+        return 4.0
+    if user_count <= 10 and alpha_count <= 20:
+        return 3.0
+    if user_count <= 50 and alpha_count <= 100:
+        return 2.0
+    if user_count <= 200 and alpha_count <= 500:
+        return 1.0
+    return 0.1
+
+
+def is_overused(user_count: int, alpha_count: int) -> bool:
+    return user_count > 500 or alpha_count > 1000
+
+
+def usage_category(user_count: int, alpha_count: int) -> str:
+    """GEM (users <= 5, alphas <= 10), MODERATE (users <= 50, alphas <= 100) or POPULAR"""
+    if user_count <= 5 and alpha_count <= 10:
+        return "GEM"
+    if user_count <= 50 and alpha_count <= 100:
+        return "MODERATE"
+    return "POPULAR"
+
+
+class FieldSamplingIndex:
+    """Sampling index over the data fields of one (region, delay)
+
+    Components:
+        base      pyramid multiplier, minus the overuse penalty, plus a success bonus
+        random    random exploration tier score
+        rare      rare field tier score
+        gem / moderate / popular
+                  pyramid multiplier of fields in that usage category, 0 elsewhere
+        low / medium / high
+                  1.0 for fields in that usage third (ranked once at build time)
+
+    The strategy score of the old ``_prioritize_fields`` is exactly
+    ``base + w_random * random + w_rare * rare``, see ``strategy_mix``.
+    """
+
+    OVERUSE_PENALTY = 2.0
+    SUCCESS_BONUS = 0.25
+    MIN_BASE_WEIGHT = 0.05
+
+    def __init__(self, fields: List[Dict], region: str = None, delay: int = None,
+                 history: Optional['FieldSamplingIndex'] = None):
+        self.region = region
+        self.delay = delay
+        self._fields = {}
+        # Local usage and successes survive a rebuild when the previous index is passed in
+        self._local_alphas = dict(history._local_alphas) if history else {}
+        self._successes = dict(history._successes) if history else {}
+        self._categories = {}
+        self.category_counts = {"GEM": 0, "MODERATE": 0, "POPULAR": 0}
+        # Usage is recorded from generator worker threads
+        self._lock = threading.Lock()
+
+        unique = []
+        for field in fields:
+            field_id = field.get('id')
+            if field_id and field_id not in self._fields:
+                self._fields[field_id] = field
+                unique.append(field)
+
+        # Usage thirds are ranked once here; the old code re-sorted on every call
+        ranked = sorted(unique, key=field_usage_score)
+        third = len(ranked) // 3
+        tiers = {}
+        for rank, field in enumerate(ranked):
+            tiers[field['id']] = "low" if rank < third else "medium" if rank < 2 * third else "high"
+
+        keys = [field['id'] for field in unique]
+        components = {name: [] for name in ("base", "random", "rare", "gem", "moderate", "popular",
+                                            "low", "medium", "high")}
+        for field in unique:
+            weights = self._component_weights(field['id'])
+            for name in ("base", "random", "rare", "gem", "moderate", "popular"):
+                components[name].append(weights[name])
+            for tier in ("low", "medium", "high"):
+                components[tier].append(1.0 if tiers[field['id']] == tier else 0.0)
+            category = self._usage_category(field['id'])
+            self._categories[field['id']] = category
+            self.category_counts[category] += 1
+
+        self._sampler = WeightedSampler(keys, components)
+        self._ids = frozenset(keys)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __contains__(self, field_id: str) -> bool:
+        return field_id in self._fields
+
+    def matches(self, fields: List[Dict]) -> bool:
+        """True if the index was built from exactly these fields"""
+        return {field.get('id') for field in fields} == self._ids
+
+    def get_field(self, field_id: str) -> Optional[Dict]:
+        return self._fields.get(field_id)
+
+    def counts(self, field_id: str):
+        """(users, alphas) including alphas this generator has produced locally"""
+        field = self._fields[field_id]
+        return field.get('userCount', 0), field.get('alphaCount', 0) + self._local_alphas.get(field_id, 0)
+
+    def _usage_category(self, field_id: str) -> str:
+        return usage_category(*self.counts(field_id))
+
+    def _component_weights(self, field_id: str) -> Dict[str, float]:
+        users, alphas = self.counts(field_id)
+        pyramid = self._fields[field_id].get('pyramidMultiplier', 1.0) or 1.0
+        base = pyramid + self.SUCCESS_BONUS * self._successes.get(field_id, 0)
+        if is_overused(users, alphas):
+            base -= self.OVERUSE_PENALTY
+        category = usage_category(users, alphas)
+        return {
+            "base": max(self.MIN_BASE_WEIGHT, base),
+            "random": random_tier_score(users, alphas),
+            "rare": rare_tier_score(users, alphas),
+            "gem": pyramid if category == "GEM" else 0.0,
+            "moderate": pyramid if category == "MODERATE" else 0.0,
+            "popular": pyramid if category == "POPULAR" else 0.0,
+        }
+
+    def _refresh(self, field_id: str):
+        for name, weight in self._component_weights(field_id).items():
+            self._sampler.set_weight(field_id, name, weight)
+        category = self._usage_category(field_id)
+        previous = self._categories[field_id]
+        if category != previous:
+            self.category_counts[previous] -= 1
+            self.category_counts[category] += 1
+            self._categories[field_id] = category
+
+    def record_usage(self, field_id: str, count: int = 1):
+        """Count a locally generated alpha against a field - O(log N)"""
+        if field_id not in self._fields:
+            return
+        with self._lock:
+            self._local_alphas[field_id] = self._local_alphas.get(field_id, 0) + count
+            self._refresh(field_id)
+
+    def record_success(self, field_id: str):
+        """Reward a field that appeared in a successful simulation - O(log N)"""
+        if field_id not in self._fields:
+            return
+        with self._lock:
+            self._successes[field_id] = self._successes.get(field_id, 0) + 1
+            self._refresh(field_id)
+
+    @staticmethod
+    def strategy_mix(strategy_weights: Dict[str, float]) -> Dict[str, float]:
+        """Component mix reproducing the dynamic field strategy score"""
+        return {"base": 1.0, "random": strategy_weights['random'], "rare": strategy_weights['rare']}
+
+    def score(self, field_id: str, mix: Dict[str, float]) -> float:
+        return self._sampler.weight(field_id, mix)
+
+    def category(self, field_id: str) -> str:
+        return self._categories[field_id]
+
+    def sample(self, k: int, mix: Dict[str, float], rng: Optional[random.Random] = None,
+               exclude: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Draw up to k distinct fields proportional to the mixed component weights"""
+        return [self._fields[field_id] for field_id in self._sampler.sample(k, mix, rng=rng, exclude=exclude)]
+
+
+OPERATOR_CATEGORIES = ("two_field", "arithmetic", "time_series", "ranking", "normalization")
+
+
+def operator_category(operator: Dict) -> str:
+    """Category used by get_diverse_operators"""
+    op_name = operator['name'].lower()
+    op_def = operator.get('definition', '').lower()
+    if 'x, y' in op_def or op_name in ['add', 'subtract', 'multiply', 'divide', 'ts_corr', 'ts_regression']:
+        return "two_field"
+    if 'ts_' in op_name:
+        return "time_series"
+    if any(rank_word in op_name for rank_word in ['rank', 'percentile', 'quantile']):
+        return "ranking"
+    if any(norm_word in op_name for norm_word in ['normalize', 'zscore', 'standardize']):
+        return "normalization"
+    return "arithmetic"
+
+
+class OperatorSamplingIndex:
+    """Sampling index over operators, weighted towards the least used ones
+
+    Each operator weighs ``1 / (1 + usage)`` in its category component, and 0
+    while it is blacklisted or at the usage cap.
+    """
+
+    def __init__(self, operators: List[Dict], usage_count: Dict[str, int], blacklist: Iterable[str],
+                 max_usage: int):
+        self.max_usage = max_usage
+        self.source = operators
+        self._operators = {}
+        self._categories = {}
+        self._usage = dict(usage_count)
+        self._blacklist = set(blacklist)
+        self._lock = threading.Lock()
+        keys = []
+        for op in operators:
+            if op['name'] in self._operators:
+                continue
+            self._operators[op['name']] = op
+            self._categories[op['name']] = operator_category(op)
+            keys.append(op['name'])
+        components = {category: [] for category in OPERATOR_CATEGORIES}
+        for name in keys:
+            weight = self._weight(name)
+            for category in OPERATOR_CATEGORIES:
+                components[category].append(weight if self._categories[name] == category else 0.0)
+        self._sampler = WeightedSampler(keys, components)
+
+    def __len__(self) -> int:
+        return len(self._operators)
+
+    def _weight(self, name: str) -> float:
+        usage = self._usage.get(name, 0)
+        if name in self._blacklist or usage >= self.max_usage:
+            return 0.0
+        return 1.0 / (1.0 + usage)
+
+    def _refresh(self, name: str):
+        if name in self._operators:
+            self._sampler.set_weight(name, self._categories[name], self._weight(name))
+
+    def set_usage(self, name: str, usage: int):
+        with self._lock:
+            self._usage[name] = usage
+            self._refresh(name)
+
+    def set_blacklisted(self, name: str, blacklisted: bool):
+        with self._lock:
+            if blacklisted:
+                self._blacklist.add(name)
+            else:
+                self._blacklist.discard(name)
+            self._refresh(name)
+
+    def available_mass(self) -> float:
+        return self._sampler.mass({category: 1.0 for category in OPERATOR_CATEGORIES})
+
+    def sample(self, k: int, categories: Iterable[str] = OPERATOR_CATEGORIES,
+               rng: Optional[random.Random] = None, exclude: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Draw up to k distinct available operators from the given categories"""
+        mix = {category: 1.0 for category in categories}
+        return [self._operators[name] for name in self._sampler.sample(k, mix, rng=rng, exclude=exclude)]
@@ -11,6 +11,7 @@ from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import ast
+import os
 import sys
 
 # Load environment variables from .env file if it exists
@@ -27,6 +28,15 @@ try:
     VECTOR_DB_AVAILABLE = True
 except ImportError:
     VECTOR_DB_AVAILABLE = False
+
+# Import offline vector index
+try:
+    from local_vector_index import LocalWorldQuantMinerQuery
+    LOCAL_VECTOR_DB_AVAILABLE = True
+except ImportError:
+    LOCAL_VECTOR_DB_AVAILABLE = False
+
+if not VECTOR_DB_AVAILABLE and not LOCAL_VECTOR_DB_AVAILABLE:
     print("Warning: Vector database query tool not available. Field suggestions will be limited.")
 
 class OperatorCategory(Enum):
@@ -75,13 +85,34 @@ class AlphaAnalyzer:
         self.operator_dict = {op.name: op for op in self.operators}
         
         # Initialize vector database client if available
-        self.vector_db = None
-        if VECTOR_DB_AVAILABLE:
+        self.vector_db = self._connect_vector_db(os.getenv("VECTOR_DB_BACKEND", "auto"))
+    
+    def _connect_vector_db(self, backend: str):
+        """
+        Connect to the configured vector database.
+        
+        Args:
+            backend (str): "local" for the offline index, "pinecone" for the hosted
+                index, or "auto" to use the local index when one has been built
+                and fall back to Pinecone otherwise.
+        """
+        if backend in ("local", "auto") and LOCAL_VECTOR_DB_AVAILABLE:
             try:
-                self.vector_db = WorldQuantMinerQuery()
+                return LocalWorldQuantMinerQuery()
+            except Exception as e:
+                if backend == "local":
+                    print(f"Warning: Could not open local vector index: {e}")
+                    return None
+        
+        if backend in ("pinecone", "auto") and VECTOR_DB_AVAILABLE:
+            try:
+                vector_db = WorldQuantMinerQuery()
                 print("Vector database connected for field suggestions")
+                return vector_db
             except Exception as e:
                 print(f"Warning: Could not connect to vector database: {e}")
+        
+        return None
     
     def _load_operators(self, filename: str) -> List[Operator]:
         """Load operator definitions from JSON file."""
@@ -245,9 +276,7 @@ class AlphaAnalyzer:
                     f"volume correlation price relationship"
                 ]
                 
-                for prompt in volume_prompts:
-                    volume_results = self.vector_db.search_by_text(prompt, top_k=5)
-                    
+                for volume_results in self.vector_db.search_by_text_batch(volume_prompts, top_k=5):
                     for result in volume_results:
                         if hasattr(result, 'fields'):
                             metadata = result.fields
@@ -286,24 +315,33 @@ class AlphaAnalyzer:
             except Exception as e:
                 print(f"Error searching for volume fields: {e}")
         
+        # Create context-aware search prompts for each field
+        context_prompts = {}
+        for field in fields:
+            context_prompts[field] = [
+                f"{field} related market data fields",
+                f"{field} alternative data variables",
+                f"{field} fundamental analysis fields",
+                f"{field} technical indicators"
+            ]
+            
+            # If improvement request is provided, add it to context
+            if improvement_request:
+                context_prompts[field].append(f"{field} {improvement_request} related fields")
+        
+        # Answer the prompts of all fields in one batch
+        batch_results = {}
+        try:
+            all_prompts = [prompt for prompts in context_prompts.values() for prompt in prompts]
+            batch_results = dict(zip(all_prompts, self.vector_db.search_by_text_batch(all_prompts, top_k=3)))
+        except Exception as e:
+            print(f"Error searching for related fields: {e}")
+        
         for field in fields:
             try:
-                # Create context-aware search prompts for each field
-                context_prompts = [
-                    f"{field} related market data fields",
-                    f"{field} alternative data variables",
-                    f"{field} fundamental analysis fields",
-                    f"{field} technical indicators"
-                ]
-                
-                # If improvement request is provided, add it to context
-                if improvement_request:
-                    context_prompts.append(f"{field} {improvement_request} related fields")
-                
                 all_results = []
-                for prompt in context_prompts:
-                    results = self.vector_db.search_by_text(prompt, top_k=3)
-                    all_results.extend(results)
+                for prompt in context_prompts[field]:
+                    all_results.extend(batch_results.get(prompt, []))
                 
                 # Remove duplicates and take top results
                 seen_fields = set()
@@ -731,8 +769,7 @@ class AlphaAnalyzer:
                 ]
                 
                 all_operator_results = []
-                for prompt in operator_prompts:
-                    operator_results = self.vector_db.search_operators(prompt, top_k=5)
+                for operator_results in self.vector_db.search_operators_batch(operator_prompts, top_k=5):
                     all_operator_results.extend(operator_results)
                 
                 # Remove duplicates and take top results
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Local Vector Index
+An offline, memory-mapped embedding index for operator and data-field
+semantic search, usable as a drop-in replacement for the Pinecone client.
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_INDEX_DIR = ".vector_index"
+NAMESPACES = ("operators", "data-fields")
+
+
+@dataclass
+class LocalMatch:
+    """
+    A search hit in the same shape as a Pinecone query match
+    (``id``, ``score`` and ``metadata``), so existing callers work unchanged.
+    """
+    id: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class HashingEmbedder:
+    """
+    Deterministic feature-hashing embedder.
+
+    Words and character trigrams are hashed into a fixed number of signed
+    buckets. No model download is needed and the same text always maps to
+    the same vector, which makes it suitable for tests and air-gapped hosts.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+        self.spec = f"hashing:{dimensions}"
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        features = list(words)
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vectors[row, bucket] += sign
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """
+    Local sentence-transformers embedder (model is loaded on first use).
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        self.model_name = model_name
+        self.name = f"st-{model_name.replace('/', '_')}"
+        self.spec = f"st:{model_name}"
+        self._model = None
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+        vectors = self._model.encode(list(texts), batch_size=64, convert_to_numpy=True)
+        return _normalize(vectors.astype(np.float32))
+
+
+def get_embedder(name: Optional[str] = None):
+    """
+    Create an embedder from a name such as ``hashing`` or ``st:<model>``.
+
+    Args:
+        name (str): Embedder spec. Defaults to the LOCAL_EMBEDDER environment variable, then ``hashing``.
+    """
+    name = name or os.getenv("LOCAL_EMBEDDER", "hashing")
+    if name.startswith("st:"):
+        return SentenceTransformerEmbedder(name[3:])
+    if name.startswith("hashing"):
+        dimensions = int(name.split(":", 1)[1]) if ":" in name else 512
+        return HashingEmbedder(dimensions)
+    raise ValueError(f"Unknown embedder: {name}")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Embedding cache keyed by the SHA-1 of the input text.
+
+    Entries are persisted per embedder so that repeated query prompts (the
+    analyzer reuses the same prompt templates) are embedded only once.
+    """
+
+    def __init__(self, embedder, cache_dir: Optional[str] = None):
+        self.embedder = embedder
+        self.path = os.path.join(cache_dir, f"embedding_cache_{embedder.name}.npz") if cache_dir else None
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        if self.path and os.path.exists(self.path):
+            with np.load(self.path) as data:
+                self._vectors = dict(zip(data["keys"].tolist(), data["vectors"]))
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed texts, computing only the ones not already cached.
+
+        Returns:
+            float32 array of shape (len(texts), dimensions)
+        """
+        keys = [_text_hash(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._vectors and key not in missing:
+                missing[key] = text
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+
+        if missing:
+            vectors = self.embedder.embed(list(missing.values()))
+            for key, vector in zip(missing.keys(), vectors):
+                self._vectors[key] = vector
+            self._dirty = True
+
+        return np.stack([self._vectors[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+    def save(self):
+        """Persist the cache if anything new was embedded."""
+        if not self.path or not self._dirty or not self._vectors:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        keys = np.array(list(self._vectors.keys()))
+        vectors = np.stack(list(self._vectors.values()))
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, keys=keys, vectors=vectors)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+class NamespaceIndex:
+    """
+    Flat or IVF inner-product index over one namespace.
+
+    Vectors are L2-normalized float32 rows stored in ``vectors.npy`` and
+    opened with ``mmap_mode='r'``, so loading is instant and memory is shared
+    between processes. Namespaces larger than ``ivf_threshold`` also get a
+    k-means coarse quantizer; queries then scan only the ``nprobe`` closest
+    lists instead of every row.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "records.json"), "r") as f:
+            self.records = json.load(f)
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.centroids = None
+        self.lists = None
+        centroids_path = os.path.join(path, "centroids.npy")
+        if os.path.exists(centroids_path):
+            self.centroids = np.load(centroids_path)
+            assignments = np.load(os.path.join(path, "assignments.npy"))
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+            self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    @staticmethod
+    def build(path: str, records: List[Dict[str, Any]], vectors: np.ndarray,
+              ivf_threshold: int = 4096, seed: int = 0):
+        """
+        Write a namespace to disk.
+
+        Args:
+            path (str): Namespace directory
+            records (list): One ``{"id": ..., "metadata": {...}}`` dict per row
+            vectors (np.ndarray): Normalized embeddings, one row per record
+            ivf_threshold (int): Build an IVF quantizer above this many rows
+        """
+        os.makedirs(path, exist_ok=True)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        np.save(os.path.join(path, "vectors.npy"), vectors)
+        with open(os.path.join(path, "records.json"), "w") as f:
+            json.dump(records, f)
+
+        for name in ("centroids.npy", "assignments.npy"):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+
+        if len(vectors) > ivf_threshold:
+            centroids, assignments = _kmeans(vectors, int(np.sqrt(len(vectors))), seed=seed)
+            np.save(os.path.join(path, "centroids.npy"), centroids)
+            np.save(os.path.join(path, "assignments.npy"), assignments)
+
+    def search(self, queries: np.ndarray, top_k: int, nprobe: int = 8) -> List[List[LocalMatch]]:
+        """
+        Return the top_k matches for each row of queries.
+        """
+        if len(self.records) == 0:
+            return [[] for _ in range(len(queries))]
+
+        if self.centroids is None:
+            scores = queries @ self.vectors.T
+            return [self._top_k(row, np.arange(len(row)), top_k) for row in scores]
+
+        results = []
+        probe = min(nprobe, len(self.centroids))
+        coarse = queries @ self.centroids.T
+        for query, centroid_scores in zip(queries, coarse):
+            nearest = np.argpartition(-centroid_scores, probe - 1)[:probe]
+            candidates = np.concatenate([self.lists[i] for i in nearest])
+            if len(candidates) == 0:
+                results.append([])
+                continue
+            candidates.sort()
+            scores = self.vectors[candidates] @ query
+            results.append(self._top_k(scores, candidates, top_k))
+        return results
+
+    def _top_k(self, scores: np.ndarray, row_ids: np.ndarray, top_k: int) -> List[LocalMatch]:
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        matches = []
+        for position in best:
+            record = self.records[int(row_ids[position])]
+            matches.append(LocalMatch(id=record["id"], score=float(scores[position]),
+                                      metadata=record.get("metadata", {})))
+        return matches
+
+
+def _kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0):
+    """Spherical k-means used for the IVF coarse quantizer."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    assignments = np.zeros(len(vectors), dtype=np.int32)
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+        for cluster in range(n_clusters):
+            members = vectors[assignments == cluster]
+            if len(members):
+                centroids[cluster] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids, assignments
+
+
+class LocalVectorIndex:
+    """
+    On-disk index with one NamespaceIndex per namespace plus an embedding cache.
+    """
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR, embedder=None):
+        self.index_dir = index_dir
+        self.embedder = embedder or self._load_embedder()
+        self.cache = EmbeddingCache(self.embedder, index_dir)
+        self._namespaces: Dict[str, NamespaceIndex] = {}
+
+    def _load_embedder(self):
+        manifest_path = os.path.join(self.index_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                return get_embedder(json.load(f).get("embedder"))
+        return get_embedder()
+
+    def namespace(self, name: str) -> Optional[NamespaceIndex]:
+        if name not in self._namespaces:
+            path = os.path.join(self.index_dir, name)
+            if not os.path.exists(os.path.join(path, "vectors.npy")):
+                return None
+            self._namespaces[name] = NamespaceIndex(path)
+        return self._namespaces[name]
+
+    def add_namespace(self, name: str, records: List[Dict[str, Any]], texts: List[str],
+                      ivf_threshold: int = 4096):
+        """
+        Embed texts and (re)build a namespace from records.
+        """
+        vectors = self.cache.embed(texts) if texts else np.zeros((0, 1), dtype=np.float32)
+        NamespaceIndex.build(os.path.join(self.index_dir, name), records, vectors, ivf_threshold)
+        self._namespaces.pop(name, None)
+        with open(os.path.join(self.index_dir, "manifest.json"), "w") as f:
+            json.dump({"embedder": self.embedder.spec}, f)
+        self.cache.save()
+
+    def search(self, namespace: str, query_texts: Sequence[str], top_k: int = 10,
+               nprobe: int = 8) -> List[List[LocalMatch]]:
+        """
+        Batch search: one list of matches per query text.
+        """
+        index = self.namespace(namespace)
+        if index is None or not query_texts:
+            return [[] for _ in query_texts]
+        queries = self.cache.embed(list(query_texts))
+        return index.search(queries, top_k, nprobe)
+
+    def close(self):
+        self.cache.save()
+
+
+def operator_records(operators: List[Dict[str, Any]]):
+    """Records and embedding texts for entries of __operator__.json."""
+    records, texts = [], []
+    for op in operators:
+        metadata = {
+            "name": op.get("name", ""),
+            "category": op.get("category", ""),
+            "definition": op.get("definition", ""),
+            "description": op.get("description", "") or "",
+        }
+        records.append({"id": metadata["name"], "metadata": metadata})
+        texts.append(f"{metadata['name']} {metadata['category']} {metadata['definition']} {metadata['description']}")
+    return records, texts
+
+
+def data_field_records(fields: List[Dict[str, Any]]):
+    """Records and embedding texts for WorldQuant Brain data-field entries."""
+    records, texts = [], []
+    for data_field in fields:
+        field_id = data_field.get("id", "")
+        if not field_id:
+            continue
+        category = data_field.get("category", "")
+        if isinstance(category, dict):
+            category = category.get("name", "")
+        dataset = data_field.get("dataset", "")
+        if isinstance(dataset, dict):
+            dataset = dataset.get("name", "")
+        metadata = {
+            "id": field_id,
+            "name": data_field.get("name", field_id),
+            "category": category,
+            "dataset": dataset,
+            "description": data_field.get("description", "") or "",
+        }
+        records.append({"id": field_id, "metadata": metadata})
+        texts.append(f"{field_id.replace('_', ' ')} {metadata['description']} {category} {dataset}")
+    return records, texts
+
+
+class LocalWorldQuantMinerQuery:
+    """
+    Offline counterpart of WorldQuantMinerQuery backed by a LocalVectorIndex.
+
+    Exposes the same search methods, plus ``*_batch`` variants that embed
+    and score many queries in a single matrix product.
+    """
+
+    def __init__(self, index_dir: str = None, embedder=None):
+        index_dir = index_dir or os.getenv("LOCAL_VECTOR_INDEX_DIR", DEFAULT_INDEX_DIR)
+        if not os.path.exists(os.path.join(index_dir, "manifest.json")):
+            raise FileNotFoundError(
+                f"No local vector index at {index_dir}. Build one with: python local_vector_index.py build")
+        self.index = LocalVectorIndex(index_dir, embedder)
+        atexit.register(self.close)
+        print(f"Using local vector index: {index_dir} ({self.index.embedder.name})")
+
+    def search_by_text(self, query_text: str, top_k: int = 10, filter_dict: Optional[Dict] = None) -> List[LocalMatch]:
+        return self.search_data_fields_batch([query_text], top_k)[0]
+
+    def search_by_text_batch(self, query_texts: List[str], top_k: int = 10) -> List[List[LocalMatch]]:
+        return self.search_data_fields_batch(query_texts, top_k)
+
+    def search_similar_metrics(self, metric_name: str, top_k: int = 10) -> List[LocalMatch]:
+        return self.search_by_text(metric_name, top_k=top_k)
+
+    def search_operators(self, query_text: str, top_k: int = 10) -> List[LocalMatch]:
+        return self.search_operators_batch([query_text], top_k)[0]
+
+    def search_operators_batch(self, query_texts: List[str], top_k: int = 10) -> List[List[LocalMatch]]:
+        return self.index.search("operators", query_texts, top_k)
+
+    def search_data_fields(self, query_text: str, top_k: int = 10) -> List[LocalMatch]:
+        return self.search_data_fields_batch([query_text], top_k)[0]
+
+    def search_data_fields_batch(self, query_texts: List[str], top_k: int = 10) -> List[List[LocalMatch]]:
+        return self.index.search("data-fields", query_texts, top_k)
+
+    def close(self):
+        self.index.close()
+
+
+def main():
+    """Build or query the local vector index."""
+    parser = argparse.ArgumentParser(description="Offline operator and data-field vector index")
+    parser.add_argument("--index-dir", default=os.getenv("LOCAL_VECTOR_INDEX_DIR", DEFAULT_INDEX_DIR),
+                        help="Directory holding the index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build the index from JSON files")
+    build.add_argument("--operators", default="__operator__.json", help="Operators JSON file")
+    build.add_argument("--fields", help="Data fields JSON file (list of WorldQuant Brain data-field objects)")
+    build.add_argument("--embedder", default=None, help="'hashing[:dims]' or 'st:<sentence-transformers model>'")
+    build.add_argument("--ivf-threshold", type=int, default=4096, help="Use IVF above this many rows")
+
+    query = subparsers.add_parser("query", help="Run one or more queries")
+    query.add_argument("namespace", choices=NAMESPACES)
+    query.add_argument("text", nargs="+", help="Query texts")
+    query.add_argument("--top-k", type=int, default=5)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        os.makedirs(args.index_dir, exist_ok=True)
+        index = LocalVectorIndex(args.index_dir, get_embedder(args.embedder))
+        with open(args.operators, "r") as f:
+            records, texts = operator_records(json.load(f))
+        index.add_namespace("operators", records, texts, args.ivf_threshold)
+        print(f"Indexed {len(records)} operators")
+        if args.fields:
+            with open(args.fields, "r") as f:
+                data = json.load(f)
+            records, texts = data_field_records(data.get("results", data) if isinstance(data, dict) else data)
+            index.add_namespace("data-fields", records, texts, args.ivf_threshold)
+            print(f"Indexed {len(records)} data fields")
+    else:
+        client = LocalWorldQuantMinerQuery(args.index_dir)
+        for text, matches in zip(args.text, client.index.search(args.namespace, args.text, args.top_k)):
+            print(f"\n{text}")
+            for i, match in enumerate(matches, 1):
+                print(f"  {i}. {match.id} (Score: {match.score:.4f})")
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -258,6 +258,22 @@ class WorldQuantMinerQuery:
                 print(f"Error in fallback data fields search: {e2}")
                 return []
     
+    def search_by_text_batch(self, query_texts: List[str], top_k: int = 10) -> List[List[Dict]]:
+        """
+        Run several text searches; one result list per query.
+        
+        Pinecone's hosted embeddings take one query per request, so this is a
+        plain loop. LocalWorldQuantMinerQuery answers the same call with a
+        single matrix product.
+        """
+        return [self.search_by_text(query_text, top_k=top_k) for query_text in query_texts]
+    
+    def search_operators_batch(self, query_texts: List[str], top_k: int = 10) -> List[List[Dict]]:
+        """
+        Run several operator searches; one result list per query.
+        """
+        return [self.search_operators(query_text, top_k=top_k) for query_text in query_texts]
+    
     def analyze_metric_trends(self, metric_pattern: str = None) -> pd.DataFrame:
         """
         Analyze trends in metrics based on timestamps.
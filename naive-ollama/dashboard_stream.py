@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Streaming log and status service for the Alpha Generator web dashboard.
+One background thread follows the logs, keeps a ring buffer of parsed events,
+maintains running statistics and pushes changes to Server-Sent Event clients,
+so the cost of the dashboard does not depend on how many people are watching.
+
+naive-ollama and consultant-naive-ollama are built separately and each ship a
+copy of this module (and of web_dashboard.py). Keep them identical; the root
+check_shared_copies.py reports drift.
+"""
+
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ALPHA_LOG_KEYWORDS = [
+    'alpha', 'generator', 'generating', 'ollama', 'model', 'prompt',
+    'response', 'idea', 'factor', 'worldquant', 'submission'
+]
+
+
+def classify_message(text: str) -> str:
+    """Get the event type from a log line."""
+    if "INFO" in text:
+        return "info"
+    if "ERROR" in text:
+        return "error"
+    if "WARNING" in text:
+        return "warning"
+    return "debug"
+
+
+def parse_log_line(line: str) -> Optional[Dict]:
+    """Parse a Docker or standard log line into an activity event."""
+    line = line.strip()
+    if not line or line.startswith('---'):
+        return None
+    try:
+        if 'time=' in line:
+            # Docker log format: time=2025-08-10T21:48:18.314Z level=INFO source=server.go:637 msg="..."
+            parts = line.split('msg="')
+            if len(parts) > 1:
+                timestamp_part = parts[0].split('time=')[1].split(' ')[0]
+                timestamp = datetime.fromisoformat(timestamp_part.replace('Z', '+00:00'))
+                return {
+                    "timestamp": timestamp.isoformat(),
+                    "message": parts[1].rstrip('"'),
+                    "type": classify_message(line)
+                }
+        elif ' - ' in line:
+            # Standard log format
+            timestamp_str, message = line.split(' - ', 1)
+            timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00').replace(',', '.'))
+            return {
+                "timestamp": timestamp.isoformat(),
+                "message": message,
+                "type": classify_message(message)
+            }
+    except Exception:
+        pass
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "message": line,
+        "type": "unknown"
+    }
+
+
+class LogFileTailer:
+    """Follow a log file by byte offset, surviving truncation and rotation."""
+
+    def __init__(self, path: str, backlog_bytes: int = 64 * 1024):
+        self.path = path
+        self.backlog_bytes = backlog_bytes
+        self._offset = None
+        self._inode = None
+        self._partial = b""
+
+    def poll(self) -> List[str]:
+        """Get the complete lines appended since the last poll."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return []
+
+        first_read = self._offset is None
+        if first_read or stat.st_ino != self._inode or stat.st_size < self._offset:
+            # New, rotated or truncated file: seed from its tail on first read, else start over
+            self._offset = max(0, stat.st_size - self.backlog_bytes) if first_read else 0
+            self._inode = stat.st_ino
+            self._partial = b""
+            skip_partial_line = first_read and self._offset > 0
+        else:
+            skip_partial_line = False
+
+        if stat.st_size == self._offset:
+            return []
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read()
+            self._offset = f.tell()
+
+        # Work on bytes so a line (or character) split across polls stays intact
+        lines = (self._partial + chunk).split(b'\n')
+        self._partial = lines.pop()
+        if skip_partial_line and lines:
+            lines = lines[1:]
+        return [line.decode('utf-8', errors='replace') for line in lines]
+
+
+class DockerLogFollower:
+    """Follow a container with a single long-lived `docker logs -f` process."""
+
+    def __init__(self, container: str, on_line: Callable[[str], None], backlog_lines: int = 200):
+        self.container = container
+        self.on_line = on_line
+        self.backlog_lines = backlog_lines
+        self.available = True
+        self._process = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_line_time = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="docker-log-follower", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._process and self._process.poll() is None:
+            self._process.terminate()
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            command = ["docker", "logs", "-f", self.container]
+            if self._last_line_time is None:
+                command[3:3] = ["--tail", str(self.backlog_lines)]
+            else:
+                # Reconnect after a container restart without replaying old lines
+                command[3:3] = ["--since", str(int(self._last_line_time))]
+            received = 0
+            try:
+                self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                                 text=True, bufsize=1, errors='replace')
+                for line in self._process.stdout:
+                    received += 1
+                    self._last_line_time = time.time()
+                    self.on_line(line)
+                returncode = self._process.wait()
+            except FileNotFoundError:
+                returncode = -1
+            except Exception as e:
+                logger.warning(f"Docker log follower error: {e}")
+                returncode = -1
+
+            if self._stop.is_set():
+                break
+            if received:
+                backoff = 1
+            if returncode != 0 and received == 0 and self._last_line_time is None:
+                # No docker or no such container: the stream falls back to the local log file
+                logger.warning(f"Docker logs unavailable for {self.container}, using local log file")
+                self.available = False
+                break
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+class ResultsStatistics:
+    """Running alpha statistics over the results directory.
+
+    Only new or modified result files are parsed; unchanged files are
+    recognized from their modification time and size.
+    """
+
+    def __init__(self, results_dir: str):
+        self.results_dir = results_dir
+        self._files = {}  # name -> (mtime, size, successful or None when unreadable)
+
+    def refresh(self) -> bool:
+        """Pick up changed result files. Returns True if anything changed."""
+        if not os.path.exists(self.results_dir):
+            changed = bool(self._files)
+            self._files = {}
+            return changed
+
+        changed = False
+        seen = set()
+        with os.scandir(self.results_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                known = self._files.get(entry.name)
+                if known and known[0] == stat.st_mtime and known[1] == stat.st_size:
+                    continue
+                try:
+                    with open(entry.path, 'r') as f:
+                        data = json.load(f)
+                    successful = bool(data and len(data) > 0)
+                except Exception:
+                    successful = None
+                self._files[entry.name] = (stat.st_mtime, stat.st_size, successful)
+                changed = True
+
+        for name in set(self._files) - seen:
+            del self._files[name]
+            changed = True
+        return changed
+
+    def snapshot(self) -> Dict:
+        """Get statistics about generated alphas and results."""
+        stats = {
+            "total_alphas_generated": len(self._files),
+            "successful_alphas": 0,
+            "failed_alphas": 0,
+            "last_24h_generated": 0,
+            "last_24h_successful": 0
+        }
+        cutoff = (datetime.now() - timedelta(hours=24)).timestamp()
+        for mtime, _, successful in self._files.values():
+            if successful:
+                stats["successful_alphas"] += 1
+            elif successful is None:
+                stats["failed_alphas"] += 1
+            if mtime > cutoff:
+                stats["last_24h_generated"] += 1
+                if successful:
+                    stats["last_24h_successful"] += 1
+        return stats
+
+
+class DashboardStream:
+    """Shared log/status state for all dashboard viewers."""
+
+    def __init__(self, dashboard, container: str = "naive-ollma-gpu", buffer_size: int = 1000,
+                 poll_interval: float = 1.0, probe_intervals: Optional[Dict[str, float]] = None):
+        """
+        Initialize the dashboard stream.
+
+        Args:
+            dashboard: AlphaDashboard providing the GPU/Ollama/WorldQuant probes
+            container: Docker container whose logs are followed
+            buffer_size: Number of parsed log events kept in memory
+            poll_interval: Seconds between log file polls and housekeeping ticks
+            probe_intervals: Seconds between runs of each status probe
+        """
+        self.dashboard = dashboard
+        self.container = container
+        self.poll_interval = poll_interval
+        self.probe_intervals = {
+            "gpu": 10, "ollama": 15, "worldquant": 600, "statistics": 10, "schedule": 60
+        }
+        self.probe_intervals.update(probe_intervals or {})
+
+        self._events = deque(maxlen=buffer_size)  # (seq, event, raw line, json)
+        self._seq = 0
+        self._version = 0
+        self._condition = threading.Condition()
+        # Ticks run on the stream thread and on /api/refresh; the tailer and probe times aren't thread-safe
+        self._tick_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+        self._status = {
+            "gpu": {"status": "unknown", "error": "GPU information not available"},
+            "ollama": {"status": "unknown"},
+            "worldquant": {"status": "unknown", "message": "Could not verify connection"},
+        }
+        self._last_probe = {}
+        self._orchestrator_match = None  # (seq, status) of the latest line that says something about the orchestrator
+        self._next_submission = None
+        self._submission_mtime = None
+        self._snapshot = None
+        self._snapshot_json = None
+        self._snapshot_version = -1
+
+        self.statistics = ResultsStatistics(dashboard.results_dir)
+        self.docker = DockerLogFollower(container, self._on_line)
+        self.file_tailer = LogFileTailer(dashboard.log_file)
+
+    # ----- lifecycle ------------------------------------------------------
+
+    def start(self):
+        """Start following logs; safe to call more than once."""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="dashboard-stream", daemon=True)
+        self.docker.start()
+        self._thread.start()
+        logger.info(f"Dashboard stream started (container {self.container}, log file {self.dashboard.log_file})")
+
+    def stop(self):
+        self._stop.set()
+        self.docker.stop()
+        with self._condition:
+            self._condition.notify_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.warning(f"Dashboard stream tick failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def tick(self, force: bool = False):
+        """Poll the log file and run any status probes that are due (all of them if force)."""
+        with self._tick_lock:
+            self._tick(force)
+
+    def _tick(self, force: bool):
+        if not self.docker.available:
+            for line in self.file_tailer.poll():
+                self._on_line(line)
+
+        if force:
+            self._last_probe.clear()
+        now = time.time()
+        changed = False
+        probes = {
+            "gpu": lambda: self._set_status("gpu", self.dashboard.get_gpu_status()),
+            "ollama": lambda: self._set_status("ollama", self.dashboard.get_ollama_status()),
+            "worldquant": lambda: self._set_status("worldquant", self.dashboard.get_worldquant_status()),
+            "statistics": self.statistics.refresh,
+            "schedule": self._refresh_submission_schedule,
+        }
+        for name, probe in probes.items():
+            if now - self._last_probe.get(name, 0) >= self.probe_intervals[name]:
+                self._last_probe[name] = now
+                changed = bool(probe()) or changed
+        if changed:
+            self._bump()
+
+    def refresh_now(self):
+        """Run every probe now, after any tick already in progress."""
+        self.tick(force=True)
+
+    # ----- updates --------------------------------------------------------
+
+    def _bump(self):
+        with self._condition:
+            self._version += 1
+            self._condition.notify_all()
+
+    def _set_status(self, name: str, value: Dict) -> bool:
+        if self._status.get(name) == value:
+            return False
+        self._status[name] = value
+        return True
+
+    def _refresh_submission_schedule(self) -> bool:
+        path = self.dashboard.submission_log_file
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return False
+        if mtime == self._submission_mtime:
+            return False
+        self._submission_mtime = mtime
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            last_submission = data.get("last_submission_date")
+            if last_submission:
+                next_submission = datetime.fromisoformat(last_submission) + timedelta(days=1)
+                next_submission = next_submission.replace(hour=14, minute=0, second=0, microsecond=0)
+                self._next_submission = next_submission.isoformat()
+        except Exception as e:
+            logger.warning(f"Could not read submission schedule: {e}")
+        return True
+
+    def _on_line(self, line: str):
+        event = parse_log_line(line)
+        if event is None:
+            return
+        raw = line.strip()
+        with self._condition:
+            self._seq += 1
+            event["id"] = self._seq
+            self._events.append((self._seq, event, raw, json.dumps(dict(event, line=raw))))
+
+            # Orchestrator state follows the most recent line that says something about it
+            if any(keyword in raw for keyword in ["alpha generator", "generating alpha", "Running alpha", "alpha idea"]):
+                self._orchestrator_match = (self._seq, "active")
+            elif any(keyword in raw for keyword in ["Error", "Failed", "Exception"]):
+                self._orchestrator_match = (self._seq, "error")
+            elif "ollama" in raw.lower() and "started" in raw.lower():
+                self._orchestrator_match = (self._seq, "active")
+
+            self._version += 1
+            self._condition.notify_all()
+
+    # ----- reads ----------------------------------------------------------
+
+    @property
+    def last_event_id(self) -> int:
+        return self._seq
+
+    def recent_lines(self, lines: int = 50, alpha_only: bool = False) -> List[str]:
+        """Get the most recent raw log lines from the ring buffer."""
+        with self._condition:
+            buffered = [raw for _, _, raw, _ in self._events]
+        if alpha_only:
+            buffered = [raw for raw in buffered if any(k in raw.lower() for k in ALPHA_LOG_KEYWORDS)]
+        return buffered[-lines:] if lines > 0 else []
+
+    def recent_activity(self, count: int = 10) -> List[Dict]:
+        with self._condition:
+            return [event for _, event, _, _ in list(self._events)[-count:]]
+
+    def events_since(self, last_id: int):
+        """Get the newest event id and the serialized events newer than last_id."""
+        with self._condition:
+            if not self._events or self._events[-1][0] <= last_id:
+                return last_id, []
+            return self._events[-1][0], [payload for seq, _, _, payload in self._events if seq > last_id]
+
+    def orchestrator_status(self) -> Dict:
+        status = {
+            "status": "unknown",
+            "last_activity": None,
+            "current_mode": "continuous",
+            "next_mining": None,
+            "next_submission": self._next_submission
+        }
+        with self._condition:
+            if self._events:
+                status["last_activity"] = self._events[-1][2]
+            # Like the old `docker logs --tail 50` scan: only the last 50 lines count
+            if self._orchestrator_match and self._seq - self._orchestrator_match[0] < 50:
+                status["status"] = self._orchestrator_match[1]
+
+        # Next mining time (every 6 hours)
+        now = datetime.now()
+        hours_since_midnight = now.hour + now.minute / 60
+        next_mining_hour = ((int(hours_since_midnight // 6) + 1) * 6) % 24
+        next_mining = now.replace(hour=int(next_mining_hour), minute=0, second=0, microsecond=0)
+        if next_mining <= now:
+            next_mining += timedelta(days=1)
+        status["next_mining"] = next_mining.isoformat()
+        return status
+
+    def snapshot(self) -> Dict:
+        """Get the current system status, rebuilt at most once per change."""
+        with self._condition:
+            version = self._version
+            if self._snapshot is not None and self._snapshot_version == version:
+                return self._snapshot
+        snapshot = {
+            "timestamp": datetime.now().isoformat(),
+            "gpu": self._status["gpu"],
+            "ollama": self._status["ollama"],
+            "orchestrator": self.orchestrator_status(),
+            "worldquant": self._status["worldquant"],
+            "recent_activity": self.recent_activity(10),
+            "statistics": self.statistics.snapshot(),
+            "last_event_id": self._seq
+        }
+        with self._condition:
+            self._snapshot = snapshot
+            self._snapshot_json = json.dumps(snapshot)
+            self._snapshot_version = version
+        return snapshot
+
+    def snapshot_json(self) -> str:
+        self.snapshot()
+        return self._snapshot_json
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        """Block until the stream version moves past `version` or the timeout expires."""
+        with self._condition:
+            if self._version == version and not self._stop.is_set():
+                self._condition.wait(timeout)
+            return self._version
+
+    def sse(self, last_event_id: int = 0, heartbeat: float = 15.0, min_interval: float = 0.5) -> Iterator[str]:
+        """Server-Sent Events: a status snapshot, then new log events and status changes."""
+        version = self._version
+        yield f"event: status\ndata: {self.snapshot_json()}\n\n"
+        last_id, missed = self.events_since(last_event_id or max(0, self._seq - 50))
+        if missed:
+            yield f"id: {last_id}\nevent: log\ndata: [{','.join(missed)}]\n\n"
+
+        while not self._stop.is_set():
+            new_version = self.wait_for_change(version, heartbeat)
+            if new_version == version:
+                yield ": keepalive\n\n"
+                continue
+            # Coalesce bursts of log lines into one message per interval
+            self._stop.wait(min_interval)
+            version = self._version
+            last_id, new_events = self.events_since(last_id)
+            if new_events:
+                yield f"id: {last_id}\nevent: log\ndata: [{','.join(new_events)}]\n\n"
+            yield f"event: status\ndata: {self.snapshot_json()}\n\n"